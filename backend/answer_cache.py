@@ -0,0 +1,254 @@
+"""
+Pamięć podręczna odpowiedzi silnika RAG
+
+Klucz odpowiedzi składa się ze znormalizowanego pytania, zbioru identyfikatorów
+źródeł wraz ze skrótami ich treści oraz wersji szablonu promptu — zmiana
+dowolnego źródła lub promptu unieważnia wpis. Opcjonalnie, przy podanej funkcji
+embeddingów, pytania sparafrazowane są dopasowywane po podobieństwie kosinusowym
+w obrębie tego samego zbioru źródeł.
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]", re.UNICODE)
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Normalizacja pytania: małe litery, bez interpunkcji i nadmiarowych spacji"""
+    question = PUNCTUATION_RE.sub(" ", question.lower())
+    return WHITESPACE_RE.sub(" ", question).strip()
+
+
+def sources_fingerprint(search_results: Sequence[Dict[str, Any]]) -> str:
+    """Skrót zbioru źródeł: identyfikatory wraz ze skrótami treści, niezależnie od kolejności"""
+    items = sorted(
+        (
+            str(result.get("id", "")),
+            hashlib.sha1(str(result.get("source", {}).get("content", "")).encode("utf-8")).hexdigest()
+        )
+        for result in search_results
+    )
+    return hashlib.sha1(json.dumps(items).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    """Wpis pamięci podręcznej odpowiedzi"""
+
+    answer: str
+    sources: List[Dict[str, Any]]
+    context_stats: Dict[str, int] = field(default_factory=dict)
+    latency_ms: float = 0.0  # Czas wygenerowania oryginalnej odpowiedzi
+
+    def to_json(self) -> str:
+        return json.dumps(self.__dict__, default=str)
+
+    @classmethod
+    def from_json(cls, raw) -> "CachedAnswer":
+        return cls(**json.loads(raw))
+
+
+class InMemoryCacheBackend:
+    """
+    Pamięć podręczna w procesie z wymianą LRU i czasem życia wpisów
+
+    Wartości nie są serializowane, więc poza tekstem JSON odpowiedzi mogą to być
+    dowolne obiekty (np. listy wyników wyszukiwania w ElasticsearchClient).
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Pamięć podręczna w Redisie (współdzielona między procesami), wymiana wg TTL"""
+
+    def __init__(self, url: str, ttl: float = 3600.0, prefix: str = "answer-cache:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Pamięć podręczna odpowiedzi w Redisie (ANSWER_CACHE_BACKEND=redis) wymaga pakietu redis")
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str):
+        self.client.set(self.prefix + key, value, ex=int(self.ttl))
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+class AnswerCache:
+    """Pamięć podręczna odpowiedzi z opcjonalnym wyszukiwaniem semantycznym"""
+
+    def __init__(
+        self,
+        backend,
+        prompt_version: str,
+        embed_fn: Optional[Callable[[str], Sequence[float]]] = None,
+        similarity_threshold: float = 0.92,
+        max_semantic_entries: int = 1000
+    ):
+        """
+        Inicjalizacja
+
+        Args:
+            backend: Magazyn wpisów (InMemoryCacheBackend lub RedisCacheBackend)
+            prompt_version: Wersja szablonu promptu, wchodząca w skład klucza
+            embed_fn: Funkcja zwracająca embedding pytania (None wyłącza dopasowanie semantyczne)
+            similarity_threshold: Minimalne podobieństwo kosinusowe parafrazy
+            max_semantic_entries: Maksymalna liczba pytań przechowywanych do dopasowania semantycznego
+        """
+        self.backend = backend
+        self.prompt_version = prompt_version
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.max_semantic_entries = max_semantic_entries
+        # Embeddingi pytań pogrupowane według zbioru źródeł: scope -> [(embedding, klucz)]
+        self._semantic: "OrderedDict[str, List[Tuple[List[float], str]]]" = OrderedDict()
+        self._semantic_size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._saved_ms = 0.0
+
+    def get(self, question: str, search_results: Sequence[Dict[str, Any]]) -> Optional[CachedAnswer]:
+        """Wyszukanie odpowiedzi dla pytania i zbioru źródeł"""
+        scope = self._scope(search_results)
+        raw = self.backend.get(self._key(scope, question))
+        semantic = False
+        if raw is None and self.embed_fn is not None:
+            similar_key = self._find_similar(scope, question)
+            if similar_key is not None:
+                raw = self.backend.get(similar_key)
+                semantic = raw is not None
+
+        with self._lock:
+            if raw is None:
+                self._misses += 1
+                return None
+            cached = CachedAnswer.from_json(raw)
+            self._hits += 1
+            self._semantic_hits += int(semantic)
+            self._saved_ms += cached.latency_ms
+            return cached
+
+    def put(self, question: str, search_results: Sequence[Dict[str, Any]], cached: CachedAnswer):
+        """Zapisanie odpowiedzi"""
+        scope = self._scope(search_results)
+        key = self._key(scope, question)
+        self.backend.set(key, cached.to_json())
+        if self.embed_fn is not None:
+            self._remember_embedding(scope, question, key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Metryki: trafienia, chybienia, współczynnik trafień i zaoszczędzony czas"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "saved_latency_ms": round(self._saved_ms, 3),
+            }
+
+    def _scope(self, search_results) -> str:
+        return f"{self.prompt_version}:{sources_fingerprint(search_results)}"
+
+    @staticmethod
+    def _key(scope: str, question: str) -> str:
+        digest = hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()
+        return f"{scope}:{digest}"
+
+    def _remember_embedding(self, scope: str, question: str, key: str):
+        embedding = list(self.embed_fn(normalize_question(question)))
+        with self._lock:
+            entries = self._semantic.setdefault(scope, [])
+            entries.append((embedding, key))
+            self._semantic.move_to_end(scope)
+            self._semantic_size += 1
+            # Usuwanie najdawniej używanych zakresów po przekroczeniu limitu
+            while self._semantic_size > self.max_semantic_entries and self._semantic:
+                _, removed = self._semantic.popitem(last=False)
+                self._semantic_size -= len(removed)
+
+    def _find_similar(self, scope: str, question: str) -> Optional[str]:
+        with self._lock:
+            entries = list(self._semantic.get(scope, []))
+        if not entries:
+            return None
+        embedding = list(self.embed_fn(normalize_question(question)))
+        best_key, best_similarity = None, self.similarity_threshold
+        for candidate, key in entries:
+            similarity = cosine_similarity(embedding, candidate)
+            if similarity >= best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key
+
+
+def cosine_similarity(first: Sequence[float], second: Sequence[float]) -> float:
+    """Podobieństwo kosinusowe dwóch wektorów"""
+    dot = sum(a * b for a, b in zip(first, second))
+    norm = math.sqrt(sum(a * a for a in first)) * math.sqrt(sum(b * b for b in second))
+    return dot / norm if norm else 0.0
+
+
+def build_answer_cache(backend: str, prompt_version: str, max_entries: int = 1000, ttl: float = 3600.0,
+                       redis_url: Optional[str] = None, embed_fn=None,
+                       similarity_threshold: float = 0.92) -> Optional[AnswerCache]:
+    """
+    Utworzenie pamięci podręcznej odpowiedzi na podstawie konfiguracji
+
+    Args:
+        backend: "memory", "redis" lub "none" (wyłączona)
+    """
+    if backend == "none":
+        return None
+    if backend == "redis":
+        store = RedisCacheBackend(redis_url, ttl=ttl)
+    elif backend == "memory":
+        store = InMemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+    else:
+        raise ValueError(f"Nieznany typ pamięci podręcznej odpowiedzi: {backend}")
+    return AnswerCache(store, prompt_version, embed_fn=embed_fn, similarity_threshold=similarity_threshold)
@@ -1,19 +1,32 @@
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Request
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 import os
+import threading
+import time
 
 import models
 from database import get_db
+from offload import run_cpu, run_io
 
 # Security configuration
 SECRET_KEY = os.getenv("JWT_SECRET", "supersecret_replace_in_production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# Authenticated-user cache: how long a looked-up user is trusted before re-reading it
+USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+# Trust the uid/active claims embedded in tokens and skip the lookup entirely.
+# Deactivation then only takes effect in this process or when the token expires.
+TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password, hashed_password):
@@ -24,6 +37,124 @@ def get_password_hash(password):
     """Hashowanie hasła"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    """Weryfikacja hasła w puli CPU, bez blokowania pętli zdarzeń"""
+    return await run_cpu(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    """Hashowanie hasła w puli CPU, bez blokowania pętli zdarzeń"""
+    return await run_cpu(get_password_hash, password)
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Tożsamość użytkownika żądania — kopia pól potrzebnych endpointom, niezależna od sesji"""
+    id: int
+    email: str
+    full_name: Optional[str]
+    is_active: bool
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "AuthenticatedUser":
+        return cls(id=user.id, email=user.email, full_name=user.full_name, is_active=bool(user.is_active))
+
+class UserCache:
+    """Pamięć podręczna użytkowników w procesie, kluczowana polem sub tokenu, z TTL i wymianą LRU"""
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Unieważnienia w kolejności czasu; starsze niż ważność tokenu nie są już potrzebne
+        self._revoked: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._claim_hits = 0
+        self._invalidations = 0
+
+    def get(self, sub: str) -> Optional[AuthenticatedUser]:
+        with self._lock:
+            entry = self._entries.get(sub)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[sub]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(sub)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, sub: str, user: AuthenticatedUser):
+        with self._lock:
+            self._entries[sub] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(sub)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, sub: str):
+        """Usunięcie użytkownika z pamięci i odrzucanie jego wcześniejszych tokenów z claimami"""
+        with self._lock:
+            self._entries.pop(sub, None)
+            now = time.time()
+            self._revoked[sub] = now
+            self._revoked.move_to_end(sub)
+            # Tokeny wystawione przed starszymi unieważnieniami już wygasły
+            expired_before = now - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            while self._revoked and next(iter(self._revoked.values())) < expired_before:
+                self._revoked.popitem(last=False)
+            self._invalidations += 1
+
+    def claims_valid(self, sub: str, issued_at: Optional[float]) -> bool:
+        """Czy claimy tokenu wystawionego w chwili issued_at nie zostały unieważnione"""
+        with self._lock:
+            revoked_at = self._revoked.get(sub)
+            if revoked_at is not None and (issued_at is None or issued_at <= revoked_at):
+                return False
+            self._claim_hits += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "token_claim_hits": self._claim_hits,
+                "invalidations": self._invalidations,
+                "revoked": len(self._revoked),
+            }
+
+user_cache = UserCache(ttl=USER_CACHE_TTL, max_entries=USER_CACHE_SIZE)
+
+def get_user_cache_stats() -> Dict[str, Any]:
+    """Metryki pamięci podręcznej użytkowników"""
+    return user_cache.stats()
+
+@event.listens_for(models.User, "after_update")
+def _invalidate_changed_user(mapper, connection, target):
+    """Unieważnienie wpisu po dezaktywacji, zmianie hasła lub adresu email użytkownika"""
+    state = inspect(target)
+    changed = [
+        name for name in ("is_active", "hashed_password", "email")
+        if state.attrs[name].history.has_changes()
+    ]
+    if not changed:
+        return
+    user_cache.invalidate(target.email)
+    email_history = state.attrs["email"].history
+    for previous_email in email_history.deleted or ():
+        user_cache.invalidate(previous_email)
+
+@event.listens_for(models.User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    user_cache.invalidate(target.email)
+
+def token_claims(user) -> Dict[str, Any]:
+    """Claimy tokenu: sub (email) oraz id i status użytkownika, pozwalające pominąć odczyt z bazy"""
+    return {"sub": user.email, "uid": user.id, "active": bool(user.is_active), "name": user.full_name}
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Tworzenie tokenu JWT"""
     to_encode = data.copy()
@@ -31,12 +162,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(request: Request, db: Session) -> Optional[models.User]:
-    """Get current user from JWT token in Authorization header"""
+async def get_current_user(request: Request, db: Session) -> Optional[AuthenticatedUser]:
+    """Get current user from JWT token in Authorization header
+
+    The user is resolved from the token claims (when trusted), then the
+    per-process user cache, and only then from the database.
+    """
     # Always allow OPTIONS requests
     if request.method == "OPTIONS":
         return None
@@ -73,16 +208,29 @@ async def get_current_user(request: Request, db: Session) -> Optional[models.Use
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    if TRUST_TOKEN_CLAIMS and "uid" in payload and "active" in payload:
+        if user_cache.claims_valid(email, payload.get("iat")):
+            return AuthenticatedUser(
+                id=payload["uid"],
+                email=email,
+                full_name=payload.get("name"),
+                is_active=bool(payload["active"])
+            )
+
+    user = user_cache.get(email)
+    if user is None:
+        db_user = await run_io(lambda: db.query(models.User).filter(models.User.email == email).first())
+        if not db_user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user = AuthenticatedUser.from_model(db_user)
+        user_cache.put(email, user)
     return user
 
-async def get_current_active_user(request: Request, db: Session) -> Optional[models.User]:
+async def get_current_active_user(request: Request, db: Session) -> Optional[AuthenticatedUser]:
     """Get current active user"""
     # Always allow OPTIONS requests
     if request.method == "OPTIONS":
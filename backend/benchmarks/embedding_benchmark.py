@@ -0,0 +1,144 @@
+"""
+Koszt embeddingów: teksty pojedynczo, dynamiczne partie i pamięć podręczna
+
+Fragmenty orzeczeń i aktów z mocks/fixtures (powielone do --passages) są
+liczone trzema sposobami:
+1. indeksowanie — każdy fragment osobnym wywołaniem modelu, potem ta sama lista
+   przez BatchingEmbedder,
+2. zapytania — --clients wątków zadaje po jednym pytaniu naraz, bezpośrednio
+   do modelu i przez BatchingEmbedder,
+3. ponowne indeksowanie niezmienionych fragmentów z EmbeddingCache (pierwszy
+   przebieg wypełnia pamięć, drugi tylko ją czyta).
+
+Backend "simulated" imituje model na CPU: każde wywołanie kosztuje stały
+narzut plus czas na tekst, a wywołania nie biegną równolegle (inferencja
+zajmuje wszystkie rdzenie). Backend "onnx" wymaga onnxruntime, tokenizers
+i modelu w EMBEDDING_ONNX_PATH.
+
+Przykład:
+    python benchmarks/embedding_benchmark.py --backend onnx --passages 2000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from chunking import chunk_text  # noqa: E402
+from config import settings  # noqa: E402
+from embeddings import BatchingEmbedder, CachedEmbedder, Embedder, EmbeddingCache, build_embedder  # noqa: E402
+from mocks.legal_api_server import FIXTURES_DIR  # noqa: E402
+
+
+class SimulatedModel(Embedder):
+    """Model o koszcie call_ms na wywołanie i text_ms na tekst, jedno wywołanie naraz"""
+
+    name = "simulated"
+    dimensions = 384
+    batched = True
+
+    def __init__(self, call_ms: float, text_ms: float):
+        self.call_ms = call_ms
+        self.text_ms = text_ms
+        self._lock = threading.Lock()
+
+    def embed(self, texts):
+        with self._lock:
+            time.sleep((self.call_ms + self.text_ms * len(texts)) / 1000)
+        return [[1.0] + [0.0] * (self.dimensions - 1) for _ in texts]
+
+
+def load_passages(count):
+    with open(os.path.join(FIXTURES_DIR, "saos.json"), encoding="utf-8") as f:
+        texts = [judgment["textContent"] for judgment in json.load(f)["judgments"]]
+    with open(os.path.join(FIXTURES_DIR, "isap.json"), encoding="utf-8") as f:
+        texts += [act["text_html"] for act in json.load(f)["acts"]]
+    passages = [
+        passage.text
+        for number, html in enumerate(texts)
+        for passage in chunk_text(BeautifulSoup(html, "lxml").get_text("\n", strip=True), str(number), 128, 16)
+    ]
+    # Powielenie z numerem, żeby każdy tekst był inny (inaczej pamięć trafiałaby w obrębie przebiegu)
+    return [f"{passages[number % len(passages)]} [{number}]" for number in range(count)]
+
+
+def timed(call):
+    started = time.perf_counter()
+    call()
+    return time.perf_counter() - started
+
+
+def concurrent_queries(embedder, questions, clients):
+    def client(offset):
+        for question in questions[offset::clients]:
+            embedder.embed_one(question)
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def run(args):
+    if args.backend == "simulated":
+        model = SimulatedModel(args.call_ms, args.text_ms)
+    else:
+        model = build_embedder(args.backend, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS,
+                               model_dir=settings.EMBEDDING_ONNX_PATH, threads=settings.EMBEDDING_THREADS)
+        if model is None:
+            sys.exit(f"Backend embeddingów {args.backend} jest niedostępny")
+    passages = load_passages(args.passages)
+    questions = [f"Jakie są skutki {passage[:60]}?" for passage in passages[:args.queries]]
+    batcher = BatchingEmbedder(model, args.batch_size, args.wait_ms / 1000)
+    print(f"{model.name}: {len(passages)} fragmentów, {len(questions)} pytań, {args.clients} klientów, "
+          f"partie do {args.batch_size} / {args.wait_ms} ms\n")
+
+    single = timed(lambda: [model.embed_one(passage) for passage in passages])
+    batched = timed(lambda: batcher.embed(passages))
+    print(f"{'indeksowanie':<34} {'s':>8} {'tekstów/s':>10}")
+    print(f"{'  pojedynczo':<34} {single:>8.2f} {len(passages) / single:>10.0f}")
+    print(f"{'  partie':<34} {batched:>8.2f} {len(passages) / batched:>10.0f}")
+
+    direct = concurrent_queries(model, questions, args.clients)
+    pooled = concurrent_queries(batcher, questions, args.clients)
+    print(f"\n{'zapytania równoległe':<34} {'s':>8} {'pytań/s':>10}")
+    print(f"{'  bezpośrednio':<34} {direct:>8.2f} {len(questions) / direct:>10.0f}")
+    print(f"{'  partie':<34} {pooled:>8.2f} {len(questions) / pooled:>10.0f}")
+    print(f"  {batcher.stats()}")
+
+    cache_dir = tempfile.mkdtemp(prefix="embedding-cache-")
+    try:
+        cache = EmbeddingCache(cache_dir, model.cache_namespace, model.dimensions)
+        cached = CachedEmbedder(batcher, cache)
+        cold = timed(lambda: cached.embed(passages))
+        warm = timed(lambda: cached.embed(passages))
+        print(f"\n{'ponowne indeksowanie':<34} {'s':>8} {'tekstów/s':>10}")
+        print(f"{'  pusta pamięć':<34} {cold:>8.2f} {len(passages) / cold:>10.0f}")
+        print(f"{'  niezmienione teksty':<34} {warm:>8.3f} {len(passages) / warm:>10.0f}")
+        print(f"  {cache.stats()}, plik {os.path.getsize(os.path.join(cache_dir, model.cache_namespace + '.vec')) // 1024} KB")
+        cache.close()
+    finally:
+        batcher.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embeddingi: pojedynczo, w partiach i z pamięci podręcznej")
+    parser.add_argument("--backend", default="simulated", choices=["simulated", "hashing", "onnx", "sentence-transformers"])
+    parser.add_argument("--passages", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16, help="Wątki zadające pytania równocześnie")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--wait-ms", type=float, default=settings.EMBEDDING_BATCH_WAIT_MS)
+    parser.add_argument("--call-ms", type=float, default=4.0, help="Model symulowany: narzut wywołania")
+    parser.add_argument("--text-ms", type=float, default=0.5, help="Model symulowany: koszt tekstu")
+    run(parser.parse_args())
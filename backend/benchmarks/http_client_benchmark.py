@@ -0,0 +1,93 @@
+"""
+Sprawdzenie limitów i ponowień wspólnego klienta HTTP na lokalnej imitacji API
+
+Uruchamia mocks/legal_api_server.py w tle (z opóźnieniem i losowymi błędami
+503), wysyła serię zapytań ISAP i SAOS z wielu wątków oraz z pętli zdarzeń
+i porównuje z limitami: osiągnięte tempo żądań, największą liczbę
+równoległych żądań widzianą przez serwer, liczbę ponowień i błędów.
+
+Przykład:
+    python benchmarks/http_client_benchmark.py --requests 40 --rate 5 --concurrency 2 --fail-rate 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import HostPolicy, PoliteHTTPClient, RetryPolicy  # noqa: E402
+from isap_client import ISAPClient  # noqa: E402
+from mocks import legal_api_server  # noqa: E402
+from saos_client import SAOSClient  # noqa: E402
+
+
+def build_clients(args, base_url, isap_url):
+    policy = HostPolicy(rate=args.rate, burst=args.rate, max_concurrency=args.concurrency)
+    http = PoliteHTTPClient(
+        host_policies={base_url.split("//")[1]: policy, isap_url.split("//")[1]: policy},
+        retry=RetryPolicy(max_attempts=args.attempts, backoff=0.05, backoff_max=1.0)
+    )
+    return http, ISAPClient(f"{isap_url}/eli", http=http), SAOSClient(f"{base_url}/saos/api", http=http)
+
+
+def report(name, elapsed, count, http, states):
+    print(f"\n{name}: {count} zapytań w {elapsed:.2f} s ({count / elapsed:.1f}/s)")
+    for host, stats in http.stats().items():
+        print(f"  klient {host}: {stats}")
+    for state in states:
+        for service, stats in state.stats.items():
+            print(f"  serwer {service}: {stats}")
+        state.reset_stats()
+
+
+def run(args):
+    # Osobne serwery, aby ISAP i SAOS miały własne hosty i własne limity
+    options = dict(latency=args.latency, jitter=args.latency, fail_rate=args.fail_rate)
+    saos_server, saos_state, base_url = legal_api_server.start(**options)
+    isap_server, isap_state, isap_url = legal_api_server.start(**options)
+    keywords = ["Kodeks", "ustawa", "cywilny", "karny", "pracy"]
+
+    http, isap, saos = build_clients(args, base_url, isap_url)
+
+    def call(number):
+        if number % 2:
+            return isap.search_acts([keywords[number % len(keywords)]])
+        return saos.search_judgments([keywords[number % len(keywords)]])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(call, range(args.requests)))
+    report("wątki (klient synchroniczny)", time.perf_counter() - started, args.requests, http, [saos_state, isap_state])
+    http.close()
+
+    http, isap, saos = build_clients(args, base_url, isap_url)
+
+    async def call_async(number):
+        if number % 2:
+            return await isap.asearch_acts([keywords[number % len(keywords)]])
+        return await saos.asearch_judgments([keywords[number % len(keywords)]])
+
+    async def run_async():
+        await asyncio.gather(*(call_async(number) for number in range(args.requests)))
+        await http.aclose()
+
+    started = time.perf_counter()
+    asyncio.run(run_async())
+    report("asyncio (klient asynchroniczny)", time.perf_counter() - started, args.requests, http, [saos_state, isap_state])
+
+    saos_server.shutdown()
+    isap_server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Limity i ponowienia klienta HTTP na imitacji API ISAP/SAOS")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--rate", type=float, default=5.0, help="Żądania na sekundę na host")
+    parser.add_argument("--concurrency", type=int, default=2, help="Równoległe żądania na host")
+    parser.add_argument("--attempts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.1, help="Opóźnienie odpowiedzi serwera (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.2, help="Odsetek odpowiedzi 503")
+    run(parser.parse_args())
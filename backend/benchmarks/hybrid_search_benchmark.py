@@ -0,0 +1,118 @@
+"""
+Porównanie trybów wyszukiwania fragmentów: fuzzy, bm25 i hybrid (BM25 + kNN, RRF)
+
+Tworzy tymczasowy indeks w Elasticsearch (ELASTICSEARCH_URL) z fragmentami
+orzeczeń i aktów z mocks/fixtures oraz dokumentami wypełniającymi
+zbudowanymi z tego samego słownictwa, a następnie zadaje pytania
+sparafrazowane, z odmienionymi formami słów, bez polskich znaków
+i z literówkami. Dla każdego trybu raportuje opóźnienie (mediana, p95)
+oraz trafność: odsetek pytań, dla których oczekiwany dokument jest wśród
+k najlepszych fragmentów.
+
+Przykład:
+    python benchmarks/hybrid_search_benchmark.py --filler 5000 --embedder sentence-transformers
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from chunking import chunk_text  # noqa: E402
+from config import settings  # noqa: E402
+from elasticsearch_client import ElasticsearchClient  # noqa: E402
+from embeddings import build_embedder  # noqa: E402
+from mocks.legal_api_server import FIXTURES_DIR  # noqa: E402
+
+# Pytanie -> dokument, który powinien się znaleźć wśród najlepszych wyników
+QUERIES = [
+    ("który sąd nadaje klauzulę wykonalności aktowi notarialnemu", "judgment-12345"),
+    ("klauzula wykonalnosci akt notarialny dluznik", "judgment-12345"),
+    ("odmowa stwierdzenia nieważności decyzji kolegium", "judgment-67890"),
+    ("obniżenie wartości nieruchomości przez służebność przesyłu", "judgment-24680"),
+    ("sluzebnosc przesylu spadek wartosci", "judgment-24680"),
+    ("zobowiązanie podatkowe określone przez naczelnika urzędu skarbowego", "judgment-13579"),
+    ("kiedy czyn zabroniony podlega odpowiedzialności karnej", "act-WDU19970880553"),
+    ("odpowiedzialnosc karna czyn zabroniony", "act-WDU19970880553"),
+    ("jakie sprawy obejmuje postępowanie sądowe cywilne", "act-WDU19640430296"),
+    ("stosunki cywilnoprawne miedzy osobami fizycznymi", "act-WDU19640160093"),
+    ("przedsiębiorca prowadzący działalność gospodarczą osoba fizyczna", "act-WDU19640160093"),
+    ("kodeks postepowania cywilengo sprawy cywilne", "act-WDU19640430296"),
+]
+
+
+def load_documents():
+    with open(os.path.join(FIXTURES_DIR, "saos.json"), encoding="utf-8") as f:
+        judgments = json.load(f)["judgments"]
+    with open(os.path.join(FIXTURES_DIR, "isap.json"), encoding="utf-8") as f:
+        acts = json.load(f)["acts"]
+    documents = {
+        f"judgment-{judgment['id']}": BeautifulSoup(judgment["textContent"], "lxml").get_text("\n", strip=True)
+        for judgment in judgments if len(judgment.get("textContent", "")) > 100
+    }
+    documents.update({
+        f"act-{act['address']}": BeautifulSoup(act["text_html"], "lxml").get_text("\n", strip=True)
+        for act in acts
+    })
+    return documents
+
+
+def filler_documents(documents, count, seed=7):
+    """Dokumenty z losowo złożonych słów korpusu — konkurują z właściwymi o te same terminy"""
+    words = " ".join(documents.values()).split()
+    rng = random.Random(seed)
+    return {f"filler-{number}": " ".join(rng.choices(words, k=rng.randint(60, 200))) for number in range(count)}
+
+
+def run(args):
+    embedder = build_embedder(args.embedder, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS)
+    if embedder is None:
+        sys.exit(f"Backend embeddingów {args.embedder} jest niedostępny")
+    client = ElasticsearchClient(settings.ELASTICSEARCH_URL, embedder=embedder)
+    index_name = f"hybrid-benchmark-{uuid.uuid4().hex[:8]}"
+    documents = load_documents()
+    corpus = {**documents, **filler_documents(documents, args.filler)}
+
+    try:
+        client.create_case_index(index_name)
+        started = time.perf_counter()
+        for parent_id, text in corpus.items():
+            passages = chunk_text(text, parent_id, settings.RAG_PASSAGE_MAX_TOKENS, settings.RAG_PASSAGE_OVERLAP_TOKENS)
+            client.index_passages(index_name, parent_id, {"type": "document", "title": ""}, passages, replace=False)
+        client.flush()
+        client.es.indices.refresh(index=index_name)
+        print(f"Zindeksowano {len(corpus)} dokumentów ({embedder.name}, {embedder.dimensions} wymiarów) "
+              f"w {time.perf_counter() - started:.1f} s\n")
+
+        print(f"{'tryb':<8} {'mediana ms':>11} {'p95 ms':>8} {f'trafność@{args.k}':>13}")
+        for mode in ("fuzzy", "bm25", "hybrid"):
+            timings, found = [], 0
+            for query, expected in QUERIES:
+                for attempt in range(args.repeat):
+                    started = time.perf_counter()
+                    hits = client.search_passages(index_name, query, size=args.k, mode=mode)
+                    timings.append((time.perf_counter() - started) * 1000)
+                found += any(hit["source"].get("parent_id") == expected for hit in hits)
+            timings.sort()
+            print(f"{mode:<8} {statistics.median(timings):>11.2f} {timings[int(len(timings) * 0.95) - 1]:>8.2f} "
+                  f"{found / len(QUERIES):>13.0%}")
+        print(f"\nStatystyki: {client.search_stats()}")
+    finally:
+        client.delete_index(index_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trafność i opóźnienie trybów wyszukiwania")
+    parser.add_argument("--filler", type=int, default=2000, help="Liczba dokumentów wypełniających")
+    parser.add_argument("--embedder", default="hashing", choices=["hashing", "sentence-transformers"])
+    parser.add_argument("--k", type=int, default=5, help="Liczba fragmentów branych pod uwagę")
+    parser.add_argument("--repeat", type=int, default=5, help="Powtórzenia każdego pytania (pomiar czasu)")
+    run(parser.parse_args())
@@ -0,0 +1,88 @@
+"""
+Odczyt aktu po isap_id: zapytanie do ISAP a lokalny korpus
+
+Uruchamia imitację API ELI z opóźnieniem odpowiedzi, synchronizuje akty
+z mocks/fixtures/isap.json do tymczasowej bazy SQLite (bez Elasticsearch),
+a następnie porównuje czas pobrania metadanych i treści aktu przez
+ISAPClient z odczytem aktu i pojedynczego artykułu z lokalnego korpusu.
+
+Przykład:
+    python benchmarks/isap_corpus_benchmark.py --latency 0.5 --repeat 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import models  # noqa: E402
+from http_client import HostPolicy, PoliteHTTPClient  # noqa: E402
+from isap_client import ISAPClient  # noqa: E402
+from isap_sync import ISAPSync  # noqa: E402
+from mocks import legal_api_server  # noqa: E402
+
+
+def measure(call, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def run(args):
+    server, state, base_url = legal_api_server.start(latency=args.latency)
+    http = PoliteHTTPClient(host_policies={base_url.split("//")[1]: HostPolicy(rate=0, max_concurrency=4)})
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='isap-corpus-'), 'corpus.db')}")
+    models.Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+
+    started = time.perf_counter()
+    result = asyncio.run(ISAPSync(session_factory, None, http=http, base_url=f"{base_url}/eli").run())
+    print(f"synchronizacja: {result['created']} aktów, {result['texts']} tekstów w {time.perf_counter() - started:.2f} s")
+
+    isap = ISAPClient(f"{base_url}/eli", http=http)
+    isap_id = state.acts[0]["address"]
+
+    def live():
+        isap.get_act(isap_id)
+        isap.get_act_content(isap_id)
+
+    def local_act():
+        db = session_factory()
+        try:
+            db.query(models.LegalAct).filter(models.LegalAct.isap_id == isap_id).one()
+        finally:
+            db.close()
+
+    def local_article():
+        db = session_factory()
+        try:
+            db.query(models.LegalActArticle).join(models.LegalAct).filter(
+                models.LegalAct.isap_id == isap_id, models.LegalActArticle.number == "1"
+            ).first()
+        finally:
+            db.close()
+
+    print(f"\n{'odczyt':<28} {'mediana ms':>11} {'maks. ms':>9}")
+    for name, call in (("ISAP (metadane + treść)", live), ("lokalnie: akt", local_act), ("lokalnie: artykuł", local_article)):
+        median, worst = measure(call, args.repeat)
+        print(f"{name:<28} {median:>11.2f} {worst:>9.2f}")
+
+    http.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Odczyt aktu z ISAP a z lokalnego korpusu")
+    parser.add_argument("--latency", type=float, default=0.5, help="Opóźnienie odpowiedzi serwera (s)")
+    parser.add_argument("--repeat", type=int, default=20)
+    run(parser.parse_args())
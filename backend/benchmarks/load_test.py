@@ -0,0 +1,114 @@
+"""
+Test obciążeniowy: mieszany ruch wgrywania dokumentów i listowania spraw
+
+Uruchamia równolegle wątki wgrywające pliki oraz wątki pobierające listę spraw
+i raportuje percentyle opóźnień dla każdego rodzaju zapytania. Pozwala porównać
+opóźnienia ogonowe (p95/p99) listowania w trakcie dużych uploadów.
+
+Przykład:
+    python benchmarks/load_test.py --base-url http://localhost:8000/api \\
+        --uploaders 4 --listers 16 --duration 30 --upload-size-mb 20
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentyl metodą najbliższej rangi"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def authenticate(base_url: str) -> Dict[str, str]:
+    """Rejestracja jednorazowego użytkownika i pobranie tokenu"""
+    email = f"loadtest-{uuid.uuid4().hex[:8]}@example.com"
+    password = uuid.uuid4().hex
+    requests.post(f"{base_url}/users", json={"email": email, "password": password, "full_name": "Load Test"})
+    response = requests.post(f"{base_url}/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def run(args):
+    headers = authenticate(args.base_url)
+    case = requests.post(f"{args.base_url}/cases", json={"title": "Load test"}, headers=headers)
+    case.raise_for_status()
+    case_id = case.json()["id"]
+    payload = os.urandom(args.upload_size_mb * 1024 * 1024)
+
+    latencies: Dict[str, List[float]] = {"upload": [], "list": []}
+    errors: Dict[str, int] = {"upload": 0, "list": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def record(kind, started, ok):
+        with lock:
+            latencies[kind].append(time.perf_counter() - started)
+            if not ok:
+                errors[kind] += 1
+
+    def uploader():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.post(
+                    f"{args.base_url}/cases/{case_id}/documents",
+                    files={"file": ("load.pdf", payload, "application/pdf")},
+                    headers=headers
+                )
+                record("upload", started, response.ok)
+            except requests.RequestException:
+                record("upload", started, False)
+
+    def lister():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.get(f"{args.base_url}/cases", headers=headers)
+                record("list", started, response.ok)
+            except requests.RequestException:
+                record("list", started, False)
+
+    with ThreadPoolExecutor(max_workers=args.uploaders + args.listers) as executor:
+        for _ in range(args.uploaders):
+            executor.submit(uploader)
+        for _ in range(args.listers):
+            executor.submit(lister)
+
+    print(f"{'rodzaj':<8} {'n':>6} {'błędy':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'req/s':>8}")
+    for kind, values in latencies.items():
+        ms = [value * 1000 for value in values]
+        print(
+            f"{kind:<8} {len(ms):>6} {errors[kind]:>6} "
+            f"{(statistics.median(ms) if ms else 0):>9.1f} {percentile(ms, 95):>9.1f} "
+            f"{percentile(ms, 99):>9.1f} {(max(ms) if ms else 0):>9.1f} {len(ms) / args.duration:>8.1f}"
+        )
+
+    try:
+        health = requests.get(f"{args.base_url}/health").json()
+        print("Statystyki pul wątków:", health.get("offload"))
+    except (requests.RequestException, ValueError):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mieszany test obciążeniowy upload + lista spraw")
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--uploaders", type=int, default=4)
+    parser.add_argument("--listers", type=int, default=16)
+    parser.add_argument("--duration", type=int, default=30, help="Czas trwania testu w sekundach")
+    parser.add_argument("--upload-size-mb", type=int, default=10)
+    run(parser.parse_args())
@@ -0,0 +1,138 @@
+"""
+Benchmark przepustowości ścieżki pytań RAG bez dostępu do sieci
+
+Buduje RAGEngine z deterministycznym modelem FakeLLMProvider i syntetycznym
+indeksem fragmentów (bez Elasticsearch), a następnie zadaje pytania z wielu
+wątków równolegle. Raportuje przepustowość, percentyle opóźnień odpowiedzi
+oraz czas do pierwszego tokenu w trybie strumieniowym.
+
+Przykład:
+    python benchmarks/rag_benchmark.py --threads 8 --questions 400 \\
+        --first-token-latency 0.2 --token-latency 0.01 --stream
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import build_answer_cache  # noqa: E402
+from llm_providers import FakeLLMProvider  # noqa: E402
+from rag_engine import PROMPT_VERSION, RAGEngine  # noqa: E402
+
+WORDS = (
+    "umowa strona zobowiązanie świadczenie termin wykonanie odszkodowanie szkoda sąd "
+    "powód pozwany wyrok apelacja kodeks przepis ustawa najem sprzedaż wierzyciel dłużnik"
+).split()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentyl metodą najbliższej rangi"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class SyntheticIndex:
+    """Zamiennik ElasticsearchClient zwracający losowe, ale powtarzalne fragmenty"""
+
+    def __init__(self, passages: int, passage_words: int, seed: int = 0):
+        rng = random.Random(seed)
+        self.passages = [
+            {
+                "id": f"document-1:{number}",
+                "score": 0.0,
+                "source": {
+                    "type": "document",
+                    "title": "Umowa",
+                    "filename": "umowa.pdf",
+                    "parent_id": "document-1",
+                    "heading": f"Art. {number + 1}",
+                    "content": f"Art. {number + 1}. " + " ".join(rng.choice(WORDS) for _ in range(passage_words))
+                }
+            }
+            for number in range(passages)
+        ]
+
+    def search_passages(self, index: str, query: str, size: int = 10) -> List[Dict[str, Any]]:
+        rng = random.Random(query)
+        results = []
+        for passage in rng.sample(self.passages, min(size, len(self.passages))):
+            results.append({**passage, "score": round(rng.uniform(1.0, 10.0), 3)})
+        return sorted(results, key=lambda result: result["score"], reverse=True)
+
+
+def run(args):
+    engine = RAGEngine(
+        SyntheticIndex(args.passages, args.passage_words),
+        context_token_budget=args.token_budget,
+        llm_provider=FakeLLMProvider(
+            first_token_latency=args.first_token_latency,
+            token_latency=args.token_latency
+        ),
+        answer_cache=build_answer_cache("memory", PROMPT_VERSION) if args.cache else None
+    )
+    rng = random.Random(1)
+    questions = [
+        " ".join(rng.choice(WORDS) for _ in range(8)) + "?"
+        for _ in range(args.distinct_questions)
+    ]
+
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    lock = threading.Lock()
+
+    def ask(number: int):
+        question = questions[number % len(questions)]
+        started = time.perf_counter()
+        results = engine.retrieve("case-1", question)
+        if args.stream:
+            for event, data in engine.stream_answer(question, results, started=started):
+                if event == "done":
+                    with lock:
+                        ttfts.append(data["ttft_ms"])
+        else:
+            engine.generate_answer_with_stats(question, results)
+        with lock:
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(ask, range(args.questions)))
+    elapsed = time.perf_counter() - started
+
+    print(f"pytania: {len(latencies)}, wątki: {args.threads}, czas: {elapsed:.2f} s, "
+          f"przepustowość: {len(latencies) / elapsed:.1f} pytań/s")
+    print(f"{'metryka':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, values in (("odpowiedź", latencies), ("ttft", ttfts)):
+        if values:
+            print(
+                f"{name:<10} {statistics.median(values):>9.1f} {percentile(values, 95):>9.1f} "
+                f"{percentile(values, 99):>9.1f} {max(values):>9.1f}"
+            )
+    if engine.cache_stats():
+        print("Pamięć podręczna odpowiedzi:", engine.cache_stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ścieżki pytań RAG z modelem zastępczym")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--distinct-questions", type=int, default=200,
+                        help="Liczba różnych pytań (mniej niż --questions daje trafienia w pamięci podręcznej)")
+    parser.add_argument("--passages", type=int, default=500)
+    parser.add_argument("--passage-words", type=int, default=250)
+    parser.add_argument("--token-budget", type=int, default=3000)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--stream", action="store_true", help="Tryb strumieniowy (mierzy czas do pierwszego tokenu)")
+    parser.add_argument("--cache", action="store_true", help="Włącz pamięć podręczną odpowiedzi")
+    run(parser.parse_args())
@@ -0,0 +1,79 @@
+"""
+Wyszukiwanie kontekstu pytania: źródła po kolei a równolegle
+
+Uruchamia imitację API ISAP i SAOS z opóźnieniem odpowiedzi i porównuje
+czas zebrania kontekstu z trzech źródeł (dokumenty sprawy — symulowane
+opóźnieniem, akty z ISAP, orzeczenia z SAOS) odpytywanych po kolei
+i przez RetrievalOrchestrator. Ostatni przebieg ustawia dla SAOS limit
+czasu krótszy niż opóźnienie serwera, aby pokazać wynik częściowy.
+
+Przykład:
+    python benchmarks/retrieval_benchmark.py --latency 0.5 --case-latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import HostPolicy, PoliteHTTPClient  # noqa: E402
+from isap_client import ISAPClient  # noqa: E402
+from mocks import legal_api_server  # noqa: E402
+from retrieval import RetrievalOrchestrator, RetrievalSource, isap_live_source, saos_live_source  # noqa: E402
+from saos_client import SAOSClient  # noqa: E402
+
+QUESTION = "Jakie przepisy kodeksu cywilnego dotyczą umowy?"
+
+
+def case_source(latency):
+    """Dokumenty sprawy: stałe opóźnienie w miejsce zapytania do Elasticsearch"""
+    async def search(question, size, case_index):
+        await asyncio.sleep(latency)
+        return [
+            {"id": f"doc-{number}", "score": 10.0 - number, "source": {"type": "document", "content": "..."}, "highlights": {}}
+            for number in range(size)
+        ]
+    return RetrievalSource("case", search, timeout=5.0)
+
+
+async def run(args):
+    server, _, base_url = legal_api_server.start(latency=args.latency)
+    http = PoliteHTTPClient(host_policies={base_url.split("//")[1]: HostPolicy(rate=0, max_concurrency=8)})
+    isap = ISAPClient(f"{base_url}/eli", http=http)
+    saos = SAOSClient(f"{base_url}/saos/api", http=http)
+    sources = [
+        case_source(args.case_latency),
+        isap_live_source(isap, size=5, timeout=5.0),
+        saos_live_source(saos, size=5, timeout=5.0, weight=0.6),
+    ]
+
+    started = time.perf_counter()
+    for source in sources:
+        await source.search(QUESTION, 10, "case-1")
+    sequential = time.perf_counter() - started
+
+    orchestrator = RetrievalOrchestrator(sources)
+    started = time.perf_counter()
+    outcome = await orchestrator.retrieve(QUESTION, 10, "case-1")
+    concurrent = time.perf_counter() - started
+
+    print(f"po kolei:   {sequential * 1000:8.1f} ms")
+    print(f"równolegle: {concurrent * 1000:8.1f} ms, wyników {len(outcome.results)}, źródła {outcome.sources}")
+
+    sources[2].timeout = args.latency / 2
+    started = time.perf_counter()
+    outcome = await RetrievalOrchestrator(sources).retrieve(QUESTION, 10, "case-1")
+    print(f"limit SAOS {sources[2].timeout:.2f} s: {(time.perf_counter() - started) * 1000:8.1f} ms, "
+          f"częściowy={outcome.partial}, wyników {len(outcome.results)}, źródła {outcome.sources}")
+
+    await http.aclose()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wyszukiwanie kontekstu po kolei i równolegle")
+    parser.add_argument("--latency", type=float, default=0.5, help="Opóźnienie odpowiedzi ISAP/SAOS (s)")
+    parser.add_argument("--case-latency", type=float, default=0.3, help="Opóźnienie wyszukiwania w dokumentach sprawy (s)")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,120 @@
+"""
+Synchronizacja orzeczeń SAOS na lokalnej imitacji API
+
+Powiela orzeczenia z mocks/fixtures/saos.json do zadanej liczby, uruchamia
+imitację API z opóźnieniem odpowiedzi i losowymi błędami, a następnie:
+- porównuje czas pełnej synchronizacji przy różnej liczbie stron pobieranych równolegle,
+- przerywa przebieg po kilku stronach i sprawdza wznowienie z punktu kontrolnego,
+- zmienia część orzeczeń i sprawdza, że przebieg przyrostowy pobiera tylko zmienione.
+
+Dane trafiają do tymczasowej bazy SQLite (bez Elasticsearch).
+
+Przykład:
+    python benchmarks/saos_sync_benchmark.py --judgments 400 --page-size 20 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import models  # noqa: E402
+from http_client import HostPolicy, PoliteHTTPClient, RetryPolicy  # noqa: E402
+from mocks import legal_api_server  # noqa: E402
+from saos_sync import SAOSSync, format_saos_datetime  # noqa: E402
+
+
+def fresh_database(directory, name):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, name)}")
+    # Pełny schemat z modeli; migracje (PostgreSQL) aktualizują tylko istniejące bazy
+    models.Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def multiply_fixtures(state, count):
+    """Powielenie orzeczeń z fixtures z nowymi identyfikatorami i datami modyfikacji"""
+    base = state.judgments
+    modified = datetime(2021, 1, 1)
+    state.judgments = [
+        {
+            **base[number % len(base)],
+            "id": 100000 + number,
+            "modificationDate": format_saos_datetime(modified + timedelta(minutes=number))
+        }
+        for number in range(count)
+    ]
+
+
+def build_sync(session_factory, base_url, args, parallel_pages):
+    host = base_url.split("//")[1]
+    http = PoliteHTTPClient(
+        host_policies={host: HostPolicy(rate=0, max_concurrency=parallel_pages)},
+        retry=RetryPolicy(max_attempts=6, backoff=0.05, backoff_max=1.0)
+    )
+    return SAOSSync(session_factory, None, http=http, base_url=f"{base_url}/saos/api",
+                    page_size=args.page_size, parallel_pages=parallel_pages, overlap=60)
+
+
+def count_judgments(session_factory):
+    db = session_factory()
+    try:
+        return db.query(models.Judgment).count()
+    finally:
+        db.close()
+
+
+async def run(args):
+    server, state, base_url = legal_api_server.start(latency=args.latency, fail_rate=args.fail_rate)
+    multiply_fixtures(state, args.judgments)
+    directory = tempfile.mkdtemp(prefix="saos-sync-")
+
+    print(f"{'równoległe strony':>18} {'czas s':>8} {'orzeczeń':>9}")
+    for parallel_pages in sorted({1, args.parallel}):
+        session_factory = fresh_database(directory, f"full-{parallel_pages}.db")
+        sync = build_sync(session_factory, base_url, args, parallel_pages)
+        started = time.perf_counter()
+        result = await sync.run()
+        elapsed = time.perf_counter() - started
+        assert result["status"] == "done" and count_judgments(session_factory) == args.judgments
+        print(f"{parallel_pages:>18} {elapsed:>8.2f} {count_judgments(session_factory):>9}")
+
+    # Przerwanie po kilku stronach i wznowienie
+    session_factory = fresh_database(directory, "resume.db")
+    sync = build_sync(session_factory, base_url, args, args.parallel)
+    partial = await sync.run(max_pages=3)
+    checkpoint = sync.load_checkpoint()
+    resumed = await build_sync(session_factory, base_url, args, args.parallel).run()
+    assert partial["status"] == "incomplete" and checkpoint["page"] == 3
+    assert resumed["created"] == args.judgments - partial["created"]
+    print(f"\nwznowienie: przerwano po {partial['created']} orzeczeniach (strona {checkpoint['page']}), "
+          f"dokończono {resumed['created']}, razem {count_judgments(session_factory)}")
+
+    # Przebieg przyrostowy po zmianie części orzeczeń
+    changed = args.judgments // 10
+    now = format_saos_datetime(datetime.utcnow() + timedelta(days=1))
+    for judgment in state.judgments[:changed]:
+        judgment["modificationDate"] = now
+    requests_before = state.stats["saos"]["requests"]
+    incremental = await sync.run()
+    print(f"przyrostowo: zmieniono {changed}, zaktualizowano {incremental['updated']} "
+          f"(w tym zakładka), żądań {state.stats['saos']['requests'] - requests_before}")
+    assert incremental["updated"] >= changed and incremental["created"] == 0
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synchronizacja SAOS na imitacji API")
+    parser.add_argument("--judgments", type=int, default=400)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="Opóźnienie odpowiedzi serwera (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="Odsetek odpowiedzi 503")
+    asyncio.run(run(parser.parse_args()))
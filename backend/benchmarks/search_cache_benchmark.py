@@ -0,0 +1,97 @@
+"""
+Powtórzone wyszukiwania: pamięć podręczna wyników i wyróżnienia na żądanie
+
+Tworzy tymczasowy indeks w Elasticsearch (ELASTICSEARCH_URL) z aktami
+i orzeczeniami z mocks/fixtures (powielonymi do --documents), a następnie
+mierzy czas ElasticsearchClient.search dla tego samego zapytania:
+bez pamięci podręcznej z wyróżnieniami (poprzednie zachowanie), bez pamięci
+bez wyróżnień, z pamięcią (trafienia) oraz z pamięcią i wyróżnieniami.
+
+Przykład:
+    python benchmarks/search_cache_benchmark.py --documents 5000 --repeat 50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from config import settings  # noqa: E402
+from elasticsearch_client import ElasticsearchClient  # noqa: E402
+from mocks.legal_api_server import FIXTURES_DIR  # noqa: E402
+
+
+def load_texts():
+    with open(os.path.join(FIXTURES_DIR, "saos.json"), encoding="utf-8") as f:
+        texts = [judgment["textContent"] for judgment in json.load(f)["judgments"]]
+    with open(os.path.join(FIXTURES_DIR, "isap.json"), encoding="utf-8") as f:
+        texts += [act["text_html"] for act in json.load(f)["acts"]]
+    return [BeautifulSoup(text, "lxml").get_text("\n", strip=True) for text in texts if text]
+
+
+def measure(call, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def run(args):
+    client = ElasticsearchClient(settings.ELASTICSEARCH_URL)
+    index_name = f"search-cache-benchmark-{uuid.uuid4().hex[:8]}"
+    texts = load_texts()
+    try:
+        client.create_case_index(index_name)
+        for number in range(args.documents):
+            client.index_document(index_name, f"document-{number}", {
+                "type": "document",
+                "doc_kind": "document",
+                "title": f"Dokument {number}",
+                "content": texts[number % len(texts)]
+            })
+        client.flush()
+        client.es.indices.refresh(index=index_name)
+        # Wyniki po zapisie są zapamiętywane dopiero po SEARCH_CACHE_SETTLE
+        time.sleep(settings.SEARCH_CACHE_SETTLE)
+
+        def uncached(highlight):
+            def call():
+                client._search_cache = None
+                client.search(index_name, args.query, size=args.size, highlight=highlight)
+            return call
+
+        cache = client._search_cache
+        rows = [("bez pamięci, z wyróżnieniami", uncached(True)), ("bez pamięci, bez wyróżnień", uncached(False))]
+        results = [(name, *measure(call, args.repeat)) for name, call in rows]
+        client._search_cache = cache
+        for name, highlight in (("pamięć, bez wyróżnień", False), ("pamięć, z wyróżnieniami", True)):
+            client.search(index_name, args.query, size=args.size, highlight=highlight)
+            results.append((name, *measure(
+                lambda: client.search(index_name, args.query, size=args.size, highlight=highlight), args.repeat
+            )))
+
+        print(f"{args.documents} dokumentów, zapytanie {args.query!r}, {args.repeat} powtórzeń\n")
+        print(f"{'wariant':<32} {'mediana ms':>11} {'maks. ms':>9}")
+        for name, median, worst in results:
+            print(f"{name:<32} {median:>11.3f} {worst:>9.3f}")
+        print(f"\nStatystyki: {client.search_stats()}")
+    finally:
+        client.delete_index(index_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pamięć podręczna wyników wyszukiwania i wyróżnienia na żądanie")
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--query", default="kodeks cywilny")
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    run(parser.parse_args())
@@ -0,0 +1,118 @@
+"""
+Mikrobenchmark serializacji odpowiedzi JSON
+
+Porównuje dotychczasową ścieżkę (model_dump → json.dumps z CustomJSONEncoder →
+json.loads → ponowna serializacja w JSONResponse) z jednoprzebiegową
+serializacją modelu pydantic prosto do bajtów (pydantic_core.to_json), dla
+kształtów odpowiedzi poszczególnych endpointów.
+
+Przykład:
+    python benchmarks/serialization_benchmark.py --documents 50 --judgments 20 --content-kb 40
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schemas  # noqa: E402
+
+
+class CustomJSONEncoder(json.JSONEncoder):
+    """Koder używany wcześniej w main.py"""
+
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super().default(obj)
+
+
+def old_path(models):
+    """Trzy serializacje: dump do słowników, dumps/loads i render JSONResponse"""
+    if isinstance(models, list):
+        content = [model.model_dump() for model in models]
+    else:
+        content = models.model_dump()
+    content = json.loads(json.dumps(content, cls=CustomJSONEncoder))
+    return JSONResponse(content=content).body
+
+
+def new_path(models):
+    """Jedna serializacja prosto do bajtów"""
+    return to_json(models)
+
+
+def build_case(documents: int, legal_acts: int, judgments: int, content_kb: int) -> schemas.CaseResponse:
+    now = datetime(2024, 1, 1)
+    content = ("Art. 1. Treść przepisu zażółć gęślą jaźń. " * 40)[:1024] * content_kb
+    return schemas.CaseResponse(
+        id=1, title="Sprawa", description="Opis sprawy", case_number="I C 1/24",
+        created_at=now, updated_at=now, owner_id=1,
+        documents=[
+            schemas.DocumentResponse(
+                id=number, title=f"dokument-{number}.pdf", description=None,
+                file_path=f"user-1/case-1/{number}.pdf", file_type="application/pdf",
+                created_at=now + timedelta(minutes=number), case_id=1
+            )
+            for number in range(documents)
+        ],
+        legal_acts=[
+            schemas.LegalActResponse(
+                id=number, title=f"Ustawa {number}", isap_id=f"WDU2024000{number}",
+                publication_date=now, document_type="ustawa", content=content, created_at=now
+            )
+            for number in range(legal_acts)
+        ],
+        judgments=[
+            schemas.JudgmentResponse(
+                id=number, saos_id=number, title=f"Wyrok {number}", case_number=f"II CSK {number}/23",
+                judgment_date=now, court_name="Sąd Najwyższy", court_type="SUPREME",
+                judges=["SSN Jan Kowalski"], keywords=["umowa"], content=content, created_at=now
+            )
+            for number in range(judgments)
+        ]
+    )
+
+
+def build_summaries(count: int):
+    now = datetime(2024, 1, 1)
+    return [
+        schemas.CaseSummary(
+            id=number, title=f"Sprawa {number}", description="Opis", case_number=f"I C {number}/24",
+            created_at=now, updated_at=now, owner_id=1, document_count=3
+        )
+        for number in range(count)
+    ]
+
+
+def run(args):
+    case = build_case(args.documents, args.legal_acts, args.judgments, args.content_kb)
+    payloads = {
+        "GET /cases/{id}": case,
+        "GET /cases": build_summaries(args.page_size),
+        "GET /cases/{id}/documents": case.documents[:args.page_size],
+    }
+    print(f"{'endpoint':<28} {'rozmiar KB':>10} {'stara ms':>10} {'nowa ms':>10} {'przyspieszenie':>15}")
+    for name, models in payloads.items():
+        assert json.loads(old_path(models)) == json.loads(new_path(models))
+        old = min(timeit.repeat(lambda: old_path(models), number=args.iterations, repeat=3)) / args.iterations
+        new = min(timeit.repeat(lambda: new_path(models), number=args.iterations, repeat=3)) / args.iterations
+        size_kb = len(new_path(models)) / 1024
+        print(f"{name:<28} {size_kb:>10.1f} {old * 1000:>10.3f} {new * 1000:>10.3f} {old / new:>14.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Porównanie kosztu serializacji odpowiedzi")
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--legal-acts", type=int, default=10)
+    parser.add_argument("--judgments", type=int, default=20)
+    parser.add_argument("--content-kb", type=int, default=20, help="Rozmiar treści aktu/orzeczenia w KB")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=50)
+    run(parser.parse_args())
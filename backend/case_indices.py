@@ -0,0 +1,417 @@
+"""
+Cykl życia współdzielonych indeksów spraw i migracja indeksów per sprawa
+
+Dokumenty spraw trafiają do indeksów cases-000001, cases-000002, ...
+za aliasem CASE_INDEX_ALIAS, a każda sprawa ma alias case-<id> z filtrem
+i routingiem po case_id (ElasticsearchClient.ensure_case_index). Dzięki temu
+liczba shardów nie rośnie z liczbą spraw, a zapytanie w obrębie sprawy
+trafia do jednego sharda.
+
+Polityka w stylu ILM, wykonywana okresowo przez aplikację (albo ręcznie):
+- rollover — gdy indeks zapisu przekroczy rozmiar shardu, liczbę dokumentów
+  lub wiek, nowe sprawy trafiają do kolejnego indeksu (warunki sprawdza
+  Elasticsearch, więc równoczesne wywołanie z kilku procesów jest bezpieczne),
+- shrink — starszy indeks, do którego od CASE_INDEX_SHRINK_IDLE sekund nic nie
+  zapisano, jest zmniejszany do CASE_INDEX_SHRINK_SHARDS shardów; aliasy spraw
+  przenoszone są na nowy indeks atomowo razem z usunięciem starego. Na czas
+  zmniejszania indeks jest zablokowany do zapisu; shrink przerwany zatrzymaniem
+  procesu cofa polecenie `python case_indices.py unblock <indeks>`.
+
+Migracja (python case_indices.py migrate) kopiuje indeks case-<id> z poprzedniego
+układu do bieżącego indeksu zapisu z routingiem sprawy, a następnie w jednej
+operacji na aliasach usuwa indeks i tworzy alias o tej samej nazwie — zapytania
+i zapisy używające case_index_name działają bez zmian.
+
+Zapisy odrzucone przez blokadę kończą zadania ekstrakcji błędem. Po zdjęciu
+blokady zadania spraw z zablokowanego indeksu zakończone w czasie jej trwania
+wracają do stanu pending i są ponownie zlecane (w aplikacji od razu, po
+migracji z wiersza poleceń — przy następnym przebiegu polityki lub starcie).
+"""
+import argparse
+import asyncio
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config import settings
+from elasticsearch_client import ElasticsearchException, case_index_name
+from offload import run_io
+
+LEGACY_INDEX_RE = re.compile(r"^case-(\d+)$")
+
+# Operacje czekające na przeniesienie shardów lub kopiowanie dokumentów
+LONG_REQUEST_TIMEOUT = 3600
+
+# Zadania zakończone tuż przed blokadą też są ponawiane (zapis z kolejki mógł trafić na blokadę)
+REQUEUE_MARGIN = timedelta(minutes=1)
+
+
+class CaseIndexLifecycle:
+    """Rollover i shrink współdzielonych indeksów spraw oraz migracja indeksów per sprawa"""
+
+    def __init__(self, es_client, alias: Optional[str] = None, session_factory=None,
+                 resume_jobs: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            es_client: Klient Elasticsearch
+            alias: Alias współdzielonych indeksów (domyślnie CASE_INDEX_ALIAS)
+            session_factory: Fabryka sesji SQLAlchemy do ponawiania zadań ekstrakcji po blokadzie zapisu
+            resume_jobs: Zlecenie oczekujących zadań ekstrakcji (np. ExtractionService.resume_pending)
+        """
+        self.es_client = es_client
+        self.es = es_client.es
+        self.alias = alias or settings.CASE_INDEX_ALIAS
+        self.session_factory = session_factory
+        self.resume_jobs = resume_jobs
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "runs": 0, "rollovers": 0, "shrinks": 0, "migrated": 0, "requeued": 0, "errors": 0,
+            "last_run": None, "last_error": None
+        }
+
+    def rollover_conditions(self) -> Dict[str, Any]:
+        conditions: Dict[str, Any] = {}
+        if settings.CASE_INDEX_ROLLOVER_MAX_SHARD_SIZE:
+            conditions["max_primary_shard_size"] = settings.CASE_INDEX_ROLLOVER_MAX_SHARD_SIZE
+        if settings.CASE_INDEX_ROLLOVER_MAX_DOCS:
+            conditions["max_docs"] = settings.CASE_INDEX_ROLLOVER_MAX_DOCS
+        if settings.CASE_INDEX_ROLLOVER_MAX_AGE:
+            conditions["max_age"] = settings.CASE_INDEX_ROLLOVER_MAX_AGE
+        return conditions
+
+    def rollover(self) -> Optional[str]:
+        """Przełączenie aliasu na nowy indeks zapisu, jeśli bieżący przekroczył któryś z limitów"""
+        conditions = self.rollover_conditions()
+        # Rollover bez warunków byłby bezwarunkowy
+        if not conditions or not self.es.indices.exists_alias(name=self.alias):
+            return None
+        result = self.es.indices.rollover(alias=self.alias, conditions=conditions)
+        if not result["rolled_over"]:
+            return None
+        print(f"Rollover '{self.alias}': {result['old_index']} -> {result['new_index']}")
+        self._count("rollovers")
+        return result["new_index"]
+
+    def backing_indices(self) -> Dict[str, bool]:
+        """Indeksy za aliasem: nazwa -> czy jest indeksem zapisu"""
+        if not self.es.indices.exists_alias(name=self.alias):
+            return {}
+        return {
+            index_name: bool(info["aliases"][self.alias].get("is_write_index"))
+            for index_name, info in self.es.indices.get_alias(name=self.alias).items()
+        }
+
+    def shrink_candidates(self) -> List[str]:
+        """Indeksy inne niż indeks zapisu, z większą liczbą shardów i bez zapisów od CASE_INDEX_SHRINK_IDLE"""
+        target_shards = settings.CASE_INDEX_SHRINK_SHARDS
+        idle_since = (time.time() - settings.CASE_INDEX_SHRINK_IDLE) * 1000
+        candidates = []
+        for index_name, is_write_index in sorted(self.backing_indices().items()):
+            if is_write_index:
+                continue
+            index_settings = self.es.indices.get_settings(index=index_name)[index_name]["settings"]["index"]
+            shards = int(index_settings["number_of_shards"])
+            # Shrink wymaga, by liczba shardów docelowych dzieliła liczbę źródłowych
+            if shards <= target_shards or shards % target_shards:
+                continue
+            if self._last_write(index_name, int(index_settings["creation_date"])) > idle_since:
+                continue
+            candidates.append(index_name)
+        return candidates
+
+    def _last_write(self, index_name: str, created: int) -> float:
+        """Czas (ms) ostatniego zapisanego dokumentu, a dla pustego indeksu — utworzenia indeksu"""
+        response = self.es.search(index=index_name, size=0, aggs={"last": {"max": {"field": "timestamp"}}})
+        return max(response["aggregations"]["last"]["value"] or 0, created)
+
+    def shrink(self, index_name: str) -> bool:
+        """
+        Zmniejszenie liczby shardów indeksu i przeniesienie na nowy indeks jego aliasów
+
+        Returns:
+            False, gdy zmniejszanie tego indeksu wykonuje już inny proces
+        """
+        target = f"shrunk-{index_name}"
+        if self.es.indices.exists(index=target):
+            return False
+        case_ids = self._case_ids(index_name)
+        blocked_at = datetime.utcnow()
+        # Shrink wymaga kopii wszystkich shardów na jednym węźle i blokady zapisu
+        self.es.indices.put_settings(index=index_name, settings={
+            "index.routing.allocation.require._name": self._node_with_most_shards(index_name),
+            "index.blocks.write": True
+        })
+        try:
+            long_es = self.es.options(request_timeout=LONG_REQUEST_TIMEOUT)
+            long_es.cluster.health(index=index_name, wait_for_no_relocating_shards=True, timeout="30m")
+            response = long_es.options(ignore_status=400).indices.shrink(index=index_name, target=target, settings={
+                "index.number_of_shards": settings.CASE_INDEX_SHRINK_SHARDS,
+                "index.number_of_replicas": settings.CASE_INDEX_REPLICAS,
+                "index.routing.allocation.require._name": None,
+                "index.blocks.write": None
+            })
+            if response.body.get("error", {}).get("type") == "resource_already_exists_exception":
+                return False
+            if "error" in response.body:
+                raise RuntimeError(f"Nie można zmniejszyć indeksu {index_name}: {response['error']}")
+            long_es.cluster.health(index=target, wait_for_status="yellow", timeout="30m")
+
+            aliases = self.es.indices.get_alias(index=index_name)[index_name]["aliases"]
+            self.es.indices.update_aliases(actions=[
+                *({"add": {"index": target, "alias": name, **properties}} for name, properties in aliases.items()),
+                {"remove_index": {"index": index_name}}
+            ])
+        except Exception:
+            self.unblock(index_name)
+            self.requeue_extraction(case_ids, blocked_at)
+            raise
+        self.requeue_extraction(case_ids, blocked_at)
+        print(f"Indeks '{index_name}' zmniejszony do {settings.CASE_INDEX_SHRINK_SHARDS} shardów ('{target}')")
+        self._count("shrinks")
+        return True
+
+    def unblock(self, index_name: str):
+        """Cofnięcie niedokończonego shrink: zdjęcie blokady zapisu i usunięcie częściowego indeksu docelowego"""
+        self.es.indices.put_settings(index=index_name, settings={
+            "index.routing.allocation.require._name": None,
+            "index.blocks.write": None
+        })
+        self.es.options(ignore_status=404).indices.delete(index=f"shrunk-{index_name}")
+
+    def _case_ids(self, index_name: str) -> List[int]:
+        """Sprawy, których aliasy wskazują na indeks"""
+        aliases = self.es.indices.get_alias(index=index_name)[index_name]["aliases"]
+        return [int(match.group(1)) for match in map(LEGACY_INDEX_RE.match, aliases) if match]
+
+    def requeue_extraction(self, case_ids: Iterable[int], blocked_at: datetime) -> int:
+        """
+        Ponowienie zadań ekstrakcji spraw zakończonych od chwili blokady zapisu
+
+        Zapis odrzucony przez blokadę kończy zadanie statusem failed, a zapis
+        wysłany przez inny proces mógł zostać utracony przy zadaniu done —
+        oba przypadki wracają do stanu pending.
+
+        Returns:
+            Liczba zadań oznaczonych do ponowienia
+        """
+        case_ids = list(case_ids)
+        if self.session_factory is None or not case_ids:
+            return 0
+        import models
+
+        requeued = 0
+        db = self.session_factory()
+        try:
+            for start in range(0, len(case_ids), 500):
+                document_ids = db.query(models.Document.id).filter(
+                    models.Document.case_id.in_(case_ids[start:start + 500])
+                )
+                requeued += db.query(models.ExtractionJob).filter(
+                    models.ExtractionJob.document_id.in_(document_ids.scalar_subquery()),
+                    models.ExtractionJob.status.in_(["done", "failed"]),
+                    models.ExtractionJob.finished_at >= blocked_at - REQUEUE_MARGIN
+                ).update({"status": "pending", "error": None}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Nie można ponowić zadań ekstrakcji po blokadzie zapisu: {e}")
+            return 0
+        finally:
+            db.close()
+        if requeued:
+            print(f"Zadania ekstrakcji do ponowienia po blokadzie zapisu: {requeued}")
+            with self._lock:
+                self._stats["requeued"] += requeued
+            if self.resume_jobs is not None:
+                self.resume_jobs()
+        return requeued
+
+    def _node_with_most_shards(self, index_name: str) -> str:
+        nodes: Dict[str, int] = {}
+        for shard in self.es.cat.shards(index=index_name, format="json"):
+            if shard.get("node"):
+                nodes[shard["node"]] = nodes.get(shard["node"], 0) + 1
+        return max(nodes, key=nodes.get)
+
+    def run_once(self) -> Dict[str, Any]:
+        """Jeden przebieg polityki: rollover, a potem shrink bezczynnych indeksów"""
+        result: Dict[str, Any] = {"rolled_over": None, "shrunk": []}
+        try:
+            result["rolled_over"] = self.rollover()
+            if settings.CASE_INDEX_SHRINK_IDLE > 0:
+                for index_name in self.shrink_candidates():
+                    if self.shrink(index_name):
+                        result["shrunk"].append(index_name)
+        except (ElasticsearchException, RuntimeError) as e:
+            with self._lock:
+                self._stats["errors"] += 1
+                self._stats["last_error"] = str(e)
+            raise
+        finally:
+            with self._lock:
+                self._stats["runs"] += 1
+                self._stats["last_run"] = datetime.utcnow().isoformat()
+        return result
+
+    async def run_forever(self, interval: float):
+        """Okresowe wykonywanie polityki w tle aplikacji"""
+        while True:
+            try:
+                result = await run_io(self.run_once)
+                if result["rolled_over"] or result["shrunk"]:
+                    print(f"Cykl życia indeksów spraw: {result}")
+            except Exception as e:
+                print(f"Błąd cyklu życia indeksów spraw: {e}")
+            if self.resume_jobs is not None:
+                # Zadania oznaczone do ponowienia przez migrację z wiersza poleceń
+                try:
+                    await run_io(self.resume_jobs)
+                except Exception as e:
+                    print(f"Nie można wznowić zadań ekstrakcji: {e}")
+            await asyncio.sleep(interval)
+
+    def legacy_indices(self) -> List[str]:
+        """Indeksy case-<id> z poprzedniego układu (jeden indeks na sprawę)"""
+        indices = self.es.indices.get(index="case-*", expand_wildcards="open", ignore_unavailable=True)
+        return sorted((name for name in indices if LEGACY_INDEX_RE.match(name)), key=lambda name: int(name[5:]))
+
+    def migrate_index(self, index_name: str, owner_id: Optional[int] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Przeniesienie indeksu case-<id> do współdzielonego indeksu zapisu
+
+        Indeks źródłowy jest blokowany do zapisu na czas kopiowania; zapisy
+        odrzucone w tym czasie nie są ponawiane automatycznie — po zdjęciu
+        blokady (sukces lub błąd) zadania ekstrakcji sprawy zakończone od jej
+        założenia wracają do stanu pending (requeue_extraction). Po błędzie
+        indeks pozostaje bez zmian.
+        """
+        case_id = int(LEGACY_INDEX_RE.match(index_name).group(1))
+        documents = self.es.count(index=index_name)["count"]
+        result = {"index": index_name, "case_id": case_id, "documents": documents}
+        if dry_run:
+            return result
+
+        target = self.es_client.ensure_shared_case_index()
+        blocked_at = datetime.utcnow()
+        self.es.indices.add_block(index=index_name, block="write")
+        try:
+            self.es.indices.refresh(index=index_name)
+            response = self.es.options(request_timeout=LONG_REQUEST_TIMEOUT).reindex(
+                source={"index": index_name, "size": 1000},
+                dest={"index": target},
+                script={
+                    "source": "ctx._source.case_id = params.case_id; ctx._routing = params.routing;"
+                              " if (params.owner_id != null) { ctx._source.owner_id = params.owner_id }",
+                    "params": {"case_id": case_id, "routing": str(case_id), "owner_id": owner_id}
+                },
+                refresh=True,
+                wait_for_completion=True
+            )
+            if response.body.get("failures"):
+                raise RuntimeError(f"Błędy kopiowania {index_name}: {response['failures'][:3]}")
+            copied = self.es.count(index=target, routing=str(case_id), query={"term": {"case_id": case_id}})["count"]
+            if copied < documents:
+                raise RuntimeError(f"Skopiowano {copied} z {documents} dokumentów {index_name}")
+            # Usunięcie indeksu i utworzenie aliasu o tej samej nazwie w jednej operacji
+            self.es.indices.update_aliases(actions=[
+                {"remove_index": {"index": index_name}},
+                {"add": {
+                    "index": target,
+                    "alias": index_name,
+                    "filter": {"term": {"case_id": case_id}},
+                    "routing": str(case_id),
+                    "is_write_index": True
+                }}
+            ])
+        except Exception:
+            self.es.indices.put_settings(index=index_name, settings={"index.blocks.write": None})
+            self.requeue_extraction([case_id], blocked_at)
+            raise
+        self.requeue_extraction([case_id], blocked_at)
+        self._count("migrated")
+        return {**result, "target": target}
+
+    def status(self) -> Dict[str, Any]:
+        """Indeksy za aliasem (dokumenty, shardy, aliasy spraw) i liczba indeksów do migracji"""
+        backing = self.backing_indices()
+        indices = {}
+        if backing:
+            aliases = self.es.indices.get_alias(index=",".join(backing))
+            for row in self.es.cat.indices(index=",".join(backing), format="json", h="index,docs.count,pri,store.size"):
+                indices[row["index"]] = {
+                    "write_index": backing[row["index"]],
+                    "documents": int(row["docs.count"] or 0),
+                    "shards": int(row["pri"]),
+                    "size": row["store.size"],
+                    "cases": sum(1 for name in aliases[row["index"]]["aliases"] if LEGACY_INDEX_RE.match(name))
+                }
+        return {"alias": self.alias, "indices": indices, "legacy_indices": len(self.legacy_indices())}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Statystyki przebiegów polityki i migracji"""
+        with self._lock:
+            return dict(self._stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Współdzielone indeksy spraw: cykl życia i migracja")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Indeksy za aliasem i liczba indeksów do migracji")
+    commands.add_parser("lifecycle", help="Jeden przebieg polityki (rollover, shrink)")
+    unblock = commands.add_parser("unblock", help="Cofnięcie przerwanego shrink indeksu")
+    unblock.add_argument("index")
+    migrate = commands.add_parser("migrate", help="Przeniesienie indeksów case-<id> do współdzielonych indeksów")
+    migrate.add_argument("--case", type=int, action="append", help="Tylko podane sprawy (można powtórzyć)")
+    migrate.add_argument("--dry-run", action="store_true", help="Wypisanie indeksów bez kopiowania")
+    args = parser.parse_args()
+
+    from elasticsearch_client import ElasticsearchClient
+
+    from database import SessionLocal
+
+    es_client = ElasticsearchClient(settings.ELASTICSEARCH_URL)
+    # Zadania ekstrakcji oznaczone tu do ponowienia wznawia działająca aplikacja
+    lifecycle = CaseIndexLifecycle(es_client, session_factory=SessionLocal)
+    try:
+        if args.command == "status":
+            print(lifecycle.status())
+        elif args.command == "lifecycle":
+            print(lifecycle.run_once())
+        elif args.command == "unblock":
+            lifecycle.unblock(args.index)
+        else:
+            import models
+
+            index_names = (
+                [case_index_name(case_id) for case_id in args.case] if args.case else lifecycle.legacy_indices()
+            )
+            db = SessionLocal()
+            try:
+                owners = dict(db.query(models.Case.id, models.Case.owner_id).all())
+            finally:
+                db.close()
+            for index_name in index_names:
+                if not LEGACY_INDEX_RE.match(index_name) or not es_client.es.indices.exists(index=index_name) \
+                        or es_client.es.indices.exists_alias(name=index_name):
+                    print(f"{index_name}: brak indeksu do migracji")
+                    continue
+                started = time.perf_counter()
+                try:
+                    result = lifecycle.migrate_index(
+                        index_name, owners.get(int(index_name[5:])), dry_run=args.dry_run
+                    )
+                    print(f"{result} ({time.perf_counter() - started:.1f} s)")
+                except Exception as e:
+                    print(f"{index_name}: migracja przerwana: {e}")
+    finally:
+        es_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Podział tekstów prawnych na fragmenty (passages) do indeksu wyszukiwania
+
+Tekst dzielony jest na jednostki redakcyjne (księgi, tytuły, działy, rozdziały,
+artykuły, paragrafy oraz sekcje orzeczeń TEZA/UZASADNIENIE), które następnie
+łączone są w fragmenty o ograniczonej liczbie tokenów. Kolejne fragmenty
+zachodzą na siebie, aby kontekst na granicy fragmentów nie był tracony.
+Moduł nie importuje konfiguracji, więc może działać w puli procesów.
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from tokenizer import decode, encode
+
+DIVISION_RE = re.compile(r"(?:KSIĘGA|TYTUŁ|DZIAŁ|Rozdział)\s+\S+")
+ARTICLE_RE = re.compile(r"Art\.\s*(\d+[a-z]*)\.(?:\s*§\s*(\d+[a-z]*)\.)?")
+PARAGRAPH_RE = re.compile(r"§\s*(\d+[a-z]*)\.")
+SECTION_RE = re.compile(r"(?:TEZA|SENTENCJA|UZASADNIENIE)\b")
+
+# Początek nowej jednostki redakcyjnej — zawsze na początku wiersza
+UNIT_BOUNDARY_RE = re.compile(
+    r"^[ \t]*(?:" + "|".join(
+        pattern.pattern for pattern in (DIVISION_RE, ARTICLE_RE, PARAGRAPH_RE, SECTION_RE)
+    ) + ")",
+    re.MULTILINE
+)
+
+
+@dataclass
+class Passage:
+    """Fragment dokumentu z odnośnikiem do dokumentu nadrzędnego"""
+
+    parent_id: str
+    ordinal: int
+    heading: str
+    text: str
+    token_count: int
+
+    @property
+    def passage_id(self) -> str:
+        return f"{self.parent_id}:{self.ordinal}"
+
+
+def split_units(text: str) -> List[Tuple[str, str]]:
+    """
+    Podział tekstu na jednostki redakcyjne
+
+    Returns:
+        Lista par (nagłówek, treść jednostki), np. ("Art. 5 § 2", "§ 2. ...")
+    """
+    starts = [match.start() for match in UNIT_BOUNDARY_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+
+    units = []
+    division: Optional[str] = None
+    article: Optional[str] = None
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        unit = text[start:end].strip()
+        if not unit:
+            continue
+        heading = ""
+        if DIVISION_RE.match(unit):
+            division = unit.splitlines()[0][:80]
+            article = None
+            heading = division
+        elif ARTICLE_RE.match(unit):
+            match = ARTICLE_RE.match(unit)
+            article = f"Art. {match.group(1)}"
+            heading = f"{article} § {match.group(2)}" if match.group(2) else article
+        elif PARAGRAPH_RE.match(unit):
+            paragraph = f"§ {PARAGRAPH_RE.match(unit).group(1)}"
+            heading = f"{article} {paragraph}" if article else paragraph
+        elif SECTION_RE.match(unit):
+            heading = SECTION_RE.match(unit).group(0)
+            article = None
+        elif division:
+            heading = division
+        units.append((heading, unit))
+    return units
+
+
+def split_articles(text: str) -> List[Tuple[str, Optional[str], str]]:
+    """
+    Podział tekstu aktu prawnego na artykuły
+
+    Returns:
+        Lista trójek (numer artykułu, jednostka nadrzędna, treść artykułu z paragrafami),
+        np. ("5a", "Rozdział 2", "Art. 5a. § 1. ... § 2. ...")
+    """
+    articles: List[List] = []
+    division: Optional[str] = None
+    for heading, unit in split_units(text):
+        match = ARTICLE_RE.match(unit)
+        if match:
+            articles.append([match.group(1), division, unit])
+        elif DIVISION_RE.match(unit):
+            division = heading
+        elif articles and heading.startswith(f"Art. {articles[-1][0]} "):
+            # Kolejny paragraf bieżącego artykułu
+            articles[-1][2] += "\n" + unit
+    return [(number, division, body) for number, division, body in articles]
+
+
+def chunk_text(text: str, parent_id: str, max_tokens: int = 400, overlap_tokens: int = 60) -> List[Passage]:
+    """
+    Podział tekstu na zachodzące na siebie fragmenty o ograniczonej długości
+
+    Args:
+        text: Pełny tekst dokumentu
+        parent_id: Identyfikator dokumentu nadrzędnego w indeksie
+        max_tokens: Maksymalna liczba tokenów fragmentu
+        overlap_tokens: Liczba tokenów z końca poprzedniego fragmentu powtarzana na początku następnego
+
+    Returns:
+        Lista fragmentów w kolejności występowania w dokumencie; nagłówkiem
+        fragmentu jest nagłówek jednostki, w której zaczyna się jego tekst
+        (przy zakładce — jednostki z końca poprzedniego fragmentu)
+    """
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    passages: List[Passage] = []
+    current_tokens: list = []
+    # Początki jednostek w bieżącym fragmencie: (pozycja tokenu, nagłówek)
+    current_starts: List[Tuple[int, str]] = []
+    tail: list = []
+    tail_heading = ""
+
+    def emit(tokens, starts):
+        nonlocal tail, tail_heading
+        body = decode(tokens).strip("\ufffd \n\t")
+        if body:
+            passages.append(Passage(parent_id, len(passages), starts[0][1] or "", body, len(tokens)))
+        tail = tokens[-overlap_tokens:] if overlap_tokens else []
+        tail_start = len(tokens) - len(tail)
+        tail_heading = [heading for offset, heading in starts if offset <= tail_start][-1]
+
+    for heading, unit in split_units(text):
+        unit_tokens = encode(unit + "\n")
+
+        if len(unit_tokens) > max_tokens - overlap_tokens:
+            # Zbyt długa jednostka — okna przesuwne z zakładką
+            if current_tokens:
+                emit(current_tokens, current_starts)
+                current_tokens = []
+            step = max_tokens - overlap_tokens
+            for offset in range(0, len(unit_tokens), step):
+                window = unit_tokens[offset:offset + max_tokens]
+                emit(window, [(0, heading)])
+                if offset + max_tokens >= len(unit_tokens):
+                    break
+            continue
+
+        if current_tokens and len(current_tokens) + len(unit_tokens) > max_tokens:
+            emit(current_tokens, current_starts)
+            current_tokens = []
+
+        if not current_tokens:
+            current_tokens = list(tail)
+            current_starts = [(0, tail_heading)] if tail else []
+        current_starts.append((len(current_tokens), heading))
+        current_tokens.extend(unit_tokens)
+
+    if current_tokens and len(current_tokens) > len(tail):
+        emit(current_tokens, current_starts)
+    return passages
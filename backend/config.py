@@ -35,12 +35,165 @@ class Settings:
         f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}/{POSTGRES_DB}"
     )
     
+    # Prometheus metrics on /metrics (see metrics.py)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # OpenTelemetry tracing (see tracing.py); exporter: otlp, file (JSON Lines) or console
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "otlp")
+    TRACING_OTLP_ENDPOINT: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACING_FILE_PATH: str = os.getenv("TRACING_FILE_PATH", "traces.jsonl")
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "asystent-prawny-backend")
+    TRACING_SAMPLE_RATIO: float = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+
+    # Database connection pool (see database.py); size + overflow matches OFFLOAD_IO_WORKERS
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "12"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    DB_READY_MAX_BACKOFF: float = float(os.getenv("DB_READY_MAX_BACKOFF", "30"))
+    
     # MinIO settings
     MINIO_ENDPOINT: str = os.getenv("MINIO_ENDPOINT", "localhost:9000")
     MINIO_ROOT_USER: str = os.getenv("MINIO_ROOT_USER", "minioadmin")
     MINIO_ROOT_PASSWORD: str = os.getenv("MINIO_ROOT_PASSWORD", "minioadmin")
     MINIO_SECURE: bool = os.getenv("MINIO_SECURE", "false").lower() == "true"
 
+    # Elasticsearch settings
+    ELASTICSEARCH_URL: str = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
+    ES_REFRESH_INTERVAL: str = os.getenv("ES_REFRESH_INTERVAL", "1s")
+    ES_BULK_MAX_ACTIONS: int = int(os.getenv("ES_BULK_MAX_ACTIONS", "500"))
+    ES_BULK_MAX_BYTES: int = int(os.getenv("ES_BULK_MAX_BYTES", str(5 * 1024 * 1024)))
+    ES_BULK_FLUSH_INTERVAL: float = float(os.getenv("ES_BULK_FLUSH_INTERVAL", "1.0"))
+
+    # Case documents: "shared" (filtered, routed alias case-<id> per case over rolled-over indices behind
+    # CASE_INDEX_ALIAS; see case_indices.py) or "per-case" (one index per case, previous layout)
+    CASE_INDEX_MODE: str = os.getenv("CASE_INDEX_MODE", "shared")
+    CASE_INDEX_ALIAS: str = os.getenv("CASE_INDEX_ALIAS", "cases")
+    CASE_INDEX_SHARDS: int = int(os.getenv("CASE_INDEX_SHARDS", "3"))
+    CASE_INDEX_REPLICAS: int = int(os.getenv("CASE_INDEX_REPLICAS", "1"))
+    # Lifecycle (checked every CASE_INDEX_LIFECYCLE_INTERVAL seconds, 0 = only via case_indices.py):
+    # roll over to a new write index at any of the limits, shrink older indices idle for CASE_INDEX_SHRINK_IDLE seconds
+    CASE_INDEX_LIFECYCLE_INTERVAL: float = float(os.getenv("CASE_INDEX_LIFECYCLE_INTERVAL", "3600"))
+    CASE_INDEX_ROLLOVER_MAX_SHARD_SIZE: str = os.getenv("CASE_INDEX_ROLLOVER_MAX_SHARD_SIZE", "30gb")
+    CASE_INDEX_ROLLOVER_MAX_DOCS: int = int(os.getenv("CASE_INDEX_ROLLOVER_MAX_DOCS", "50000000"))
+    CASE_INDEX_ROLLOVER_MAX_AGE: str = os.getenv("CASE_INDEX_ROLLOVER_MAX_AGE", "90d")  # Empty = no age limit
+    CASE_INDEX_SHRINK_SHARDS: int = int(os.getenv("CASE_INDEX_SHRINK_SHARDS", "1"))
+    CASE_INDEX_SHRINK_IDLE: float = float(os.getenv("CASE_INDEX_SHRINK_IDLE", str(7 * 86400)))  # 0 = never shrink
+
+    # Search ranking: "bm25" (exact terms; a fuzzy pass only when it finds fewer than SEARCH_FUZZY_MIN_HITS),
+    # "hybrid" (BM25 and kNN over local embeddings, fused with reciprocal rank fusion) or "fuzzy" (previous behaviour).
+    # Hybrid needs an embedding backend (see embeddings.py): none, hashing, onnx or sentence-transformers
+    SEARCH_MODE: str = os.getenv("SEARCH_MODE", "hybrid")
+    SEARCH_FUZZY_MIN_HITS: int = int(os.getenv("SEARCH_FUZZY_MIN_HITS", "3"))
+    SEARCH_RRF_K: int = int(os.getenv("SEARCH_RRF_K", "60"))
+    SEARCH_KNN_CANDIDATES: int = int(os.getenv("SEARCH_KNN_CANDIDATES", "100"))
+    # Search result cache (per process): entries are dropped on any write to the index through this client and
+    # expire after SEARCH_CACHE_TTL, which bounds staleness after writes made by other workers; 0 entries disables it
+    SEARCH_CACHE_MAX_ENTRIES: int = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2000"))
+    SEARCH_CACHE_TTL: float = float(os.getenv("SEARCH_CACHE_TTL", "30"))
+    # Results are not cached until a write is visible: bulk flush interval plus index refresh interval
+    SEARCH_CACHE_SETTLE: float = float(os.getenv("SEARCH_CACHE_SETTLE", "2.0"))
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "none")
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    EMBEDDING_ONNX_PATH: str = os.getenv("EMBEDDING_ONNX_PATH", "models/paraphrase-multilingual-MiniLM-L12-v2-onnx")
+    EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = onnxruntime default (all cores)
+    EMBEDDING_DIMENSIONS: int = int(os.getenv("EMBEDDING_DIMENSIONS", "384"))  # Hashing backend only
+    EMBEDDING_MAX_CHARS: int = int(os.getenv("EMBEDDING_MAX_CHARS", "2000"))
+    # Model backends batch texts from all threads: a batch runs when full or EMBEDDING_BATCH_WAIT_MS after its first text
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+    EMBEDDING_BATCH_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+    # Upper bound on waiting for a batched vector (seconds) before the caller gets a TimeoutError
+    EMBEDDING_BATCH_TIMEOUT: float = float(os.getenv("EMBEDDING_BATCH_TIMEOUT", "60"))
+    # Vectors keyed by content hash, shared by all workers; empty disables the cache
+    EMBEDDING_CACHE_DIR: str = os.getenv("EMBEDDING_CACHE_DIR", "embedding-cache")
+
+    # Background text extraction (see extraction_service.py)
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", "2"))
+    EXTRACTION_DISPATCHERS: int = int(os.getenv("EXTRACTION_DISPATCHERS", "2"))
+
+    # RAG passage index and context packing
+    RAG_PASSAGE_MAX_TOKENS: int = int(os.getenv("RAG_PASSAGE_MAX_TOKENS", "400"))
+    RAG_PASSAGE_OVERLAP_TOKENS: int = int(os.getenv("RAG_PASSAGE_OVERLAP_TOKENS", "60"))
+    RAG_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))
+    RAG_DEDUP_THRESHOLD: float = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.8"))
+
+    # Language model used by the RAG engine (see llm_providers.py): "openai", "llamacpp" or "fake"
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")
+    LLM_TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+    LLM_MAX_TOKENS: int = int(os.getenv("LLM_MAX_TOKENS", "512"))
+    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "sk-test-key-replace-in-production")
+    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo-instruct")
+    LLAMACPP_MODEL_PATH: str = os.getenv("LLAMACPP_MODEL_PATH", "models/model.gguf")
+    LLAMACPP_CONTEXT: int = int(os.getenv("LLAMACPP_CONTEXT", "4096"))
+    LLAMACPP_THREADS: int = int(os.getenv("LLAMACPP_THREADS", str(os.cpu_count() or 2)))
+    FAKE_LLM_FIRST_TOKEN_LATENCY: float = float(os.getenv("FAKE_LLM_FIRST_TOKEN_LATENCY", "0.2"))
+    FAKE_LLM_TOKEN_LATENCY: float = float(os.getenv("FAKE_LLM_TOKEN_LATENCY", "0.02"))
+
+    # Answer cache (see answer_cache.py): "memory", "redis" or "none"
+    ANSWER_CACHE_BACKEND: str = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+    ANSWER_CACHE_SIMILARITY: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # External legal sources (see http_client.py): Sejm ELI API (ISAP) and SAOS, with polite per-host limits
+    ISAP_API_URL: str = os.getenv("ISAP_API_URL", "https://api.sejm.gov.pl/eli")
+    ISAP_RATE_LIMIT: float = float(os.getenv("ISAP_RATE_LIMIT", "2"))
+    ISAP_RATE_BURST: int = int(os.getenv("ISAP_RATE_BURST", "4"))
+    ISAP_MAX_CONCURRENCY: int = int(os.getenv("ISAP_MAX_CONCURRENCY", "2"))
+    SAOS_API_URL: str = os.getenv("SAOS_API_URL", "https://www.saos.org.pl/api")
+    SAOS_RATE_LIMIT: float = float(os.getenv("SAOS_RATE_LIMIT", "2"))
+    SAOS_RATE_BURST: int = int(os.getenv("SAOS_RATE_BURST", "4"))
+    SAOS_MAX_CONCURRENCY: int = int(os.getenv("SAOS_MAX_CONCURRENCY", "2"))
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", "15"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    HTTP_MAX_KEEPALIVE: int = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+    HTTP_RETRY_ATTEMPTS: int = int(os.getenv("HTTP_RETRY_ATTEMPTS", "4"))
+    HTTP_RETRY_BACKOFF: float = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+    HTTP_RETRY_BACKOFF_MAX: float = float(os.getenv("HTTP_RETRY_BACKOFF_MAX", "20"))
+    HTTP_USER_AGENT: str = os.getenv("HTTP_USER_AGENT", "AsystentPrawny/0.1")
+
+    # Local SAOS mirror (see saos_sync.py); SAOS_SYNC_INTERVAL=0 disables the periodic sync
+    SAOS_INDEX: str = os.getenv("SAOS_INDEX", "saos-judgments")
+    SAOS_SYNC_INTERVAL: float = float(os.getenv("SAOS_SYNC_INTERVAL", "0"))
+    SAOS_SYNC_PAGE_SIZE: int = int(os.getenv("SAOS_SYNC_PAGE_SIZE", "100"))
+    SAOS_SYNC_PARALLEL_PAGES: int = int(os.getenv("SAOS_SYNC_PARALLEL_PAGES", "2"))
+    SAOS_SYNC_SINCE: str = os.getenv("SAOS_SYNC_SINCE", "")  # First run only, e.g. 2024-01-01T00:00:00.000
+    SAOS_SYNC_OVERLAP: float = float(os.getenv("SAOS_SYNC_OVERLAP", "3600"))
+
+    # Local ISAP corpus (see isap_sync.py); ISAP_SYNC_INTERVAL=0 disables the periodic refresh
+    ISAP_INDEX: str = os.getenv("ISAP_INDEX", "isap-acts")
+    ISAP_SYNC_INTERVAL: float = float(os.getenv("ISAP_SYNC_INTERVAL", "0"))
+    ISAP_SYNC_PUBLISHERS: str = os.getenv("ISAP_SYNC_PUBLISHERS", "DU")  # Comma-separated: DU, MP
+    ISAP_SYNC_PAGE_SIZE: int = int(os.getenv("ISAP_SYNC_PAGE_SIZE", "100"))
+    ISAP_SYNC_SINCE: str = os.getenv("ISAP_SYNC_SINCE", "")  # First run only, publication date e.g. 2020-01-01
+    ISAP_SYNC_OVERLAP: float = float(os.getenv("ISAP_SYNC_OVERLAP", "86400"))
+
+    # Question context fan-out (see retrieval.py): acts/judgments come from the local mirrors ("local"),
+    # the live APIs ("live") or are skipped ("off"); each source has a result budget, timeout and ranking weight
+    RETRIEVAL_CASE_TIMEOUT: float = float(os.getenv("RETRIEVAL_CASE_TIMEOUT", "2.0"))
+    RETRIEVAL_CASE_WEIGHT: float = float(os.getenv("RETRIEVAL_CASE_WEIGHT", "1.0"))
+    RETRIEVAL_ACTS_SOURCE: str = os.getenv("RETRIEVAL_ACTS_SOURCE", "local")
+    RETRIEVAL_ACTS_SIZE: int = int(os.getenv("RETRIEVAL_ACTS_SIZE", "5"))
+    RETRIEVAL_ACTS_TIMEOUT: float = float(os.getenv("RETRIEVAL_ACTS_TIMEOUT", "1.5"))
+    RETRIEVAL_ACTS_WEIGHT: float = float(os.getenv("RETRIEVAL_ACTS_WEIGHT", "0.8"))
+    RETRIEVAL_JUDGMENTS_SOURCE: str = os.getenv("RETRIEVAL_JUDGMENTS_SOURCE", "local")
+    RETRIEVAL_JUDGMENTS_SIZE: int = int(os.getenv("RETRIEVAL_JUDGMENTS_SIZE", "5"))
+    RETRIEVAL_JUDGMENTS_TIMEOUT: float = float(os.getenv("RETRIEVAL_JUDGMENTS_TIMEOUT", "1.5"))
+    RETRIEVAL_JUDGMENTS_WEIGHT: float = float(os.getenv("RETRIEVAL_JUDGMENTS_WEIGHT", "0.6"))
+
+    # Thread pools for blocking I/O and CPU-bound work (see offload.py)
+    OFFLOAD_IO_WORKERS: int = int(os.getenv("OFFLOAD_IO_WORKERS", "32"))
+    OFFLOAD_CPU_WORKERS: int = int(os.getenv("OFFLOAD_CPU_WORKERS", str(os.cpu_count() or 2)))
+    # Streamed LLM answers hold a thread per open stream, so they get their own pool
+    OFFLOAD_LLM_WORKERS: int = int(os.getenv("OFFLOAD_LLM_WORKERS", "16"))
+
+    def get_isap_sync_publishers(self) -> List[str]:
+        """Publishers whose acts are kept in the local ISAP corpus"""
+        return [publisher.strip() for publisher in self.ISAP_SYNC_PUBLISHERS.split(",") if publisher.strip()]
+
     def get_cors_origins(self) -> List[str]:
         """Get all CORS origins including any dynamic ones"""
         origins = self.BACKEND_CORS_ORIGINS.copy()
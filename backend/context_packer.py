@@ -0,0 +1,161 @@
+"""
+Składanie kontekstu dla LLM z wyników wyszukiwania
+
+Etapy: policzenie tokenów każdego fragmentu (tiktoken), usunięcie duplikatów
+i prawie-duplikatów (podobieństwo Jaccarda zbiorów shingli słownych) oraz
+zachłanne pakowanie według gęstości trafności (score / tokeny) w ramach budżetu.
+"""
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from tokenizer import count_tokens, truncate_to_tokens
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+ELLIPSIS = "..."
+
+# Skrócony fragment krótszy niż tyle tokenów (obok innych fragmentów) nie wnosi treści do kontekstu
+MIN_TRUNCATED_TOKENS = 16
+
+
+@dataclass
+class ContextCandidate:
+    """Fragment kandydujący do kontekstu"""
+
+    text: str
+    score: float
+    result: Dict[str, Any]
+    content: Optional[str] = None  # Treść porównywana przy usuwaniu duplikatów (domyślnie text)
+    tokens: int = 0
+
+
+@dataclass
+class PackedContext:
+    """Wynik składania kontekstu wraz ze statystykami"""
+
+    context: str
+    selected: List[Dict[str, Any]] = field(default_factory=list)
+    candidate_count: int = 0
+    duplicates_removed: int = 0
+    dropped_for_budget: int = 0
+    candidate_tokens: int = 0
+    context_tokens: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        """Liczba tokenów zaoszczędzonych względem sklejenia wszystkich wyników"""
+        return self.candidate_tokens - self.context_tokens
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "candidates": self.candidate_count,
+            "selected": len(self.selected),
+            "duplicates_removed": self.duplicates_removed,
+            "dropped_for_budget": self.dropped_for_budget,
+            "candidate_tokens": self.candidate_tokens,
+            "context_tokens": self.context_tokens,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def shingles(text: str, size: int = 5) -> Set[str]:
+    """Zbiór shingli słownych (n-gramów słów) tekstu"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(first: Set[str], second: Set[str]) -> float:
+    """Podobieństwo Jaccarda dwóch zbiorów"""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class ContextPacker:
+    """Składanie kontekstu w budżecie tokenów z usuwaniem prawie-duplikatów"""
+
+    def __init__(self, token_budget: int = 3000, similarity_threshold: float = 0.8, shingle_size: int = 5):
+        """
+        Inicjalizacja
+
+        Args:
+            token_budget: Maksymalna liczba tokenów kontekstu
+            similarity_threshold: Próg podobieństwa Jaccarda, powyżej którego fragment jest duplikatem
+            shingle_size: Liczba słów w shinglu
+        """
+        self.token_budget = token_budget
+        self.similarity_threshold = similarity_threshold
+        self.shingle_size = shingle_size
+
+    def pack(self, candidates: List[ContextCandidate], separator: str = "\n\n") -> PackedContext:
+        """
+        Złożenie kontekstu z kandydatów
+
+        Args:
+            candidates: Kandydaci w kolejności malejącej trafności
+            separator: Separator między fragmentami
+
+        Returns:
+            PackedContext z tekstem kontekstu, wybranymi wynikami i statystykami
+        """
+        result = PackedContext(context="", candidate_count=len(candidates))
+        for candidate in candidates:
+            candidate.tokens = count_tokens(candidate.text)
+            result.candidate_tokens += candidate.tokens
+
+        unique = self._deduplicate(candidates)
+        result.duplicates_removed = len(candidates) - len(unique)
+
+        # Fragment dłuższy niż cały budżet ma gęstość liczoną na budżecie i jest skracany
+        # do miejsca pozostałego w chwili, gdy przyjdzie jego kolej
+        separator_tokens = count_tokens(separator)
+        ellipsis_tokens = count_tokens(ELLIPSIS)
+        remaining = self.token_budget
+        chosen = []
+        by_density = sorted(
+            unique,
+            key=lambda candidate: candidate.score / max(min(candidate.tokens, self.token_budget), 1),
+            reverse=True
+        )
+        for candidate in by_density:
+            separator_cost = separator_tokens if chosen else 0
+            if candidate.tokens > self.token_budget:
+                room = remaining - separator_cost - ellipsis_tokens
+                if room > 0 and (room >= MIN_TRUNCATED_TOKENS or not chosen):
+                    candidate.text = truncate_to_tokens(candidate.text, room) + ELLIPSIS
+                    candidate.tokens = count_tokens(candidate.text)
+            cost = candidate.tokens + separator_cost
+            if cost <= remaining:
+                chosen.append(candidate)
+                remaining -= cost
+            else:
+                result.dropped_for_budget += 1
+
+        # W prompcie zachowujemy kolejność trafności
+        chosen.sort(key=lambda candidate: candidate.score, reverse=True)
+        result.context = separator.join(candidate.text for candidate in chosen)
+        result.context_tokens = self.token_budget - remaining
+        result.selected = [candidate.result for candidate in chosen]
+        return result
+
+    def _deduplicate(self, candidates: List[ContextCandidate]) -> List[ContextCandidate]:
+        """Usunięcie duplikatów — zostaje kandydat o najwyższej trafności"""
+        kept: List[ContextCandidate] = []
+        kept_shingles: List[Set[str]] = []
+        seen_hashes = set()
+        for candidate in sorted(candidates, key=lambda candidate: candidate.score, reverse=True):
+            normalized = " ".join(WORD_RE.findall((candidate.content or candidate.text).lower()))
+            digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+            if digest in seen_hashes:
+                continue
+            candidate_shingles = shingles(normalized, self.shingle_size)
+            if any(jaccard(candidate_shingles, other) >= self.similarity_threshold for other in kept_shingles):
+                continue
+            seen_hashes.add(digest)
+            kept.append(candidate)
+            kept_shingles.append(candidate_shingles)
+        return kept
@@ -1,12 +1,78 @@
+import threading
+import time
+
 from elasticsearch import Elasticsearch
-from elasticsearch.exceptions import ElasticsearchException
 from fastapi import HTTPException, status
 
+from answer_cache import InMemoryCacheBackend
+from config import settings
+from embeddings import get_embedder
+from indexing_queue import BulkIndexingQueue, IndexingError
+from metrics import ES_SECONDS, timed
+from tracing import traced
+
+try:
+    from elasticsearch.exceptions import ElasticsearchException
+except ImportError:  # elasticsearch>=8 nie ma wspólnej klasy bazowej wyjątków
+    from elasticsearch.exceptions import ApiError, TransportError
+    ElasticsearchException = (ApiError, TransportError)
+
+# Wyróżnienia fragmentów treści w wynikach search (liczone tylko na żądanie)
+SEARCH_HIGHLIGHT = {
+    "fields": {
+        "content": {},
+        "title": {}
+    },
+    "pre_tags": ["<strong>"],
+    "post_tags": ["</strong>"]
+}
+
+def case_index_name(case_id):
+    """Nazwa indeksu Elasticsearch dla sprawy"""
+    return f"case-{case_id}"
+
+def reciprocal_rank_fusion(rankings, size, k=60):
+    """
+    Złączenie list wyników metodą reciprocal rank fusion
+
+    Ocena dokumentu to suma 1 / (k + pozycja) po wszystkich listach, więc
+    liczą się tylko pozycje, a nie nieporównywalne oceny BM25 i kNN.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            entry = fused.setdefault(hit["id"], {**hit, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+            if not entry["highlights"] and hit["highlights"]:
+                entry["highlights"] = hit["highlights"]
+    return sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)[:size]
+
 class ElasticsearchClient:
-    def __init__(self, url):
-        """Inicjalizacja klienta Elasticsearch"""
+    def __init__(self, url, embedder=None):
+        """Inicjalizacja klienta Elasticsearch (embedder domyślnie z ustawień EMBEDDING_*)"""
         self.es = Elasticsearch([url])
+        self.embedder = embedder or get_embedder()
+        self._stats_lock = threading.Lock()
+        self._search_stats = {"fuzzy_fallbacks": 0, "cache_hits": 0, "cache_misses": 0, "highlight_requests": 0}
+        # Wyniki wyszukiwań ważne do następnego zapisu w indeksie (licznik generacji indeksu)
+        self._search_cache = (
+            InMemoryCacheBackend(settings.SEARCH_CACHE_MAX_ENTRIES, settings.SEARCH_CACHE_TTL)
+            if settings.SEARCH_CACHE_MAX_ENTRIES > 0 else None
+        )
+        self._generations = {}
+        self._last_writes = {}
+        # Indeksy/aliasy spraw, o których wiadomo, że istnieją (bez sprawdzania przy każdym dokumencie)
+        self._case_indices = set()
+        self._case_template_ready = False
+        # Zapisy grupowane w żądania _bulk zamiast odświeżania indeksu po każdej operacji
+        self.indexing_queue = BulkIndexingQueue(
+            self.es,
+            max_actions=settings.ES_BULK_MAX_ACTIONS,
+            max_bytes=settings.ES_BULK_MAX_BYTES,
+            flush_interval=settings.ES_BULK_FLUSH_INTERVAL
+        )
     
+    @traced()
     def check_connection(self):
         """Sprawdzenie połączenia z Elasticsearch"""
         try:
@@ -23,76 +89,100 @@ class ElasticsearchClient:
                 detail=f"Nie można połączyć się z Elasticsearch: {str(e)}"
             )
     
-    def create_case_index(self, index_name):
-        """Tworzenie indeksu dla sprawy"""
-        try:
-            # Sprawdzenie czy indeks już istnieje
-            if not self.es.indices.exists(index=index_name):
-                # Konfiguracja indeksu
-                index_config = {
-                    "settings": {
-                        "analysis": {
-                            "analyzer": {
-                                "polish": {
-                                    "type": "custom",
-                                    "tokenizer": "standard",
-                                    "filter": ["lowercase", "polish_stop", "polish_stem"]
-                                }
-                            },
-                            "filter": {
-                                "polish_stop": {
-                                    "type": "stop",
-                                    "stopwords": "_polish_"
-                                },
-                                "polish_stem": {
-                                    "type": "stemmer",
-                                    "language": "polish"
-                                }
-                            }
+    def _index_body(self, extra_properties=None, **index_settings):
+        """Ustawienia (analizator polski) i mapowanie pól indeksu dokumentów i fragmentów"""
+        return {
+            "settings": {
+                # Widoczność zapisów zapewnia okresowe odświeżanie, a nie refresh po każdym zapisie
+                "refresh_interval": settings.ES_REFRESH_INTERVAL,
+                **index_settings,
+                "analysis": {
+                    "analyzer": {
+                        "polish": {
+                            "type": "custom",
+                            "tokenizer": "standard",
+                            "filter": ["lowercase", "polish_stop", "polish_stem"]
                         }
                     },
-                    "mappings": {
-                        "properties": {
-                            "content": {
-                                "type": "text",
-                                "analyzer": "polish"
-                            },
-                            "title": {
-                                "type": "text",
-                                "analyzer": "polish"
-                            },
-                            "filename": {
-                                "type": "text",
-                                "analyzer": "polish"
-                            },
-                            "document_type": {
-                                "type": "keyword"
-                            },
-                            "court_name": {
-                                "type": "text",
-                                "analyzer": "polish"
-                            },
-                            "case_number": {
-                                "type": "keyword"
-                            },
-                            "publication": {
-                                "type": "keyword"
-                            },
-                            "year": {
-                                "type": "integer"
-                            },
-                            "type": {
-                                "type": "keyword"
-                            },
-                            "timestamp": {
-                                "type": "date"
-                            }
+                    "filter": {
+                        "polish_stop": {
+                            "type": "stop",
+                            "stopwords": "_polish_"
+                        },
+                        "polish_stem": {
+                            "type": "stemmer",
+                            "language": "polish"
                         }
                     }
                 }
-                
+            },
+            "mappings": {
+                "properties": {
+                    "content": {
+                        "type": "text",
+                        "analyzer": "polish"
+                    },
+                    "title": {
+                        "type": "text",
+                        "analyzer": "polish"
+                    },
+                    "filename": {
+                        "type": "text",
+                        "analyzer": "polish"
+                    },
+                    "document_type": {
+                        "type": "keyword"
+                    },
+                    "court_name": {
+                        "type": "text",
+                        "analyzer": "polish"
+                    },
+                    "case_number": {
+                        "type": "keyword"
+                    },
+                    "publication": {
+                        "type": "keyword"
+                    },
+                    "year": {
+                        "type": "integer"
+                    },
+                    "type": {
+                        "type": "keyword"
+                    },
+                    "timestamp": {
+                        "type": "date"
+                    },
+                    # Pola fragmentów (passages) dokumentów
+                    "doc_kind": {
+                        "type": "keyword"
+                    },
+                    "parent_id": {
+                        "type": "keyword"
+                    },
+                    "ordinal": {
+                        "type": "integer"
+                    },
+                    "heading": {
+                        "type": "text",
+                        "analyzer": "polish"
+                    },
+                    "token_count": {
+                        "type": "integer"
+                    },
+                    **self._embedding_properties(),
+                    **(extra_properties or {})
+                }
+            }
+        }
+
+    @traced()
+    def create_case_index(self, index_name, extra_properties=None):
+        """Tworzenie indeksu dla sprawy (extra_properties uzupełniają mapowanie pól)"""
+        try:
+            # Sprawdzenie czy indeks już istnieje
+            if not self.es.indices.exists(index=index_name):
                 # Utworzenie indeksu
-                self.es.indices.create(index=index_name, body=index_config)
+                self.es.indices.create(index=index_name, body=self._index_body(extra_properties))
                 print(f"Indeks '{index_name}' utworzony.")
             else:
                 print(f"Indeks '{index_name}' już istnieje.")
@@ -104,89 +194,525 @@ class ElasticsearchClient:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Nie można utworzyć indeksu: {str(e)}"
             )
-    
-    def index_document(self, index_name, document_id, document):
-        """Indeksowanie dokumentu w Elasticsearch"""
+
+    @traced()
+    def ensure_case_index(self, case_id):
+        """
+        Indeks, do którego trafiają dokumenty sprawy (nazwa z case_index_name)
+
+        W trybie CASE_INDEX_MODE=shared jest to alias filtrowany po case_id
+        i trasowany (routing) po case_id, wskazujący bieżący indeks zapisu
+        współdzielonego aliasu CASE_INDEX_ALIAS. Sprawa pozostaje w indeksie,
+        w którym powstał jej alias — rollover kieruje do nowego indeksu tylko
+        nowe sprawy, więc aktualizacja dokumentu nigdy nie tworzy jego kopii
+        w innym indeksie. Istniejący indeks sprawy sprzed migracji
+        (case_indices.py migrate) jest używany bez zmian.
+        """
+        index_name = case_index_name(case_id)
+        if index_name in self._case_indices:
+            return index_name
+        if settings.CASE_INDEX_MODE != "shared":
+            self.create_case_index(index_name, extra_properties=self._case_properties())
+        else:
+            try:
+                if not self.es.indices.exists(index=index_name):
+                    self.es.indices.put_alias(
+                        index=self.ensure_shared_case_index(),
+                        name=index_name,
+                        filter={"term": {"case_id": case_id}},
+                        routing=str(case_id),
+                        is_write_index=True
+                    )
+                    print(f"Alias '{index_name}' utworzony.")
+            except ElasticsearchException as e:
+                # Alias mógł powstać równocześnie w innym procesie (przed rolloverem lub po nim)
+                if not self.es.indices.exists_alias(name=index_name):
+                    print(f"Błąd Elasticsearch: {e}")
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=f"Nie można utworzyć aliasu sprawy: {str(e)}"
+                    )
+        self._case_indices.add(index_name)
+        return index_name
+
+    @staticmethod
+    def _case_properties():
+        return {"case_id": {"type": "long"}, "owner_id": {"type": "long"}}
+
+    @traced()
+    def ensure_shared_case_index(self):
+        """
+        Szablon współdzielonych indeksów spraw i pierwszy indeks zapisu aliasu CASE_INDEX_ALIAS
+
+        Returns:
+            Nazwa bieżącego indeksu zapisu (zmienia się po rolloverze)
+        """
+        alias = settings.CASE_INDEX_ALIAS
         try:
-            self.es.index(
-                index=index_name,
-                id=document_id,
-                body=document
+            if not self._case_template_ready:
+                self.es.indices.put_index_template(
+                    name=f"{alias}-template",
+                    index_patterns=[f"{alias}-*"],
+                    template=self._index_body(
+                        self._case_properties(),
+                        number_of_shards=settings.CASE_INDEX_SHARDS,
+                        number_of_replicas=settings.CASE_INDEX_REPLICAS
+                    )
+                )
+                self._case_template_ready = True
+            if not self.es.indices.exists_alias(name=alias):
+                # Równoczesne utworzenie w innym procesie kończy się błędem 400, który nie przeszkadza
+                self.es.options(ignore_status=400).indices.create(
+                    index=f"{alias}-000001", aliases={alias: {"is_write_index": True}}
+                )
+                print(f"Indeks '{alias}-000001' utworzony.")
+            for index_name, info in self.es.indices.get_alias(name=alias).items():
+                if info["aliases"][alias].get("is_write_index"):
+                    return index_name
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Alias '{alias}' nie ma indeksu zapisu"
             )
-            # Odświeżenie indeksu, aby zmiany były widoczne natychmiast
-            self.es.indices.refresh(index=index_name)
-            return True
         except ElasticsearchException as e:
             print(f"Błąd Elasticsearch: {e}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Nie można zindeksować dokumentu: {str(e)}"
+                detail=f"Nie można utworzyć współdzielonego indeksu spraw: {str(e)}"
             )
-    
-    def search(self, index_name, query, size=10):
-        """Wyszukiwanie w Elasticsearch"""
+
+    @traced()
+    def delete_case_index(self, case_id):
+        """
+        Usunięcie dokumentów sprawy z wyszukiwarki
+
+        Alias sprawy: dokumenty są usuwane zapytaniem przez alias (filtr
+        i routing ograniczają je do sprawy), a następnie alias. Indeks sprawy
+        sprzed migracji jest usuwany w całości.
+        """
+        index_name = case_index_name(case_id)
+        self._case_indices.discard(index_name)
+        self._bump_generation(index_name)
         try:
-            search_query = {
-                "query": {
-                    "multi_match": {
-                        "query": query,
-                        "fields": ["content^3", "title^2", "filename", "court_name"],
-                        "fuzziness": "AUTO"
-                    }
-                },
-                "highlight": {
-                    "fields": {
-                        "content": {},
-                        "title": {}
-                    },
-                    "pre_tags": ["<strong>"],
-                    "post_tags": ["</strong>"]
-                },
-                "size": size
-            }
-            
-            response = self.es.search(
-                index=index_name,
-                body=search_query
+            if self.es.indices.exists_alias(name=index_name):
+                with timed(ES_SECONDS, operation="delete_by_query"):
+                    self.es.delete_by_query(index=index_name, query={"match_all": {}}, conflicts="proceed")
+                self.es.indices.delete_alias(index="_all", name=index_name)
+                print(f"Alias '{index_name}' i dokumenty sprawy usunięte.")
+                return True
+        except ElasticsearchException as e:
+            print(f"Błąd Elasticsearch: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Nie można usunąć dokumentów sprawy: {str(e)}"
             )
-            
-            results = []
-            for hit in response["hits"]["hits"]:
-                result = {
-                    "id": hit["_id"],
-                    "score": hit["_score"],
-                    "source": hit["_source"],
-                    "highlights": hit.get("highlight", {})
-                }
-                results.append(result)
-            
-            return results
+        return self.delete_index(index_name)
+    
+    def _embedding_properties(self):
+        """Pole wektora do wyszukiwania kNN (tylko przy włączonych embeddingach)"""
+        if self.embedder is None:
+            return {}
+        return {
+            "embedding": {
+                "type": "dense_vector",
+                "dims": self.embedder.dimensions,
+                "index": True,
+                "similarity": "cosine"
+            }
+        }
+    
+    def create_judgments_index(self, index_name):
+        """Tworzenie indeksu lokalnej kopii orzeczeń SAOS"""
+        return self.create_case_index(index_name, extra_properties={
+            "saos_id": {"type": "integer"},
+            "court_type": {"type": "keyword"},
+            "judgment_date": {"type": "date"},
+            "keywords": {"type": "keyword"},
+            "judges": {"type": "text", "analyzer": "polish"}
+        })
+
+    def create_legal_acts_index(self, index_name):
+        """Tworzenie indeksu lokalnego korpusu aktów prawnych ISAP"""
+        return self.create_case_index(index_name, extra_properties={
+            "isap_id": {"type": "keyword"},
+            "status": {"type": "keyword"},
+            "publication_date": {"type": "date"},
+            "version": {"type": "integer"}
+        })
+    
+    @traced()
+    def index_document(self, index_name, document_id, document, wait_for=False):
+        """
+        Indeksowanie dokumentu w Elasticsearch
+
+        Operacja trafia do kolejki zapisu i jest wysyłana w partii _bulk. Przy
+        wait_for=True wywołanie czeka, aż dokument będzie widoczny w wyszukiwaniu
+        (refresh=wait_for), co jest potrzebne tylko dla read-your-writes.
+        Przy włączonych embeddingach dokument dostaje pole embedding.
+        """
+        if self.embedder is not None and "embedding" not in document and document.get("content"):
+            document = self._with_embeddings([document])[0]
+        pending = self._submit_index(index_name, document_id, document, wait_for)
+        if wait_for:
+            self._wait_for_write(pending, "Nie można zindeksować dokumentu")
+        return True
+
+    def _submit_index(self, index_name, document_id, document, wait_for):
+        self._bump_generation(index_name)
+        return self.indexing_queue.submit_index(index_name, document_id, document, wait=wait_for)
+    
+    @traced()
+    def search(self, index_name, query, size=10, mode=None, highlight=False):
+        """
+        Wyszukiwanie dokumentów (bez fragmentów) w Elasticsearch
+
+        Args:
+            mode: Tryb rankingu (domyślnie SEARCH_MODE): bm25, hybrid lub fuzzy
+            highlight: Czy uzupełnić wyniki o wyróżnione fragmenty treści (highlights);
+                bez tego pole highlights jest puste, a zapytanie nie uruchamia highlightera
+        """
+        fields = ["content^3", "title^2", "filename", "court_name"]
+        hits = self._ranked_search(
+            index_name, query, size,
+            fields=fields,
+            # Fragmenty wyszukiwane są osobno przez search_passages
+            doc_filter={"bool": {"must_not": {"term": {"doc_kind": "passage"}}}},
+            mode=mode,
+            operation="search"
+        )
+        if highlight and hits:
+            hits = self._with_highlights(index_name, query, fields, hits)
+        return hits
+    
+    @traced()
+    def search_passages(self, index_name, query, size=10, mode=None):
+        """
+        Wyszukiwanie najlepiej dopasowanych fragmentów dokumentów
+
+        Zwraca wyniki w tym samym formacie co search, a źródło każdego wyniku
+        zawiera treść fragmentu, jego nagłówek oraz odnośnik parent_id.
+        """
+        return self._ranked_search(
+            index_name, query, size,
+            fields=["content^3", "heading^2", "title", "court_name"],
+            doc_filter={"term": {"doc_kind": "passage"}},
+            mode=mode,
+            operation="search_passages"
+        )
+    
+    def _ranked_search(self, index_name, query, size, fields, doc_filter, mode=None, operation="search"):
+        """
+        Wyszukiwanie BM25 lub hybrydowe (BM25 + kNN, łączone przez reciprocal rank fusion)
+
+        Pierwsze przejście BM25 dopasowuje dokładne (po analizie) terminy —
+        rozwijanie fuzziness jest kosztowne na dużych indeksach, więc drugie,
+        rozmyte przejście wykonywane jest tylko, gdy pierwsze znajdzie mniej niż
+        SEARCH_FUZZY_MIN_HITS wyników. Zapytanie BM25 i kNN wysyłane są razem
+        w jednym żądaniu _msearch, więc Elasticsearch wykonuje je równolegle.
+        Wynik trafia do pamięci podręcznej (_cached_search).
+        """
+        mode = mode or settings.SEARCH_MODE
+        if mode == "hybrid" and self.embedder is None:
+            mode = "bm25"
+        key = self._cache_key(operation, index_name, mode, size, query)
+        cached = self._cached_search(key)
+        if cached is not None:
+            return cached
+        started = time.monotonic()
+        searches = [self._bm25_body(query, size, fields, doc_filter, fuzzy=mode == "fuzzy")]
+        if mode == "hybrid":
+            searches.append(self._knn_body(query, size, doc_filter))
+        try:
+            with timed(ES_SECONDS, operation=operation):
+                responses = self._msearch(index_name, searches)
+            bm25_hits = self._hits(responses[0], raise_error=True)
+            fuzzy_fallback = mode != "fuzzy" and len(bm25_hits) < min(settings.SEARCH_FUZZY_MIN_HITS, size)
+            if fuzzy_fallback:
+                with timed(ES_SECONDS, operation=f"{operation}_fuzzy"):
+                    fuzzy = self._msearch(index_name, [self._bm25_body(query, size, fields, doc_filter, fuzzy=True)])
+                seen = {hit["id"] for hit in bm25_hits}
+                bm25_hits += [hit for hit in self._hits(fuzzy[0], raise_error=True) if hit["id"] not in seen]
+            # Indeks bez pola embedding (sprzed włączenia embeddingów) zwraca błąd tylko dla kNN
+            knn_hits = self._hits(responses[1]) if mode == "hybrid" else []
         except ElasticsearchException as e:
             print(f"Błąd Elasticsearch: {e}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Nie można wykonać wyszukiwania: {str(e)}"
             )
+        self._count_search(mode, fuzzy_fallback)
+        if mode != "hybrid":
+            hits = bm25_hits[:size]
+        else:
+            hits = reciprocal_rank_fusion([bm25_hits, knn_hits], size, k=settings.SEARCH_RRF_K)
+        # Wpis przechowuje kopie — zwrócone wyniki wywołujący może modyfikować
+        self._cache_search(key, index_name, started, [dict(hit) for hit in hits])
+        return hits
+
+    @staticmethod
+    def _bm25_body(query, size, fields, doc_filter, fuzzy=False):
+        multi_match = {"query": query, "fields": fields}
+        if fuzzy:
+            multi_match["fuzziness"] = "AUTO"
+        return {
+            "query": {"bool": {"must": {"multi_match": multi_match}, "filter": doc_filter}},
+            "_source": {"excludes": ["embedding"]},
+            "size": size
+        }
+
+    def _with_highlights(self, index_name, query, fields, hits):
+        """
+        Wyniki uzupełnione o wyróżnienia, liczone osobnym zapytaniem tylko dla tych dokumentów
+
+        Wyróżnienia również trafiają do pamięci podręcznej, więc powtórzone
+        wyszukiwanie z highlight=True nie uruchamia highlightera ponownie.
+        """
+        ids = [hit["id"] for hit in hits]
+        key = self._cache_key("highlight", index_name, "", len(ids), query, *ids)
+        highlights = self._search_cache.get(key) if key is not None else None
+        if highlights is None:
+            started = time.monotonic()
+            # should zamiast must: wyniki kNN i rozmytego przejścia nie muszą zawierać dokładnych terminów
+            body = {
+                "query": {"bool": {
+                    "should": {"multi_match": {"query": query, "fields": fields, "fuzziness": "AUTO"}},
+                    "filter": {"ids": {"values": ids}}
+                }},
+                "_source": False,
+                "size": len(ids),
+                "highlight": SEARCH_HIGHLIGHT
+            }
+            try:
+                with timed(ES_SECONDS, operation="highlight"):
+                    response = self._msearch(index_name, [body])[0]
+            except ElasticsearchException as e:
+                print(f"Błąd Elasticsearch: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Nie można wyróżnić fragmentów: {str(e)}"
+                )
+            highlights = {hit["id"]: hit["highlights"] for hit in self._hits(response)}
+            with self._stats_lock:
+                self._search_stats["highlight_requests"] += 1
+            self._cache_search(key, index_name, started, highlights)
+        return [{**hit, "highlights": highlights.get(hit["id"], {})} for hit in hits]
+
+    def _cache_key(self, operation, index_name, mode, size, query, *extra):
+        """Klucz wyniku: operacja, indeks z bieżącą generacją, tryb, liczba wyników i znormalizowane zapytanie"""
+        if self._search_cache is None:
+            return None
+        with self._stats_lock:
+            generation = self._generations.get(index_name, 0)
+        return "|".join(map(str, (operation, index_name, generation, mode, size, " ".join(query.lower().split()), *extra)))
+
+    def _cached_search(self, key):
+        if key is None:
+            return None
+        cached = self._search_cache.get(key)
+        with self._stats_lock:
+            self._search_stats["cache_hits" if cached is not None else "cache_misses"] += 1
+        # Kopie wyników — wywołujący może je uzupełniać bez zmiany wpisu w pamięci
+        return [dict(hit) for hit in cached] if cached is not None else None
+
+    def _cache_search(self, key, index_name, started, value):
+        """
+        Zapis wyniku, o ile zapytanie widziało już wszystkie zapisy w indeksie
+
+        Zapis jest widoczny w wyszukiwaniu dopiero po wysłaniu partii _bulk
+        i odświeżeniu indeksu, dlatego wyniki zapytań rozpoczętych krócej niż
+        SEARCH_CACHE_SETTLE sekund po ostatnim zapisie nie są zapamiętywane.
+        """
+        if key is None:
+            return
+        with self._stats_lock:
+            last_write = self._last_writes.get(index_name)
+        if last_write is None or started - last_write >= settings.SEARCH_CACHE_SETTLE:
+            self._search_cache.set(key, value)
+
+    def _bump_generation(self, index_name):
+        """Unieważnienie zapamiętanych wyników indeksu po zapisie lub usunięciu"""
+        with self._stats_lock:
+            self._generations[index_name] = self._generations.get(index_name, 0) + 1
+            self._last_writes[index_name] = time.monotonic()
+
+    def _knn_body(self, query, size, doc_filter):
+        return {
+            "knn": {
+                "field": "embedding",
+                "query_vector": self.embedder.embed_one(query),
+                "k": size,
+                "num_candidates": max(settings.SEARCH_KNN_CANDIDATES, size),
+                "filter": doc_filter
+            },
+            "_source": {"excludes": ["embedding"]},
+            "size": size
+        }
+
+    def _msearch(self, index_name, bodies):
+        searches = []
+        for body in bodies:
+            searches.extend([{}, body])
+        return self.es.msearch(index=index_name, searches=searches)["responses"]
+
+    @staticmethod
+    def _hits(response, raise_error=False):
+        """Wyniki jednego zapytania z _msearch w formacie search (błąd zapytania: wyjątek albo brak wyników)"""
+        if "error" in response:
+            if raise_error:
+                print(f"Błąd Elasticsearch: {response['error']}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Nie można wykonać wyszukiwania: {response['error']}"
+                )
+            print(f"Błąd zapytania Elasticsearch: {response['error']}")
+            return []
+        return [
+            {
+                "id": hit["_id"],
+                "score": hit["_score"],
+                "source": hit.get("_source", {}),
+                "highlights": hit.get("highlight", {})
+            }
+            for hit in response["hits"]["hits"]
+        ]
+
+    def _count_search(self, mode, fuzzy_fallback):
+        with self._stats_lock:
+            self._search_stats[mode] = self._search_stats.get(mode, 0) + 1
+            self._search_stats["fuzzy_fallbacks"] += int(fuzzy_fallback)
+
+    def search_stats(self):
+        """Liczba wyszukiwań w poszczególnych trybach i rozmytych przejść awaryjnych"""
+        with self._stats_lock:
+            return dict(self._search_stats)
+
+    def _with_embeddings(self, documents):
+        """Dokumenty z polem embedding (tytuł, nagłówek i początek treści), liczonym w jednej partii"""
+        texts = [
+            "\n".join(filter(None, (document.get("title"), document.get("heading"), document.get("content"))))
+            [:settings.EMBEDDING_MAX_CHARS]
+            for document in documents
+        ]
+        vectors = self.embedder.embed(texts)
+        return [
+            {**document, "embedding": vector} if any(vector) else document
+            for document, vector in zip(documents, vectors)
+        ]
+    
+    @traced()
+    def index_passages(self, index_name, parent_id, parent_fields, passages, replace=True, wait_for=False):
+        """
+        Indeksowanie fragmentów dokumentu nadrzędnego
+
+        Args:
+            index_name: Nazwa indeksu
+            parent_id: Identyfikator dokumentu nadrzędnego
+            parent_fields: Pola dokumentu nadrzędnego kopiowane do każdego fragmentu (tytuł, typ, sygnatura...)
+            passages: Lista obiektów chunking.Passage
+            replace: Czy dokument mógł być już zindeksowany (False pomija usuwanie starych fragmentów)
+            wait_for: Czy czekać na zapis wszystkich fragmentów (błąd zapisu zgłaszany jako HTTPException)
+        """
+        # Usunięcie fragmentów pozostałych z poprzedniej, dłuższej wersji dokumentu
+        if replace:
+            self.delete_passages(index_name, parent_id, from_ordinal=len(passages))
+        documents = [
+            {
+                **parent_fields,
+                "doc_kind": "passage",
+                "parent_id": parent_id,
+                "ordinal": passage.ordinal,
+                "heading": passage.heading,
+                "content": passage.text,
+                "token_count": passage.token_count
+            }
+            for passage in passages
+        ]
+        if self.embedder is not None and documents:
+            documents = self._with_embeddings(documents)
+        # Najpierw wszystkie fragmenty trafiają do kolejki, aby zmieściły się we wspólnych partiach
+        pending = [
+            self._submit_index(index_name, passage.passage_id, document, wait_for)
+            for passage, document in zip(passages, documents)
+        ]
+        if wait_for:
+            for item in pending:
+                self._wait_for_write(item, "Nie można zindeksować fragmentu dokumentu")
+        return True
     
-    def delete_document(self, index_name, document_id):
-        """Usuwanie dokumentu z Elasticsearch"""
+    @traced()
+    def delete_passages(self, index_name, parent_id, from_ordinal=0):
+        """Usunięcie fragmentów dokumentu nadrzędnego (od podanego numeru porządkowego)"""
+        self._bump_generation(index_name)
         try:
-            self.es.delete(
-                index=index_name,
-                id=document_id
-            )
-            # Odświeżenie indeksu, aby zmiany były widoczne natychmiast
-            self.es.indices.refresh(index=index_name)
+            if not self.es.indices.exists(index=index_name):
+                return True
+            with timed(ES_SECONDS, operation="delete_by_query"):
+                self.es.delete_by_query(
+                    index=index_name,
+                    query={
+                        "bool": {
+                            "filter": [
+                                {"term": {"doc_kind": "passage"}},
+                                {"term": {"parent_id": parent_id}},
+                                {"range": {"ordinal": {"gte": from_ordinal}}}
+                            ]
+                        }
+                    },
+                    conflicts="proceed"
+                )
             return True
         except ElasticsearchException as e:
             print(f"Błąd Elasticsearch: {e}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Nie można usunąć dokumentu: {str(e)}"
+                detail=f"Nie można usunąć fragmentów dokumentu: {str(e)}"
+            )
+    
+    @traced()
+    def delete_document(self, index_name, document_id, wait_for=False):
+        """Usuwanie dokumentu z Elasticsearch (przez kolejkę zapisu, jak index_document)"""
+        self._bump_generation(index_name)
+        pending = self.indexing_queue.submit_delete(index_name, document_id, wait=wait_for)
+        if wait_for:
+            self._wait_for_write(pending, "Nie można usunąć dokumentu")
+        return True
+
+    @traced()
+    def flush(self):
+        """Wysłanie wszystkich oczekujących zapisów i oczekiwanie na ich widoczność"""
+        try:
+            self.indexing_queue.flush()
+            return True
+        except IndexingError as e:
+            print(f"Błąd Elasticsearch: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Nie można zapisać zmian w indeksie: {str(e)}"
+            )
+
+    def indexing_stats(self):
+        """Metryki kolejki indeksowania (głębokość kolejki, opóźnienia wysyłki _bulk)"""
+        return self.indexing_queue.stats()
+
+    def close(self):
+        """Wysłanie pozostałych zapisów i zamknięcie klienta"""
+        self.indexing_queue.stop()
+        self.es.close()
+
+    def _wait_for_write(self, pending, message):
+        """Oczekiwanie na zapis operacji z kolejki i zamiana błędu na HTTPException"""
+        try:
+            self.indexing_queue.wait(pending)
+        except IndexingError as e:
+            print(f"Błąd Elasticsearch: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"{message}: {str(e)}"
             )
     
+    @traced()
     def delete_index(self, index_name):
         """Usuwanie indeksu z Elasticsearch"""
+        self._bump_generation(index_name)
         try:
             if self.es.indices.exists(index=index_name):
                 self.es.indices.delete(index=index_name)
@@ -0,0 +1,540 @@
+"""
+Embeddingi tekstów liczone lokalnie na CPU (wyszukiwanie hybrydowe)
+
+Backendy wybierane ustawieniem EMBEDDING_BACKEND:
+- "onnx" — wielojęzyczny model zdań wyeksportowany do ONNX i uruchamiany
+  przez onnxruntime na CPU (opcjonalne zależności onnxruntime i tokenizers),
+  np. paraphrase-multilingual-MiniLM-L12-v2 wyeksportowany poleceniem
+  `optimum-cli export onnx --model sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2 <katalog>`,
+- "sentence-transformers" — ten sam model przez pakiet sentence-transformers
+  (opcjonalna zależność, wymaga PyTorch),
+- "hashing" — bez zależności: n-gramy znakowe słów haszowane do wektora
+  o stałej długości; odporny na odmianę słów i literówki, ale nie rozumie
+  parafraz (testy, benchmarki, małe wdrożenia bez modelu),
+- "none" — brak embeddingów, wyszukiwanie wyłącznie BM25.
+
+Wektory są normalizowane do długości 1, więc podobieństwo kosinusowe w indeksie
+(dense_vector z similarity=cosine) jest iloczynem skalarnym.
+
+Wspólny embedder procesu (get_embedder) składa się z warstw:
+- EmbeddingCache — wektory zapisane w pliku mapowanym w pamięci, z kluczem
+  będącym skrótem treści; ponowne indeksowanie niezmienionego tekstu nie
+  uruchamia modelu (EMBEDDING_CACHE_DIR),
+- BatchingEmbedder — teksty z wielu wątków (indeksowanie, zapytania RAG)
+  łączone w partie: partia jest liczona, gdy zbierze EMBEDDING_BATCH_SIZE
+  tekstów albo minie EMBEDDING_BATCH_WAIT_MS od pierwszego tekstu w kolejce,
+- backend modelu.
+"""
+import abc
+import array
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import settings
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Opcjonalna zależność — bez niej dostępny jest tylko backend "hashing"
+    SentenceTransformer = None
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder(abc.ABC):
+    """Interfejs backendu embeddingów"""
+
+    name = ""
+    dimensions = 0
+    batched = False  # Czy model liczy partię tekstów szybciej niż teksty pojedynczo
+
+    @property
+    def cache_namespace(self) -> str:
+        """Przestrzeń nazw w pamięci podręcznej — wektory różnych modeli nie są wymieszane"""
+        return f"{self.name}-{self.dimensions}"
+
+    @abc.abstractmethod
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embeddingi tekstów (znormalizowane), w kolejności wejścia"""
+
+    def embed_one(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+
+def normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
+
+
+class HashingEmbedder(Embedder):
+    """Embeddingi z haszowanych n-gramów znakowych słów (feature hashing)"""
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = 384, ngram: int = 3):
+        self.dimensions = dimensions
+        self.ngram = ngram
+
+    @lru_cache(maxsize=100_000)
+    def _slot(self, gram: str) -> Tuple[int, float]:
+        """Pozycja w wektorze i znak dla n-gramu (znak zmniejsza wpływ kolizji)"""
+        value = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little")
+        return value % self.dimensions, 1.0 if value >> 63 else -1.0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in WORD_RE.findall(text.lower()):
+            padded = f"<{word}>"
+            for start in range(max(len(padded) - self.ngram + 1, 1)):
+                index, sign = self._slot(padded[start:start + self.ngram])
+                vector[index] += sign
+        return normalize(vector)
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}-{self.dimensions}-{self.ngram}"
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Model zdań sentence-transformers uruchamiany na CPU"""
+
+    name = "sentence-transformers"
+    batched = True
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        if SentenceTransformer is None:
+            raise RuntimeError("Pakiet sentence-transformers nie jest zainstalowany")
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}-{self.model_name}-{self.dimensions}"
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        vectors = self.model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return vectors.tolist()
+
+
+class OnnxEmbedder(Embedder):
+    """
+    Model zdań w formacie ONNX uruchamiany przez onnxruntime na CPU
+
+    Katalog modelu zawiera model.onnx (wyjście last_hidden_state albo gotowy
+    embedding zdania) i tokenizer.json. Embedding zdania to średnia stanów
+    ukrytych tokenów z pominięciem dopełnienia (mean pooling, jak
+    w sentence-transformers). Teksty w partii są sortowane według długości,
+    żeby podpartie miały jak najmniej dopełnienia.
+    """
+
+    name = "onnx"
+    batched = True
+
+    def __init__(self, model_dir: str, batch_size: int = 32, max_tokens: int = 256, threads: int = 0):
+        try:
+            import numpy
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise RuntimeError("Backend onnx wymaga pakietów onnxruntime i tokenizers")
+        self.numpy = numpy
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_tokens)
+        pad_token = self.tokenizer.padding["pad_token"] if self.tokenizer.padding else "<pad>"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+        self.dimensions = len(self._run(["test"])[0])
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}-{os.path.basename(os.path.normpath(self.model_dir))}-{self.dimensions}"
+
+    def _run(self, texts: Sequence[str]):
+        numpy = self.numpy
+        encodings = self.tokenizer.encode_batch(list(texts))
+        inputs = {
+            "input_ids": numpy.array([encoding.ids for encoding in encodings], dtype=numpy.int64),
+            "attention_mask": numpy.array([encoding.attention_mask for encoding in encodings], dtype=numpy.int64),
+            "token_type_ids": numpy.array([encoding.type_ids for encoding in encodings], dtype=numpy.int64),
+        }
+        output = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        if output.ndim == 3:
+            mask = inputs["attention_mask"][:, :, None].astype(output.dtype)
+            output = (output * mask).sum(axis=1) / numpy.clip(mask.sum(axis=1), 1e-9, None)
+        norms = numpy.linalg.norm(output, axis=1, keepdims=True)
+        return output / numpy.clip(norms, 1e-12, None)
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        order = sorted(range(len(texts)), key=lambda position: len(texts[position]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            positions = order[start:start + self.batch_size]
+            for position, vector in zip(positions, self._run([texts[position] for position in positions]).tolist()):
+                vectors[position] = vector
+        return vectors
+
+
+class BatchingEmbedder(Embedder):
+    """
+    Dynamiczne łączenie tekstów z wielu wątków w partie liczone przez jeden wątek modelu
+
+    Wątek modelu pobiera pierwszy tekst z kolejki i dobiera kolejne, aż partia
+    osiągnie max_batch tekstów albo minie max_wait sekund. Pojedyncze pytania
+    RAG zadawane równocześnie trafiają więc do wspólnej partii, a długie listy
+    fragmentów z indeksowania są dzielone na partie o stałym rozmiarze.
+    Po `close()` teksty są liczone bezpośrednio w wątku wywołującego.
+    """
+
+    def __init__(self, embedder: Embedder, max_batch: int = 32, max_wait: float = 0.005, timeout: float = 60.0):
+        self.embedder = embedder
+        self.name = embedder.name
+        self.dimensions = embedder.dimensions
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"batches": 0, "texts": 0, "full_batches": 0, "errors": 0, "max_batch": 0}
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.embedder.cache_namespace
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        futures = []
+        with self._lock:
+            # Sprawdzenie i dopisanie pod blokadą, aby tekst nie trafił do kolejki za znacznikiem końca
+            if not self._closed:
+                for text in texts:
+                    future: Future = Future()
+                    self._queue.put((text, future))
+                    futures.append(future)
+        if not futures and texts:
+            return self.embedder.embed(list(texts))
+        return [future.result(self.timeout) for future in futures]
+
+    def _next_batch(self) -> Optional[List[Tuple[str, Future]]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                # Teksty już czekające w kolejce są dobierane bez czekania na termin
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                vectors = self.embedder.embed([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                with self._lock:
+                    self._stats["errors"] += 1
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["texts"] += len(batch)
+                self._stats["full_batches"] += len(batch) == self.max_batch
+                self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+
+    def stats(self) -> Dict[str, Any]:
+        """Liczba partii i tekstów, średni rozmiar partii, długość kolejki"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def close(self):
+        """Zatrzymanie wątku modelu po policzeniu tekstów już oczekujących w kolejce"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join(timeout=5)
+
+
+class EmbeddingCache:
+    """
+    Trwała pamięć podręczna embeddingów w plikach mapowanych w pamięci
+
+    Dla każdej przestrzeni nazw (model i wymiar) istnieją dwa pliki:
+    <namespace>.keys — 16-bajtowe skróty BLAKE2b treści w kolejności dopisania,
+    <namespace>.vec — wektory float32 w tej samej kolejności (wiersz i ma klucz i).
+    Pliki są tylko dopisywane: wektor jest zapisywany przed kluczem, więc
+    przerwany zapis zostawia co najwyżej nieużywany wiersz. Dopisywanie odbywa
+    się pod blokadą pliku (flock), dlatego z jednego katalogu mogą korzystać
+    wszystkie procesy robocze; każdy z nich doczytuje klucze dopisane przez
+    pozostałe. Odczyt wektora to kopia wiersza z mapowania, bez wywołań systemowych.
+    Pamięć nie ma limitu rozmiaru (ok. 1,5 KB na tekst przy 384 wymiarach) —
+    usunięcie katalogu czyści ją w całości.
+    """
+
+    KEY_BYTES = 16
+
+    def __init__(self, directory: str, namespace: str, dimensions: int):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, re.sub(r"[^\w.-]+", "_", namespace))
+        self.dimensions = dimensions
+        self.row_bytes = dimensions * 4
+        self._keys_fd = os.open(base + ".keys", os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._vectors_fd = os.open(base + ".vec", os.O_RDWR | os.O_CREAT, 0o644)
+        self._map: Optional[mmap.mmap] = None
+        self._rows: Dict[bytes, int] = {}
+        self._keys_size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+        with self._lock, self._file_lock():
+            # Niepełny klucz po przerwanym zapisie przesunąłby wszystkie następne
+            size = os.fstat(self._keys_fd).st_size
+            if size % self.KEY_BYTES:
+                os.ftruncate(self._keys_fd, size - size % self.KEY_BYTES)
+            self._load_new_keys()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=EmbeddingCache.KEY_BYTES).digest()
+
+    def _file_lock(self):
+        return _FileLock(self._keys_fd)
+
+    def _load_new_keys(self):
+        """Doczytanie kluczy dopisanych od ostatniego odczytu (także przez inne procesy)"""
+        size = os.fstat(self._keys_fd).st_size
+        size -= size % self.KEY_BYTES
+        if size <= self._keys_size:
+            return
+        data = os.pread(self._keys_fd, size - self._keys_size, self._keys_size)
+        row = self._keys_size // self.KEY_BYTES
+        for offset in range(0, len(data), self.KEY_BYTES):
+            self._rows[data[offset:offset + self.KEY_BYTES]] = row
+            row += 1
+        self._keys_size = size
+
+    def _mapped(self, rows: int) -> mmap.mmap:
+        """Mapowanie obejmujące co najmniej podaną liczbę wierszy (plik rośnie skokowo)"""
+        needed = rows * self.row_bytes
+        if self._map is None or len(self._map) < needed:
+            size = os.fstat(self._vectors_fd).st_size
+            if size < needed:
+                size = max(needed, 2 * size, 1024 * self.row_bytes)
+                os.ftruncate(self._vectors_fd, size)
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._vectors_fd, size)
+        return self._map
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Wektory tekstów albo None dla tekstów, których nie ma w pamięci"""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                self._load_new_keys()
+            rows = [self._rows.get(key) for key in keys]
+            found = [row for row in rows if row is not None]
+            vectors = []
+            if found:
+                mapped = self._mapped(max(found) + 1)
+            for row in rows:
+                if row is None:
+                    vectors.append(None)
+                    continue
+                vector = array.array("f")
+                vector.frombytes(mapped[row * self.row_bytes:(row + 1) * self.row_bytes])
+                vectors.append(vector.tolist())
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(rows) - len(found)
+        return vectors
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Dopisanie wektorów tekstów (teksty już obecne są pomijane)"""
+        with self._lock, self._file_lock():
+            self._load_new_keys()
+            new_keys = []
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                if key in self._rows or len(vector) != self.dimensions:
+                    continue
+                row = self._keys_size // self.KEY_BYTES + len(new_keys)
+                mapped = self._mapped(row + 1)
+                mapped[row * self.row_bytes:(row + 1) * self.row_bytes] = array.array("f", vector).tobytes()
+                new_keys.append(key)
+            if new_keys:
+                os.write(self._keys_fd, b"".join(new_keys))
+                self._load_new_keys()
+                self._stats["writes"] += len(new_keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Trafienia, chybienia, liczba zapisanych wektorów"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._rows),
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+                self._map.close()
+                self._map = None
+            os.close(self._keys_fd)
+            os.close(self._vectors_fd)
+
+
+class _FileLock:
+    """Wyłączna blokada pliku między procesami (flock) jako menedżer kontekstu"""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def __enter__(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+class CachedEmbedder(Embedder):
+    """Embedder sprawdzający pamięć podręczną przed uruchomieniem modelu"""
+
+    def __init__(self, embedder: Embedder, cache: EmbeddingCache):
+        self.embedder = embedder
+        self.cache = cache
+        self.name = embedder.name
+        self.dimensions = embedder.dimensions
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.embedder.cache_namespace
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            computed = dict(zip(missing, self.embedder.embed(missing)))
+            self.cache.put_many(missing, [computed[text] for text in missing])
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+
+def build_embedder(backend: str, model_name: Optional[str] = None, dimensions: int = 384,
+                   model_dir: Optional[str] = None, threads: int = 0) -> Optional[Embedder]:
+    """
+    Utworzenie backendu embeddingów na podstawie konfiguracji
+
+    Returns:
+        Embedder albo None (backend "none" lub niedostępny model — wyszukiwanie tylko BM25)
+    """
+    if backend == "hashing":
+        return HashingEmbedder(dimensions)
+    if backend == "sentence-transformers":
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            print(f"Nie można załadować modelu embeddingów {model_name}: {e}. Wyszukiwanie tylko BM25")
+            return None
+    if backend == "onnx":
+        try:
+            return OnnxEmbedder(model_dir, threads=threads)
+        except Exception as e:
+            print(f"Nie można załadować modelu ONNX z {model_dir}: {e}. Wyszukiwanie tylko BM25")
+            return None
+    return None
+
+
+_embedder: Optional[Embedder] = None
+_embedder_loaded = False
+_embedder_lock = threading.Lock()
+
+
+_batcher: Optional[BatchingEmbedder] = None
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedder() -> Optional[Embedder]:
+    """Wspólny embedder procesu (model ładowany raz), z partiami i pamięcią podręczną według ustawień"""
+    global _embedder, _embedder_loaded, _batcher, _cache
+    if not _embedder_loaded:
+        with _embedder_lock:
+            if not _embedder_loaded:
+                _embedder = build_embedder(
+                    settings.EMBEDDING_BACKEND, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS,
+                    model_dir=settings.EMBEDDING_ONNX_PATH, threads=settings.EMBEDDING_THREADS
+                )
+                if _embedder is not None and _embedder.batched and settings.EMBEDDING_BATCH_SIZE > 1:
+                    _embedder = _batcher = BatchingEmbedder(
+                        _embedder, settings.EMBEDDING_BATCH_SIZE, settings.EMBEDDING_BATCH_WAIT_MS / 1000,
+                        settings.EMBEDDING_BATCH_TIMEOUT
+                    )
+                if _embedder is not None and settings.EMBEDDING_CACHE_DIR:
+                    _cache = EmbeddingCache(settings.EMBEDDING_CACHE_DIR, _embedder.cache_namespace, _embedder.dimensions)
+                    _embedder = CachedEmbedder(_embedder, _cache)
+                _embedder_loaded = True
+    return _embedder
+
+
+def get_embedding_stats() -> Dict[str, Any]:
+    """Statystyki wspólnego embeddera: backend, partie i pamięć podręczna"""
+    embedder = get_embedder()
+    return {
+        "backend": embedder.name if embedder is not None else "none",
+        "batching": _batcher.stats() if _batcher is not None else {},
+        "cache": _cache.stats() if _cache is not None else {}
+    }
+
+
+def close_embedder():
+    """Zatrzymanie wątku partii i zapis mapowanych wektorów na dysk"""
+    if _batcher is not None:
+        _batcher.close()
+    if _cache is not None:
+        _cache.close()
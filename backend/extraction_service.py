@@ -0,0 +1,289 @@
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import models
+from chunking import chunk_text
+from text_extraction import extract_pages
+
+
+class ExtractionService:
+    """
+    Usługa ekstrakcji tekstu z wgranych dokumentów działająca w tle
+
+    Wątki dyspozytorskie pobierają identyfikatory dokumentów z kolejki, strumieniują
+    plik z MinIO do pliku tymczasowego, zlecają parsowanie puli procesów (parsowanie
+    obciąża CPU), zapisują Document.content_text i indeksują tekst w indeksie sprawy
+    wraz z fragmentami (passages) wykorzystywanymi przez RAG.
+    Postęp i czasy etapów zapisywane są w tabeli extraction_jobs.
+    """
+
+    def __init__(self, minio_client, es_client, session_factory, max_workers: int = 2,
+                 dispatchers: int = 2, extract_timeout: float = 300.0,
+                 passage_max_tokens: int = 400, passage_overlap_tokens: int = 60):
+        """
+        Inicjalizacja usługi
+
+        Args:
+            minio_client: Klient MinIO, z którego pobierane są pliki
+            es_client: Klient Elasticsearch do indeksowania tekstu
+            session_factory: Fabryka sesji SQLAlchemy
+            max_workers: Liczba procesów parsujących dokumenty
+            dispatchers: Liczba wątków obsługujących pobieranie i zapis
+            extract_timeout: Maksymalny czas parsowania jednego dokumentu (s)
+            passage_max_tokens: Maksymalna długość fragmentu w tokenach
+            passage_overlap_tokens: Zakładka między kolejnymi fragmentami w tokenach
+        """
+        self.minio_client = minio_client
+        self.es_client = es_client
+        self.session_factory = session_factory
+        self.max_workers = max_workers
+        self.dispatchers = dispatchers
+        self.extract_timeout = extract_timeout
+        self.passage_max_tokens = passage_max_tokens
+        self.passage_overlap_tokens = passage_overlap_tokens
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        # Dokumenty w kolejce lub w trakcie przetwarzania — ponowne zlecenie jest pomijane
+        self._queued_ids = set()
+        self._completed = 0
+        self._failed = 0
+        self._in_progress = 0
+
+    def start(self):
+        """Uruchomienie puli procesów i wątków oraz wznowienie niedokończonych zadań"""
+        if self._threads:
+            return
+        with self._pool_lock:
+            self._pool = self._create_pool()
+        for number in range(self.dispatchers):
+            thread = threading.Thread(target=self._run, name=f"extraction-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.resume_pending()
+
+    def stop(self):
+        """Zatrzymanie wątków i puli procesów"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def submit(self, document_id: int):
+        """Zlecenie ekstrakcji tekstu dokumentu (nie blokuje wywołującego)"""
+        with self._stats_lock:
+            if document_id in self._queued_ids:
+                return
+            self._queued_ids.add(document_id)
+        self._queue.put(document_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Statystyki usługi: długość kolejki, zadania w toku, zakończone i nieudane"""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "in_progress": self._in_progress,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        # "spawn" zamiast "fork" — proces serwera ma już uruchomione wątki
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def resume_pending(self):
+        """Ponowne zlecenie zadań przerwanych np. przez restart serwera lub oznaczonych do ponowienia"""
+        db = self.session_factory()
+        try:
+            document_ids = [
+                document_id for (document_id,) in db.query(models.ExtractionJob.document_id).filter(
+                    models.ExtractionJob.status.in_(["pending", "running"])
+                )
+            ]
+        except Exception as e:
+            print(f"Nie można wznowić zadań ekstrakcji: {e}")
+            document_ids = []
+        finally:
+            db.close()
+        for document_id in document_ids:
+            self.submit(document_id)
+
+    def _run(self):
+        """Pętla wątku dyspozytorskiego"""
+        while True:
+            document_id = self._queue.get()
+            if document_id is None:
+                return
+            with self._stats_lock:
+                self._in_progress += 1
+            ok = self._process(document_id)
+            with self._stats_lock:
+                self._queued_ids.discard(document_id)
+                self._in_progress -= 1
+                if ok:
+                    self._completed += 1
+                elif ok is False:
+                    self._failed += 1
+
+    @staticmethod
+    @contextmanager
+    def _stage(timings: Dict[str, float], name: str):
+        """Pomiar czasu etapu w milisekundach"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] = round((time.perf_counter() - started) * 1000, 3)
+
+    def _process(self, document_id: int) -> Optional[bool]:
+        """
+        Przetworzenie jednego dokumentu
+
+        Returns:
+            True po sukcesie, False po błędzie, None gdy nie było nic do zrobienia
+        """
+        db = self.session_factory()
+        timings: Dict[str, float] = {}
+        try:
+            job = db.query(models.ExtractionJob).filter(
+                models.ExtractionJob.document_id == document_id
+            ).first()
+            if job is None or job.status == "done" or job.document is None:
+                return None
+            document = job.document
+
+            job.status = "running"
+            job.attempts = (job.attempts or 0) + 1
+            job.started_at = datetime.utcnow()
+            job.error = None
+            db.commit()
+
+            extension = os.path.splitext(document.title or "")[1]
+            tmp = tempfile.NamedTemporaryFile(suffix=extension, delete=False)
+            try:
+                # Strumieniowe pobranie pliku z MinIO na dysk, bez trzymania go w pamięci
+                with self._stage(timings, "download_ms"), tmp:
+                    for chunk in self.minio_client.stream_file(document.file_path):
+                        tmp.write(chunk)
+                with self._stage(timings, "extract_ms"):
+                    pages = self._run_in_pool(extract_pages, tmp.name, document.file_type, document.title)
+            finally:
+                os.unlink(tmp.name)
+
+            with self._stage(timings, "store_ms"):
+                document.content_text = "\n\n".join(page for page in pages if page)
+                job.page_count = len(pages)
+                job.char_count = len(document.content_text)
+                db.commit()
+
+            parent_id = f"document-{document.id}"
+            with self._stage(timings, "chunk_ms"):
+                passages = self._run_in_pool(
+                    chunk_text,
+                    document.content_text,
+                    parent_id,
+                    self.passage_max_tokens,
+                    self.passage_overlap_tokens
+                )
+
+            with self._stage(timings, "index_ms"):
+                self._index(document, parent_id, passages)
+
+            for name, value in timings.items():
+                setattr(job, name, value)
+            job.status = "done"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            return True
+        except Exception as e:
+            print(f"Błąd ekstrakcji tekstu dokumentu {document_id}: {e}")
+            db.rollback()
+            self._mark_failed(db, document_id, str(e), timings)
+            return False
+        finally:
+            db.close()
+
+    def _run_in_pool(self, func, *args):
+        """Wykonanie funkcji w puli procesów (z odtworzeniem puli po awarii procesu lub przekroczeniu czasu)"""
+        pool = self._pool
+        try:
+            return pool.submit(func, *args).result(self.extract_timeout)
+        except CancelledError:
+            # Zlecenie oczekujące anulowane przy wymianie puli po awarii innego zadania
+            if self._pool is pool or self._pool is None:
+                raise
+            return self._run_in_pool(func, *args)
+        except (BrokenProcessPool, FuturesTimeoutError):
+            # Zawieszony proces nadal zajmowałby miejsce w puli, a uszkodzona pula odrzuca każde zlecenie
+            self._replace_pool(pool)
+            raise
+
+    def _replace_pool(self, pool: ProcessPoolExecutor):
+        """Zamknięcie puli wraz z jej procesami i utworzenie nowej (raz, nawet przy kilku zgłaszających)"""
+        with self._pool_lock:
+            if self._pool is not pool:
+                return
+            processes = list((getattr(pool, "_processes", None) or {}).values())
+            pool.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            self._pool = self._create_pool()
+
+    def _index(self, document, parent_id, passages):
+        """Indeksowanie wyekstrahowanego tekstu i jego fragmentów w indeksie sprawy"""
+        index_name = self.es_client.ensure_case_index(document.case_id)
+        parent_fields = {
+            "type": "document",
+            "document_id": document.id,
+            "case_id": document.case_id,
+            "owner_id": document.case.owner_id if document.case is not None else None,
+            "title": document.title,
+            "filename": document.title,
+            "document_type": document.file_type,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        # Zadanie jest oznaczane jako zakończone dopiero po zapisie w Elasticsearch;
+        # błąd zapisu (np. blokada zapisu indeksu) kończy zadanie statusem failed
+        self.es_client.index_document(index_name, parent_id, {
+            **parent_fields,
+            "doc_kind": "document",
+            "content": document.content_text
+        }, wait_for=True)
+        self.es_client.index_passages(index_name, parent_id, parent_fields, passages, wait_for=True)
+
+    def _mark_failed(self, db, document_id: int, error: str, timings: Dict[str, float]):
+        try:
+            job = db.query(models.ExtractionJob).filter(
+                models.ExtractionJob.document_id == document_id
+            ).first()
+            if job is None:
+                return
+            for name, value in timings.items():
+                setattr(job, name, value)
+            job.status = "failed"
+            job.error = error
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            print(f"Nie można zapisać statusu zadania ekstrakcji {document_id}: {e}")
+            db.rollback()
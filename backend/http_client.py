@@ -0,0 +1,356 @@
+"""
+Wspólna warstwa HTTP dla klientów zewnętrznych serwisów (ISAP, SAOS)
+
+Jeden klient httpx (synchroniczny i asynchroniczny) utrzymuje pulę połączeń
+keep-alive. Dla każdego hosta obowiązuje limit równoległych żądań oraz limit
+częstotliwości (kubełek tokenów), aby nie przeciążać serwisów publicznych.
+Żądania idempotentne kończące się błędem sieci lub statusem 429/5xx są
+ponawiane z wykładniczym opóźnieniem z losowym rozrzutem (full jitter),
+z uwzględnieniem nagłówka Retry-After.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import settings
+from tracing import span
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class UpstreamError(Exception):
+    """Zewnętrzny serwis nie odpowiedział poprawnie mimo ponowień"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class HostPolicy:
+    """Limity dla jednego hosta: żądania na sekundę, rozmiar serii i liczba równoległych żądań"""
+    rate: float = 5.0
+    burst: int = 5
+    max_concurrency: int = 4
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Ponawianie żądań: liczba prób oraz bazowe i maksymalne opóźnienie (s)"""
+    max_attempts: int = 4
+    backoff: float = 0.5
+    backoff_max: float = 20.0
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Opóźnienie przed kolejną próbą (attempt liczone od 1)"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.strip().isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1)))
+
+
+class TokenBucket:
+    """
+    Kubełek tokenów z rezerwacją
+
+    Każde żądanie pobiera token; gdy kubełek jest pusty, liczba tokenów spada
+    poniżej zera, a wywołujący czeka, aż dług zostanie spłacony. Kolejne
+    żądania ustawiają się więc w kolejce w tempie `rate` na sekundę.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Pobranie tokenu; zwraca czas (s), jaki trzeba odczekać przed wysłaniem żądania"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class HostLimiter:
+    """Limit częstotliwości i równoległości żądań do jednego hosta, wraz ze statystykami"""
+
+    def __init__(self, policy: HostPolicy):
+        self.policy = policy
+        self.bucket = TokenBucket(policy.rate, policy.burst)
+        self._semaphore = threading.BoundedSemaphore(policy.max_concurrency)
+        # asyncio.Semaphore jest związany z pętlą zdarzeń, więc osobny dla każdej pętli
+        self._async_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.throttled_ms = 0.0
+
+    def async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.policy.max_concurrency)
+        return semaphore
+
+    def record(self, **deltas: float):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "in_flight": self.in_flight,
+                "throttled_ms": round(self.throttled_ms, 3),
+            }
+
+
+class PoliteHTTPClient:
+    """
+    Klient HTTP z pulą połączeń, limitami na host i ponawianiem żądań
+
+    Metody `request`/`get_json`/`get_text` są blokujące (do wywołania przez
+    run_io), a `arequest`/`aget_json`/`aget_text` ich odpowiednikami dla pętli
+    zdarzeń. Odpowiedzi z nieponawialnym statusem (np. 404) są zwracane bez
+    zmian; błędy po wyczerpaniu prób zgłaszane są jako UpstreamError.
+    """
+
+    def __init__(
+        self,
+        host_policies: Optional[Dict[str, HostPolicy]] = None,
+        default_policy: HostPolicy = HostPolicy(),
+        retry: RetryPolicy = RetryPolicy(),
+        timeout: float = 15.0,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        self.host_policies = dict(host_policies or {})
+        self.default_policy = default_policy
+        self.retry = retry
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self._timeout = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+        self._headers = headers or {}
+        self._limiters: Dict[str, HostLimiter] = {}
+        self._limiters_lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._client_lock = threading.Lock()
+
+    def limiter(self, url: str) -> HostLimiter:
+        host = urlsplit(url).netloc
+        with self._limiters_lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = HostLimiter(self.host_policies.get(host, self.default_policy))
+                self._limiters[host] = limiter
+            return limiter
+
+    def _sync_client(self) -> httpx.Client:
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    limits=self._limits, timeout=self._timeout, headers=self._headers, follow_redirects=True
+                )
+            return self._client
+
+    def _async_http(self) -> httpx.AsyncClient:
+        with self._client_lock:
+            if self._async_client is None:
+                self._async_client = httpx.AsyncClient(
+                    limits=self._limits, timeout=self._timeout, headers=self._headers, follow_redirects=True
+                )
+            return self._async_client
+
+    def _should_retry(self, method: str, attempt: int) -> bool:
+        return method in IDEMPOTENT_METHODS and attempt < self.retry.max_attempts
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Wysłanie żądania (blokujące) z limitami hosta i ponawianiem"""
+        method = method.upper()
+        limiter = self.limiter(url)
+        client = self._sync_client()
+        attempt = 0
+        with span(f"HTTP {method}", **{"http.method": method, "http.url": url}):
+            while True:
+                attempt += 1
+                wait = limiter.bucket.reserve()
+                if wait:
+                    limiter.record(throttled_ms=wait * 1000)
+                    time.sleep(wait)
+                with limiter._semaphore:
+                    limiter.record(requests=1, in_flight=1)
+                    try:
+                        response = client.request(method, url, **kwargs)
+                        error = None
+                    except httpx.TransportError as e:
+                        response, error = None, e
+                    finally:
+                        limiter.record(in_flight=-1)
+                if error is None and response.status_code not in RETRY_STATUSES:
+                    return response
+                if not self._should_retry(method, attempt):
+                    limiter.record(failures=1)
+                    raise self._upstream_error(url, response, error)
+                limiter.record(retries=1)
+                time.sleep(self.retry.delay(attempt, response))
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Asynchroniczny odpowiednik `request`"""
+        method = method.upper()
+        limiter = self.limiter(url)
+        client = self._async_http()
+        attempt = 0
+        with span(f"HTTP {method}", **{"http.method": method, "http.url": url}):
+            while True:
+                attempt += 1
+                wait = limiter.bucket.reserve()
+                if wait:
+                    limiter.record(throttled_ms=wait * 1000)
+                    await asyncio.sleep(wait)
+                async with limiter.async_semaphore():
+                    limiter.record(requests=1, in_flight=1)
+                    try:
+                        response = await client.request(method, url, **kwargs)
+                        error = None
+                    except httpx.TransportError as e:
+                        response, error = None, e
+                    finally:
+                        limiter.record(in_flight=-1)
+                if error is None and response.status_code not in RETRY_STATUSES:
+                    return response
+                if not self._should_retry(method, attempt):
+                    limiter.record(failures=1)
+                    raise self._upstream_error(url, response, error)
+                limiter.record(retries=1)
+                await asyncio.sleep(self.retry.delay(attempt, response))
+
+    @staticmethod
+    def _upstream_error(url: str, response: Optional[httpx.Response], error: Optional[Exception]) -> UpstreamError:
+        if response is not None:
+            return UpstreamError(f"{url} zwrócił status {response.status_code}", response.status_code)
+        return UpstreamError(f"Błąd połączenia z {url}: {error}")
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """Pobranie dokumentu JSON; None, gdy zasób nie istnieje (404)"""
+        response = self.request("GET", url, params=params)
+        return self._json(url, response)
+
+    def get_text(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Pobranie treści tekstowej; None, gdy zasób nie istnieje (404)"""
+        response = self.request("GET", url, params=params)
+        return self._text(url, response)
+
+    async def aget_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        response = await self.arequest("GET", url, params=params)
+        return self._json(url, response)
+
+    async def aget_text(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        response = await self.arequest("GET", url, params=params)
+        return self._text(url, response)
+
+    @staticmethod
+    def _checked(url: str, response: httpx.Response) -> bool:
+        if response.status_code == 404:
+            return False
+        if response.status_code >= 400:
+            raise UpstreamError(f"{url} zwrócił status {response.status_code}", response.status_code)
+        return True
+
+    def _json(self, url: str, response: httpx.Response) -> Optional[Any]:
+        if not self._checked(url, response):
+            return None
+        try:
+            return response.json()
+        except ValueError as e:
+            raise UpstreamError(f"{url} zwrócił niepoprawny JSON: {e}", response.status_code)
+
+    def _text(self, url: str, response: httpx.Response) -> Optional[str]:
+        return response.text if self._checked(url, response) else None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statystyki żądań dla każdego hosta"""
+        with self._limiters_lock:
+            limiters = dict(self._limiters)
+        return {host: limiter.stats() for host, limiter in limiters.items()}
+
+    def close(self):
+        """Zamknięcie puli połączeń synchronicznych (asynchroniczne zamyka `aclose`)"""
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        """Zamknięcie obu pul połączeń (synchronicznej i asynchronicznej)"""
+        self.close()
+        with self._client_lock:
+            client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+
+
+_shared_client: Optional[PoliteHTTPClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_http_client() -> PoliteHTTPClient:
+    """Wspólny klient HTTP procesu, skonfigurowany limitami dla ISAP i SAOS z ustawień"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = PoliteHTTPClient(
+                host_policies={
+                    urlsplit(settings.ISAP_API_URL).netloc: HostPolicy(
+                        rate=settings.ISAP_RATE_LIMIT,
+                        burst=settings.ISAP_RATE_BURST,
+                        max_concurrency=settings.ISAP_MAX_CONCURRENCY
+                    ),
+                    urlsplit(settings.SAOS_API_URL).netloc: HostPolicy(
+                        rate=settings.SAOS_RATE_LIMIT,
+                        burst=settings.SAOS_RATE_BURST,
+                        max_concurrency=settings.SAOS_MAX_CONCURRENCY
+                    ),
+                },
+                retry=RetryPolicy(
+                    max_attempts=settings.HTTP_RETRY_ATTEMPTS,
+                    backoff=settings.HTTP_RETRY_BACKOFF,
+                    backoff_max=settings.HTTP_RETRY_BACKOFF_MAX
+                ),
+                timeout=settings.HTTP_TIMEOUT,
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive=settings.HTTP_MAX_KEEPALIVE,
+                headers={"User-Agent": settings.HTTP_USER_AGENT}
+            )
+        return _shared_client
+
+
+def get_http_stats() -> Dict[str, Dict[str, Any]]:
+    """Statystyki wspólnego klienta (pusty słownik, dopóki nie został utworzony)"""
+    return _shared_client.stats() if _shared_client is not None else {}
+
+
+async def close_http_client():
+    """Zamknięcie wspólnego klienta przy zatrzymaniu aplikacji (obie pule połączeń)"""
+    if _shared_client is not None:
+        await _shared_client.aclose()
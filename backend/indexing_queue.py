@@ -0,0 +1,277 @@
+import json
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from elasticsearch import helpers
+
+from metrics import ES_SECONDS, observe
+
+
+class IndexingError(Exception):
+    """Błąd zapisu operacji indeksowania w Elasticsearch"""
+
+
+class PendingAction:
+    """Operacja indeksowania oczekująca w kolejce na wysłanie w żądaniu _bulk"""
+
+    def __init__(self, action: Dict[str, Any], wait: bool = False):
+        self.action = action
+        self.key = (action["_index"], action["_id"])
+        self.size = len(json.dumps(action.get("_source", {}), default=str))
+        self.done = threading.Event() if wait else None
+        self.error: Optional[str] = None
+
+    def resolve(self, error: Optional[str] = None):
+        """Oznaczenie operacji jako zakończonej i wybudzenie oczekującego wątku"""
+        self.error = error
+        if self.done is not None:
+            self.done.set()
+
+
+class BulkIndexingQueue:
+    """
+    Kolejka zapisu z opóźnieniem (write-behind) dla Elasticsearch
+
+    Operacje index/delete trafiają do kolejki, a wątek roboczy grupuje je w żądania
+    _bulk wysyłane po osiągnięciu limitu liczby operacji, rozmiaru lub czasu.
+    Indeks nie jest odświeżany po każdym zapisie — widoczność zapewnia
+    refresh_interval indeksu, a operacje wymagające read-your-writes wymuszają
+    wysłanie partii z refresh=wait_for.
+    """
+
+    def __init__(
+        self,
+        es,
+        max_actions: int = 500,
+        max_bytes: int = 5 * 1024 * 1024,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000
+    ):
+        """
+        Inicjalizacja kolejki
+
+        Args:
+            es: Klient Elasticsearch
+            max_actions: Maksymalna liczba operacji w jednym żądaniu _bulk
+            max_bytes: Przybliżony maksymalny rozmiar partii w bajtach
+            flush_interval: Maksymalny czas oczekiwania operacji w kolejce (s)
+            max_queue_size: Pojemność kolejki (po jej zapełnieniu zapis blokuje)
+        """
+        self.es = es
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[PendingAction]]" = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._actions = 0
+        self._coalesced = 0
+        self._failed = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Uruchomienie wątku roboczego (idempotentne)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="es-bulk-indexer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 30.0):
+        """Wysłanie pozostałych operacji i zatrzymanie wątku roboczego"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def submit_index(self, index_name: str, document_id, document: Dict[str, Any], wait: bool = False) -> PendingAction:
+        """Dodanie operacji indeksowania dokumentu do kolejki"""
+        return self._submit({
+            "_op_type": "index",
+            "_index": index_name,
+            "_id": str(document_id),
+            "_source": document
+        }, wait)
+
+    def submit_delete(self, index_name: str, document_id, wait: bool = False) -> PendingAction:
+        """Dodanie operacji usunięcia dokumentu do kolejki"""
+        return self._submit({
+            "_op_type": "delete",
+            "_index": index_name,
+            "_id": str(document_id)
+        }, wait)
+
+    def wait(self, pending: PendingAction, timeout: Optional[float] = 30.0):
+        """
+        Oczekiwanie na zapis operacji dodanej z wait=True
+
+        Raises:
+            IndexingError: Gdy zapis się nie powiódł lub przekroczono czas oczekiwania
+        """
+        if pending.done is None:
+            raise ValueError("Operacja nie została dodana z wait=True")
+        if not pending.done.wait(timeout):
+            raise IndexingError("Przekroczono czas oczekiwania na zapis w Elasticsearch")
+        if pending.error:
+            raise IndexingError(pending.error)
+
+    def flush(self, timeout: Optional[float] = 30.0):
+        """Wymuszenie wysłania wszystkich operacji z kolejki i oczekiwanie na ich zapis"""
+        # Pusty znacznik z wait=True wymusza natychmiastowe wysłanie bieżącej partii
+        self.start()
+        marker = PendingAction({"_op_type": "flush", "_index": "", "_id": ""}, wait=True)
+        self._queue.put(marker)
+        self.wait(marker, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Metryki kolejki: głębokość, liczba partii i opóźnienia wysyłki"""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "actions": self._actions,
+                "coalesced": self._coalesced,
+                "failed": self._failed,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+                "max_flush_ms": round(self._max_flush_ms, 3),
+                "avg_flush_ms": round(self._total_flush_ms / self._batches, 3) if self._batches else 0.0,
+            }
+
+    def _submit(self, action: Dict[str, Any], wait: bool) -> PendingAction:
+        self.start()
+        pending = PendingAction(action, wait)
+        self._queue.put(pending)
+        return pending
+
+    def _run(self):
+        """Pętla wątku roboczego"""
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect_batch()
+            if batch:
+                self._flush(batch)
+
+    def _collect_batch(self):
+        """Zebranie partii do wysłania; zwraca (partia, czy_zatrzymać)"""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return [], False
+        if first is None:
+            return [], True
+
+        batch: List[PendingAction] = [first]
+        size = first.size
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_actions and size < self.max_bytes and batch[-1].done is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            size += item.size
+        return batch, False
+
+    def _error_lookup(self, errors: Dict[Any, str], latest: Dict[Any, PendingAction]) -> Callable[[Any], Optional[str]]:
+        """
+        Przypisanie błędów z odpowiedzi _bulk do operacji z partii
+
+        Zapis przez alias (indeks sprawy we współdzielonym indeksie) zwraca
+        w odpowiedzi nazwę indeksu docelowego. Błąd jest wtedy przypisywany po
+        samym _id, gdy w partii jest tylko jedna operacja z tym _id, a w
+        przeciwnym razie po indeksie, na który wskazuje alias operacji.
+        """
+        by_id: Dict[str, Dict[str, str]] = {}
+        for (index_name, document_id), error in errors.items():
+            by_id.setdefault(str(document_id), {})[index_name] = error
+        id_counts: Dict[str, int] = {}
+        for _, document_id in latest:
+            id_counts[str(document_id)] = id_counts.get(str(document_id), 0) + 1
+        concrete: Dict[str, str] = {}
+
+        def lookup(key) -> Optional[str]:
+            if key in errors:
+                return errors[key]
+            index_name, document_id = key
+            failed = by_id.get(str(document_id))
+            if not failed:
+                return None
+            if id_counts.get(str(document_id)) == 1:
+                return next(iter(failed.values()))
+            if index_name not in concrete:
+                concrete[index_name] = self._concrete_index(index_name)
+            return failed.get(concrete[index_name])
+        return lookup
+
+    def _concrete_index(self, name: str) -> str:
+        """Indeks, do którego trafiają zapisy przez alias (nazwa bez zmian, gdy to nie alias)"""
+        try:
+            response = self.es.indices.get_alias(name=name)
+        except Exception:
+            return name
+        indices = list(response.keys())
+        for index_name in indices:
+            if response[index_name]["aliases"].get(name, {}).get("is_write_index"):
+                return index_name
+        return indices[0] if len(indices) == 1 else name
+
+    def _flush(self, batch: List[PendingAction]):
+        """Wysłanie partii jednym żądaniem _bulk"""
+        # Kolejne zapisy tego samego dokumentu w partii — wysyłany jest tylko ostatni
+        latest: Dict[Any, PendingAction] = {}
+        for item in batch:
+            if item.action["_op_type"] != "flush":
+                latest[item.key] = item
+        actions = [item.action for item in latest.values()]
+        refresh = "wait_for" if any(item.done is not None for item in batch) else False
+
+        errors: Dict[Any, str] = {}
+        started = time.perf_counter()
+        if actions:
+            try:
+                _, failures = helpers.bulk(
+                    self.es,
+                    actions,
+                    chunk_size=self.max_actions,
+                    max_chunk_bytes=self.max_bytes,
+                    raise_on_error=False,
+                    raise_on_exception=False,
+                    refresh=refresh
+                )
+                for failure in failures:
+                    op_type, result = next(iter(failure.items()))
+                    # Usunięcie nieistniejącego dokumentu nie jest błędem
+                    if op_type == "delete" and result.get("status") == 404:
+                        continue
+                    errors[(result.get("_index"), result.get("_id"))] = str(result.get("error", result))
+            except Exception as e:
+                print(f"Błąd Elasticsearch podczas zapisu _bulk: {e}")
+                errors = {key: str(e) for key in latest}
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if actions:
+            observe(ES_SECONDS, elapsed_ms / 1000, operation="bulk")
+
+        summary = f"{len(errors)} operacji _bulk nie powiodło się" if errors else None
+        resolve_error = self._error_lookup(errors, latest) if errors else errors.get
+        for item in batch:
+            item.resolve(summary if item.action["_op_type"] == "flush" else resolve_error(item.key))
+        if errors:
+            print(f"Błąd Elasticsearch: {summary}")
+
+        submitted = sum(1 for item in batch if item.action["_op_type"] != "flush")
+        with self._stats_lock:
+            self._batches += 1
+            self._actions += len(actions)
+            self._coalesced += submitted - len(actions)
+            self._failed += len(errors)
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
@@ -1,10 +1,52 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import text
+
 from database import engine
 import models
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+def apply_migrations(bind=engine):
+    """Apply pending SQL migrations from migrations/ in filename order.
+
+    Applied versions are recorded in schema_migrations, so each file runs once.
+    """
+    with bind.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version VARCHAR(255) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+        ))
+        applied = {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+        
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith(".sql") or filename in applied:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding="utf-8") as f:
+            script = f.read()
+        # Each migration runs in its own transaction, one statement at a time
+        with bind.begin() as connection:
+            for statement in split_statements(script):
+                connection.exec_driver_sql(statement)
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+                {"version": filename, "applied_at": datetime.utcnow()}
+            )
+        print(f"Applied migration {filename}")
+
+def split_statements(script: str):
+    """Split an SQL script into statements, skipping comment lines"""
+    lines = [line for line in script.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
 def init_db():
     print("Creating database tables...")
     models.Base.metadata.create_all(bind=engine)
     print("Database tables created successfully!")
+    print("Applying migrations...")
+    apply_migrations()
+    print("Migrations applied successfully!")
 
 if __name__ == "__main__":
-    init_db() 
\ No newline at end of file
+    init_db() 
@@ -1,171 +1,184 @@
-import requests
 from bs4 import BeautifulSoup
+import asyncio
 import re
+from datetime import datetime
 from fastapi import HTTPException, status
-from typing import List, Dict, Any
-import time
-import random
+from typing import List, Dict, Any, Optional, Tuple
+
+from config import settings
+from http_client import PoliteHTTPClient, UpstreamError, get_http_client
+from tracing import traced
+
+# Identyfikator ISAP, np. WDU19640430296: wydawca (Dz.U./M.P.), rok, numer i pozycja
+ISAP_ID_PATTERN = re.compile(r"^W(DU|MP)(\d{4})(\d{3})(\d{4})$")
 
 class ISAPClient:
-    """Klient do komunikacji z Internetowym Systemem Aktów Prawnych (ISAP)"""
-    
-    def __init__(self):
+    """Klient do komunikacji z Internetowym Systemem Aktów Prawnych (ISAP)
+
+    Dane pobierane są z API ELI Sejmu (api.sejm.gov.pl/eli), które udostępnia
+    metadane i teksty aktów z ISAP, przez wspólnego klienta HTTP z limitami
+    żądań (http_client.py).
+    """
+
+    def __init__(self, base_url: Optional[str] = None, http: Optional[PoliteHTTPClient] = None):
         """Inicjalizacja klienta ISAP"""
-        self.base_url = "https://isap.sejm.gov.pl"
-        self.search_url = f"{self.base_url}/isap.nsf/search.xsp"
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "pl,en-US;q=0.7,en;q=0.3",
+        self.base_url = (base_url or settings.ISAP_API_URL).rstrip("/")
+        self.search_url = f"{self.base_url}/acts/search"
+        self.http = http or get_http_client()
+
+    @staticmethod
+    def parse_isap_id(isap_id: str) -> Tuple[str, int, int]:
+        """
+        Rozbicie identyfikatora ISAP na wydawcę, rok i pozycję (adres ELI)
+
+        Args:
+            isap_id: Identyfikator aktu prawnego w ISAP, np. WDU19640430296
+
+        Returns:
+            Tuple (wydawca, rok, pozycja), np. ("DU", 1964, 296)
+        """
+        match = ISAP_ID_PATTERN.match(isap_id or "")
+        if not match:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Nieprawidłowy identyfikator ISAP: {isap_id}"
+            )
+        publisher, year, _, position = match.groups()
+        return publisher, int(year), int(position)
+
+    def act_url(self, isap_id: str) -> str:
+        """Adres aktu w API ELI"""
+        publisher, year, position = self.parse_isap_id(isap_id)
+        return f"{self.base_url}/acts/{publisher}/{year}/{position}"
+
+    @staticmethod
+    def act_summary(item: Dict[str, Any]) -> Dict[str, Any]:
+        """Ujednolicenie opisu aktu z API ELI"""
+        promulgation = item.get("promulgation") or item.get("announcementDate")
+        return {
+            "title": item.get("title"),
+            "isap_id": item.get("address"),
+            "publication": item.get("displayAddress"),
+            "year": item.get("year"),
+            "publication_date": datetime.fromisoformat(promulgation) if promulgation else None,
+            "document_type": item.get("type"),
+            "status": item.get("status"),
         }
-    
-    def search_acts(self, keywords: List[str]) -> List[Dict[str, Any]]:
+
+    @staticmethod
+    def _unavailable(error: UpstreamError) -> HTTPException:
+        print(f"Błąd ISAP: {error}")
+        return HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Serwis ISAP jest niedostępny: {error}"
+        )
+
+    @classmethod
+    def _merge_results(cls, pages: List[Optional[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+        """Połączenie wyników wyszukiwania dla kolejnych słów kluczowych, bez powtórzeń"""
+        acts, seen = [], set()
+        for page in pages:
+            for item in (page or {}).get("items", []):
+                if item.get("address") in seen:
+                    continue
+                seen.add(item.get("address"))
+                acts.append(cls.act_summary(item))
+        return acts[:limit]
+
+    @traced()
+    def search_acts(self, keywords: List[str], limit: int = 20) -> List[Dict[str, Any]]:
         """
         Wyszukiwanie aktów prawnych w ISAP
-        
+
         Args:
-            keywords: Lista słów kluczowych do wyszukiwania
-        
+            keywords: Lista słów kluczowych do wyszukiwania (w tytule aktu)
+            limit: Maksymalna liczba wyników
+
         Returns:
             Lista znalezionych aktów prawnych
         """
-        # W rzeczywistej implementacji tutaj byłoby wyszukiwanie przez ISAP API
-        # lub scraping strony wyszukiwania ISAP
-        # Poniżej mamy implementację symulacyjną, która zwraca przykładowe dane
-        
-        # Symulacja opóźnienia wyszukiwania
-        time.sleep(random.uniform(0.5, 1.5))
-        
-        # Przykładowe akty prawne
-        example_acts = [
-            {
-                "title": "Ustawa z dnia 17 listopada 1964 r. - Kodeks postępowania cywilnego",
-                "isap_id": "WDU19640430296",
-                "publication": "Dz.U. 1964 nr 43 poz. 296",
-                "year": 1964,
-                "content": "Art. 1. § 1. Kodeks postępowania cywilnego normuje postępowanie sądowe w sprawach ze stosunków z zakresu prawa cywilnego, rodzinnego i opiekuńczego oraz prawa pracy, jak również w sprawach z zakresu ubezpieczeń społecznych oraz w innych sprawach, do których przepisy tego Kodeksu stosuje się z mocy ustaw szczególnych (sprawy cywilne)."
-            },
-            {
-                "title": "Ustawa z dnia 23 kwietnia 1964 r. - Kodeks cywilny",
-                "isap_id": "WDU19640160093",
-                "publication": "Dz.U. 1964 nr 16 poz. 93",
-                "year": 1964,
-                "content": "Art. 1. Kodeks niniejszy reguluje stosunki cywilnoprawne między osobami fizycznymi i osobami prawnymi."
-            },
-            {
-                "title": "Ustawa z dnia 6 czerwca 1997 r. - Kodeks karny",
-                "isap_id": "WDU19970880553",
-                "publication": "Dz.U. 1997 nr 88 poz. 553",
-                "year": 1997,
-                "content": "Art. 1. § 1. Odpowiedzialności karnej podlega ten tylko, kto popełnia czyn zabroniony pod groźbą kary przez ustawę obowiązującą w czasie jego popełnienia."
-            },
-            {
-                "title": "Ustawa z dnia 6 czerwca 1997 r. - Kodeks postępowania karnego",
-                "isap_id": "WDU19970890555",
-                "publication": "Dz.U. 1997 nr 89 poz. 555",
-                "year": 1997,
-                "content": "Art. 1. § 1. Postępowanie karne w sprawach należących do właściwości sądów toczy się według przepisów niniejszego kodeksu."
-            },
-            {
-                "title": "Ustawa z dnia 26 czerwca 1974 r. - Kodeks pracy",
-                "isap_id": "WDU19740240141",
-                "publication": "Dz.U. 1974 nr 24 poz. 141",
-                "year": 1974,
-                "content": "Art. 1. Kodeks pracy określa prawa i obowiązki pracowników i pracodawców."
-            }
-        ]
-        
-        # Filtrowanie według słów kluczowych
-        filtered_acts = []
-        for act in example_acts:
-            for keyword in keywords:
-                if keyword.lower() in act["title"].lower() or keyword.lower() in act["content"].lower():
-                    filtered_acts.append(act)
-                    break
-        
-        # Jeśli nie znaleziono żadnych pasujących aktów, zwróć wszystkie przykładowe
-        if not filtered_acts:
-            return example_acts
-        
-        return filtered_acts
-    
-    def get_act_content(self, isap_id: str) -> str:
+        try:
+            pages = [
+                self.http.get_json(self.search_url, params={"title": keyword, "limit": limit})
+                for keyword in keywords if keyword.strip()
+            ]
+        except UpstreamError as e:
+            raise self._unavailable(e)
+        return self._merge_results(pages, limit)
+
+    async def asearch_acts(self, keywords: List[str], limit: int = 20) -> List[Dict[str, Any]]:
+        """Asynchroniczny odpowiednik `search_acts`; zapytania o kolejne słowa kluczowe wysyłane równolegle"""
+        try:
+            pages = await asyncio.gather(*(
+                self.http.aget_json(self.search_url, params={"title": keyword, "limit": limit})
+                for keyword in keywords if keyword.strip()
+            ))
+        except UpstreamError as e:
+            raise self._unavailable(e)
+        return self._merge_results(list(pages), limit)
+
+    @traced()
+    def get_act(self, isap_id: str) -> Dict[str, Any]:
         """
-        Pobieranie treści aktu prawnego
-        
+        Pobieranie metadanych aktu prawnego
+
         Args:
             isap_id: Identyfikator aktu prawnego w ISAP
-        
+
         Returns:
-            Treść aktu prawnego
+            Opis aktu prawnego
         """
-        # W rzeczywistej implementacji tutaj byłoby pobieranie treści przez ISAP API
-        # lub scraping strony z treścią aktu prawnego
-        # Poniżej mamy implementację symulacyjną
-        
-        # Symulacja opóźnienia
-        time.sleep(random.uniform(1.0, 2.0))
-        
-        # Przykładowa treść dla wybranych aktów
-        example_contents = {
-            "WDU19640430296": """Ustawa z dnia 17 listopada 1964 r. - Kodeks postępowania cywilnego
-
-TYTUŁ WSTĘPNY. Przepisy ogólne
+        try:
+            details = self.http.get_json(self.act_url(isap_id))
+        except UpstreamError as e:
+            raise self._unavailable(e)
+        if details is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Nie znaleziono aktu prawnego o identyfikatorze {isap_id}"
+            )
+        return self.act_summary(details)
 
-Art. 1. § 1. Kodeks postępowania cywilnego normuje postępowanie sądowe w sprawach ze stosunków z zakresu prawa cywilnego, rodzinnego i opiekuńczego oraz prawa pracy, jak również w sprawach z zakresu ubezpieczeń społecznych oraz w innych sprawach, do których przepisy tego Kodeksu stosuje się z mocy ustaw szczególnych (sprawy cywilne).
-§ 2. Przepisy Kodeksu stosuje się także do postępowań w sprawach, do których przepisy innych ustaw nie stanowią inaczej.
-§ 3. Nie są rozpoznawane w postępowaniu sądowym sprawy cywilne, jeżeli przepisy szczególne przekazują je do właściwości innych organów.""",
-            "WDU19640160093": """Ustawa z dnia 23 kwietnia 1964 r. - Kodeks cywilny
-
-KSIĘGA PIERWSZA. CZĘŚĆ OGÓLNA
+    @traced()
+    def get_act_content(self, isap_id: str) -> str:
+        """
+        Pobieranie treści aktu prawnego
 
-TYTUŁ I. Przepisy wstępne
+        Args:
+            isap_id: Identyfikator aktu prawnego w ISAP
 
-Art. 1. Kodeks niniejszy reguluje stosunki cywilnoprawne między osobami fizycznymi i osobami prawnymi.
+        Returns:
+            Treść aktu prawnego (tekst wyodrębniony z wersji HTML)
+        """
+        try:
+            html = self.http.get_text(f"{self.act_url(isap_id)}/text.html")
+        except UpstreamError as e:
+            raise self._unavailable(e)
+        if html is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Treść aktu prawnego {isap_id} nie jest dostępna w formacie HTML"
+            )
+        return BeautifulSoup(html, "lxml").get_text("\n", strip=True)
 
-Art. 2. Jeżeli ustawa nie stanowi inaczej, do osoby fizycznej wykonującej działalność gospodarczą stosuje się przepisy Kodeksu dotyczące przedsiębiorców.""",
-        }
-        
-        # Jeśli znamy treść aktu, zwróć ją
-        if isap_id in example_contents:
-            return example_contents[isap_id]
-        
-        # W przeciwnym przypadku zwróć ogólną informację
-        return f"Treść aktu prawnego o identyfikatorze {isap_id} w systemie ISAP."
-    
+    @traced()
     def get_recent_acts(self, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Pobieranie najnowszych aktów prawnych
-        
+
         Args:
             limit: Maksymalna liczba aktów do pobrania
-        
+
         Returns:
             Lista najnowszych aktów prawnych
         """
-        # W rzeczywistej implementacji tutaj byłoby pobieranie najnowszych aktów przez ISAP API
-        # lub scraping strony z najnowszymi aktami
-        # Poniżej mamy implementację symulacyjną
-        
-        # Symulacja opóźnienia
-        time.sleep(random.uniform(0.5, 1.0))
-        
-        # Przykładowe najnowsze akty
-        recent_acts = [
-            {
-                "title": "Ustawa z dnia 14 maja 2020 r. o zmianie niektórych ustaw w zakresie działań osłonowych w związku z rozprzestrzenianiem się wirusa SARS-CoV-2",
-                "isap_id": "WDU20200000875",
-                "publication": "Dz.U. 2020 poz. 875",
-                "year": 2020,
-                "content": "Art. 1. W ustawie z dnia 31 stycznia 1959 r. o cmentarzach i chowaniu zmarłych (Dz. U. z 2019 r. poz. 1473) wprowadza się następujące zmiany: (...)"
-            },
-            {
-                "title": "Ustawa z dnia 14 maja 2020 r. o zmianie ustawy o świadczeniach opieki zdrowotnej finansowanych ze środków publicznych oraz niektórych innych ustaw",
-                "isap_id": "WDU20200000945",
-                "publication": "Dz.U. 2020 poz. 945",
-                "year": 2020,
-                "content": "Art. 1. W ustawie z dnia 27 sierpnia 2004 r. o świadczeniach opieki zdrowotnej finansowanych ze środków publicznych (Dz. U. z 2019 r. poz. 1373, z późn. zm.) wprowadza się następujące zmiany: (...)"
-            }
-        ]
-        
-        return recent_acts[:limit]
+        try:
+            page = self.http.get_json(self.search_url, params={
+                "publisher": "DU",
+                "sortBy": "promulgation",
+                "sortDir": "desc",
+                "limit": limit
+            })
+        except UpstreamError as e:
+            raise self._unavailable(e)
+        return self._merge_results([page], limit)
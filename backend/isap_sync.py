@@ -0,0 +1,368 @@
+"""
+Lokalny korpus aktów prawnych ISAP i jego przyrostowe odświeżanie
+
+Zadanie pobiera z API ELI Sejmu metadane aktów oraz tekst ujednolicony
+(text.html), dzieli tekst na artykuły i zapisuje akt w tabeli legal_acts
+(artykuły w legal_act_articles) oraz w osobnym indeksie Elasticsearch.
+Odczyty aktów po isap_id i wyszukiwanie (`search_acts`) korzystają wyłącznie
+z lokalnej kopii.
+
+Przebieg składa się z faz:
+- "published:<wydawca>" — akty ogłoszone od ostatnio widzianej daty ogłoszenia
+  (/acts/search z dateFrom, rosnąco wg daty ogłoszenia),
+- "changed" — akty zmienione od poprzedniego przebiegu (/changes/acts):
+  znowelizowane, z nowym tekstem ujednoliconym lub zmienionym statusem.
+
+Tekst aktu pobierany jest tylko dla aktów nowych i tych, których data zmiany
+w ISAP różni się od zapisanej; sama zmiana statusu (np. uchylenie) aktualizuje
+metadane bez pobierania tekstu. Zmiana treści zwiększa wersję aktu. Po każdej
+stronie wyników stan zadania trafia do tabeli sync_checkpoints, więc przerwany
+przebieg wznawia się od pierwszej niezapisanej strony.
+
+Przykład:
+    python isap_sync.py --since 2024-01-01
+"""
+import argparse
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from bs4 import BeautifulSoup
+
+import models
+from chunking import chunk_text, split_articles
+from config import settings
+from http_client import PoliteHTTPClient, get_http_client
+from isap_client import ISAPClient
+from offload import run_io
+from sync_job import SyncJob
+from tracing import traced
+
+
+def format_eli_datetime(value: datetime) -> str:
+    """Data w formacie parametru since API ELI"""
+    return value.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def content_hash(content: Optional[str]) -> Optional[str]:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest() if content else None
+
+
+class ISAPSync(SyncJob):
+    """Synchronizacja aktów prawnych ISAP do bazy danych i indeksu Elasticsearch"""
+
+    name = "isap-acts"
+    label = "aktów prawnych ISAP"
+
+    def __init__(
+        self,
+        session_factory,
+        es_client=None,
+        http: Optional[PoliteHTTPClient] = None,
+        base_url: Optional[str] = None,
+        index_name: Optional[str] = None,
+        publishers: Sequence[str] = ("DU",),
+        page_size: int = 100,
+        overlap: float = 86400.0,
+        passage_max_tokens: int = 400,
+        passage_overlap_tokens: int = 60
+    ):
+        """
+        Inicjalizacja zadania
+
+        Args:
+            session_factory: Fabryka sesji SQLAlchemy
+            es_client: Klient Elasticsearch (None — zapis tylko do bazy danych)
+            http: Klient HTTP (domyślnie wspólny klient z limitami dla ISAP)
+            base_url: Adres API ELI (domyślnie ISAP_API_URL)
+            index_name: Indeks lokalnego korpusu (domyślnie ISAP_INDEX)
+            publishers: Wydawcy, których akty trafiają do korpusu (DU — Dziennik Ustaw, MP — Monitor Polski)
+            page_size: Liczba aktów na stronie wyników
+            overlap: Zakładka (s) odejmowana od znacznika zmian kolejnego przebiegu
+            passage_max_tokens, passage_overlap_tokens: Parametry podziału treści na fragmenty
+        """
+        super().__init__(session_factory)
+        self.es_client = es_client
+        self.http = http or get_http_client()
+        self.isap = ISAPClient(base_url, http=self.http)
+        self.changes_url = f"{self.isap.base_url}/changes/acts"
+        self.index_name = index_name or settings.ISAP_INDEX
+        self.publishers = list(publishers)
+        self.page_size = max(page_size, 1)
+        self.overlap = timedelta(seconds=overlap)
+        self.passage_max_tokens = passage_max_tokens
+        self.passage_overlap_tokens = passage_overlap_tokens
+
+    async def _run(self, since: Optional[str], max_pages: Optional[int], reset: bool) -> Dict[str, Any]:
+        state = {} if reset else await run_io(self.load_checkpoint)
+        if state.get("phase") is None:
+            published_since = since or state.get("published_since") or settings.ISAP_SYNC_SINCE or None
+            changed_since = state.get("changed_since")
+            state = {
+                # Pierwszy przebieg pobiera wszystkie akty z fazy published — fazy changed nie ma
+                "phases": [f"published:{publisher}" for publisher in self.publishers] + (["changed"] if changed_since else []),
+                "phase": 0,
+                "offset": 0,
+                "published_since": published_since,
+                "changed_since": changed_since,
+                "run_started": format_eli_datetime(datetime.utcnow()),
+                "max_published": None,
+                "max_changed": None,
+            }
+        else:
+            print(f"Wznowienie synchronizacji ISAP od fazy {state['phases'][state['phase']]}, pozycji {state['offset']}")
+        if self.es_client is not None:
+            await run_io(self.es_client.create_legal_acts_index, self.index_name)
+
+        result = {"status": "incomplete", "pages": 0, "created": 0, "updated": 0, "unchanged": 0, "texts": 0}
+        while state["phase"] < len(state["phases"]) and (max_pages is None or result["pages"] < max_pages):
+            phase = state["phases"][state["phase"]]
+            page = await self._fetch_page(phase, state)
+            # Lista zmian obejmuje wszystkich wydawców
+            items = [item for item in page if item.get("publisher", self.publishers[0]) in self.publishers]
+            if items:
+                stored = await self._process_page(items)
+                for key in ("created", "updated", "unchanged", "texts"):
+                    result[key] += stored[key]
+                cursor = "max_changed" if phase == "changed" else "max_published"
+                state[cursor] = max(filter(None, (state[cursor], stored[cursor])), default=None)
+            if len(page) < self.page_size:
+                state["phase"] += 1
+                state["offset"] = 0
+            else:
+                state["offset"] += len(page)
+            await run_io(self.save_checkpoint, state)
+            result["pages"] += 1
+
+        if state["phase"] >= len(state["phases"]):
+            next_state = {
+                "published_since": state["max_published"] or state["published_since"],
+                "changed_since": self._next_changed_since(state),
+                "phase": None,
+            }
+            await run_io(self.save_checkpoint, next_state)
+            result.update(status="done", **next_state)
+        return result
+
+    def _next_changed_since(self, state: Dict[str, Any]) -> str:
+        """Znacznik zmian kolejnego przebiegu: najnowsza widziana zmiana, najpóźniej start przebiegu, minus zakładka"""
+        run_started = datetime.fromisoformat(state["run_started"])
+        newest = datetime.fromisoformat(state["max_changed"]) if state["max_changed"] else run_started
+        next_since = min(newest, run_started) - self.overlap
+        if state["changed_since"]:
+            next_since = max(next_since, datetime.fromisoformat(state["changed_since"]))
+        return format_eli_datetime(next_since)
+
+    async def _fetch_page(self, phase: str, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        params = {"offset": state["offset"], "limit": self.page_size}
+        if phase == "changed":
+            url = self.changes_url
+            params["since"] = state["changed_since"]
+        else:
+            url = self.isap.search_url
+            params.update(publisher=phase.split(":", 1)[1], sortBy="promulgation", sortDir="asc")
+            if state["published_since"]:
+                params["dateFrom"] = state["published_since"]
+        page = await self.http.aget_json(url, params=params)
+        return page if isinstance(page, list) else (page or {}).get("items", [])
+
+    async def _process_page(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Porównanie strony z korpusem, pobranie tekstów nowych i zmienionych aktów, zapis"""
+        plan = await run_io(self._plan_page, items)
+        needs_text = [item for item in items if plan[item["address"]] in ("new", "changed")]
+        htmls = await asyncio.gather(*(self._fetch_text(item) for item in needs_text))
+        # Brak tekstu HTML (tylko PDF, 404) nie może wyczyścić treści zapisanej wcześniej
+        texts = {item["address"]: html for item, html in zip(needs_text, htmls) if html is not None}
+        return await run_io(self._store_page, items, plan, texts)
+
+    def _plan_page(self, items: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Klasyfikacja aktów ze strony wyników
+
+        Returns:
+            isap_id -> "new" | "changed" (nowa data zmiany — pobranie tekstu) |
+            "status" (tylko nowy status) | "unchanged"
+        """
+        db = self.session_factory()
+        try:
+            existing = {
+                act.isap_id: act
+                for act in db.query(models.LegalAct).filter(models.LegalAct.isap_id.in_([item["address"] for item in items]))
+            }
+        finally:
+            db.close()
+        plan = {}
+        for item in items:
+            act = existing.get(item["address"])
+            change_date = datetime.fromisoformat(item["changeDate"]) if item.get("changeDate") else None
+            if act is None:
+                plan[item["address"]] = "new"
+            elif act.change_date != change_date or (item.get("textHTML") and not act.content):
+                plan[item["address"]] = "changed"
+            elif act.status != item.get("status"):
+                plan[item["address"]] = "status"
+            else:
+                plan[item["address"]] = "unchanged"
+        return plan
+
+    async def _fetch_text(self, item: Dict[str, Any]) -> Optional[str]:
+        """Tekst ujednolicony aktu w HTML (None, gdy ISAP udostępnia tylko PDF)"""
+        if not item.get("textHTML"):
+            return None
+        return await self.http.aget_text(f"{self.isap.act_url(item['address'])}/text.html")
+
+    @traced()
+    def _store_page(self, items: List[Dict[str, Any]], plan: Dict[str, str],
+                    texts: Dict[str, str]) -> Dict[str, Any]:
+        """Zapis strony aktów w bazie danych (wg isap_id) i w indeksie (blokujące, uruchamiać przez run_io)"""
+        changed = [item for item in items if plan[item["address"]] != "unchanged"]
+        db = self.session_factory()
+        try:
+            existing = {
+                act.isap_id: act
+                for act in db.query(models.LegalAct).filter(
+                    models.LegalAct.isap_id.in_([item["address"] for item in changed])
+                )
+            } if changed else {}
+            stored = []
+            for item in changed:
+                summary = ISAPClient.act_summary(item)
+                act = existing.get(item["address"])
+                if act is None:
+                    act = models.LegalAct(isap_id=item["address"], version=1)
+                    db.add(act)
+                act.title = summary["title"]
+                act.publication_date = summary["publication_date"]
+                act.document_type = summary["document_type"]
+                act.status = summary["status"]
+                act.change_date = datetime.fromisoformat(item["changeDate"]) if item.get("changeDate") else None
+                if item.get("textPDF"):
+                    act.pdf_url = f"{self.isap.act_url(item['address'])}/text.pdf"
+                if item["address"] in texts:
+                    self._set_content(act, texts[item["address"]])
+                stored.append((act, item, item["address"] in existing))
+            db.commit()
+
+            if self.es_client is not None:
+                for act, item, replace in stored:
+                    self._index(act, item, replace)
+
+            published = [item["promulgation"] for item in items if item.get("promulgation")]
+            changes = [item["changeDate"] for item in items if item.get("changeDate")]
+            return {
+                "created": sum(1 for _, _, replace in stored if not replace),
+                "updated": sum(1 for _, _, replace in stored if replace),
+                "unchanged": len(items) - len(stored),
+                "texts": sum(1 for html in texts.values() if html),
+                "max_published": max(published, default=None),
+                "max_changed": max(changes, default=None),
+            }
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _set_content(act, html: Optional[str]):
+        """Nowa treść aktu i jego artykuły; zmiana treści istniejącego aktu zwiększa wersję"""
+        if html is None:
+            return
+        content = BeautifulSoup(html, "lxml").get_text("\n", strip=True) if html else None
+        digest = content_hash(content)
+        if digest == act.content_hash:
+            return
+        if act.content_hash is not None:
+            act.version = (act.version or 1) + 1
+        act.content = content
+        act.content_hash = digest
+        act.articles = [
+            models.LegalActArticle(ordinal=ordinal, number=number, division=division, content=body)
+            for ordinal, (number, division, body) in enumerate(split_articles(content or ""))
+        ]
+
+    def _index(self, act, item: Dict[str, Any], replace: bool):
+        """Indeksowanie aktu i jego fragmentów w indeksie lokalnego korpusu"""
+        parent_id = f"act-{act.isap_id}"
+        parent_fields = {
+            "type": "legal_act",
+            "isap_id": act.isap_id,
+            "title": act.title,
+            "publication": item.get("displayAddress"),
+            "year": item.get("year"),
+            "document_type": act.document_type,
+            "status": act.status,
+            "publication_date": act.publication_date.isoformat() if act.publication_date else None,
+            "version": act.version,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        self.es_client.index_document(self.index_name, parent_id, {
+            **parent_fields,
+            "doc_kind": "legal_act",
+            "content": act.content or ""
+        })
+        passages = chunk_text(act.content or "", parent_id, self.passage_max_tokens, self.passage_overlap_tokens)
+        self.es_client.index_passages(self.index_name, parent_id, parent_fields, passages, replace=replace)
+
+    def search_acts(self, keywords: List[str], limit: int = 20, snippets: bool = False) -> List[Dict[str, Any]]:
+        """
+        Wyszukiwanie aktów w lokalnym indeksie (bez zapytań do ISAP)
+
+        Zwraca wyniki w formacie ISAPClient.search_acts z oceną trafności. Treść to
+        początek tekstu, a przy snippets=True — wyróżnione fragmenty pasujące
+        do zapytania (highlighter uruchamiany tylko wtedy).
+        """
+        query = " ".join(keyword for keyword in keywords if keyword.strip())
+        if not query or self.es_client is None:
+            return []
+        results = []
+        for hit in self.es_client.search(self.index_name, query, size=limit, highlight=snippets):
+            source = hit["source"]
+            highlights = hit.get("highlights", {}).get("content", [])
+            results.append({
+                "title": source.get("title"),
+                "isap_id": source.get("isap_id"),
+                "publication": source.get("publication"),
+                "year": source.get("year"),
+                "publication_date": source.get("publication_date"),
+                "document_type": source.get("document_type"),
+                "status": source.get("status"),
+                "version": source.get("version"),
+                "content": " … ".join(highlights) if highlights else (source.get("content") or "")[:1000],
+                "score": hit["score"],
+            })
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronizacja lokalnego korpusu aktów prawnych ISAP")
+    parser.add_argument("--since", help="Data ogłoszenia dla nowego przebiegu, np. 2024-01-01")
+    parser.add_argument("--max-pages", type=int, help="Przerwanie po podanej liczbie stron (do wznowienia)")
+    parser.add_argument("--page-size", type=int, default=settings.ISAP_SYNC_PAGE_SIZE)
+    parser.add_argument("--reset", action="store_true", help="Pominięcie zapisanego punktu kontrolnego")
+    parser.add_argument("--no-index", action="store_true", help="Zapis tylko do bazy danych")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+    from elasticsearch_client import ElasticsearchClient
+
+    es_client = None if args.no_index else ElasticsearchClient(settings.ELASTICSEARCH_URL)
+    sync = ISAPSync(
+        SessionLocal,
+        es_client,
+        publishers=settings.get_isap_sync_publishers(),
+        page_size=args.page_size,
+        overlap=settings.ISAP_SYNC_OVERLAP,
+        passage_max_tokens=settings.RAG_PASSAGE_MAX_TOKENS,
+        passage_overlap_tokens=settings.RAG_PASSAGE_OVERLAP_TOKENS
+    )
+    try:
+        print(asyncio.run(sync.run(since=args.since, max_pages=args.max_pages, reset=args.reset)))
+    finally:
+        if es_client is not None:
+            es_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Dostawcy modeli językowych dla silnika RAG
+
+Każdy dostawca udostępnia generowanie pełnej odpowiedzi (complete) oraz
+strumieniowe, token po tokenie (stream). Dostępne implementacje:
+- OpenAIProvider — model OpenAI przez langchain,
+- LlamaCppProvider — lokalny model GGUF uruchamiany na CPU (llama-cpp-python, import opcjonalny),
+- FakeLLMProvider — deterministyczna odpowiedź z konfigurowalnym opóźnieniem, do testów
+  i benchmarków bez dostępu do sieci.
+"""
+import hashlib
+import re
+import threading
+import time
+from typing import Iterator, Optional
+
+WORD_RE = re.compile(r"\S+\s*")
+
+
+class LLMProvider:
+    """Interfejs dostawcy modelu językowego"""
+
+    name = "base"
+
+    def complete(self, prompt: str) -> str:
+        """Wygenerowanie pełnej odpowiedzi"""
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Generowanie odpowiedzi fragment po fragmencie"""
+        raise NotImplementedError
+
+
+class OpenAIProvider(LLMProvider):
+    """Model OpenAI (klucz API przekazywany jawnie, bez ustawiania globalnego openai.api_key)"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model_name: str = "gpt-3.5-turbo-instruct",
+                 temperature: float = 0.2, max_tokens: int = 512):
+        from langchain.llms import OpenAI
+
+        self.llm = OpenAI(
+            openai_api_key=api_key,
+            model_name=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+    def complete(self, prompt: str) -> str:
+        return self.llm.predict(prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        return self.llm.stream(prompt)
+
+
+class LlamaCppProvider(LLMProvider):
+    """Lokalny model w formacie GGUF uruchamiany przez llama.cpp na CPU"""
+
+    name = "llamacpp"
+
+    def __init__(self, model_path: str, n_ctx: int = 4096, n_threads: Optional[int] = None,
+                 temperature: float = 0.2, max_tokens: int = 512):
+        try:
+            from llama_cpp import Llama
+        except ImportError:
+            raise RuntimeError("Dostawca llamacpp wymaga pakietu llama-cpp-python")
+
+        self.model = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        # Kontekst modelu nie jest bezpieczny wątkowo — jedno generowanie naraz
+        self._lock = threading.Lock()
+
+    def complete(self, prompt: str) -> str:
+        with self._lock:
+            result = self.model(prompt, max_tokens=self.max_tokens, temperature=self.temperature)
+        return result["choices"][0]["text"]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        with self._lock:
+            for chunk in self.model(prompt, max_tokens=self.max_tokens,
+                                    temperature=self.temperature, stream=True):
+                yield chunk["choices"][0]["text"]
+
+
+class FakeLLMProvider(LLMProvider):
+    """
+    Deterministyczny zamiennik modelu do testów i benchmarków offline
+
+    Odpowiedź zależy wyłącznie od promptu: zawiera skrót promptu oraz początek
+    kontekstu. Opóźnienia symulują czas do pierwszego tokenu i tempo generowania.
+    """
+
+    name = "fake"
+
+    def __init__(self, first_token_latency: float = 0.2, token_latency: float = 0.02, answer_words: int = 60):
+        """
+        Inicjalizacja
+
+        Args:
+            first_token_latency: Opóźnienie przed pierwszym tokenem (s)
+            token_latency: Opóźnienie między kolejnymi tokenami (s)
+            answer_words: Liczba słów odpowiedzi
+        """
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.answer_words = answer_words
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        words = WORD_RE.findall(self._answer(prompt))
+        time.sleep(self.first_token_latency)
+        for number, word in enumerate(words):
+            if number:
+                time.sleep(self.token_latency)
+            yield word
+
+    def _answer(self, prompt: str) -> str:
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+        context = prompt.split("Kontekst:", 1)[-1].split("Pytanie:", 1)[0]
+        words = context.split()[:max(self.answer_words - 4, 0)]
+        return f"Odpowiedź testowa [{digest}]: " + " ".join(words)
+
+
+def create_llm_provider(settings) -> LLMProvider:
+    """Utworzenie dostawcy modelu wskazanego w konfiguracji (LLM_PROVIDER)"""
+    provider = settings.LLM_PROVIDER
+    if provider == "openai":
+        return OpenAIProvider(
+            settings.OPENAI_API_KEY,
+            model_name=settings.OPENAI_MODEL,
+            temperature=settings.LLM_TEMPERATURE,
+            max_tokens=settings.LLM_MAX_TOKENS
+        )
+    if provider == "llamacpp":
+        return LlamaCppProvider(
+            settings.LLAMACPP_MODEL_PATH,
+            n_ctx=settings.LLAMACPP_CONTEXT,
+            n_threads=settings.LLAMACPP_THREADS,
+            temperature=settings.LLM_TEMPERATURE,
+            max_tokens=settings.LLM_MAX_TOKENS
+        )
+    if provider == "fake":
+        return FakeLLMProvider(
+            first_token_latency=settings.FAKE_LLM_FIRST_TOKEN_LATENCY,
+            token_latency=settings.FAKE_LLM_TOKEN_LATENCY
+        )
+    raise ValueError(f"Nieznany dostawca modelu językowego: {provider}")
@@ -1,21 +1,42 @@
 from fastapi import FastAPI, HTTPException, status, Request, APIRouter, Depends, Form, File, UploadFile
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from pydantic_core import to_json
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
 from datetime import timedelta, datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
 import json
 import os
 import shutil
+import time
 import mimetypes
 from pathlib import Path
 
-from database import get_db
+from database import get_db, SessionLocal, check_connection, get_pool_stats, readiness
 import models
 import schemas
-from auth import create_access_token, get_current_active_user, get_password_hash, verify_password, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth import create_access_token, get_current_active_user, get_password_hash_async, verify_password_async, token_claims, get_user_cache_stats, ACCESS_TOKEN_EXPIRE_MINUTES
 from config import settings
-from storage import MinioClient
+from offload import run_io, run_llm, get_offload_stats, shutdown_pools
+from pagination import LIKE_ESCAPE, keyset_page, like_pattern
+from storage import MinioClient, SizeLimitedStream, UploadTooLargeError
+from elasticsearch_client import ElasticsearchClient, case_index_name
+from embeddings import get_embedding_stats, close_embedder
+from extraction_service import ExtractionService
+from answer_cache import build_answer_cache
+from rag_engine import RAGEngine, PROMPT_VERSION
+from llm_providers import create_llm_provider
+from http_client import get_http_stats, close_http_client
+from saos_sync import SAOSSync
+from isap_sync import ISAPSync
+from isap_client import ISAPClient
+from saos_client import SAOSClient
+from retrieval import build_orchestrator
+from case_indices import CaseIndexLifecycle
+import metrics
+import tracing
 
 # Create FastAPI application
 app = FastAPI(
@@ -23,6 +44,31 @@ app = FastAPI(
     version=settings.VERSION
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route request latency histogram (route template, not the raw path)"""
+    if metrics.HTTP_REQUEST_SECONDS is None:
+        return await call_next(request)
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.observe(
+            metrics.HTTP_REQUEST_SECONDS,
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status_code)
+        )
+
+# Request spans wrap the metrics middleware, so every span below links to the request
+tracing.init_tracing()
+tracing.instrument_app(app)
+
 # Configure CORS - must be before adding routes
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +76,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Content-Disposition", "Content-Range", "Accept-Ranges", "ETag", "Content-Length", "X-Next-Cursor"],
 )
 
 # Initialize MinIO client
@@ -39,6 +86,86 @@ minio_client = MinioClient(
     secret_key=settings.MINIO_ROOT_PASSWORD
 )
 
+# Initialize Elasticsearch client (writes are batched by its indexing queue)
+es_client = ElasticsearchClient(settings.ELASTICSEARCH_URL)
+
+# Background text extraction; uploads only enqueue work here
+extraction_service = ExtractionService(
+    minio_client,
+    es_client,
+    SessionLocal,
+    max_workers=settings.EXTRACTION_WORKERS,
+    dispatchers=settings.EXTRACTION_DISPATCHERS,
+    passage_max_tokens=settings.RAG_PASSAGE_MAX_TOKENS,
+    passage_overlap_tokens=settings.RAG_PASSAGE_OVERLAP_TOKENS
+)
+
+# Question answering over case documents; repeated questions are served from the answer cache
+llm_provider = create_llm_provider(settings)
+rag_engine = RAGEngine(
+    es_client,
+    context_token_budget=settings.RAG_CONTEXT_TOKEN_BUDGET,
+    dedup_threshold=settings.RAG_DEDUP_THRESHOLD,
+    llm_provider=llm_provider,
+    answer_cache=build_answer_cache(
+        settings.ANSWER_CACHE_BACKEND,
+        f"{PROMPT_VERSION}:{llm_provider.name}",  # Answers differ between models
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl=settings.ANSWER_CACHE_TTL,
+        redis_url=settings.REDIS_URL,
+        # Paraphrased questions share the search embedder (and its batching and vector cache)
+        embed_fn=es_client.embedder.embed_one if es_client.embedder is not None else None,
+        similarity_threshold=settings.ANSWER_CACHE_SIMILARITY
+    )
+)
+
+# Local mirror of SAOS judgments; user searches read only from its index
+saos_sync = SAOSSync(
+    SessionLocal,
+    es_client,
+    page_size=settings.SAOS_SYNC_PAGE_SIZE,
+    parallel_pages=settings.SAOS_SYNC_PARALLEL_PAGES,
+    overlap=settings.SAOS_SYNC_OVERLAP,
+    passage_max_tokens=settings.RAG_PASSAGE_MAX_TOKENS,
+    passage_overlap_tokens=settings.RAG_PASSAGE_OVERLAP_TOKENS
+)
+
+# Local corpus of ISAP legal acts; lookups by isap_id and act searches never call ISAP
+isap_sync = ISAPSync(
+    SessionLocal,
+    es_client,
+    publishers=settings.get_isap_sync_publishers(),
+    page_size=settings.ISAP_SYNC_PAGE_SIZE,
+    overlap=settings.ISAP_SYNC_OVERLAP,
+    passage_max_tokens=settings.RAG_PASSAGE_MAX_TOKENS,
+    passage_overlap_tokens=settings.RAG_PASSAGE_OVERLAP_TOKENS
+)
+
+# Case documents live in shared, rolled-over indices behind per-case filtered aliases
+# Extraction jobs whose writes hit a shrink/migration write block are requeued once it is lifted
+case_index_lifecycle = CaseIndexLifecycle(
+    es_client, session_factory=SessionLocal, resume_jobs=extraction_service.resume_pending
+)
+
+# Question context is gathered from case documents, acts and judgments concurrently
+retrieval = build_orchestrator(es_client, ISAPClient(), SAOSClient())
+
+# Export the runtime statistics shown in /api/health as Prometheus gauges
+metrics.register_stats("offload", get_offload_stats)
+metrics.register_stats("indexing", es_client.indexing_stats)
+metrics.register_stats("search", es_client.search_stats)
+metrics.register_stats("case_indices", case_index_lifecycle.stats)
+metrics.register_stats("embeddings", get_embedding_stats)
+metrics.register_stats("extraction", extraction_service.stats)
+metrics.register_stats("answer_cache", rag_engine.cache_stats)
+metrics.register_stats("streaming", rag_engine.streaming_stats)
+metrics.register_stats("auth", get_user_cache_stats)
+metrics.register_stats("database", get_pool_stats)
+metrics.register_stats("http", get_http_stats)
+metrics.register_stats("saos_sync", saos_sync.stats)
+metrics.register_stats("isap_sync", isap_sync.stats)
+metrics.register_stats("retrieval", retrieval.stats)
+
 # Create API router
 api_router = APIRouter(prefix="/api")
 
@@ -50,31 +177,288 @@ def get_cors_headers(request: Request) -> Dict[str, str]:
     return {
         "Access-Control-Allow-Origin": "*",  # For development - update this in production
         "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-        "Access-Control-Allow-Headers": "Content-Type, Authorization, X-Requested-With",
+        "Access-Control-Allow-Headers": "Content-Type, Authorization, X-Requested-With, Range, If-None-Match, If-Range",
+        "Access-Control-Expose-Headers": "Content-Disposition, Content-Range, Accept-Ranges, ETag, Content-Length, X-Next-Cursor",
         "Access-Control-Allow-Credentials": "true",
         "Access-Control-Max-Age": "600",
     }
 
 def create_response(content: Any, status_code: int = 200, headers: Dict[str, str] = None) -> Response:
-    """Create a response with CORS headers"""
-    if headers is None:
-        headers = {}
-        
-    # Ensure proper JSON serialization for all types
-    if not isinstance(content, (str, int, float, bool, type(None))):
-        content = json.loads(json.dumps(content, cls=CustomJSONEncoder))
-        
-    return JSONResponse(
-        content=content,
+    """Create a JSON response with CORS headers
+
+    Content may be a pydantic model, a list or dict of models, or plain data.
+    It is serialized once, straight to bytes (datetimes as ISO 8601).
+    """
+    return Response(
+        content=to_json(content),
         status_code=status_code,
-        headers=headers
+        headers=headers or {},
+        media_type="application/json"
+    )
+
+def save_instance(db: Session, instance):
+    """Add, commit and refresh a model instance (blocking, run via run_io)"""
+    db.add(instance)
+    db.commit()
+    db.refresh(instance)
+    return instance
+
+def delete_instance(db: Session, instance):
+    """Delete a model instance and commit (blocking, run via run_io)"""
+    db.delete(instance)
+    db.commit()
+
+def get_owned_case(db: Session, case_id: int, user_id: int):
+    """Get a case belonging to the given user (blocking, run via run_io)"""
+    return db.query(models.Case).filter(
+        models.Case.id == case_id,
+        models.Case.owner_id == user_id  # Ensure case belongs to user
+    ).first()
+
+def count_related(column, case_column):
+    """Correlated COUNT subquery of rows related to the outer case"""
+    return select(func.count(column)).where(case_column == models.Case.id).scalar_subquery()
+
+# Page size limits for case and document listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sortable listing columns; each has a composite (parent, column, id) index
+CASE_SORT_COLUMNS = {
+    "updated_at": models.Case.updated_at,
+    "created_at": models.Case.created_at,
+    "title": models.Case.title,
+}
+DOCUMENT_SORT_COLUMNS = {
+    "updated_at": models.Document.updated_at,
+    "created_at": models.Document.created_at,
+}
+# Nullable sort columns are paged by COALESCE(column, value), matching the expression index
+SORT_NULL_VALUES = {
+    "title": "",
+}
+
+def parse_listing_params(request: Request, sort_columns: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse pagination, sorting and date filter query parameters
+
+    Sorting is "<column>" (ascending) or "-<column>" (descending, default
+    "-updated_at"). Dates accept ISO 8601. Raises ValueError on invalid input.
+    """
+    params = request.query_params
+    sort = params.get("sort", "-updated_at")
+    direction = "desc" if sort.startswith("-") else "asc"
+    sort = sort.lstrip("-")
+    if sort not in sort_columns:
+        raise ValueError(f"Unsupported sort column: {sort}")
+    limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    dates = {
+        name: datetime.fromisoformat(params[name]) if params.get(name) else None
+        for name in ("created_from", "created_to", "updated_from", "updated_to")
+    }
+    return {
+        "sort": sort,
+        "direction": direction,
+        "limit": limit,
+        "cursor": params.get("cursor"),
+        "title": params.get("title"),
+        **dates
+    }
+
+def filter_by_dates(query, model, listing: Dict[str, Any]):
+    """Apply created/updated date range filters"""
+    if listing["created_from"]:
+        query = query.filter(model.created_at >= listing["created_from"])
+    if listing["created_to"]:
+        query = query.filter(model.created_at <= listing["created_to"])
+    if listing["updated_from"]:
+        query = query.filter(model.updated_at >= listing["updated_from"])
+    if listing["updated_to"]:
+        query = query.filter(model.updated_at <= listing["updated_to"])
+    return query
+
+def list_case_summaries(db: Session, user_id: int, listing: Dict[str, Any], case_number: Optional[str] = None):
+    """List one page of a user's cases with related object counts in a single query (blocking, run via run_io)
+
+    Returns:
+        Tuple of (summaries, cursor of the next page or None)
+    """
+    query = db.query(
+        models.Case.id,
+        models.Case.title,
+        models.Case.description,
+        models.Case.case_number,
+        models.Case.created_at,
+        models.Case.updated_at,
+        models.Case.owner_id,
+        count_related(models.Document.id, models.Document.case_id).label("document_count"),
+        count_related(models.case_legal_act.c.legal_act_id, models.case_legal_act.c.case_id).label("legal_act_count"),
+        count_related(models.case_judgment.c.judgment_id, models.case_judgment.c.case_id).label("judgment_count"),
+        count_related(models.Question.id, models.Question.case_id).label("question_count")
+    ).filter(
+        models.Case.owner_id == user_id
+    )
+    if listing["title"]:
+        query = query.filter(models.Case.title.ilike(like_pattern(listing["title"]), escape=LIKE_ESCAPE))
+    if case_number:
+        query = query.filter(models.Case.case_number.ilike(like_pattern(case_number, prefix=True), escape=LIKE_ESCAPE))
+    query = filter_by_dates(query, models.Case, listing)
+    
+    rows, next_cursor = keyset_page(
+        query,
+        listing["sort"],
+        CASE_SORT_COLUMNS[listing["sort"]],
+        models.Case.id,
+        direction=listing["direction"],
+        cursor=listing["cursor"],
+        limit=listing["limit"],
+        null_value=SORT_NULL_VALUES.get(listing["sort"])
+    )
+    return [schemas.CaseSummary.model_validate(dict(row._mapping)) for row in rows], next_cursor
+
+def list_case_documents(db: Session, case_id: int, listing: Dict[str, Any], file_type: Optional[str] = None):
+    """List one page of a case's documents without their extracted text (blocking, run via run_io)
+
+    Returns:
+        Tuple of (documents, cursor of the next page or None)
+    """
+    query = db.query(
+        models.Document.id,
+        models.Document.title,
+        models.Document.description,
+        models.Document.file_path,
+        models.Document.file_type,
+        models.Document.created_at,
+        models.Document.updated_at,
+        models.Document.case_id
+    ).filter(
+        models.Document.case_id == case_id
+    )
+    if listing["title"]:
+        query = query.filter(models.Document.title.ilike(like_pattern(listing["title"]), escape=LIKE_ESCAPE))
+    if file_type:
+        query = query.filter(models.Document.file_type == file_type)
+    query = filter_by_dates(query, models.Document, listing)
+    
+    rows, next_cursor = keyset_page(
+        query,
+        listing["sort"],
+        DOCUMENT_SORT_COLUMNS[listing["sort"]],
+        models.Document.id,
+        direction=listing["direction"],
+        cursor=listing["cursor"],
+        limit=listing["limit"]
     )
+    return [schemas.DocumentResponse.model_validate(dict(row._mapping)) for row in rows], next_cursor
+
+def page_headers(request: Request, next_cursor: Optional[str]) -> Dict[str, str]:
+    """CORS headers plus X-Next-Cursor when another page exists"""
+    headers = get_cors_headers(request)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return headers
+
+def get_case_detail(db: Session, case_id: int, user_id: int):
+    """Get an owned case with documents, legal acts and judgments loaded up front (blocking, run via run_io)"""
+    return db.query(models.Case).options(
+        selectinload(models.Case.documents),
+        selectinload(models.Case.legal_acts),
+        selectinload(models.Case.judgments)
+    ).filter(
+        models.Case.id == case_id,
+        models.Case.owner_id == user_id
+    ).first()
+
+def get_owned_document(db: Session, case_id: int, document_id: int, user_id: int):
+    """Get a document whose case belongs to the given user (blocking, run via run_io)"""
+    return db.query(models.Document).join(
+        models.Case
+    ).filter(
+        models.Document.id == document_id,
+        models.Document.case_id == case_id,
+        models.Case.owner_id == user_id  # Ensure case belongs to user
+    ).first()
+
+def upload_too_large_response(request: Request) -> Response:
+    """Create a 413 response for uploads above MAX_UPLOAD_SIZE"""
+    return create_response(
+        {"detail": f"File size exceeds maximum limit of {MAX_UPLOAD_SIZE // (1024 * 1024)}MB"},
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        headers=get_cors_headers(request)
+    )
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range: bytes=...`` header into inclusive (start, end).
+
+    Returns None when the header is absent or not a single byte range (the full
+    body is served then). Raises ValueError when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    start_str, end_str = (part.strip() for part in spec.split("-", 1))
+    try:
+        if not start_str:
+            # Suffix range: last N bytes
+            suffix_length = int(end_str)
+            if suffix_length <= 0 or size == 0:
+                raise ValueError("Unsatisfiable range")
+            return max(size - suffix_length, 0), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        raise ValueError("Unsatisfiable range")
+    if start >= size or end < start:
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
+def etag_matches(header_value: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match / If-Range header value against a quoted ETag"""
+    if not header_value:
+        return False
+    candidates = [value.strip() for value in header_value.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
 
 @api_router.options("/{path:path}")
 async def options_route(request: Request):
     """Handle all OPTIONS requests"""
     return Response(status_code=200, headers=get_cors_headers(request))
 
+@api_router.get("/health")
+async def health(request: Request):
+    """Health check with thread pool telemetry"""
+    return create_response(
+        {
+            "status": "ok",
+            "offload": get_offload_stats(),
+            "indexing": es_client.indexing_stats(),
+            "search": es_client.search_stats(),
+            "case_indices": case_index_lifecycle.stats(),
+            "embeddings": get_embedding_stats(),
+            "extraction": extraction_service.stats(),
+            "answer_cache": rag_engine.cache_stats(),
+            "streaming": rag_engine.streaming_stats(),
+            "auth": get_user_cache_stats(),
+            "database": get_pool_stats(),
+            "saos_sync": saos_sync.stats(),
+            "isap_sync": isap_sync.stats(),
+            "retrieval": retrieval.stats()
+        },
+        headers=get_cors_headers(request)
+    )
+
+@api_router.get("/ready")
+async def ready(request: Request):
+    """Readiness probe: 503 until the database connection has been established"""
+    return create_response(
+        readiness.stats(),
+        status_code=status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers=get_cors_headers(request)
+    )
+
 @api_router.post("/users")
 async def create_user(request: Request, db: Session = Depends(get_db)):
     """User registration endpoint"""
@@ -83,7 +467,7 @@ async def create_user(request: Request, db: Session = Depends(get_db)):
         
     try:
         user_data = await request.json()
-        db_user = db.query(models.User).filter(models.User.email == user_data["email"]).first()
+        db_user = await run_io(lambda: db.query(models.User).filter(models.User.email == user_data["email"]).first())
         if db_user:
             return create_response(
                 {"detail": "Email już zarejestrowany"},
@@ -91,7 +475,7 @@ async def create_user(request: Request, db: Session = Depends(get_db)):
                 headers=get_cors_headers(request)
             )
         
-        hashed_password = get_password_hash(user_data["password"])
+        hashed_password = await get_password_hash_async(user_data["password"])
         db_user = models.User(
             email=user_data["email"],
             hashed_password=hashed_password,
@@ -99,13 +483,11 @@ async def create_user(request: Request, db: Session = Depends(get_db)):
             is_active=True
         )
         
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await run_io(save_instance, db, db_user)
         
         # Create user directory in MinIO
         try:
-            minio_client.create_user_bucket(db_user.id)
+            await run_io(minio_client.create_user_bucket, db_user.id)
         except Exception as e:
             print(f"Error creating MinIO directory for user {db_user.id}: {str(e)}")
             # Continue even if MinIO directory creation fails
@@ -151,8 +533,8 @@ async def login_for_access_token(
                 headers=get_cors_headers(request)
             )
             
-        user = db.query(models.User).filter(models.User.email == username).first()
-        if not user or not verify_password(password, user.hashed_password):
+        user = await run_io(lambda: db.query(models.User).filter(models.User.email == username).first())
+        if not user or not await verify_password_async(password, user.hashed_password):
             return create_response(
                 {"detail": "Niepoprawny email lub hasło"},
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -161,7 +543,7 @@ async def login_for_access_token(
         
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+            data=token_claims(user), expires_delta=access_token_expires
         )
         return create_response(
             {"access_token": access_token, "token_type": "bearer"},
@@ -205,9 +587,15 @@ async def read_users_me(request: Request, db: Session = Depends(get_db)):
             headers=get_cors_headers(request)
         )
 
-@api_router.get("/cases", response_model=List[schemas.CaseResponse])
+@api_router.get("/cases", response_model=List[schemas.CaseSummary])
 async def get_cases(request: Request, db: Session = Depends(get_db)):
-    """Get all cases for the current user"""
+    """Get one page of case summaries (list columns and related counts) for the current user
+
+    Query parameters: limit, cursor (from the X-Next-Cursor header of the
+    previous page), sort (updated_at, created_at, title; "-" prefix for
+    descending), title, case_number, created_from/created_to and
+    updated_from/updated_to.
+    """
     if request.method == "OPTIONS":
         return Response(status_code=200, headers=get_cors_headers(request))
         
@@ -220,16 +608,19 @@ async def get_cases(request: Request, db: Session = Depends(get_db)):
                 headers=get_cors_headers(request)
             )
             
-        cases = db.query(models.Case).filter(models.Case.owner_id == user.id).all()
+        listing = parse_listing_params(request, CASE_SORT_COLUMNS)
         
-        # Convert each case to a Pydantic model and then to dict with proper serialization
-        response_cases = [schemas.CaseResponse.model_validate(case) for case in cases]
-        response_dicts = [case.model_dump() for case in response_cases]
+        def load_cases():
+            summaries, next_cursor = list_case_summaries(
+                db, user.id, listing, case_number=request.query_params.get("case_number")
+            )
+            return summaries, next_cursor
+            
+        summaries, next_cursor = await run_io(load_cases)
         
-        # Use custom JSON encoder for the response
         return create_response(
-            json.loads(json.dumps(response_dicts, cls=CustomJSONEncoder)),
-            headers=get_cors_headers(request)
+            summaries,
+            headers=page_headers(request, next_cursor)
         )
     except Exception as e:
         return create_response(
@@ -253,26 +644,24 @@ async def get_case(case_id: int, request: Request, db: Session = Depends(get_db)
                 headers=get_cors_headers(request)
             )
             
-        # Get the case and verify ownership
-        case = db.query(models.Case).filter(
-            models.Case.id == case_id,
-            models.Case.owner_id == user.id  # Ensure case belongs to user
-        ).first()
-        
-        if not case:
+        def load_case():
+            # Get the case and verify ownership; relationships are loaded with one query each
+            case = get_case_detail(db, case_id, user.id)
+            if not case:
+                return None
+            # Convert to response model (relationships are already loaded)
+            return schemas.CaseResponse.model_validate(case)
+            
+        case_response = await run_io(load_case)
+        if case_response is None:
             return create_response(
                 {"detail": "Case not found or access denied"},
                 status_code=status.HTTP_404_NOT_FOUND,
                 headers=get_cors_headers(request)
             )
-            
-        # Convert to response model
-        response = schemas.CaseResponse.model_validate(case)
-        response_dict = response.model_dump()
         
-        # Use custom JSON encoder for the response
         return create_response(
-            json.loads(json.dumps(response_dict, cls=CustomJSONEncoder)),
+            case_response,
             headers=get_cors_headers(request)
         )
     except Exception as e:
@@ -282,12 +671,6 @@ async def get_case(case_id: int, request: Request, db: Session = Depends(get_db)
             headers=get_cors_headers(request)
         )
 
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
-
 @api_router.post("/cases", response_model=schemas.CaseResponse)
 async def create_case(request: Request, db: Session = Depends(get_db)):
     """Create a new case"""
@@ -309,23 +692,22 @@ async def create_case(request: Request, db: Session = Depends(get_db)):
         db_case = models.Case(
             title=case_create.title,
             description=case_create.description or "",
+            case_number=case_create.case_number,
             owner_id=user.id,
             documents=[],  # Explicitly initialize documents as empty list
             legal_acts=[],  # Initialize legal_acts as empty list
             judgments=[]  # Initialize judgments as empty list
         )
         
-        db.add(db_case)
-        db.commit()
-        db.refresh(db_case)
-        
-        # Convert to Pydantic model and then to dict with datetime handling
-        response = schemas.CaseResponse.model_validate(db_case)
-        response_dict = response.model_dump()
+        def store_case():
+            save_instance(db, db_case)
+            # Convert to response model while the session can still load attributes
+            return schemas.CaseResponse.model_validate(db_case)
+            
+        case_response = await run_io(store_case)
         
-        # Use custom JSON encoder for the response
         return create_response(
-            json.loads(json.dumps(response_dict, cls=CustomJSONEncoder)),
+            case_response,
             headers=get_cors_headers(request)
         )
     except Exception as e:
@@ -351,10 +733,7 @@ async def delete_case(case_id: int, request: Request, db: Session = Depends(get_
             )
             
         # Get the case and verify ownership
-        case = db.query(models.Case).filter(
-            models.Case.id == case_id,
-            models.Case.owner_id == user.id  # Ensure case belongs to user
-        ).first()
+        case = await run_io(get_owned_case, db, case_id, user.id)
         
         if not case:
             return create_response(
@@ -367,21 +746,25 @@ async def delete_case(case_id: int, request: Request, db: Session = Depends(get_
         try:
             # Delete case directory and all its contents from MinIO
             case_path = f"users/{user.id}/cases/{case.id}"
-            minio_client.delete_case_directory(case_path)
+            await run_io(minio_client.delete_case_directory, case_path)
         except Exception as e:
             print(f"Error during MinIO cleanup for case {case.id}: {str(e)}")
             # Continue with database deletion even if MinIO cleanup fails
             
+        try:
+            await run_io(es_client.delete_case_index, case.id)
+        except Exception as e:
+            print(f"Error deleting search index for case {case.id}: {str(e)}")
+            
         # Delete the case from database (this will cascade delete related records)
-        db.delete(case)
-        db.commit()
+        await run_io(delete_instance, db, case)
         
         return create_response(
             {"detail": "Case and all associated files deleted successfully"},
             headers=get_cors_headers(request)
         )
     except Exception as e:
-        db.rollback()  # Rollback transaction on error
+        await run_io(db.rollback)  # Rollback transaction on error
         return create_response(
             {"detail": str(e)},
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -402,27 +785,6 @@ async def upload_document(
         return Response(status_code=200, headers=get_cors_headers(request))
         
     try:
-        # Check file size before reading
-        file_size = 0
-        chunk_size = 1024 * 1024  # 1MB chunks
-        content = bytearray()
-        
-        while True:
-            chunk = await file.read(chunk_size)
-            if not chunk:
-                break
-            file_size += len(chunk)
-            if file_size > MAX_UPLOAD_SIZE:
-                return create_response(
-                    {"detail": f"File size exceeds maximum limit of {MAX_UPLOAD_SIZE // (1024 * 1024)}MB"},
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    headers=get_cors_headers(request)
-                )
-            content.extend(chunk)
-            
-        # Reset file position for potential re-read
-        await file.seek(0)
-        
         user = await get_current_active_user(request, db)
         if not user:
             return create_response(
@@ -432,10 +794,7 @@ async def upload_document(
             )
             
         # Get the case and verify ownership
-        case = db.query(models.Case).filter(
-            models.Case.id == case_id,
-            models.Case.owner_id == user.id  # Ensure case belongs to user
-        ).first()
+        case = await run_io(get_owned_case, db, case_id, user.id)
         
         if not case:
             return create_response(
@@ -444,6 +803,10 @@ async def upload_document(
                 headers=get_cors_headers(request)
             )
             
+        # Reject early when the client declared a size above the limit
+        if file.size is not None and file.size > MAX_UPLOAD_SIZE:
+            return upload_too_large_response(request)
+            
         # Generate unique object name for MinIO with user isolation
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         original_filename = file.filename
@@ -451,14 +814,22 @@ async def upload_document(
         safe_filename = f"{timestamp}{file_extension}"
         object_path = f"users/{user.id}/cases/{case.id}/documents/{safe_filename}"
         
-        # Use the content we've already read
-        minio_client.upload_file(object_path, content)
-        
         # Determine file type if not provided
         if not document_type:
             mime_type, _ = mimetypes.guess_type(original_filename)
             document_type = mime_type if mime_type else "application/octet-stream"
             
+        # Stream the upload straight into MinIO, enforcing the size limit on the fly
+        try:
+            await run_io(
+                minio_client.upload_stream,
+                object_path,
+                SizeLimitedStream(file.file, MAX_UPLOAD_SIZE),
+                content_type=document_type
+            )
+        except UploadTooLargeError:
+            return upload_too_large_response(request)
+            
         # Create document record
         db_document = models.Document(
             title=original_filename,
@@ -467,25 +838,72 @@ async def upload_document(
             file_type=document_type,
             case_id=case.id
         )
+        db_document.extraction_job = models.ExtractionJob(status="pending")
         
-        db.add(db_document)
-        db.commit()
-        db.refresh(db_document)
+        await run_io(save_instance, db, db_document)
         
-        # Convert to response model
-        response = schemas.DocumentResponse.model_validate(db_document)
-        response_dict = response.model_dump()
+        # Text extraction runs in the background and never delays the upload response
+        extraction_service.submit(db_document.id)
         
         return create_response(
-            json.loads(json.dumps(response_dict, cls=CustomJSONEncoder)),
+            schemas.DocumentResponse.model_validate(db_document),
             headers=get_cors_headers(request)
         )
     except Exception as e:
         # If document was created in DB but MinIO upload failed, clean up
         if 'db_document' in locals():
-            db.delete(db_document)
-            db.commit()
+            await run_io(delete_instance, db, db_document)
+            
+        return create_response(
+            {"detail": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            headers=get_cors_headers(request)
+        )
+
+@api_router.get("/cases/{case_id}/documents", response_model=List[schemas.DocumentResponse])
+async def get_case_documents(case_id: int, request: Request, db: Session = Depends(get_db)):
+    """Get one page of documents in a case
+
+    Query parameters: limit, cursor, sort (updated_at, created_at; "-" prefix
+    for descending), title, file_type, created_from/created_to and
+    updated_from/updated_to.
+    """
+    if request.method == "OPTIONS":
+        return Response(status_code=200, headers=get_cors_headers(request))
+        
+    try:
+        user = await get_current_active_user(request, db)
+        if not user:
+            return create_response(
+                {"detail": "Not authenticated"},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                headers=get_cors_headers(request)
+            )
+            
+        listing = parse_listing_params(request, DOCUMENT_SORT_COLUMNS)
+        
+        def load_documents():
+            if not get_owned_case(db, case_id, user.id):
+                return None
+            documents, next_cursor = list_case_documents(
+                db, case_id, listing, file_type=request.query_params.get("file_type")
+            )
+            return documents, next_cursor
             
+        result = await run_io(load_documents)
+        if result is None:
+            return create_response(
+                {"detail": "Case not found or access denied"},
+                status_code=status.HTTP_404_NOT_FOUND,
+                headers=get_cors_headers(request)
+            )
+        documents, next_cursor = result
+        
+        return create_response(
+            documents,
+            headers=page_headers(request, next_cursor)
+        )
+    except Exception as e:
         return create_response(
             {"detail": str(e)},
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -513,13 +931,7 @@ async def get_document(
             )
             
         # Get the document and verify ownership through case
-        document = db.query(models.Document).join(
-            models.Case
-        ).filter(
-            models.Document.id == document_id,
-            models.Document.case_id == case_id,
-            models.Case.owner_id == user.id  # Ensure case belongs to user
-        ).first()
+        document = await run_io(get_owned_document, db, case_id, document_id, user.id)
         
         if not document:
             return create_response(
@@ -528,17 +940,96 @@ async def get_document(
                 headers=get_cors_headers(request)
             )
             
-        # Get file content from MinIO
-        content = minio_client.download_file(document.file_path)
-        
-        # Return file content with appropriate headers
-        return Response(
-            content=content,
+        # Read object metadata only; the body is streamed below
+        stat = await run_io(minio_client.stat_file, document.file_path)
+        etag = f'"{stat.etag}"'
+        headers = {
+            **get_cors_headers(request),
+            "Content-Disposition": f'attachment; filename="{document.title}"',
+            "Accept-Ranges": "bytes",
+            "ETag": etag,
+        }
+        if stat.last_modified:
+            headers["Last-Modified"] = stat.last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT")
+            
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            
+        # Honour Range only if If-Range (when sent) still matches the current object
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if if_range and not etag_matches(if_range, etag):
+            range_header = None
+            
+        try:
+            byte_range = parse_range_header(range_header, stat.size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{stat.size}"}
+            )
+            
+        if byte_range is None:
+            headers["Content-Length"] = str(stat.size)
+            return StreamingResponse(
+                await run_io(minio_client.stream_file, document.file_path),
+                media_type=document.file_type,
+                headers=headers
+            )
+            
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            await run_io(minio_client.stream_file, document.file_path, offset=start, length=end - start + 1),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
             media_type=document.file_type,
-            headers={
-                **get_cors_headers(request),
-                "Content-Disposition": f'attachment; filename="{document.title}"'
-            }
+            headers=headers
+        )
+    except Exception as e:
+        return create_response(
+            {"detail": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            headers=get_cors_headers(request)
+        )
+
+@api_router.get("/cases/{case_id}/documents/{document_id}/extraction")
+async def get_document_extraction(
+    case_id: int,
+    document_id: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """Get text extraction job status for a document"""
+    if request.method == "OPTIONS":
+        return Response(status_code=200, headers=get_cors_headers(request))
+        
+    try:
+        user = await get_current_active_user(request, db)
+        if not user:
+            return create_response(
+                {"detail": "Not authenticated"},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                headers=get_cors_headers(request)
+            )
+            
+        def load_job():
+            document = get_owned_document(db, case_id, document_id, user.id)
+            if not document or not document.extraction_job:
+                return None
+            return schemas.ExtractionJobResponse.model_validate(document.extraction_job)
+            
+        job_response = await run_io(load_job)
+        if job_response is None:
+            return create_response(
+                {"detail": "Extraction job not found or access denied"},
+                status_code=status.HTTP_404_NOT_FOUND,
+                headers=get_cors_headers(request)
+            )
+            
+        return create_response(
+            job_response,
+            headers=get_cors_headers(request)
         )
     except Exception as e:
         return create_response(
@@ -568,13 +1059,7 @@ async def delete_document(
             )
             
         # Get the document and verify ownership through case
-        document = db.query(models.Document).join(
-            models.Case
-        ).filter(
-            models.Document.id == document_id,
-            models.Document.case_id == case_id,
-            models.Case.owner_id == user.id  # Ensure case belongs to user
-        ).first()
+        document = await run_io(get_owned_document, db, case_id, document_id, user.id)
         
         if not document:
             return create_response(
@@ -585,30 +1070,418 @@ async def delete_document(
             
         # Delete file from MinIO
         try:
-            minio_client.delete_file(document.file_path)
+            await run_io(minio_client.delete_file, document.file_path)
         except Exception as e:
             print(f"Error deleting file from MinIO: {str(e)}")
             # Continue with database deletion even if MinIO deletion fails
             
+        # Remove extracted text and its passages from the case search index
+        try:
+            es_client.delete_document(case_index_name(case_id), f"document-{document.id}")
+            await run_io(es_client.delete_passages, case_index_name(case_id), f"document-{document.id}")
+        except Exception as e:
+            print(f"Error removing document {document.id} from search index: {str(e)}")
+            
         # Delete document from database
-        db.delete(document)
-        db.commit()
+        await run_io(delete_instance, db, document)
         
         return create_response(
             {"detail": "Document deleted successfully"},
             headers=get_cors_headers(request)
         )
     except Exception as e:
-        db.rollback()  # Rollback transaction on error
+        await run_io(db.rollback)  # Rollback transaction on error
+        return create_response(
+            {"detail": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            headers=get_cors_headers(request)
+        )
+
+def sse_event(event: str, data: Any) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def store_question(case_id: int, question_text: str, answer_text: str) -> int:
+    """Persist an answered question (blocking, run via run_io)
+
+    Uses its own session: the request-scoped one is closed before the
+    streaming body finishes.
+    """
+    db = SessionLocal()
+    try:
+        question = save_instance(db, models.Question(
+            question_text=question_text,
+            answer_text=answer_text,
+            case_id=case_id
+        ))
+        return question.id
+    finally:
+        db.close()
+
+@api_router.post("/cases/{case_id}/questions/stream")
+async def stream_question(case_id: int, request: Request, db: Session = Depends(get_db)):
+    """Answer a question about a case, streaming tokens as Server-Sent Events
+
+    Events: "sources" (sources used in the context), "token" (answer text
+    fragments), "done" (full answer, question id, time to first token and
+    the retrieval status of each context source) and "error".
+    """
+    if request.method == "OPTIONS":
+        return Response(status_code=200, headers=get_cors_headers(request))
+        
+    started = time.perf_counter()
+    try:
+        user = await get_current_active_user(request, db)
+        if not user:
+            return create_response(
+                {"detail": "Not authenticated"},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                headers=get_cors_headers(request)
+            )
+            
+        question_ask = schemas.QuestionAsk(**(await request.json()))
+        
+        case = await run_io(get_owned_case, db, case_id, user.id)
+        if not case:
+            return create_response(
+                {"detail": "Case not found or access denied"},
+                status_code=status.HTTP_404_NOT_FOUND,
+                headers=get_cors_headers(request)
+            )
+            
+        # Sources that fail or exceed their timeout are skipped; the answer uses the rest
+        retrieved = await retrieval.retrieve(
+            question_ask.question_text,
+            question_ask.max_sources,
+            case_index_name(case_id)
+        )
+        search_results = retrieved.results
+    except Exception as e:
+        return create_response(
+            {"detail": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            headers=get_cors_headers(request)
+        )
+        
+    async def event_stream():
+        # The LLM client blocks while waiting for tokens, so each step runs on the dedicated,
+        # bounded LLM pool rather than the I/O pool shared with database and storage calls
+        events = rag_engine.stream_answer(question_ask.question_text, search_results, started=started)
+        try:
+            while True:
+                item = await run_llm(next, events, None)
+                if item is None:
+                    break
+                event, data = item
+                if event == "done":
+                    data["retrieval"] = retrieved.sources
+                    data["question_id"] = await run_io(
+                        store_question, case_id, question_ask.question_text, data["answer"]
+                    )
+                yield sse_event(event, data)
+        except Exception as e:
+            print(f"Error streaming answer for case {case_id}: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            try:
+                events.close()
+            except ValueError:
+                pass  # Generator still running on a worker thread after the client disconnected
+            
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            **get_cors_headers(request),
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering so tokens arrive immediately
+        }
+    )
+
+def judgment_response(judgment: models.Judgment) -> schemas.JudgmentResponse:
+    """Judgment row as a response model (judges and keywords are stored as JSON text)"""
+    return schemas.JudgmentResponse(
+        id=judgment.id,
+        saos_id=judgment.saos_id,
+        title=judgment.title or "",
+        case_number=judgment.case_number or "",
+        judgment_date=judgment.judgment_date,
+        court_name=judgment.court_name or "",
+        court_type=judgment.court_type or "",
+        judges=json.loads(judgment.judges) if judgment.judges else None,
+        keywords=json.loads(judgment.keywords) if judgment.keywords else None,
+        content=judgment.content,
+        source_url=judgment.source_url,
+        created_at=judgment.created_at
+    )
+
+@api_router.get("/judgments/search")
+async def search_judgments(request: Request, db: Session = Depends(get_db)):
+    """Search judgments in the local SAOS mirror (query parameters: q, size, snippets=true for highlighted fragments)"""
+    if request.method == "OPTIONS":
+        return Response(status_code=200, headers=get_cors_headers(request))
+        
+    try:
+        user = await get_current_active_user(request, db)
+        if not user:
+            return create_response(
+                {"detail": "Not authenticated"},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                headers=get_cors_headers(request)
+            )
+            
+        query = request.query_params.get("q", "")
+        size = min(int(request.query_params.get("size", "10")), MAX_PAGE_SIZE)
+        snippets = request.query_params.get("snippets", "false").lower() == "true"
+        results = await run_io(saos_sync.search_judgments, query.split(), size, snippets)
+        return create_response(results, headers=get_cors_headers(request))
+    except Exception as e:
+        return create_response(
+            {"detail": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            headers=get_cors_headers(request)
+        )
+
+@api_router.get("/judgments/{saos_id}", response_model=schemas.JudgmentResponse)
+async def get_judgment(saos_id: int, request: Request, db: Session = Depends(get_db)):
+    """Get a judgment from the local SAOS mirror by its SAOS id"""
+    if request.method == "OPTIONS":
+        return Response(status_code=200, headers=get_cors_headers(request))
+        
+    try:
+        user = await get_current_active_user(request, db)
+        if not user:
+            return create_response(
+                {"detail": "Not authenticated"},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                headers=get_cors_headers(request)
+            )
+            
+        judgment = await run_io(
+            lambda: db.query(models.Judgment).filter(models.Judgment.saos_id == saos_id).first()
+        )
+        if judgment is None:
+            return create_response(
+                {"detail": "Judgment not found"},
+                status_code=status.HTTP_404_NOT_FOUND,
+                headers=get_cors_headers(request)
+            )
+        return create_response(judgment_response(judgment), headers=get_cors_headers(request))
+    except Exception as e:
+        return create_response(
+            {"detail": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            headers=get_cors_headers(request)
+        )
+
+@api_router.get("/legal-acts/search")
+async def search_legal_acts(request: Request, db: Session = Depends(get_db)):
+    """Search legal acts in the local ISAP corpus (query parameters: q, size, snippets=true for highlighted fragments)"""
+    if request.method == "OPTIONS":
+        return Response(status_code=200, headers=get_cors_headers(request))
+        
+    try:
+        user = await get_current_active_user(request, db)
+        if not user:
+            return create_response(
+                {"detail": "Not authenticated"},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                headers=get_cors_headers(request)
+            )
+            
+        query = request.query_params.get("q", "")
+        size = min(int(request.query_params.get("size", "10")), MAX_PAGE_SIZE)
+        snippets = request.query_params.get("snippets", "false").lower() == "true"
+        results = await run_io(isap_sync.search_acts, query.split(), size, snippets)
+        return create_response(results, headers=get_cors_headers(request))
+    except Exception as e:
+        return create_response(
+            {"detail": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            headers=get_cors_headers(request)
+        )
+
+@api_router.get("/legal-acts/{isap_id}", response_model=schemas.LegalActResponse)
+async def get_legal_act(isap_id: str, request: Request, db: Session = Depends(get_db)):
+    """Get a legal act from the local ISAP corpus by its ISAP id, e.g. WDU19640160093"""
+    if request.method == "OPTIONS":
+        return Response(status_code=200, headers=get_cors_headers(request))
+        
+    try:
+        user = await get_current_active_user(request, db)
+        if not user:
+            return create_response(
+                {"detail": "Not authenticated"},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                headers=get_cors_headers(request)
+            )
+            
+        act = await run_io(
+            lambda: db.query(models.LegalAct).filter(models.LegalAct.isap_id == isap_id).first()
+        )
+        if act is None:
+            return create_response(
+                {"detail": "Legal act not found"},
+                status_code=status.HTTP_404_NOT_FOUND,
+                headers=get_cors_headers(request)
+            )
+        return create_response(
+            schemas.LegalActResponse.model_validate(act),
+            headers=get_cors_headers(request)
+        )
+    except Exception as e:
         return create_response(
             {"detail": str(e)},
             status_code=status.HTTP_400_BAD_REQUEST,
             headers=get_cors_headers(request)
         )
 
+@api_router.get("/legal-acts/{isap_id}/articles/{number}", response_model=schemas.LegalActArticleResponse)
+async def get_legal_act_article(isap_id: str, number: str, request: Request, db: Session = Depends(get_db)):
+    """Get a single article of a legal act from the local ISAP corpus, e.g. .../articles/415"""
+    if request.method == "OPTIONS":
+        return Response(status_code=200, headers=get_cors_headers(request))
+        
+    try:
+        user = await get_current_active_user(request, db)
+        if not user:
+            return create_response(
+                {"detail": "Not authenticated"},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                headers=get_cors_headers(request)
+            )
+            
+        row = await run_io(
+            lambda: db.query(models.LegalActArticle, models.LegalAct.version)
+            .join(models.LegalAct, models.LegalActArticle.legal_act_id == models.LegalAct.id)
+            .filter(models.LegalAct.isap_id == isap_id, models.LegalActArticle.number == number)
+            .order_by(models.LegalActArticle.ordinal)
+            .first()
+        )
+        if row is None:
+            return create_response(
+                {"detail": "Article not found"},
+                status_code=status.HTTP_404_NOT_FOUND,
+                headers=get_cors_headers(request)
+            )
+        article, version = row
+        return create_response(
+            schemas.LegalActArticleResponse(
+                isap_id=isap_id,
+                number=article.number,
+                division=article.division,
+                content=article.content,
+                version=version
+            ),
+            headers=get_cors_headers(request)
+        )
+    except Exception as e:
+        return create_response(
+            {"detail": str(e)},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            headers=get_cors_headers(request)
+        )
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    if not metrics.ENABLED:
+        return Response("Metrics are disabled\n", status_code=status.HTTP_404_NOT_FOUND, media_type="text/plain")
+    body, content_type = await run_io(metrics.render_latest)
+    return Response(body, media_type=content_type)
+
 # Add router to app
 app.include_router(api_router)
 
+async def wait_for_database():
+    """Poll the database with exponential backoff without blocking startup or the event loop"""
+    delay = 1.0
+    while not await run_io(check_connection):
+        print(f"Baza danych niedostępna: {readiness.last_error}. Ponowna próba za {delay:.0f} s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, settings.DB_READY_MAX_BACKOFF)
+
+@app.on_event("startup")
+async def start_database_readiness_check():
+    """Check database readiness in the background; /api/ready reports the result"""
+    app.state.database_readiness_task = asyncio.create_task(wait_for_database())
+
+@app.on_event("startup")
+async def start_saos_sync():
+    """Keep the local SAOS mirror up to date in the background (SAOS_SYNC_INTERVAL > 0)"""
+    if settings.SAOS_SYNC_INTERVAL > 0:
+        app.state.saos_sync_task = asyncio.create_task(saos_sync.run_forever(settings.SAOS_SYNC_INTERVAL))
+
+@app.on_event("startup")
+async def start_isap_sync():
+    """Keep the local ISAP corpus up to date in the background (ISAP_SYNC_INTERVAL > 0)"""
+    if settings.ISAP_SYNC_INTERVAL > 0:
+        app.state.isap_sync_task = asyncio.create_task(isap_sync.run_forever(settings.ISAP_SYNC_INTERVAL))
+
+@app.on_event("startup")
+async def start_case_index_lifecycle():
+    """Roll over and shrink the shared case indices in the background (CASE_INDEX_LIFECYCLE_INTERVAL > 0)"""
+    if settings.CASE_INDEX_MODE == "shared" and settings.CASE_INDEX_LIFECYCLE_INTERVAL > 0:
+        app.state.case_index_task = asyncio.create_task(
+            case_index_lifecycle.run_forever(settings.CASE_INDEX_LIFECYCLE_INTERVAL)
+        )
+
+@app.on_event("startup")
+def start_extraction_service():
+    """Start background text extraction and resume unfinished jobs"""
+    extraction_service.start()
+
+@app.on_event("shutdown")
+def stop_saos_sync():
+    """Stop the periodic SAOS sync; an interrupted run resumes from its checkpoint"""
+    task = getattr(app.state, "saos_sync_task", None)
+    if task is not None:
+        task.cancel()
+
+@app.on_event("shutdown")
+def stop_isap_sync():
+    """Stop the periodic ISAP refresh; an interrupted run resumes from its checkpoint"""
+    task = getattr(app.state, "isap_sync_task", None)
+    if task is not None:
+        task.cancel()
+
+@app.on_event("shutdown")
+def stop_case_index_lifecycle():
+    """Stop the case index lifecycle loop"""
+    task = getattr(app.state, "case_index_task", None)
+    if task is not None:
+        task.cancel()
+
+@app.on_event("shutdown")
+def stop_extraction_service():
+    """Stop extraction workers before the worker exits"""
+    extraction_service.stop()
+
+@app.on_event("shutdown")
+def shutdown_offload_pools():
+    """Wait for in-flight blocking work before the worker exits"""
+    shutdown_pools()
+
+@app.on_event("shutdown")
+def shutdown_elasticsearch():
+    """Flush queued index writes before the worker exits"""
+    es_client.close()
+
+@app.on_event("shutdown")
+def shutdown_embedder():
+    """Stop the embedding batch worker and flush cached vectors to disk"""
+    close_embedder()
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    """Close pooled keep-alive connections to ISAP and SAOS"""
+    await close_http_client()
+
+@app.on_event("shutdown")
+def shutdown_tracing():
+    """Export buffered spans before the worker exits"""
+    tracing.shutdown_tracing()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
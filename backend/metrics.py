@@ -0,0 +1,194 @@
+"""
+Metryki Prometheus i pomiar czasu etapów przetwarzania
+
+Etapy mierzone są wspólnym menedżerem kontekstu `timed` (lub dekoratorem
+`timed_function`). Gdy metryki są wyłączone (METRICS_ENABLED=false albo brak
+pakietu prometheus_client), `timed` zwraca współdzielony pusty kontekst, więc
+pomiar kosztuje jedno wywołanie funkcji. Statystyki zbierane już wcześniej
+(pule wątków, kolejka indeksowania, pule połączeń, pamięci podręczne) są
+eksportowane jako wskaźniki przez `register_stats`.
+"""
+import functools
+import re
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict
+
+from config import settings
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    CollectorRegistry = None
+
+ENABLED = settings.METRICS_ENABLED and CollectorRegistry is not None
+
+_NOOP = nullcontext()
+
+# Przedziały histogramów (s): od zapytań do bazy po generowanie odpowiedzi LLM
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+_stats_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+class _StatsCollector:
+    """Eksport słowników statystyk jako wskaźników (gauge) przy każdym odczycie /metrics"""
+
+    def collect(self):
+        for name, source in _stats_sources.items():
+            try:
+                stats = source()
+            except Exception as e:
+                print(f"Nie można odczytać statystyk {name}: {e}")
+                continue
+            yield from _gauges(f"asystent_{name}", stats or {})
+
+
+def _gauges(prefix: str, stats: Dict[str, Any]):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _gauges(f"{prefix}_{key}", value)
+        elif isinstance(value, (int, float)):
+            # Klucze mogą być np. nazwami hostów, a nazwy metryk dopuszczają tylko [a-zA-Z0-9_]
+            name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{key}")
+            yield GaugeMetricFamily(name, f"{prefix} {key}", value=float(value))
+
+
+if ENABLED:
+    registry = CollectorRegistry()
+    registry.register(_StatsCollector())
+
+    HTTP_REQUEST_SECONDS = Histogram(
+        "asystent_http_request_duration_seconds", "Czas obsługi żądania HTTP",
+        ["method", "route", "status"], buckets=FAST_BUCKETS + (10.0, 30.0), registry=registry
+    )
+    DB_QUERY_SECONDS = Histogram(
+        "asystent_db_query_duration_seconds", "Czas wykonania zapytania SQL",
+        ["operation"], buckets=FAST_BUCKETS, registry=registry
+    )
+    STORAGE_SECONDS = Histogram(
+        "asystent_storage_operation_duration_seconds", "Czas operacji MinIO",
+        ["operation"], buckets=FAST_BUCKETS + (10.0, 30.0), registry=registry
+    )
+    STORAGE_BYTES = Counter(
+        "asystent_storage_bytes_total", "Bajty przesłane do/z MinIO",
+        ["direction"], registry=registry
+    )
+    ES_SECONDS = Histogram(
+        "asystent_elasticsearch_request_duration_seconds", "Czas żądania do Elasticsearch",
+        ["operation"], buckets=FAST_BUCKETS, registry=registry
+    )
+    LLM_TTFT_SECONDS = Histogram(
+        "asystent_llm_time_to_first_token_seconds", "Czas do pierwszego tokenu odpowiedzi LLM",
+        ["provider"], buckets=SLOW_BUCKETS, registry=registry
+    )
+    LLM_SECONDS = Histogram(
+        "asystent_llm_generation_duration_seconds", "Całkowity czas generowania odpowiedzi LLM",
+        ["provider", "mode"], buckets=SLOW_BUCKETS, registry=registry
+    )
+    RAG_STAGE_SECONDS = Histogram(
+        "asystent_rag_stage_duration_seconds", "Czas etapów RAG: wyszukiwanie, składanie kontekstu, generowanie",
+        ["stage"], buckets=FAST_BUCKETS + SLOW_BUCKETS[-4:], registry=registry
+    )
+    RETRIEVAL_SOURCE_SECONDS = Histogram(
+        "asystent_retrieval_source_duration_seconds", "Czas wyszukiwania kontekstu w jednym źródle",
+        ["source", "status"], buckets=FAST_BUCKETS, registry=registry
+    )
+else:
+    registry = None
+    HTTP_REQUEST_SECONDS = DB_QUERY_SECONDS = STORAGE_SECONDS = STORAGE_BYTES = None
+    ES_SECONDS = LLM_TTFT_SECONDS = LLM_SECONDS = RAG_STAGE_SECONDS = RETRIEVAL_SOURCE_SECONDS = None
+
+
+class _Timer:
+    __slots__ = ("metric", "started")
+
+    def __init__(self, metric):
+        self.metric = metric
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metric.observe(time.perf_counter() - self.started)
+        return False
+
+
+def timed(metric, **labels):
+    """
+    Pomiar czasu bloku kodu w histogramie
+
+    Przykład:
+        with timed(ES_SECONDS, operation="search"):
+            ...
+    """
+    if metric is None:
+        return _NOOP
+    return _Timer(metric.labels(**labels) if labels else metric)
+
+
+def timed_function(metric, **labels):
+    """Dekorator mierzący czas wywołania funkcji; przy wyłączonych metrykach zwraca funkcję bez zmian"""
+    def decorator(func):
+        if metric is None:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(metric, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe(metric, value: float, **labels):
+    """Zapisanie pojedynczej obserwacji (np. zmierzonego wcześniej czasu w sekundach)"""
+    if metric is not None:
+        (metric.labels(**labels) if labels else metric).observe(value)
+
+
+def count(metric, amount: float, **labels):
+    """Zwiększenie licznika"""
+    if metric is not None and amount:
+        (metric.labels(**labels) if labels else metric).inc(amount)
+
+
+def register_stats(name: str, source: Callable[[], Dict[str, Any]]):
+    """Rejestracja funkcji zwracającej słownik statystyk eksportowanych jako wskaźniki"""
+    _stats_sources[name] = source
+
+
+def instrument_engine(engine):
+    """Pomiar czasu zapytań SQL silnika SQLAlchemy"""
+    if DB_QUERY_SECONDS is None:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip()[:6].upper()
+        if operation not in SQL_OPERATIONS:
+            operation = "OTHER"
+        DB_QUERY_SECONDS.labels(operation=operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        # Nieudane zapytanie nie wywołuje after_cursor_execute — zdjęcie znacznika czasu ze stosu
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def render_latest():
+    """Treść odpowiedzi /metrics i jej typ MIME"""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
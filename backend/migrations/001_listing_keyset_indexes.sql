@@ -0,0 +1,10 @@
+-- Indeksy złożone pod stronicowanie kluczem (keyset) list spraw i dokumentów.
+-- Kolejność kolumn: filtr właściciela/sprawy, kolumna sortowania, id (rozstrzyga remisy).
+-- PostgreSQL przegląda indeks B-drzewa w obu kierunkach, więc obsługuje też sortowanie malejące.
+
+CREATE INDEX IF NOT EXISTS ix_cases_owner_updated_id ON cases (owner_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS ix_cases_owner_created_id ON cases (owner_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_cases_owner_title_id ON cases (owner_id, title, id);
+
+CREATE INDEX IF NOT EXISTS ix_documents_case_updated_id ON documents (case_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS ix_documents_case_created_id ON documents (case_id, created_at, id);
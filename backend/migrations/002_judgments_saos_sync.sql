@@ -0,0 +1,10 @@
+-- Lokalna kopia orzeczeń SAOS (saos_sync.py): zapis orzeczeń po saos_id
+-- oraz punkty kontrolne synchronizacji, pozwalające wznowić przerwane zadanie.
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_judgments_saos_id ON judgments (saos_id);
+
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+    name VARCHAR PRIMARY KEY,
+    state TEXT,
+    updated_at TIMESTAMP
+);
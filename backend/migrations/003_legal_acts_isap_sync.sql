@@ -0,0 +1,21 @@
+-- Lokalny korpus aktów prawnych ISAP (isap_sync.py): wersjonowanie aktów
+-- (status, data zmiany, skrót treści), zapis po isap_id oraz artykuły
+-- wyodrębnione z tekstu ujednoliconego.
+
+ALTER TABLE legal_acts ADD COLUMN IF NOT EXISTS status VARCHAR;
+ALTER TABLE legal_acts ADD COLUMN IF NOT EXISTS change_date TIMESTAMP;
+ALTER TABLE legal_acts ADD COLUMN IF NOT EXISTS content_hash VARCHAR;
+ALTER TABLE legal_acts ADD COLUMN IF NOT EXISTS version INTEGER DEFAULT 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_legal_acts_isap_id ON legal_acts (isap_id);
+
+CREATE TABLE IF NOT EXISTS legal_act_articles (
+    id SERIAL PRIMARY KEY,
+    legal_act_id INTEGER REFERENCES legal_acts (id),
+    ordinal INTEGER,
+    number VARCHAR,
+    division VARCHAR,
+    content TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ix_legal_act_articles_legal_act_id ON legal_act_articles (legal_act_id);
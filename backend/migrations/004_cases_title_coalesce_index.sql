@@ -0,0 +1,6 @@
+-- Tytuł sprawy może być NULL, więc lista spraw sortowana po tytule używa
+-- COALESCE(title, '') (pagination.keyset_page, null_value); indeks obejmuje
+-- to samo wyrażenie, aby stronicowanie kluczem nadal korzystało z indeksu.
+
+DROP INDEX IF EXISTS ix_cases_owner_title_id;
+CREATE INDEX IF NOT EXISTS ix_cases_owner_title_id ON cases (owner_id, (COALESCE(title, '')), id);
@@ -0,0 +1,264 @@
+"""
+Lokalny serwer imitujący API ELI Sejmu (ISAP) i API SAOS
+
+Odpowiada danymi z plików fixtures/isap.json i fixtures/saos.json w formacie
+zgodnym z prawdziwymi serwisami. Pozwala symulować opóźnienia, błędy 5xx
+i limit częstotliwości (429 z nagłówkiem Retry-After), a pod /_stats
+udostępnia liczniki żądań oraz największą zaobserwowaną liczbę równoległych
+żądań — do sprawdzania ponowień i limitów klienta HTTP bez ruchu do
+serwisów publicznych.
+
+Przykład:
+    python mocks/legal_api_server.py --port 8085 --latency 0.2 --fail-rate 0.1
+    ISAP_API_URL=http://localhost:8085/eli SAOS_API_URL=http://localhost:8085/saos/api uvicorn main:app
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class MockState:
+    """Dane i konfiguracja serwera oraz statystyki żądań"""
+
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR, latency: float = 0.0, jitter: float = 0.0,
+                 fail_rate: float = 0.0, rate_limit: float = 0.0):
+        with open(os.path.join(fixtures_dir, "isap.json"), encoding="utf-8") as f:
+            self.acts: List[Dict[str, Any]] = json.load(f)["acts"]
+        with open(os.path.join(fixtures_dir, "saos.json"), encoding="utf-8") as f:
+            self.judgments: List[Dict[str, Any]] = json.load(f)["judgments"]
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        self._window: Dict[str, List[float]] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def _service_stats(self, service: str) -> Dict[str, float]:
+        return self.stats.setdefault(service, {
+            "requests": 0, "failures_injected": 0, "rate_limited": 0, "max_concurrency": 0
+        })
+
+    def enter(self, service: str) -> Optional[int]:
+        """Rejestracja żądania; zwraca status błędu do zasymulowania albo None"""
+        now = time.monotonic()
+        with self._lock:
+            stats = self._service_stats(service)
+            stats["requests"] += 1
+            self._in_flight[service] = self._in_flight.get(service, 0) + 1
+            stats["max_concurrency"] = max(stats["max_concurrency"], self._in_flight[service])
+            if self.rate_limit:
+                window = [t for t in self._window.get(service, []) if now - t < 1.0]
+                window.append(now)
+                self._window[service] = window
+                if len(window) > self.rate_limit:
+                    stats["rate_limited"] += 1
+                    return 429
+            if self.fail_rate and random.random() < self.fail_rate:
+                stats["failures_injected"] += 1
+                return 503
+        return None
+
+    def leave(self, service: str):
+        with self._lock:
+            self._in_flight[service] -= 1
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {}
+            self._window = {}
+
+
+def _first(query: Dict[str, List[str]], name: str, default: Optional[str] = None) -> Optional[str]:
+    values = query.get(name)
+    return values[0] if values else default
+
+
+def _saos_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def _acts_page(acts: List[Dict[str, Any]], query: Dict[str, List[str]]) -> Dict[str, Any]:
+    offset = int(_first(query, "offset", "0"))
+    limit = int(_first(query, "limit", "100"))
+    items = [{k: v for k, v in act.items() if k != "text_html"} for act in acts[offset:offset + limit]]
+    return {"count": len(items), "offset": offset, "totalCount": len(acts), "items": items}
+
+
+def eli_response(state: MockState, path: str, query: Dict[str, List[str]]) -> Tuple[int, Any]:
+    """Odpowiedzi API ELI: /eli/acts/search, /eli/changes/acts, /eli/acts/{wydawca}/{rok}/{poz}[/text.html]"""
+    parts = path.strip("/").split("/")[1:]
+    if parts == ["acts", "search"]:
+        acts = state.acts
+        title = (_first(query, "title") or "").lower()
+        if title:
+            acts = [act for act in acts if title in act["title"].lower()]
+        publisher = _first(query, "publisher")
+        if publisher:
+            acts = [act for act in acts if act["publisher"] == publisher]
+        date_from = _first(query, "dateFrom")
+        if date_from:
+            acts = [act for act in acts if act["promulgation"] >= date_from]
+        sort_by = _first(query, "sortBy")
+        if sort_by:
+            acts = sorted(acts, key=lambda act: act.get(sort_by) or "", reverse=_first(query, "sortDir") == "desc")
+        return 200, _acts_page(acts, query)
+    if parts == ["changes", "acts"]:
+        # Akty zmienione (ogłoszone, znowelizowane, uchylone) od daty since, od najstarszej zmiany
+        since = _first(query, "since")
+        acts = [act for act in state.acts if not since or act["changeDate"] >= since]
+        return 200, _acts_page(sorted(acts, key=lambda act: (act["changeDate"], act["address"])), query)
+    if len(parts) in (4, 5) and parts[0] == "acts":
+        publisher, year, position = parts[1], parts[2], parts[3]
+        act = next((
+            act for act in state.acts
+            if act["publisher"] == publisher and str(act["year"]) == year and str(act["pos"]) == position
+        ), None)
+        if act is None:
+            return 404, {"message": "Not found"}
+        if len(parts) == 5:
+            return (200, act["text_html"]) if parts[4] == "text.html" else (404, {"message": "Not found"})
+        return 200, {k: v for k, v in act.items() if k != "text_html"}
+    return 404, {"message": "Not found"}
+
+
+def saos_response(state: MockState, path: str, query: Dict[str, List[str]]) -> Tuple[int, Any]:
+    """Odpowiedzi API SAOS: /saos/api/search/judgments, /saos/api/dump/judgments, /saos/api/judgments/{id}"""
+    parts = path.strip("/").split("/")[2:]
+    if parts == ["search", "judgments"]:
+        judgments = state.judgments
+        words = (_first(query, "all") or "").lower().split()
+        if words:
+            judgments = [
+                judgment for judgment in judgments
+                if all(word in json.dumps(judgment, ensure_ascii=False).lower() for word in words)
+            ]
+        judgments = sorted(judgments, key=lambda judgment: judgment["judgmentDate"],
+                           reverse=_first(query, "sortingDirection", "DESC") == "DESC")
+        page_size = int(_first(query, "pageSize", "10"))
+        page_number = int(_first(query, "pageNumber", "0"))
+        items = judgments[page_number * page_size:(page_number + 1) * page_size]
+        return 200, {"items": items, "info": {"totalResults": len(judgments)}}
+    if parts == ["dump", "judgments"]:
+        # Zrzut: wszystkie orzeczenia zmienione od sinceModificationDate, w kolejności id
+        judgments = state.judgments
+        since = _first(query, "sinceModificationDate")
+        if since:
+            judgments = [j for j in judgments if _saos_datetime(j["modificationDate"]) >= _saos_datetime(since)]
+        judgments = sorted(judgments, key=lambda judgment: judgment["id"])
+        page_size = int(_first(query, "pageSize", "20"))
+        page_number = int(_first(query, "pageNumber", "0"))
+        items = judgments[page_number * page_size:(page_number + 1) * page_size]
+        links = []
+        if (page_number + 1) * page_size < len(judgments):
+            links.append({"rel": "next", "href": f"/saos/api/dump/judgments?pageSize={page_size}&pageNumber={page_number + 1}"})
+        return 200, {"links": links, "items": items}
+    if len(parts) == 2 and parts[0] == "judgments":
+        judgment = next((j for j in state.judgments if str(j["id"]) == parts[1]), None)
+        if judgment is None:
+            return 404, {"error": {"message": "Not found"}}
+        return 200, {"data": judgment}
+    return 404, {"error": {"message": "Not found"}}
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, jak w prawdziwych serwisach
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status_code: int, body: Any, headers: Optional[Dict[str, str]] = None):
+            if isinstance(body, str) and status_code == 200:
+                payload, content_type = body.encode("utf-8"), "text/html; charset=utf-8"
+            else:
+                payload, content_type = json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json"
+            try:
+                self.send_response(status_code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # Klient zrezygnował z odpowiedzi (np. po przekroczeniu limitu czasu)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/_stats":
+                return self._send(200, state.stats)
+            if url.path.startswith("/eli/"):
+                service, responder = "isap", eli_response
+            elif url.path.startswith("/saos/api/"):
+                service, responder = "saos", saos_response
+            else:
+                return self._send(404, {"message": "Not found"})
+
+            injected = state.enter(service)
+            try:
+                if state.latency or state.jitter:
+                    time.sleep(state.latency + random.uniform(0, state.jitter))
+                if injected == 429:
+                    return self._send(429, {"message": "Too many requests"}, {"Retry-After": "1"})
+                if injected:
+                    return self._send(injected, {"message": "Service unavailable"})
+                status_code, body = responder(state, url.path, query)
+                self._send(status_code, body)
+            finally:
+                state.leave(service)
+
+        def do_DELETE(self):
+            if urlsplit(self.path).path == "/_stats":
+                state.reset_stats()
+                return self._send(200, {})
+            self._send(404, {"message": "Not found"})
+
+    return Handler
+
+
+def start(port: int = 0, host: str = "127.0.0.1", **options) -> Tuple[ThreadingHTTPServer, MockState, str]:
+    """
+    Uruchomienie serwera w wątku w tle
+
+    Returns:
+        Tuple (serwer, stan, adres bazowy np. http://127.0.0.1:8085); serwer
+        zatrzymuje `server.shutdown()`
+    """
+    state = MockState(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="legal-api-mock", daemon=True).start()
+    return server, state, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokalna imitacja API ISAP (ELI) i SAOS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Katalog z isap.json i saos.json")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stałe opóźnienie odpowiedzi (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Losowe dodatkowe opóźnienie (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Odsetek odpowiedzi 503")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Żądania na sekundę na serwis, powyżej 429")
+    args = parser.parse_args()
+    server, _, base_url = start(
+        args.port, args.host, fixtures_dir=args.fixtures, latency=args.latency,
+        jitter=args.jitter, fail_rate=args.fail_rate, rate_limit=args.rate_limit
+    )
+    print(f"ISAP (ELI): {base_url}/eli  SAOS: {base_url}/saos/api  statystyki: {base_url}/_stats")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
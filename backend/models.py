@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Table, Float, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -56,6 +56,14 @@ class Case(Base):
     legal_acts = relationship("LegalAct", secondary=case_legal_act, back_populates="cases")
     judgments = relationship("Judgment", secondary=case_judgment, back_populates="cases")
     questions = relationship("Question", back_populates="case", cascade="all, delete-orphan")
+    
+    # Indeksy pod stronicowanie kluczem (migrations/001_listing_keyset_indexes.sql,
+    # 004_cases_title_coalesce_index.sql — tytuł może być NULL, sortowany jest COALESCE)
+    __table_args__ = (
+        Index("ix_cases_owner_updated_id", "owner_id", "updated_at", "id"),
+        Index("ix_cases_owner_created_id", "owner_id", "created_at", "id"),
+        Index("ix_cases_owner_title_id", "owner_id", text("coalesce(title, '')"), "id"),
+    )
 
 class Document(Base):
     """Model dokumentu sprawy."""
@@ -74,6 +82,38 @@ class Document(Base):
     
     # Relacje
     case = relationship("Case", back_populates="documents")
+    extraction_job = relationship("ExtractionJob", back_populates="document", uselist=False, cascade="all, delete-orphan")
+    
+    # Indeksy pod stronicowanie kluczem (migrations/001_listing_keyset_indexes.sql)
+    __table_args__ = (
+        Index("ix_documents_case_updated_id", "case_id", "updated_at", "id"),
+        Index("ix_documents_case_created_id", "case_id", "created_at", "id"),
+    )
+
+class ExtractionJob(Base):
+    """Model zadania ekstrakcji tekstu z dokumentu."""
+    
+    __tablename__ = "extraction_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), unique=True, index=True)
+    status = Column(String, default="pending", index=True)  # pending, running, done, failed
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    page_count = Column(Integer)
+    char_count = Column(Integer)
+    # Czasy poszczególnych etapów w milisekundach
+    download_ms = Column(Float)
+    extract_ms = Column(Float)
+    chunk_ms = Column(Float)
+    store_ms = Column(Float)
+    index_ms = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    # Relacje
+    document = relationship("Document", back_populates="extraction_job")
     
 class LegalAct(Base):
     """Model aktu prawnego."""
@@ -88,11 +128,39 @@ class LegalAct(Base):
     content = Column(Text)
     pdf_url = Column(String)
     local_path = Column(String)  # Ścieżka do lokalnej kopii
+    status = Column(String)  # Status z ISAP, np. obowiązujący, uchylony
+    change_date = Column(DateTime)  # Data ostatniej zmiany aktu w ISAP (np. nowelizacji)
+    content_hash = Column(String)  # SHA-256 treści, do wykrywania zmian tekstu ujednoliconego
+    version = Column(Integer, default=1)  # Zwiększana przy każdej zmianie treści
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacje
     cases = relationship("Case", secondary=case_legal_act, back_populates="legal_acts")
+    articles = relationship(
+        "LegalActArticle", back_populates="legal_act", cascade="all, delete-orphan",
+        order_by="LegalActArticle.ordinal"
+    )
+    
+    # Synchronizacja z ISAP zapisuje akty po isap_id (patrz migrations/003)
+    __table_args__ = (
+        Index("ux_legal_acts_isap_id", "isap_id", unique=True),
+    )
+
+class LegalActArticle(Base):
+    """Model artykułu aktu prawnego (z tekstu ujednoliconego)."""
+    
+    __tablename__ = "legal_act_articles"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    legal_act_id = Column(Integer, ForeignKey("legal_acts.id"), index=True)
+    ordinal = Column(Integer)  # Kolejność w akcie
+    number = Column(String)  # Numer artykułu, np. 5a
+    division = Column(String)  # Jednostka nadrzędna, np. Rozdział 2
+    content = Column(Text)
+    
+    # Relacje
+    legal_act = relationship("LegalAct", back_populates="articles")
 
 class Judgment(Base):
     """Model orzeczenia sądowego."""
@@ -115,6 +183,11 @@ class Judgment(Base):
     
     # Relacje
     cases = relationship("Case", secondary=case_judgment, back_populates="judgments")
+    
+    # Synchronizacja z SAOS zapisuje orzeczenia po saos_id (patrz migrations/002)
+    __table_args__ = (
+        Index("ux_judgments_saos_id", "saos_id", unique=True),
+    )
 
 class Question(Base):
     """Model pytania do sprawy."""
@@ -128,4 +201,13 @@ class Question(Base):
     case_id = Column(Integer, ForeignKey("cases.id"))
     
     # Relacje
-    case = relationship("Case", back_populates="questions")
\ No newline at end of file
+    case = relationship("Case", back_populates="questions")
+
+class SyncCheckpoint(Base):
+    """Punkt kontrolny zadania synchronizacji z zewnętrznym źródłem (np. SAOS)."""
+    
+    __tablename__ = "sync_checkpoints"
+    
+    name = Column(String, primary_key=True)
+    state = Column(Text)  # Stan zadania w formie JSON
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,142 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from config import settings
+
+
+class BlockingPool:
+    """Ograniczona pula wątków do wykonywania blokujących operacji poza pętlą zdarzeń"""
+
+    def __init__(self, name: str, max_workers: int):
+        """
+        Inicjalizacja puli
+
+        Args:
+            name: Nazwa puli (używana w nazwach wątków i statystykach)
+            max_workers: Maksymalna liczba równoległych wątków
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"offload-{name}"
+        )
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._queued = 0
+        self._in_flight = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Wykonanie funkcji w puli wątków i oczekiwanie na wynik bez blokowania pętli
+
+        Args:
+            func: Blokująca funkcja do wykonania
+            *args, **kwargs: Argumenty przekazywane do funkcji
+
+        Returns:
+            Wynik funkcji (wyjątki są propagowane do wywołującego)
+        """
+        enqueued_at = time.perf_counter()
+        with self._lock:
+            self._submitted += 1
+            self._queued += 1
+
+        def call():
+            started_at = time.perf_counter()
+            wait = started_at - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._in_flight += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._completed += 1
+                    self._failed += int(failed)
+                    self._total_run += time.perf_counter() - started_at
+
+        def cancelled(future):
+            # Anulowanie oczekującego (np. asyncio.wait_for) przed startem zadania — call() nie zostanie wykonane
+            if future.cancelled():
+                with self._lock:
+                    self._queued -= 1
+
+        # Kontekst wywołującego (m.in. bieżący span śledzenia) przenoszony do wątku puli
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, call)
+        future.add_done_callback(cancelled)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Bieżące statystyki puli (kolejka, zajętość, czasy oczekiwania i wykonania)"""
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "max_workers": self.max_workers,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "queued": self._queued,
+                "in_flight": self._in_flight,
+                "avg_wait_ms": round(self._total_wait / completed * 1000, 3),
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+                "avg_run_ms": round(self._total_run / completed * 1000, 3),
+            }
+
+    def shutdown(self):
+        """Zamknięcie puli po zakończeniu bieżących zadań"""
+        self._executor.shutdown(wait=True)
+
+
+# Pula dla operacji wejścia/wyjścia (PostgreSQL, MinIO)
+io_pool = BlockingPool("io", settings.OFFLOAD_IO_WORKERS)
+
+# Pula dla operacji obciążających CPU (hashowanie haseł bcrypt)
+cpu_pool = BlockingPool("cpu", settings.OFFLOAD_CPU_WORKERS)
+
+# Pula dla strumieni odpowiedzi LLM (każdy token to blokujące oczekiwanie na dostawcę),
+# oddzielona od puli io, aby długie strumienie nie blokowały bazy danych i MinIO
+llm_pool = BlockingPool("llm", settings.OFFLOAD_LLM_WORKERS)
+
+
+async def run_io(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Wykonanie blokującej operacji I/O w puli io"""
+    return await io_pool.run(func, *args, **kwargs)
+
+
+async def run_cpu(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Wykonanie operacji obciążającej CPU w puli cpu"""
+    return await cpu_pool.run(func, *args, **kwargs)
+
+
+async def run_llm(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Wykonanie kroku strumienia odpowiedzi LLM w puli llm"""
+    return await llm_pool.run(func, *args, **kwargs)
+
+
+def get_offload_stats() -> Dict[str, Dict[str, Any]]:
+    """Statystyki wszystkich pul"""
+    return {pool.name: pool.stats() for pool in (io_pool, cpu_pool, llm_pool)}
+
+
+def shutdown_pools():
+    """Zamknięcie wszystkich pul"""
+    for pool in (io_pool, cpu_pool, llm_pool):
+        pool.shutdown()
@@ -0,0 +1,107 @@
+"""
+Stronicowanie kluczem (keyset) dla list spraw i dokumentów
+
+Zamiast OFFSET, który wymaga przeczytania i odrzucenia wszystkich wcześniejszych
+wierszy, kolejna strona zaczyna się za ostatnim wierszem poprzedniej:
+WHERE (kolumna_sortowania, id) < (:wartość, :id). Przy indeksie złożonym
+(właściciel, kolumna_sortowania, id) koszt strony nie zależy od jej numeru.
+Kursor jest nieprzezroczystym ciągiem base64 z wartością klucza ostatniego wiersza.
+Kolumny dopuszczające NULL sortowane są po COALESCE(kolumna, null_value) —
+porównanie krotki z NULL nie jest prawdziwe, więc takie wiersze wypadałyby ze stron.
+Filtry tekstowe list dopasowują wpisaną frazę dosłownie (`like_pattern`).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import func, tuple_
+
+SORT_DIRECTIONS = ("asc", "desc")
+
+# Znak ucieczki wzorców LIKE; przekazywany jako escape= do like/ilike
+LIKE_ESCAPE = "\\"
+
+
+class InvalidCursorError(ValueError):
+    """Kursor nie pasuje do zapytania lub jest uszkodzony"""
+
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    """Zakodowanie kursora wskazującego na wiersz (wartość klucza sortowania, id)"""
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    payload = json.dumps([sort, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """Odkodowanie kursora; kursor musi pochodzić z zapytania o tym samym sortowaniu"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError("Nieprawidłowy kursor stronicowania")
+    if cursor_sort != sort:
+        raise InvalidCursorError("Kursor dotyczy innego sortowania")
+    return value, int(row_id)
+
+
+def like_pattern(value: str, prefix: bool = False) -> str:
+    """
+    Wzorzec LIKE dopasowujący frazę dosłownie (% i _ we frazie nie są symbolami wieloznacznymi)
+
+    Args:
+        value: Fraza wpisana przez użytkownika
+        prefix: Dopasowanie początku wartości zamiast dowolnego jej fragmentu
+    """
+    for char in (LIKE_ESCAPE, "%", "_"):
+        value = value.replace(char, LIKE_ESCAPE + char)
+    return f"{value}%" if prefix else f"%{value}%"
+
+
+def keyset_page(query, sort: str, sort_column, id_column, direction: str = "desc",
+                cursor: Optional[str] = None, limit: int = 50,
+                null_value: Any = None) -> Tuple[List[Any], Optional[str]]:
+    """
+    Pobranie jednej strony wyników
+
+    Args:
+        query: Zapytanie SQLAlchemy z nałożonymi filtrami (bez sortowania)
+        sort: Nazwa sortowania zapisywana w kursorze (np. "updated_at")
+        sort_column: Kolumna sortowania
+        id_column: Kolumna identyfikatora, rozstrzygająca remisy
+        direction: "asc" lub "desc"
+        cursor: Kursor zwrócony z poprzedniej strony
+        limit: Rozmiar strony
+        null_value: Wartość zastępująca NULL w kolumnie sortowania (None — kolumna bez NULL)
+
+    Returns:
+        Tuple (wiersze strony, kursor następnej strony lub None, gdy to ostatnia strona)
+    """
+    if direction not in SORT_DIRECTIONS:
+        raise InvalidCursorError(f"Nieprawidłowy kierunek sortowania: {direction}")
+    sort_key = func.coalesce(sort_column, null_value) if null_value is not None else sort_column
+    key = tuple_(sort_key, id_column)
+    if cursor:
+        value, row_id = decode_cursor(cursor, f"{sort}:{direction}")
+        query = query.filter(key < (value, row_id) if direction == "desc" else key > (value, row_id))
+    if direction == "desc":
+        query = query.order_by(sort_key.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_key.asc(), id_column.asc())
+
+    # Jeden wiersz ponad limit mówi, czy istnieje następna strona
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    value = getattr(last, sort_column.key)
+    return rows, encode_cursor(
+        f"{sort}:{direction}",
+        null_value if value is None else value,
+        getattr(last, id_column.key)
+    )
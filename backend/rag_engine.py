@@ -1,28 +1,60 @@
-from typing import List, Dict, Any, Tuple
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import os
 import json
-from langchain.llms import OpenAI
+import threading
+import time
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-import openai
+
+from answer_cache import AnswerCache, CachedAnswer
+from context_packer import ContextCandidate, ContextPacker, PackedContext
+from llm_providers import LLMProvider, OpenAIProvider
+from metrics import LLM_SECONDS, LLM_TTFT_SECONDS, RAG_STAGE_SECONDS, observe, timed
+from tracing import record_event, span, start_span, traced
+
+# Wersja szablonu promptu — zmiana treści szablonu wymaga podbicia wersji,
+# aby odpowiedzi z pamięci podręcznej wygenerowane starym promptem nie były zwracane
+PROMPT_VERSION = "qa-v1"
+
+@dataclass
+class RAGAnswer:
+    """Odpowiedź silnika RAG wraz ze źródłami i statystykami kontekstu"""
+    answer: str
+    sources: List[Dict[str, Any]]
+    context_stats: Dict[str, int] = field(default_factory=dict)
+    cached: bool = False
 
 class RAGEngine:
     """Silnik odpowiadający na pytania używając Retrieval Augmented Generation"""
     
-    def __init__(self, elasticsearch_client):
+    def __init__(self, elasticsearch_client, context_token_budget: int = 3000, dedup_threshold: float = 0.8,
+                 answer_cache: Optional[AnswerCache] = None, llm_provider: Optional[LLMProvider] = None):
         """
         Inicjalizacja silnika RAG
         
         Args:
             elasticsearch_client: Klient Elasticsearch do wyszukiwania dokumentów
+            context_token_budget: Maksymalna liczba tokenów kontekstu przekazywanego do LLM
+            dedup_threshold: Próg podobieństwa, powyżej którego fragmenty uznawane są za duplikaty
+            answer_cache: Pamięć podręczna odpowiedzi (None wyłącza)
+            llm_provider: Dostawca modelu językowego (domyślnie OpenAI z kluczem z OPENAI_API_KEY)
         """
         self.elasticsearch_client = elasticsearch_client
+        self.answer_cache = answer_cache
+        self._stream_lock = threading.Lock()
+        self._streams = 0
+        self._ttft_total_ms = 0.0
+        self._ttft_max_ms = 0.0
+        self._ttft_last_ms = 0.0
+        self.context_packer = ContextPacker(
+            token_budget=context_token_budget,
+            similarity_threshold=dedup_threshold
+        )
         
-        # Inicjalizacja klienta OpenAI
-        openai.api_key = os.getenv("OPENAI_API_KEY", "sk-test-key-replace-in-production")
-        
-        # Utworzenie łańcucha LLM
-        self.llm = OpenAI(temperature=0.2)
+        # Model językowy wybierany w konfiguracji (patrz llm_providers.py)
+        self.llm = llm_provider or OpenAIProvider(
+            os.getenv("OPENAI_API_KEY", "sk-test-key-replace-in-production")
+        )
         
         self.prompt_template = PromptTemplate(
             input_variables=["question", "context"],
@@ -39,8 +71,22 @@ class RAGEngine:
             Odpowiedź:
             """
         )
+    
+    @traced()
+    def retrieve(self, index_name: str, question: str, size: int = 10) -> List[Dict[str, Any]]:
+        """
+        Wyszukanie fragmentów dokumentów najlepiej pasujących do pytania
+        
+        Args:
+            index_name: Nazwa indeksu Elasticsearch
+            question: Pytanie zadane przez użytkownika
+            size: Maksymalna liczba fragmentów
         
-        self.qa_chain = LLMChain(llm=self.llm, prompt=self.prompt_template)
+        Returns:
+            Wyniki wyszukiwania fragmentów (format jak ElasticsearchClient.search)
+        """
+        with timed(RAG_STAGE_SECONDS, stage="retrieval"):
+            return self.elasticsearch_client.search_passages(index_name, question, size=size)
     
     def generate_answer(self, question: str, search_results: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
         """
@@ -53,21 +99,175 @@ class RAGEngine:
         Returns:
             Tuple zawierająca odpowiedź oraz listę źródeł
         """
+        result = self.generate_answer_with_stats(question, search_results)
+        return result.answer, result.sources
+    
+    @traced()
+    def generate_answer_with_stats(self, question: str, search_results: List[Dict[str, Any]]) -> RAGAnswer:
+        """
+        Generowanie odpowiedzi wraz ze statystykami składania kontekstu
+        
+        Args:
+            question: Pytanie zadane przez użytkownika
+            search_results: Wyniki wyszukiwania z Elasticsearch
+        
+        Returns:
+            RAGAnswer z odpowiedzią, źródłami i statystykami kontekstu (m.in. zaoszczędzone tokeny)
+        """
+        # Odpowiedź na to samo pytanie przy tych samych źródłach mogła już zostać wygenerowana
+        cached = self.answer_cache.get(question, search_results) if self.answer_cache else None
+        if cached is not None:
+            return RAGAnswer(
+                answer=cached.answer,
+                sources=cached.sources,
+                context_stats=cached.context_stats,
+                cached=True
+            )
+        
         # Przygotowanie kontekstu na podstawie wyników wyszukiwania
-        context = self._prepare_context(search_results)
+        with timed(RAG_STAGE_SECONDS, stage="packing"):
+            packed = self._pack_context(search_results)
         
         # Generowanie odpowiedzi
+        started = time.perf_counter()
         try:
-            answer = self.qa_chain.run({"question": question, "context": context})
+            prompt = self.prompt_template.format(question=question, context=packed.context)
+            with span("llm.complete", **{"llm.provider": self.llm.name}):
+                answer = self.llm.complete(prompt)
+            generated = True
         except Exception as e:
             print(f"Błąd podczas generowania odpowiedzi: {e}")
             # W przypadku błędu, zwróć prostą odpowiedź
             answer = "Przepraszam, nie mogę wygenerować odpowiedzi w tej chwili."
+            generated = False
+        latency_ms = (time.perf_counter() - started) * 1000
+        observe(RAG_STAGE_SECONDS, latency_ms / 1000, stage="generation")
+        observe(LLM_SECONDS, latency_ms / 1000, provider=self.llm.name, mode="complete")
         
-        # Przygotowanie listy źródeł
-        sources = self._prepare_sources(search_results)
+        # Przygotowanie listy źródeł (tylko wyniki, które trafiły do kontekstu)
+        sources = self._prepare_sources(packed.selected)
         
-        return answer, sources
+        # Zapamiętywane są tylko odpowiedzi faktycznie wygenerowane przez model
+        if self.answer_cache and generated:
+            self.answer_cache.put(question, search_results, CachedAnswer(
+                answer=answer,
+                sources=sources,
+                context_stats=packed.stats(),
+                latency_ms=round(latency_ms, 3)
+            ))
+        
+        return RAGAnswer(answer=answer, sources=sources, context_stats=packed.stats())
+    
+    @traced()
+    def stream_answer(self, question: str, search_results: List[Dict[str, Any]],
+                      started: Optional[float] = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Generowanie odpowiedzi strumieniowo, token po tokenie
+        
+        Args:
+            question: Pytanie zadane przez użytkownika
+            search_results: Wyniki wyszukiwania z Elasticsearch
+            started: Chwila rozpoczęcia obsługi pytania (time.perf_counter), od której
+                liczony jest czas do pierwszego tokenu; domyślnie wywołanie metody
+        
+        Yields:
+            Zdarzenia (nazwa, dane): najpierw ("sources", lista źródeł), następnie
+            ("token", fragment tekstu), na końcu ("done", odpowiedź wraz ze statystykami)
+        """
+        started = started if started is not None else time.perf_counter()
+        
+        cached = self.answer_cache.get(question, search_results) if self.answer_cache else None
+        if cached is not None:
+            yield "sources", cached.sources
+            ttft_ms = self._record_ttft(started)
+            yield "token", cached.answer
+            yield "done", {
+                "answer": cached.answer,
+                "context_stats": cached.context_stats,
+                "cached": True,
+                "ttft_ms": ttft_ms,
+                "total_ms": round((time.perf_counter() - started) * 1000, 3)
+            }
+            return
+        
+        with timed(RAG_STAGE_SECONDS, stage="packing"):
+            packed = self._pack_context(search_results)
+        sources = self._prepare_sources(packed.selected)
+        yield "sources", sources
+        
+        prompt = self.prompt_template.format(question=question, context=packed.context)
+        generation_started = time.perf_counter()
+        ttft_ms = None
+        parts = []
+        generated = True
+        # Span zamykany ręcznie: kolejne tokeny mogą być pobierane w różnych wątkach
+        llm_span = start_span("llm.stream", **{"llm.provider": self.llm.name})
+        try:
+            for token in self.llm.stream(prompt):
+                if not token:
+                    continue
+                if ttft_ms is None:
+                    ttft_ms = self._record_ttft(started)
+                    observe(LLM_TTFT_SECONDS, time.perf_counter() - generation_started, provider=self.llm.name)
+                    record_event(llm_span, "first_token", generation_started)
+                parts.append(token)
+                yield "token", token
+        except Exception as e:
+            print(f"Błąd podczas strumieniowego generowania odpowiedzi: {e}")
+            llm_span.record_exception(e)
+            generated = False
+            if not parts:
+                fallback = "Przepraszam, nie mogę wygenerować odpowiedzi w tej chwili."
+                ttft_ms = self._record_ttft(started)
+                parts.append(fallback)
+                yield "token", fallback
+        finally:
+            llm_span.set_attribute("llm.tokens", len(parts))
+            llm_span.end()
+        answer = "".join(parts)
+        generation_seconds = time.perf_counter() - generation_started
+        observe(RAG_STAGE_SECONDS, generation_seconds, stage="generation")
+        observe(LLM_SECONDS, generation_seconds, provider=self.llm.name, mode="stream")
+        
+        if self.answer_cache and generated:
+            self.answer_cache.put(question, search_results, CachedAnswer(
+                answer=answer,
+                sources=sources,
+                context_stats=packed.stats(),
+                latency_ms=round(generation_seconds * 1000, 3)
+            ))
+        
+        yield "done", {
+            "answer": answer,
+            "context_stats": packed.stats(),
+            "cached": False,
+            "ttft_ms": ttft_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+    
+    def streaming_stats(self) -> Dict[str, Any]:
+        """Metryki odpowiedzi strumieniowych: liczba strumieni i czas do pierwszego tokenu"""
+        with self._stream_lock:
+            return {
+                "streams": self._streams,
+                "avg_ttft_ms": round(self._ttft_total_ms / self._streams, 3) if self._streams else 0.0,
+                "max_ttft_ms": round(self._ttft_max_ms, 3),
+                "last_ttft_ms": round(self._ttft_last_ms, 3),
+            }
+    
+    def _record_ttft(self, started: float) -> float:
+        """Zapisanie czasu do pierwszego tokenu (ms)"""
+        ttft_ms = (time.perf_counter() - started) * 1000
+        with self._stream_lock:
+            self._streams += 1
+            self._ttft_total_ms += ttft_ms
+            self._ttft_max_ms = max(self._ttft_max_ms, ttft_ms)
+            self._ttft_last_ms = ttft_ms
+        return round(ttft_ms, 3)
+    
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Metryki pamięci podręcznej odpowiedzi (None, gdy wyłączona)"""
+        return self.answer_cache.stats() if self.answer_cache else None
     
     def _prepare_context(self, search_results: List[Dict[str, Any]]) -> str:
         """
@@ -79,7 +279,20 @@ class RAGEngine:
         Returns:
             Kontekst do wykorzystania w zapytaniu do LLM
         """
-        context_parts = []
+        return self._pack_context(search_results).context
+    
+    @traced()
+    def _pack_context(self, search_results: List[Dict[str, Any]]) -> PackedContext:
+        """
+        Złożenie kontekstu: usunięcie prawie-duplikatów i pakowanie w budżecie tokenów
+        
+        Args:
+            search_results: Wyniki wyszukiwania z Elasticsearch
+        
+        Returns:
+            PackedContext z tekstem kontekstu, wybranymi wynikami i statystykami
+        """
+        candidates = []
         
         for result in search_results:
             source = result["source"]
@@ -95,16 +308,18 @@ class RAGEngine:
             else:
                 source_info = f"Dokument: {title}"
             
-            # Skrócenie zawartości, jeśli jest za długa
-            max_content_length = 2000  # Maksymalna długość zawartości
-            if len(content) > max_content_length:
-                content = content[:max_content_length] + "..."
+            # Wskazanie jednostki redakcyjnej fragmentu (np. Art. 5 § 2, UZASADNIENIE)
+            if source.get("heading"):
+                source_info += f" ({source['heading']})"
             
-            # Dodanie do kontekstu
-            context_parts.append(f"{source_info}\n{content}\n")
+            candidates.append(ContextCandidate(
+                text=f"{source_info}\n{content}\n",
+                score=result["score"] or 0.0,
+                result=result,
+                content=content
+            ))
         
-        # Połączenie części kontekstu
-        return "\n\n".join(context_parts)
+        return self.context_packer.pack(candidates)
     
     def _prepare_sources(self, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -128,6 +343,13 @@ class RAGEngine:
                 "type": source_type
             }
             
+            # Odnośnik do dokumentu nadrzędnego dla fragmentów
+            if source.get("parent_id"):
+                source_info.update({
+                    "parent_id": source["parent_id"],
+                    "heading": source.get("heading", "")
+                })
+            
             # Dodanie specyficznych informacji w zależności od typu źródła
             if source_type == "legal_act":
                 source_info.update({
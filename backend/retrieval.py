@@ -0,0 +1,237 @@
+"""
+Równoległe wyszukiwanie kontekstu pytania w wielu źródłach
+
+Pytanie do sprawy trafia jednocześnie do indeksu dokumentów sprawy,
+lokalnego korpusu aktów ISAP (isap_sync.py) i lokalnej kopii orzeczeń SAOS
+(saos_sync.py) — albo, dla źródeł ustawionych jako "live", do API ISAP/SAOS.
+Każde źródło ma własny limit czasu i liczbę wyników. Źródło, które nie zdąży
+lub zwróci błąd, jest pomijane, a kontekst powstaje z pozostałych wyników
+(wynik częściowy). Czas wyszukiwania jest więc zbliżony do czasu
+najwolniejszego źródła mieszczącego się w limicie, a nie do sumy czasów.
+
+Oceny BM25 z różnych indeksów nie są porównywalne, dlatego przed złączeniem
+w jedną listę oceny w obrębie źródła dzielone są przez najlepszą ocenę tego
+źródła i mnożone przez jego wagę; powtórzenia (ten sam id) są usuwane.
+"""
+import asyncio
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import settings
+from metrics import RAG_STAGE_SECONDS, RETRIEVAL_SOURCE_SECONDS, observe, timed
+from offload import run_io
+from tracing import span
+
+# search(pytanie, liczba wyników, indeks sprawy) -> wyniki w formacie ElasticsearchClient.search
+SearchFunction = Callable[[str, int, Optional[str]], Awaitable[List[Dict[str, Any]]]]
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class RetrievalSource:
+    """Źródło kontekstu z budżetem wyników i czasu"""
+
+    name: str
+    search: SearchFunction
+    size: Optional[int] = None  # None — liczba wyników z zapytania
+    timeout: float = 2.0
+    weight: float = 1.0
+
+
+@dataclass
+class RetrievalOutcome:
+    """Połączone wyniki wszystkich źródeł oraz stan każdego źródła"""
+
+    results: List[Dict[str, Any]]
+    sources: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @property
+    def partial(self) -> bool:
+        """Czy któreś źródło przekroczyło limit czasu lub zwróciło błąd"""
+        return any(source["status"] != "ok" for source in self.sources.values())
+
+
+def query_keywords(question: str, limit: int = 3, min_length: int = 5) -> List[str]:
+    """
+    Słowa kluczowe pytania dla wyszukiwarek ISAP/SAOS, które nie obsługują pełnego tekstu pytania
+
+    Wybiera najdłuższe (zwykle najbardziej znaczące) różne słowa, np.
+    "Jakie są przesłanki przedawnienia roszczenia?" -> ["przedawnienia", "przesłanki", "roszczenia"]
+    """
+    words = list(dict.fromkeys(word.lower() for word in WORD_RE.findall(question) if len(word) >= min_length))
+    return sorted(words, key=len, reverse=True)[:limit]
+
+
+def passages_source(name: str, es_client, index_name: Optional[str] = None, **options) -> RetrievalSource:
+    """Fragmenty z indeksu Elasticsearch; bez index_name — z indeksu sprawy z zapytania"""
+    async def search(question: str, size: int, case_index: Optional[str]) -> List[Dict[str, Any]]:
+        return await run_io(es_client.search_passages, index_name or case_index, question, size)
+    return RetrievalSource(name, search, **options)
+
+
+def isap_live_source(isap_client, **options) -> RetrievalSource:
+    """Akty prawne bezpośrednio z API ISAP (wyszukiwanie w tytułach)"""
+    async def search(question: str, size: int, case_index: Optional[str]) -> List[Dict[str, Any]]:
+        acts = await isap_client.asearch_acts(query_keywords(question), limit=size)
+        return [
+            {
+                "id": f"act-{act['isap_id']}",
+                "score": 1.0 / (rank + 1),  # API nie zwraca oceny trafności
+                "source": {
+                    "type": "legal_act",
+                    "title": act["title"],
+                    "publication": act["publication"],
+                    "year": act["year"],
+                    "content": f"{act['title']} ({act['status']})"
+                },
+                "highlights": {}
+            }
+            for rank, act in enumerate(acts)
+        ]
+    return RetrievalSource(name="acts", search=search, **options)
+
+
+def saos_live_source(saos_client, **options) -> RetrievalSource:
+    """Orzeczenia bezpośrednio z API SAOS"""
+    from saos_sync import plain_text
+
+    async def search(question: str, size: int, case_index: Optional[str]) -> List[Dict[str, Any]]:
+        judgments = await saos_client.asearch_judgments(query_keywords(question), page_size=size)
+        return [
+            {
+                "id": f"judgment-{judgment['saos_id']}",
+                "score": 1.0 / (rank + 1),
+                "source": {
+                    "type": "judgment",
+                    "court_name": judgment["court_name"],
+                    "case_number": judgment["case_number"],
+                    "judgment_date": judgment["judgment_date"].isoformat() if judgment["judgment_date"] else "",
+                    "content": plain_text(judgment["content"] or "")[:4000]
+                },
+                "highlights": {}
+            }
+            for rank, judgment in enumerate(judgments[:size])
+        ]
+    return RetrievalSource(name="judgments", search=search, **options)
+
+
+class RetrievalOrchestrator:
+    """Równoległe zapytania do źródeł kontekstu z limitami czasu i łączeniem wyników"""
+
+    def __init__(self, sources: List[RetrievalSource]):
+        self.sources = sources
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {
+            source.name: {"calls": 0, "timeouts": 0, "errors": 0, "results": 0, "total_ms": 0.0, "max_ms": 0.0}
+            for source in sources
+        }
+        self._partial = 0
+
+    async def retrieve(self, question: str, size: int = 10, case_index: Optional[str] = None) -> RetrievalOutcome:
+        """
+        Wyszukanie kontekstu we wszystkich źródłach jednocześnie
+
+        Args:
+            question: Pytanie zadane przez użytkownika
+            size: Liczba wyników źródeł bez własnego budżetu (dokumenty sprawy)
+            case_index: Indeks dokumentów sprawy
+
+        Returns:
+            RetrievalOutcome z wynikami posortowanymi wg znormalizowanej oceny
+        """
+        with timed(RAG_STAGE_SECONDS, stage="retrieval"), span("retrieval.fan_out", **{"retrieval.sources": len(self.sources)}):
+            answers = await asyncio.gather(*(
+                self._query(source, question, size, case_index) for source in self.sources
+            ))
+        outcome = RetrievalOutcome(
+            results=self.merge([(source, results) for source, results, _ in answers]),
+            sources={source.name: state for source, _, state in answers}
+        )
+        if outcome.partial:
+            with self._lock:
+                self._partial += 1
+            print(f"Wyszukiwanie częściowe: {outcome.sources}")
+        return outcome
+
+    async def _query(self, source: RetrievalSource, question: str, size: int, case_index: Optional[str]):
+        started = time.perf_counter()
+        state: Dict[str, Any] = {"status": "ok"}
+        results: List[Dict[str, Any]] = []
+        with span("retrieval.source", **{"retrieval.source": source.name}):
+            try:
+                # Przekroczenie limitu porzuca wynik; operacja w puli io kończy się w tle
+                results = await asyncio.wait_for(source.search(question, source.size or size, case_index), source.timeout)
+            except asyncio.TimeoutError:
+                state["status"] = "timeout"
+            except Exception as e:
+                state.update(status="error", error=str(e))
+        elapsed = time.perf_counter() - started
+        state.update(count=len(results), ms=round(elapsed * 1000, 3))
+        observe(RETRIEVAL_SOURCE_SECONDS, elapsed, source=source.name, status=state["status"])
+        with self._lock:
+            stats = self._stats[source.name]
+            stats["calls"] += 1
+            stats["timeouts"] += state["status"] == "timeout"
+            stats["errors"] += state["status"] == "error"
+            stats["results"] += len(results)
+            stats["total_ms"] += state["ms"]
+            stats["max_ms"] = max(stats["max_ms"], state["ms"])
+        return source, results, state
+
+    @staticmethod
+    def merge(answers) -> List[Dict[str, Any]]:
+        """Złączenie wyników źródeł: normalizacja ocen w źródle, waga źródła, usunięcie powtórzeń"""
+        merged: Dict[str, Dict[str, Any]] = {}
+        for source, results in answers:
+            best = max((result["score"] or 0.0 for result in results), default=0.0) or 1.0
+            for result in results:
+                score = (result["score"] or 0.0) / best * source.weight
+                if result["id"] not in merged or merged[result["id"]]["score"] < score:
+                    merged[result["id"]] = {**result, "score": score, "retrieval_source": source.name}
+        return sorted(merged.values(), key=lambda result: result["score"], reverse=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Statystyki źródeł: wywołania, przekroczenia limitu, błędy, średni i maksymalny czas"""
+        with self._lock:
+            return {
+                "partial": self._partial,
+                **{
+                    name: {
+                        **{key: value for key, value in stats.items() if key != "total_ms"},
+                        "avg_ms": round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0
+                    }
+                    for name, stats in self._stats.items()
+                }
+            }
+
+
+def build_orchestrator(es_client, isap_client=None, saos_client=None) -> RetrievalOrchestrator:
+    """
+    Orkiestrator skonfigurowany z ustawień RETRIEVAL_*
+
+    Akty i orzeczenia pochodzą z lokalnych indeksów ("local"), z API ("live",
+    wymaga isap_client/saos_client) albo są pomijane ("off").
+    """
+    sources = [passages_source(
+        "case", es_client, timeout=settings.RETRIEVAL_CASE_TIMEOUT, weight=settings.RETRIEVAL_CASE_WEIGHT
+    )]
+    acts_options = dict(
+        size=settings.RETRIEVAL_ACTS_SIZE, timeout=settings.RETRIEVAL_ACTS_TIMEOUT, weight=settings.RETRIEVAL_ACTS_WEIGHT
+    )
+    if settings.RETRIEVAL_ACTS_SOURCE == "local":
+        sources.append(passages_source("acts", es_client, settings.ISAP_INDEX, **acts_options))
+    elif settings.RETRIEVAL_ACTS_SOURCE == "live" and isap_client is not None:
+        sources.append(isap_live_source(isap_client, **acts_options))
+    judgments_options = dict(
+        size=settings.RETRIEVAL_JUDGMENTS_SIZE, timeout=settings.RETRIEVAL_JUDGMENTS_TIMEOUT,
+        weight=settings.RETRIEVAL_JUDGMENTS_WEIGHT
+    )
+    if settings.RETRIEVAL_JUDGMENTS_SOURCE == "local":
+        sources.append(passages_source("judgments", es_client, settings.SAOS_INDEX, **judgments_options))
+    elif settings.RETRIEVAL_JUDGMENTS_SOURCE == "live" and saos_client is not None:
+        sources.append(saos_live_source(saos_client, **judgments_options))
+    return RetrievalOrchestrator(sources)
@@ -1,225 +1,151 @@
-import requests
-import json
 from fastapi import HTTPException, status
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
-import time
-import random
+
+from config import settings
+from http_client import PoliteHTTPClient, UpstreamError, get_http_client
+from tracing import traced
+
+# Nazwy sądów, dla których API nie podaje wydziału z nazwą sądu
+COURT_TYPE_NAMES = {
+    "SUPREME": "Sąd Najwyższy",
+    "CONSTITUTIONAL_TRIBUNAL": "Trybunał Konstytucyjny",
+    "NATIONAL_APPEAL_CHAMBER": "Krajowa Izba Odwoławcza",
+}
 
 class SAOSClient:
-    """Klient do komunikacji z API Systemem Analizy Orzeczeń Sądowych (SAOS)"""
-    
-    def __init__(self):
+    """Klient do komunikacji z API Systemem Analizy Orzeczeń Sądowych (SAOS)
+
+    Żądania wysyłane są przez wspólnego klienta HTTP z limitami żądań
+    i ponawianiem (http_client.py).
+    """
+
+    def __init__(self, base_url: Optional[str] = None, http: Optional[PoliteHTTPClient] = None):
         """Inicjalizacja klienta SAOS"""
-        self.base_url = "https://www.saos.org.pl/api"
-        self.api_version = "v1"
-        self.search_endpoint = f"{self.base_url}/{self.api_version}/search/judgments"
-        self.judgment_endpoint = f"{self.base_url}/{self.api_version}/judgments"
-        self.headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json"
+        self.base_url = (base_url or settings.SAOS_API_URL).rstrip("/")
+        self.search_endpoint = f"{self.base_url}/search/judgments"
+        self.judgment_endpoint = f"{self.base_url}/judgments"
+        self.http = http or get_http_client()
+
+    @staticmethod
+    def court_name(item: Dict[str, Any]) -> Optional[str]:
+        """Nazwa sądu z opisu orzeczenia (sądy powszechne i administracyjne podają ją w wydziale)"""
+        court = ((item.get("division") or {}).get("court") or {}).get("name")
+        return court or COURT_TYPE_NAMES.get(item.get("courtType"))
+
+    @classmethod
+    def judgment_summary(cls, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Ujednolicenie opisu orzeczenia z wyników wyszukiwania SAOS"""
+        cases = item.get("courtCases") or []
+        judgment_date = item.get("judgmentDate")
+        return {
+            "saos_id": item.get("id"),
+            "court_name": cls.court_name(item),
+            "court_type": item.get("courtType"),
+            "case_number": cases[0].get("caseNumber") if cases else None,
+            "judgment_date": datetime.fromisoformat(judgment_date) if judgment_date else None,
+            "judges": [judge.get("name") for judge in item.get("judges") or []],
+            "keywords": item.get("keywords") or [],
+            "content": item.get("textContent") or "",
         }
-    
+
+    @staticmethod
+    def _unavailable(error: UpstreamError) -> HTTPException:
+        print(f"Błąd SAOS: {error}")
+        return HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Serwis SAOS jest niedostępny: {error}"
+        )
+
+    @staticmethod
+    def _search_params(keywords: List[str], page_size: int) -> Dict[str, Any]:
+        # API SAOS przyjmuje rozmiar strony od 10 do 100
+        params = {
+            "pageSize": min(max(page_size, 10), 100),
+            "pageNumber": 0,
+            "sortingField": "JUDGMENT_DATE",
+            "sortingDirection": "DESC",
+        }
+        query = " ".join(keyword for keyword in keywords if keyword.strip())
+        if query:
+            params["all"] = query
+        return params
+
+    @traced()
     def search_judgments(self, keywords: List[str], page_size: int = 10) -> List[Dict[str, Any]]:
         """
         Wyszukiwanie orzeczeń w SAOS
-        
+
         Args:
             keywords: Lista słów kluczowych do wyszukiwania
             page_size: Liczba wyników na stronie
-        
+
         Returns:
             Lista znalezionych orzeczeń
         """
-        # W rzeczywistej implementacji, tutaj byłoby odpytanie API SAOS
-        # Poniżej mamy implementację symulacyjną, która zwraca przykładowe dane
-        
-        # Symulacja opóźnienia wyszukiwania
-        time.sleep(random.uniform(0.5, 1.5))
-        
-        # Przykładowe orzeczenia
-        example_judgments = [
-            {
-                "court_name": "Sąd Najwyższy",
-                "case_number": "III CZP 36/19",
-                "judgment_date": datetime(2020, 1, 15),
-                "content": """Sąd Najwyższy w składzie: (...)
-
-TEZA
-Sądem właściwym do nadania klauzuli wykonalności aktowi notarialnemu, w którym dłużnik poddał się egzekucji w trybie art. 777 § 1 pkt 5 k.p.c. i który spełnia wszystkie wymagania przewidziane tym przepisem, jest sąd rejonowy ogólnej właściwości dłużnika (art. 781 § 1 k.p.c.).
-
-UZASADNIENIE
-(...)
-                """,
-                "saos_id": "judgment-12345"
-            },
-            {
-                "court_name": "Naczelny Sąd Administracyjny",
-                "case_number": "II OSK: 1257/19",
-                "judgment_date": datetime(2020, 3, 5),
-                "content": """Naczelny Sąd Administracyjny w składzie: (...)
-
-UZASADNIENIE
-Zaskarżonym wyrokiem z dnia 6 lutego 2019 r. Wojewódzki Sąd Administracyjny w Warszawie oddalił skargę B.L. na decyzję Samorządowego Kolegium Odwoławczego w W. z dnia 12 lipca 2018 r. nr [...] w przedmiocie odmowy stwierdzenia nieważności decyzji.
-(...)
-                """,
-                "saos_id": "judgment-67890"
-            },
-            {
-                "court_name": "Sąd Apelacyjny w Warszawie",
-                "case_number": "V ACa 248/18",
-                "judgment_date": datetime(2019, 6, 20),
-                "content": """Sąd Apelacyjny w Warszawie V Wydział Cywilny w składzie: (...)
-
-TEZA
-Przyczyną spadku wartości nieruchomości obciążonej służebnością przesyłu są ograniczenia, które właściciel zobowiązany jest znosić w związku z korzystaniem z nieruchomości przez uprawniony podmiot oraz te, które wiążą się z posadowieniem urządzeń na nieruchomości.
-
-UZASADNIENIE
-(...)
-                """,
-                "saos_id": "judgment-24680"
-            },
-            {
-                "court_name": "Wojewódzki Sąd Administracyjny w Krakowie",
-                "case_number": "I SA/Kr 1234/19",
-                "judgment_date": datetime(2020, 2, 10),
-                "content": """Wojewódzki Sąd Administracyjny w Krakowie w składzie: (...)
-
-UZASADNIENIE
-Decyzją z dnia [...] Dyrektor Izby Administracji Skarbowej w K., po rozpatrzeniu odwołania skarżącej, utrzymał w mocy decyzję Naczelnika Urzędu Skarbowego w T. z dnia [...] określającą skarżącej zobowiązanie podatkowe w podatku od towarów i usług za poszczególne miesiące 2016 r.
-(...)
-                """,
-                "saos_id": "judgment-13579"
-            }
-        ]
-        
-        # Filtrowanie według słów kluczowych
-        filtered_judgments = []
-        for judgment in example_judgments:
-            for keyword in keywords:
-                if keyword.lower() in judgment["court_name"].lower() or \
-                   keyword.lower() in judgment["case_number"].lower() or \
-                   keyword.lower() in judgment["content"].lower():
-                    filtered_judgments.append(judgment)
-                    break
-        
-        # Jeśli nie znaleziono żadnych pasujących orzeczeń, zwróć wszystkie przykładowe
-        if not filtered_judgments:
-            return example_judgments
-        
-        return filtered_judgments
-    
+        try:
+            page = self.http.get_json(self.search_endpoint, params=self._search_params(keywords, page_size))
+        except UpstreamError as e:
+            raise self._unavailable(e)
+        return [self.judgment_summary(item) for item in (page or {}).get("items", [])[:page_size]]
+
+    async def asearch_judgments(self, keywords: List[str], page_size: int = 10) -> List[Dict[str, Any]]:
+        """Asynchroniczny odpowiednik `search_judgments`"""
+        try:
+            page = await self.http.aget_json(self.search_endpoint, params=self._search_params(keywords, page_size))
+        except UpstreamError as e:
+            raise self._unavailable(e)
+        return [self.judgment_summary(item) for item in (page or {}).get("items", [])[:page_size]]
+
+    @traced()
     def get_judgment_details(self, judgment_id: str) -> Dict[str, Any]:
         """
         Pobieranie szczegółów orzeczenia
-        
+
         Args:
             judgment_id: Identyfikator orzeczenia w SAOS
-        
+
         Returns:
             Szczegóły orzeczenia
         """
-        # W rzeczywistej implementacji, tutaj byłoby odpytanie API SAOS
-        # Poniżej mamy implementację symulacyjną
-        
-        # Symulacja opóźnienia
-        time.sleep(random.uniform(0.5, 1.0))
-        
-        # Przykładowe szczegóły orzeczenia
-        judgment_details = {
-            "judgment-12345": {
-                "id": "judgment-12345",
-                "court_name": "Sąd Najwyższy",
-                "case_number": "III CZP 36/19",
-                "judgment_date": "2020-01-15",
-                "judges": [
-                    "Jan Kowalski",
-                    "Anna Nowak",
-                    "Piotr Wiśniewski"
-                ],
-                "content": """Sąd Najwyższy w składzie: (...)
-
-TEZA
-Sądem właściwym do nadania klauzuli wykonalności aktowi notarialnemu, w którym dłużnik poddał się egzekucji w trybie art. 777 § 1 pkt 5 k.p.c. i który spełnia wszystkie wymagania przewidziane tym przepisem, jest sąd rejonowy ogólnej właściwości dłużnika (art. 781 § 1 k.p.c.).
-
-UZASADNIENIE
-(...)
-                """,
-                "keywords": [
-                    "klauzula wykonalności",
-                    "akt notarialny",
-                    "właściwość sądu"
-                ]
-            },
-            "judgment-67890": {
-                "id": "judgment-67890",
-                "court_name": "Naczelny Sąd Administracyjny",
-                "case_number": "II OSK: 1257/19",
-                "judgment_date": "2020-03-05",
-                "judges": [
-                    "Maria Kowalczyk",
-                    "Tomasz Nowicki",
-                    "Agnieszka Dąbrowska"
-                ],
-                "content": """Naczelny Sąd Administracyjny w składzie: (...)
-
-UZASADNIENIE
-Zaskarżonym wyrokiem z dnia 6 lutego 2019 r. Wojewódzki Sąd Administracyjny w Warszawie oddalił skargę B.L. na decyzję Samorządowego Kolegium Odwoławczego w W. z dnia 12 lipca 2018 r. nr [...] w przedmiocie odmowy stwierdzenia nieważności decyzji.
-(...)
-                """,
-                "keywords": [
-                    "skarga kasacyjna",
-                    "postępowanie administracyjne",
-                    "stwierdzenie nieważności"
-                ]
-            }
-        }
-        
-        if judgment_id in judgment_details:
-            return judgment_details[judgment_id]
-        
+        details = None
+        if str(judgment_id).isdigit():
+            try:
+                details = self.http.get_json(f"{self.judgment_endpoint}/{judgment_id}")
+            except UpstreamError as e:
+                raise self._unavailable(e)
+
         # Jeśli nie znaleziono orzeczenia o podanym ID, zwróć błąd
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Nie znaleziono orzeczenia o identyfikatorze {judgment_id}"
-        )
-    
+        if not details or "data" not in details:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Nie znaleziono orzeczenia o identyfikatorze {judgment_id}"
+            )
+
+        data = details["data"]
+        summary = self.judgment_summary(data)
+        return {
+            "id": data.get("id"),
+            "court_name": summary["court_name"],
+            "court_type": summary["court_type"],
+            "case_number": summary["case_number"],
+            "judgment_date": data.get("judgmentDate"),
+            "judgment_type": data.get("judgmentType"),
+            "judges": summary["judges"],
+            "content": summary["content"],
+            "keywords": summary["keywords"],
+            "source_url": data.get("href") or f"{self.judgment_endpoint}/{judgment_id}",
+        }
+
+    @traced()
     def get_recent_judgments(self, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Pobieranie najnowszych orzeczeń
-        
+
         Args:
             limit: Maksymalna liczba orzeczeń do pobrania
-        
+
         Returns:
             Lista najnowszych orzeczeń
         """
-        # Symulacja opóźnienia
-        time.sleep(random.uniform(0.5, 1.0))
-        
-        # Przykładowe najnowsze orzeczenia
-        recent_judgments = [
-            {
-                "court_name": "Sąd Najwyższy",
-                "case_number": "III CZP 42/20",
-                "judgment_date": datetime(2020, 5, 10),
-                "content": "Skrócona treść orzeczenia...",
-                "saos_id": "judgment-54321"
-            },
-            {
-                "court_name": "Naczelny Sąd Administracyjny",
-                "case_number": "II OSK: 3265/19",
-                "judgment_date": datetime(2020, 5, 8),
-                "content": "Skrócona treść orzeczenia...",
-                "saos_id": "judgment-98765"
-            },
-            {
-                "court_name": "Sąd Apelacyjny w Warszawie",
-                "case_number": "V ACa 537/19",
-                "judgment_date": datetime(2020, 5, 5),
-                "content": "Skrócona treść orzeczenia...",
-                "saos_id": "judgment-24681"
-            }
-        ]
-        
-        return recent_judgments[:limit]
+        return self.search_judgments([], page_size=limit)
@@ -0,0 +1,291 @@
+"""
+Lokalna kopia orzeczeń SAOS i jej przyrostowa synchronizacja
+
+Zadanie pobiera z API zrzutu SAOS (/dump/judgments) orzeczenia zmienione od
+poprzedniej synchronizacji (parametr sinceModificationDate), zapisuje je
+w tabeli judgments i indeksuje w osobnym indeksie Elasticsearch. Wyszukiwania
+użytkowników (`search_judgments`) korzystają wyłącznie z tego indeksu.
+
+Strony pobierane są równolegle w oknach po `parallel_pages`, a zapisywane po
+kolei; po każdej zapisanej stronie stan zadania trafia do tabeli
+sync_checkpoints, więc przerwany przebieg wznawia się od pierwszej
+niezapisanej strony. Kolejny przebieg zaczyna od najnowszej widzianej daty
+modyfikacji (nie późniejszej niż start poprzedniego przebiegu) pomniejszonej
+o zakładkę `overlap`: orzeczenia zmienione w trakcie przebiegu mogą przesunąć
+się między stronami, a ponowny zapis tego samego orzeczenia jest idempotentny.
+
+Przykład:
+    python saos_sync.py --since 2024-01-01T00:00:00.000 --parallel 2
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+import models
+from chunking import chunk_text
+from config import settings
+from http_client import PoliteHTTPClient, get_http_client
+from offload import run_io
+from saos_client import SAOSClient
+from sync_job import SyncJob
+from tracing import traced
+
+
+def format_saos_datetime(value: datetime) -> str:
+    """Data w formacie parametru sinceModificationDate (milisekundy, bez strefy czasowej)"""
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}"
+
+
+def parse_saos_datetime(value: str) -> datetime:
+    """Odczyt daty SAOS (np. 2020-02-14T10:30:00.000, także ze strefą czasową) jako czasu UTC bez strefy"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def plain_text(content: str) -> str:
+    """Treść orzeczenia bez znaczników HTML (sądy powszechne publikują ją w HTML)"""
+    if "<" in content and ">" in content:
+        return BeautifulSoup(content, "lxml").get_text("\n", strip=True)
+    return content
+
+
+class SAOSSync(SyncJob):
+    """Synchronizacja orzeczeń SAOS do bazy danych i indeksu Elasticsearch"""
+
+    name = "saos-judgments"
+    label = "orzeczeń SAOS"
+
+    def __init__(
+        self,
+        session_factory,
+        es_client=None,
+        http: Optional[PoliteHTTPClient] = None,
+        base_url: Optional[str] = None,
+        index_name: Optional[str] = None,
+        page_size: int = 100,
+        parallel_pages: int = 2,
+        overlap: float = 3600.0,
+        passage_max_tokens: int = 400,
+        passage_overlap_tokens: int = 60
+    ):
+        """
+        Inicjalizacja zadania
+
+        Args:
+            session_factory: Fabryka sesji SQLAlchemy
+            es_client: Klient Elasticsearch (None — zapis tylko do bazy danych)
+            http: Klient HTTP (domyślnie wspólny klient z limitami dla SAOS)
+            base_url: Adres API SAOS (domyślnie SAOS_API_URL)
+            index_name: Indeks lokalnej kopii orzeczeń (domyślnie SAOS_INDEX)
+            page_size: Liczba orzeczeń na stronie zrzutu (maksymalnie 100)
+            parallel_pages: Liczba stron pobieranych równolegle
+            overlap: Zakładka (s) odejmowana od znacznika kolejnego przebiegu
+            passage_max_tokens, passage_overlap_tokens: Parametry podziału treści na fragmenty
+        """
+        super().__init__(session_factory)
+        self.es_client = es_client
+        self.http = http or get_http_client()
+        self.dump_url = f"{(base_url or settings.SAOS_API_URL).rstrip('/')}/dump/judgments"
+        self.index_name = index_name or settings.SAOS_INDEX
+        self.page_size = min(max(page_size, 1), 100)
+        self.parallel_pages = max(parallel_pages, 1)
+        self.overlap = timedelta(seconds=overlap)
+        self.passage_max_tokens = passage_max_tokens
+        self.passage_overlap_tokens = passage_overlap_tokens
+
+    async def _run(self, since: Optional[str], max_pages: Optional[int], reset: bool) -> Dict[str, Any]:
+        state = {} if reset else await run_io(self.load_checkpoint)
+        if state.get("page") is None:
+            state = {
+                "since": since or state.get("next_since") or settings.SAOS_SYNC_SINCE or None,
+                "page": 0,
+                "run_started": format_saos_datetime(datetime.utcnow()),
+                "max_seen": None,
+            }
+        else:
+            print(f"Wznowienie synchronizacji SAOS od strony {state['page']} (od {state['since']})")
+        if self.es_client is not None:
+            await run_io(self.es_client.create_judgments_index, self.index_name)
+
+        result = {"status": "incomplete", "since": state["since"], "pages": 0, "created": 0, "updated": 0}
+        finished = False
+        while not finished and (max_pages is None or result["pages"] < max_pages):
+            window = self.parallel_pages if max_pages is None else min(self.parallel_pages, max_pages - result["pages"])
+            numbers = list(range(state["page"], state["page"] + window))
+            pages = await asyncio.gather(
+                *(self._fetch_page(state["since"], number) for number in numbers),
+                return_exceptions=True
+            )
+            # Zapis stron po kolei; błąd strony przerywa przebieg po zapisaniu wcześniejszych
+            for number, items in zip(numbers, pages):
+                if isinstance(items, BaseException):
+                    raise items
+                if items:
+                    stored = await run_io(self._store_page, items)
+                    result["created"] += stored["created"]
+                    result["updated"] += stored["updated"]
+                    state["max_seen"] = max(filter(None, (state["max_seen"], stored["max_seen"])), default=None)
+                state["page"] = number + 1
+                await run_io(self.save_checkpoint, state)
+                result["pages"] += 1
+                if len(items) < self.page_size:
+                    finished = True
+                    break
+
+        if finished:
+            next_since = self._next_since(state)
+            await run_io(self.save_checkpoint, {"next_since": next_since, "page": None})
+            result.update(status="done", next_since=next_since)
+        return result
+
+    def _next_since(self, state: Dict[str, Any]) -> str:
+        """Znacznik kolejnego przebiegu: najnowsza widziana modyfikacja, najpóźniej start przebiegu, minus zakładka"""
+        run_started = parse_saos_datetime(state["run_started"])
+        newest = parse_saos_datetime(state["max_seen"]) if state["max_seen"] else run_started
+        next_since = min(newest, run_started) - self.overlap
+        if state["since"]:
+            next_since = max(next_since, parse_saos_datetime(state["since"]))
+        return format_saos_datetime(next_since)
+
+    async def _fetch_page(self, since: Optional[str], number: int) -> List[Dict[str, Any]]:
+        params = {"pageSize": self.page_size, "pageNumber": number}
+        if since:
+            params["sinceModificationDate"] = since
+        page = await self.http.aget_json(self.dump_url, params=params)
+        return (page or {}).get("items", [])
+
+    @traced()
+    def _store_page(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Zapis strony orzeczeń w bazie danych (wg saos_id) i w indeksie (blokujące, uruchamiać przez run_io)"""
+        db = self.session_factory()
+        try:
+            ids = [item["id"] for item in items]
+            existing = {
+                judgment.saos_id: judgment
+                for judgment in db.query(models.Judgment).filter(models.Judgment.saos_id.in_(ids))
+            }
+            stored = []
+            for item in items:
+                summary = SAOSClient.judgment_summary(item)
+                judgment = existing.get(item["id"])
+                if judgment is None:
+                    judgment = models.Judgment(saos_id=item["id"])
+                    db.add(judgment)
+                judgment.case_number = summary["case_number"]
+                judgment.title = f"{summary['case_number']} — {summary['court_name']}"
+                judgment.judgment_date = summary["judgment_date"]
+                judgment.court_name = summary["court_name"]
+                judgment.court_type = summary["court_type"]
+                judgment.judges = json.dumps(summary["judges"], ensure_ascii=False)
+                judgment.keywords = json.dumps(summary["keywords"], ensure_ascii=False)
+                judgment.content = plain_text(summary["content"])
+                judgment.source_url = item.get("href") or f"{settings.SAOS_API_URL}/judgments/{item['id']}"
+                stored.append((judgment, item, item["id"] in existing))
+            db.commit()
+
+            if self.es_client is not None:
+                for judgment, item, replace in stored:
+                    self._index(judgment, item, replace)
+
+            modified = [parse_saos_datetime(item["modificationDate"]) for item in items if item.get("modificationDate")]
+            return {
+                "created": sum(1 for _, _, replace in stored if not replace),
+                "updated": sum(1 for _, _, replace in stored if replace),
+                "max_seen": format_saos_datetime(max(modified)) if modified else None,
+            }
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _index(self, judgment, item: Dict[str, Any], replace: bool):
+        """Indeksowanie orzeczenia i jego fragmentów w indeksie lokalnej kopii"""
+        parent_id = f"judgment-{judgment.saos_id}"
+        parent_fields = {
+            "type": "judgment",
+            "saos_id": judgment.saos_id,
+            "title": judgment.title,
+            "case_number": judgment.case_number,
+            "court_name": judgment.court_name,
+            "court_type": judgment.court_type,
+            "document_type": item.get("judgmentType"),
+            "judgment_date": judgment.judgment_date.isoformat() if judgment.judgment_date else None,
+            "keywords": json.loads(judgment.keywords),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        self.es_client.index_document(self.index_name, parent_id, {
+            **parent_fields,
+            "doc_kind": "judgment",
+            "judges": ", ".join(json.loads(judgment.judges)),
+            "content": judgment.content
+        })
+        passages = chunk_text(judgment.content, parent_id, self.passage_max_tokens, self.passage_overlap_tokens)
+        self.es_client.index_passages(self.index_name, parent_id, parent_fields, passages, replace=replace)
+
+    def search_judgments(self, keywords: List[str], page_size: int = 10, snippets: bool = False) -> List[Dict[str, Any]]:
+        """
+        Wyszukiwanie orzeczeń w lokalnym indeksie (bez zapytań do SAOS)
+
+        Zwraca wyniki w formacie SAOSClient.search_judgments z oceną trafności. Treść to
+        początek tekstu, a przy snippets=True — wyróżnione fragmenty pasujące
+        do zapytania (highlighter uruchamiany tylko wtedy).
+        """
+        query = " ".join(keyword for keyword in keywords if keyword.strip())
+        if not query or self.es_client is None:
+            return []
+        results = []
+        for hit in self.es_client.search(self.index_name, query, size=page_size, highlight=snippets):
+            source = hit["source"]
+            highlights = hit.get("highlights", {}).get("content", [])
+            results.append({
+                "saos_id": source.get("saos_id"),
+                "court_name": source.get("court_name"),
+                "court_type": source.get("court_type"),
+                "case_number": source.get("case_number"),
+                "judgment_date": source.get("judgment_date"),
+                "keywords": source.get("keywords") or [],
+                "content": " … ".join(highlights) if highlights else (source.get("content") or "")[:1000],
+                "score": hit["score"],
+            })
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronizacja lokalnej kopii orzeczeń SAOS")
+    parser.add_argument("--since", help="Data modyfikacji dla nowego przebiegu, np. 2024-01-01T00:00:00.000")
+    parser.add_argument("--max-pages", type=int, help="Przerwanie po podanej liczbie stron (do wznowienia)")
+    parser.add_argument("--parallel", type=int, default=settings.SAOS_SYNC_PARALLEL_PAGES)
+    parser.add_argument("--page-size", type=int, default=settings.SAOS_SYNC_PAGE_SIZE)
+    parser.add_argument("--reset", action="store_true", help="Pominięcie zapisanego punktu kontrolnego")
+    parser.add_argument("--no-index", action="store_true", help="Zapis tylko do bazy danych")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+    from elasticsearch_client import ElasticsearchClient
+
+    es_client = None if args.no_index else ElasticsearchClient(settings.ELASTICSEARCH_URL)
+    sync = SAOSSync(
+        SessionLocal,
+        es_client,
+        page_size=args.page_size,
+        parallel_pages=args.parallel,
+        overlap=settings.SAOS_SYNC_OVERLAP,
+        passage_max_tokens=settings.RAG_PASSAGE_MAX_TOKENS,
+        passage_overlap_tokens=settings.RAG_PASSAGE_OVERLAP_TOKENS
+    )
+    try:
+        print(asyncio.run(sync.run(since=args.since, max_pages=args.max_pages, reset=args.reset)))
+    finally:
+        if es_client is not None:
+            es_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -63,6 +63,25 @@ class DocumentResponse(DocumentBase):
 class DocumentContent(BaseModel):
     content_text: str
 
+class ExtractionJobResponse(BaseModel):
+    id: int
+    document_id: int
+    status: str
+    error: Optional[str] = None
+    attempts: int = 0
+    page_count: Optional[int] = None
+    char_count: Optional[int] = None
+    download_ms: Optional[float] = None
+    extract_ms: Optional[float] = None
+    chunk_ms: Optional[float] = None
+    store_ms: Optional[float] = None
+    index_ms: Optional[float] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(**BaseConfig.__dict__)
+
 # Schematy aktu prawnego
 class LegalActBase(BaseModel):
     title: str
@@ -79,10 +98,20 @@ class LegalActResponse(LegalActBase):
     content: Optional[str] = None
     pdf_url: Optional[str] = None
     local_path: Optional[str] = None
+    status: Optional[str] = None
+    change_date: Optional[datetime] = None
+    version: Optional[int] = None
     created_at: datetime
     
     model_config = ConfigDict(**BaseConfig.__dict__)
 
+class LegalActArticleResponse(BaseModel):
+    isap_id: str
+    number: str
+    division: Optional[str] = None
+    content: str
+    version: Optional[int] = None
+
 # Schematy orzeczenia sądowego
 class JudgmentBase(BaseModel):
     saos_id: int
@@ -131,6 +160,19 @@ class CaseResponse(CaseBase):
     
     model_config = ConfigDict(**BaseConfig.__dict__)
 
+class CaseSummary(CaseBase):
+    """Sprawa na liście spraw — bez powiązanych obiektów, tylko ich liczba"""
+    id: int
+    created_at: datetime
+    updated_at: datetime
+    owner_id: int
+    document_count: int = 0
+    legal_act_count: int = 0
+    judgment_count: int = 0
+    question_count: int = 0
+    
+    model_config = ConfigDict(**BaseConfig.__dict__)
+
 # Schematy pytania i odpowiedzi
 class QuestionCreate(BaseModel):
     question_text: str
@@ -145,6 +187,10 @@ class QuestionResponse(BaseModel):
     
     model_config = ConfigDict(**BaseConfig.__dict__)
 
+class QuestionAsk(BaseModel):
+    question_text: str
+    max_sources: int = 10
+
 class AnswerCreate(BaseModel):
     answer_text: str
 
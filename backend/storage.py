@@ -4,6 +4,40 @@ from io import BytesIO
 import os
 from fastapi import HTTPException, status
 
+from metrics import STORAGE_BYTES, STORAGE_SECONDS, count, timed
+from tracing import traced
+
+# Rozmiar części przy wgrywaniu wieloczęściowym (minimum dopuszczalne przez S3)
+UPLOAD_PART_SIZE = 5 * 1024 * 1024
+
+# Rozmiar fragmentu przekazywanego klientowi podczas strumieniowego pobierania
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Wyjątek zgłaszany, gdy strumień przekroczy dopuszczalny rozmiar pliku"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        super().__init__(f"Plik przekracza maksymalny rozmiar {max_size} bajtów")
+
+
+class SizeLimitedStream:
+    """Strumień zliczający odczytane bajty i przerywający odczyt po przekroczeniu limitu"""
+
+    def __init__(self, source, max_size):
+        self.source = source
+        self.max_size = max_size
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = self.source.read(size)
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self.max_size:
+            raise UploadTooLargeError(self.max_size)
+        return chunk
+
+
 class MinioClient:
     def __init__(self, endpoint, access_key, secret_key):
         """Inicjalizacja klienta MinIO"""
@@ -16,6 +50,7 @@ class MinioClient:
         self.bucket_name = "asystent-prawny"
         self.ensure_bucket_exists()
 
+    @traced()
     def ensure_bucket_exists(self):
         """Sprawdzenie czy bucket istnieje, jeśli nie - utworzenie go"""
         try:
@@ -31,6 +66,7 @@ class MinioClient:
                 detail=f"Nie można utworzyć bucketa: {str(e)}"
             )
 
+    @traced()
     def check_connection(self):
         """Sprawdzenie połączenia z MinIO"""
         try:
@@ -43,6 +79,7 @@ class MinioClient:
                 detail=f"Nie można połączyć się z MinIO: {str(e)}"
             )
 
+    @traced()
     def create_user_bucket(self, user_id):
         """Tworzenie struktury katalogów dla użytkownika"""
         try:
@@ -61,6 +98,7 @@ class MinioClient:
                 detail=f"Nie można utworzyć struktury katalogów: {str(e)}"
             )
 
+    @traced()
     def create_case_directory(self, case_path):
         """Tworzenie struktury katalogów dla sprawy"""
         try:
@@ -79,6 +117,7 @@ class MinioClient:
                 detail=f"Nie można utworzyć struktury katalogów: {str(e)}"
             )
 
+    @traced()
     def delete_case_directory(self, case_path):
         """Usunięcie wszystkich plików sprawy"""
         try:
@@ -102,15 +141,18 @@ class MinioClient:
                 detail=f"Nie można usunąć plików sprawy: {str(e)}"
             )
 
+    @traced()
     def upload_file(self, file_path, content):
         """Wgrywanie pliku do MinIO"""
         try:
-            self.client.put_object(
-                bucket_name=self.bucket_name,
-                object_name=file_path,
-                data=BytesIO(content),
-                length=len(content)
-            )
+            with timed(STORAGE_SECONDS, operation="put"):
+                self.client.put_object(
+                    bucket_name=self.bucket_name,
+                    object_name=file_path,
+                    data=BytesIO(content),
+                    length=len(content)
+                )
+            count(STORAGE_BYTES, len(content), direction="put")
             return True
         except S3Error as e:
             print(f"Błąd MinIO: {e}")
@@ -119,16 +161,50 @@ class MinioClient:
                 detail=f"Nie można wgrać pliku: {str(e)}"
             )
 
+    @traced()
+    def upload_stream(self, file_path, stream, content_type="application/octet-stream"):
+        """
+        Strumieniowe wgrywanie pliku do MinIO bez buforowania całej zawartości
+
+        Plik wysyłany jest jako multipart upload o nieznanej długości, więc w pamięci
+        znajduje się co najwyżej jedna część o rozmiarze UPLOAD_PART_SIZE.
+        Zwraca liczbę wgranych bajtów.
+        """
+        if not isinstance(stream, SizeLimitedStream):
+            stream = SizeLimitedStream(stream, float("inf"))
+        try:
+            with timed(STORAGE_SECONDS, operation="put"):
+                self.client.put_object(
+                    bucket_name=self.bucket_name,
+                    object_name=file_path,
+                    data=stream,
+                    length=-1,
+                    part_size=UPLOAD_PART_SIZE,
+                    num_parallel_uploads=1,
+                    content_type=content_type
+                )
+            count(STORAGE_BYTES, stream.bytes_read, direction="put")
+            return stream.bytes_read
+        except S3Error as e:
+            print(f"Błąd MinIO: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Nie można wgrać pliku: {str(e)}"
+            )
+
+    @traced()
     def download_file(self, file_path):
         """Pobieranie pliku z MinIO"""
         try:
-            response = self.client.get_object(
-                bucket_name=self.bucket_name,
-                object_name=file_path
-            )
-            content = response.read()
-            response.close()
-            response.release_conn()
+            with timed(STORAGE_SECONDS, operation="get"):
+                response = self.client.get_object(
+                    bucket_name=self.bucket_name,
+                    object_name=file_path
+                )
+                content = response.read()
+                response.close()
+                response.release_conn()
+            count(STORAGE_BYTES, len(content), direction="get")
             return content
         except S3Error as e:
             print(f"Błąd MinIO: {e}")
@@ -137,6 +213,62 @@ class MinioClient:
                 detail=f"Nie można pobrać pliku: {str(e)}"
             )
 
+    @traced()
+    def stat_file(self, file_path):
+        """Pobieranie metadanych pliku (rozmiar, ETag, data modyfikacji) bez pobierania treści"""
+        try:
+            with timed(STORAGE_SECONDS, operation="stat"):
+                return self.client.stat_object(
+                    bucket_name=self.bucket_name,
+                    object_name=file_path
+                )
+        except S3Error as e:
+            print(f"Błąd MinIO: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Nie można pobrać pliku: {str(e)}"
+            )
+
+    @traced()
+    def stream_file(self, file_path, offset=0, length=0, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Strumieniowe pobieranie pliku (lub jego zakresu) z MinIO
+
+        Połączenie z MinIO otwierane jest od razu, dzięki czemu błędy zgłaszane są
+        przed wysłaniem nagłówków odpowiedzi. Zwracany generator oddaje kolejne
+        fragmenty i zwalnia połączenie po zakończeniu lub przerwaniu transmisji.
+        """
+        try:
+            # Mierzony jest czas do otrzymania odpowiedzi; transfer treści liczony jest w bajtach
+            with timed(STORAGE_SECONDS, operation="get_stream"):
+                response = self.client.get_object(
+                    bucket_name=self.bucket_name,
+                    object_name=file_path,
+                    offset=offset,
+                    length=length
+                )
+        except S3Error as e:
+            print(f"Błąd MinIO: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Nie można pobrać pliku: {str(e)}"
+            )
+        return self._iter_response(response, chunk_size)
+
+    @staticmethod
+    def _iter_response(response, chunk_size):
+        """Iteracja po odpowiedzi MinIO z gwarancją zwolnienia połączenia"""
+        transferred = 0
+        try:
+            for chunk in response.stream(chunk_size):
+                transferred += len(chunk)
+                yield chunk
+        finally:
+            count(STORAGE_BYTES, transferred, direction="get")
+            response.close()
+            response.release_conn()
+
+    @traced()
     def list_files(self, directory_path):
         """Listowanie plików w katalogu"""
         try:
@@ -153,13 +285,15 @@ class MinioClient:
                 detail=f"Nie można pobrać listy plików: {str(e)}"
             )
 
+    @traced()
     def delete_file(self, file_path):
         """Usuwanie pliku z MinIO"""
         try:
-            self.client.remove_object(
-                bucket_name=self.bucket_name,
-                object_name=file_path
-            )
+            with timed(STORAGE_SECONDS, operation="delete"):
+                self.client.remove_object(
+                    bucket_name=self.bucket_name,
+                    object_name=file_path
+                )
             return True
         except S3Error as e:
             print(f"Błąd MinIO: {e}")
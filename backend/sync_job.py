@@ -0,0 +1,120 @@
+"""
+Wspólna obsługa zadań synchronizacji z zewnętrznymi źródłami (SAOS, ISAP)
+
+Zadanie zapisuje swój stan w tabeli sync_checkpoints (po nazwie zadania),
+zbiera statystyki przebiegów i może działać okresowo w tle aplikacji.
+Klasy pochodne implementują `_run`, który wznawia przerwany przebieg
+z punktu kontrolnego.
+"""
+import abc
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import models
+
+
+class SyncJob(abc.ABC):
+    """Bazowe zadanie synchronizacji z punktem kontrolnym w bazie danych"""
+
+    name = ""  # Klucz punktu kontrolnego w tabeli sync_checkpoints
+    label = ""  # Opis w komunikatach, np. "orzeczeń SAOS"
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._running = False
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "runs": 0,
+            "failures": 0,
+            "pages": 0,
+            "created": 0,
+            "updated": 0,
+            "last_run_ms": 0.0,
+            "last_finished_at": None,
+            "last_error": None,
+        }
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        """Odczyt stanu zadania z tabeli sync_checkpoints"""
+        db = self.session_factory()
+        try:
+            checkpoint = db.query(models.SyncCheckpoint).filter(models.SyncCheckpoint.name == self.name).first()
+            return json.loads(checkpoint.state) if checkpoint and checkpoint.state else {}
+        finally:
+            db.close()
+
+    def save_checkpoint(self, state: Dict[str, Any]):
+        """Zapis stanu zadania"""
+        db = self.session_factory()
+        try:
+            checkpoint = db.query(models.SyncCheckpoint).filter(models.SyncCheckpoint.name == self.name).first()
+            if checkpoint is None:
+                checkpoint = models.SyncCheckpoint(name=self.name)
+                db.add(checkpoint)
+            checkpoint.state = json.dumps(state)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def run(self, since: Optional[str] = None, max_pages: Optional[int] = None,
+                  reset: bool = False) -> Dict[str, Any]:
+        """
+        Jeden przebieg synchronizacji (lub wznowienie przerwanego)
+
+        Args:
+            since: Początek zakresu dla nowego przebiegu (domyślnie z punktu kontrolnego)
+            max_pages: Maksymalna liczba stron w tym wywołaniu; niedokończony przebieg zostaje w punkcie kontrolnym
+            reset: Pominięcie zapisanego stanu i rozpoczęcie od `since`
+
+        Returns:
+            Podsumowanie przebiegu: liczba stron, nowych i zaktualizowanych rekordów, czy zakończony
+        """
+        if self._running:
+            return {"status": "already_running"}
+        self._running = True
+        started = time.perf_counter()
+        try:
+            result = await self._run(since, max_pages, reset)
+        except Exception as e:
+            print(f"Błąd synchronizacji {self.label}: {e}")
+            with self._lock:
+                self._stats["failures"] += 1
+                self._stats["last_error"] = str(e)
+            raise
+        finally:
+            self._running = False
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["pages"] += result["pages"]
+            self._stats["created"] += result["created"]
+            self._stats["updated"] += result["updated"]
+            self._stats["last_run_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            self._stats["last_finished_at"] = datetime.utcnow().isoformat()
+            self._stats["last_error"] = None
+        return result
+
+    @abc.abstractmethod
+    async def _run(self, since: Optional[str], max_pages: Optional[int], reset: bool) -> Dict[str, Any]:
+        """Przebieg synchronizacji: słownik z liczbą stron (pages), nowych (created) i zaktualizowanych (updated) rekordów"""
+
+    async def run_forever(self, interval: float):
+        """Okresowa synchronizacja w tle aplikacji"""
+        while True:
+            try:
+                result = await self.run()
+                print(f"Synchronizacja {self.label}: {result}")
+            except Exception:
+                pass  # Błąd zapisany w statystykach; punkt kontrolny pozwala wznowić przy kolejnej próbie
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Statystyki synchronizacji"""
+        with self._lock:
+            return {**self._stats, "running": self._running}
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+# Moduły backendu importowane są jak w aplikacji (uruchamianej z katalogu backend)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import models  # noqa: E402
+from http_client import HostPolicy, PoliteHTTPClient, RetryPolicy  # noqa: E402
+from mocks import legal_api_server  # noqa: E402
+
+# Bez limitu częstotliwości i z krótkimi opóźnieniami ponowień, o ile test nie sprawdza właśnie ich
+UNLIMITED = HostPolicy(rate=0, burst=1, max_concurrency=16)
+FAST_RETRY = RetryPolicy(max_attempts=3, backoff=0.01, backoff_max=2.0)
+
+
+@pytest.fixture
+def mock_api():
+    servers = []
+
+    def start(**options):
+        server, state, base_url = legal_api_server.start(**options)
+        servers.append(server)
+        return state, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(policy=UNLIMITED, retry=FAST_RETRY):
+        client = PoliteHTTPClient(default_policy=policy, retry=retry, timeout=5.0)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # Plik zamiast bazy w pamięci — zadania synchronizacji korzystają z bazy w wątkach puli I/O
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
@@ -0,0 +1,14 @@
+import sys
+
+import pytest
+
+from answer_cache import build_answer_cache
+
+
+def test_redis_backend_without_package_fails_at_startup(monkeypatch):
+    # None w sys.modules powoduje ImportError przy `import redis`
+    monkeypatch.setitem(sys.modules, "redis", None)
+
+    with pytest.raises(RuntimeError, match="wymaga pakietu redis"):
+        build_answer_cache("redis", "v1", redis_url="redis://localhost:6379/0")
+
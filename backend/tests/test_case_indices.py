@@ -0,0 +1,233 @@
+from datetime import datetime
+
+import pytest
+
+import models
+from case_indices import CaseIndexLifecycle
+from config import settings
+from elasticsearch_client import ElasticsearchClient
+
+
+class Response(dict):
+    """Odpowiedź klienta z atrybutem body, jak ObjectApiResponse"""
+
+    @property
+    def body(self):
+        return self
+
+
+class FakeIndices:
+    def __init__(self, es):
+        self.es = es
+
+    def exists(self, index):
+        return index in self.es.indices_data
+
+    def exists_alias(self, name):
+        return any(name in info["aliases"] for info in self.es.indices_data.values())
+
+    def get_alias(self, name=None, index=None):
+        if index is not None:
+            return {index: {"aliases": dict(self.es.indices_data[index]["aliases"])}}
+        return {
+            index_name: {"aliases": {name: info["aliases"][name]}}
+            for index_name, info in self.es.indices_data.items() if name in info["aliases"]
+        }
+
+    def put_index_template(self, **template):
+        self.es.templates.append(template)
+
+    def create(self, index, aliases=None, **_):
+        self.es.indices_data[index] = {"aliases": dict(aliases or {}), "settings": {}, "documents": 0}
+
+    def put_alias(self, index, name, **properties):
+        self.es.indices_data[index]["aliases"][name] = properties
+
+    def add_block(self, index, block):
+        self.es.indices_data[index]["settings"][f"index.blocks.{block}"] = True
+
+    def put_settings(self, index, settings):
+        self.es.indices_data[index]["settings"].update(settings)
+
+    def refresh(self, index):
+        pass
+
+    def shrink(self, index, target, settings):
+        self.create(target)
+        return Response()
+
+    def delete(self, index):
+        self.es.indices_data.pop(index, None)
+
+    def update_aliases(self, actions):
+        for action in actions:
+            if "remove_index" in action:
+                del self.es.indices_data[action["remove_index"]["index"]]
+            else:
+                properties = dict(action["add"])
+                index_name, alias = properties.pop("index"), properties.pop("alias")
+                self.es.indices_data[index_name]["aliases"][alias] = properties
+
+
+class FakeCluster:
+    def __init__(self, es):
+        self.es = es
+
+    def health(self, index, **_):
+        if index in self.es.unhealthy:
+            raise RuntimeError(f"Indeks {index} nie osiągnął stanu yellow")
+
+
+class FakeCat:
+    def shards(self, index, format):
+        return [{"node": "node-1"}, {"node": "node-1"}, {"node": None}]
+
+
+class FakeElasticsearch:
+    """Indeksy i aliasy w pamięci; reindex kopiuje `copied` dokumentów"""
+
+    def __init__(self):
+        self.indices_data = {}
+        self.templates = []
+        self.unhealthy = set()
+        self.copied = None
+        self.indices = FakeIndices(self)
+        self.cluster = FakeCluster(self)
+        self.cat = FakeCat()
+
+    def options(self, **_):
+        return self
+
+    def count(self, index, **_):
+        return {"count": self.indices_data[index]["documents"]}
+
+    def reindex(self, source, dest, **_):
+        documents = self.indices_data[source["index"]]["documents"]
+        self.indices_data[dest["index"]]["documents"] += documents if self.copied is None else self.copied
+        return Response(failures=[])
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def es_client():
+    client = ElasticsearchClient("http://localhost:9200")
+    client.es = FakeElasticsearch()
+    client.embedder = None
+    yield client
+    client.indexing_queue.stop()
+
+
+@pytest.fixture
+def finished_job(session_factory):
+    """Zadanie ekstrakcji dokumentu sprawy 7 zakończone w czasie blokady zapisu"""
+    db = session_factory()
+    db.add(models.Case(id=7, owner_id=1, title="Sprawa"))
+    db.add(models.Document(id=70, case_id=7, title="Pozew"))
+    db.add(models.ExtractionJob(id=700, document_id=70, status="failed", error="blokada zapisu"))
+    db.commit()
+    db.close()
+
+    def status():
+        db = session_factory()
+        try:
+            return db.get(models.ExtractionJob, 700).status
+        finally:
+            db.close()
+
+    def finish_now():
+        db = session_factory()
+        db.get(models.ExtractionJob, 700).finished_at = datetime.utcnow()
+        db.commit()
+        db.close()
+
+    return status, finish_now
+
+
+def legacy_index(es, name="case-7", documents=3):
+    es.indices.create(index=name)
+    es.indices_data[name]["documents"] = documents
+
+
+def wrap_after(method, callback):
+    """Wywołanie callback po metodzie klienta (zadanie kończy się w trakcie kopiowania)"""
+    def wrapper(*args, **kwargs):
+        result = method(*args, **kwargs)
+        callback()
+        return result
+    return wrapper
+
+
+def test_migrate_replaces_index_with_alias(es_client, session_factory, finished_job):
+    es = es_client.es
+    legacy_index(es)
+    status, finish_now = finished_job
+    resumed = []
+    lifecycle = CaseIndexLifecycle(es_client, session_factory=session_factory, resume_jobs=lambda: resumed.append(1))
+    es.reindex = wrap_after(es.reindex, finish_now)
+
+    result = lifecycle.migrate_index("case-7", owner_id=1)
+
+    assert result["target"] == "cases-000001"
+    assert "case-7" not in es.indices_data
+    assert es.indices_data["cases-000001"]["aliases"]["case-7"] == {
+        "filter": {"term": {"case_id": 7}}, "routing": "7", "is_write_index": True
+    }
+    assert status() == "pending" and resumed
+    assert lifecycle.stats()["migrated"] == 1
+
+
+def test_migrate_with_missing_documents_leaves_index_intact(es_client, session_factory, finished_job):
+    es = es_client.es
+    legacy_index(es)
+    es.copied = 2
+    status, finish_now = finished_job
+    lifecycle = CaseIndexLifecycle(es_client, session_factory=session_factory)
+    es.reindex = wrap_after(es.reindex, finish_now)
+
+    with pytest.raises(RuntimeError, match="Skopiowano 2 z 3"):
+        lifecycle.migrate_index("case-7")
+
+    assert es.indices_data["case-7"]["settings"]["index.blocks.write"] is None
+    assert es.indices_data["case-7"]["documents"] == 3
+    assert not es.indices.exists_alias(name="case-7")
+    assert status() == "pending"
+    assert lifecycle.stats()["migrated"] == 0
+
+
+def test_failed_shrink_unblocks_and_deletes_target(es_client, session_factory, finished_job):
+    es = es_client.es
+    es.indices.create(index="cases-000001", aliases={
+        "cases": {"is_write_index": False},
+        "case-7": {"filter": {"term": {"case_id": 7}}, "routing": "7"}
+    })
+    status, finish_now = finished_job
+    finish_now()
+    es.unhealthy.add("shrunk-cases-000001")
+    lifecycle = CaseIndexLifecycle(es_client, session_factory=session_factory)
+
+    with pytest.raises(RuntimeError, match="yellow"):
+        lifecycle.shrink("cases-000001")
+
+    assert "shrunk-cases-000001" not in es.indices_data
+    assert es.indices_data["cases-000001"]["settings"] == {
+        "index.routing.allocation.require._name": None, "index.blocks.write": None
+    }
+    assert "case-7" in es.indices_data["cases-000001"]["aliases"]
+    assert status() == "pending"
+
+
+def test_ensure_case_index_creates_routed_alias_in_shared_mode(es_client, monkeypatch):
+    monkeypatch.setattr(settings, "CASE_INDEX_MODE", "shared")
+    es = es_client.es
+
+    assert es_client.ensure_case_index(7) == "case-7"
+    assert es_client.ensure_case_index(7) == "case-7"
+
+    assert es.templates[0]["index_patterns"] == ["cases-*"]
+    assert es.indices_data["cases-000001"]["aliases"] == {
+        "cases": {"is_write_index": True},
+        "case-7": {"filter": {"term": {"case_id": 7}}, "routing": "7", "is_write_index": True},
+    }
+
@@ -0,0 +1,33 @@
+import re
+
+from chunking import chunk_text, split_units
+
+
+def articles(count, words=25):
+    return "\n".join(
+        f"Art. {number}. " + " ".join(f"słowo{number}x{index}" for index in range(words))
+        for number in range(1, count + 1)
+    )
+
+
+def test_split_units_headings():
+    units = split_units("Rozdział 1\nArt. 5. § 1. Treść.\n§ 2. Dalej.\nArt. 6. Koniec.")
+
+    assert [heading for heading, _ in units] == ["Rozdział 1", "Art. 5 § 1", "Art. 5 § 2", "Art. 6"]
+
+
+def test_overlap_heading_names_unit_where_text_starts():
+    passages = chunk_text(articles(7), "document-1", max_tokens=120, overlap_tokens=30)
+
+    assert len(passages) > 1
+    for passage in passages:
+        # Tekst zaczyna się nagłówkiem artykułu albo (zakładka) słowem z jego treści
+        number = re.match(r"(?:Art\. |słowo)(\d+)", passage.text).group(1)
+        assert passage.heading == f"Art. {number}"
+
+
+def test_passages_without_overlap_start_at_unit():
+    passages = chunk_text(articles(7), "document-1", max_tokens=120, overlap_tokens=0)
+
+    for passage in passages:
+        assert passage.text.startswith(f"{passage.heading}.")
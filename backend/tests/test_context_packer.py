@@ -0,0 +1,46 @@
+from context_packer import ContextCandidate, ContextPacker
+from tokenizer import count_tokens
+
+
+def candidate(text, score, doc_id):
+    return ContextCandidate(text=text, score=score, result={"id": doc_id})
+
+
+def words(prefix, count):
+    return " ".join(f"{prefix}{number}" for number in range(count))
+
+
+def test_best_passage_longer_than_budget_is_truncated_into_context():
+    packer = ContextPacker(token_budget=120)
+    best = candidate(words("uzasadnienie", 400), 10.0, "best")
+    short = [candidate(words(f"teza{number}x", 8), 2.0, f"short-{number}") for number in range(2)]
+
+    packed = packer.pack([best, *short])
+
+    # Najtrafniejszy fragment jest w kontekście (pierwszy) zamiast wypaść po krótszych
+    assert packed.selected[0]["id"] == "best"
+    assert packed.context.startswith("uzasadnienie0 uzasadnienie1")
+    assert packed.context_tokens <= 120
+    assert count_tokens(packed.context) <= 120
+
+
+def test_only_passage_longer_than_budget_fills_budget():
+    packer = ContextPacker(token_budget=50)
+
+    packed = packer.pack([candidate(words("art", 300), 1.0, "only")])
+
+    assert [result["id"] for result in packed.selected] == ["only"]
+    assert packed.context.endswith("...")
+    assert 40 <= packed.context_tokens <= 50
+
+
+def test_passages_within_budget_are_not_truncated():
+    passages = [candidate(words(f"fragment{number}x", 20), 1.0 + number, f"p{number}") for number in range(3)]
+    budget = count_tokens(passages[2].text) + count_tokens("\n\n") + count_tokens(passages[1].text)
+    texts = [passage.text for passage in passages]
+
+    packed = ContextPacker(token_budget=budget).pack(passages)
+
+    assert [result["id"] for result in packed.selected] == ["p2", "p1"]
+    assert packed.dropped_for_budget == 1
+    assert packed.context == f"{texts[2]}\n\n{texts[1]}"
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+import pytest
+
+from embeddings import BatchingEmbedder, EmbeddingCache, Embedder, HashingEmbedder
+
+TEXTS = ["Art. 1. Kodeks cywilny", "Art. 2. Kodeks karny", "Art. 3. Prawo pracy"]
+
+
+class RecordingEmbedder(HashingEmbedder):
+    """HashingEmbedder zapisujący partie i wątki, w których zostały policzone"""
+
+    def __init__(self):
+        super().__init__(dimensions=16)
+        self.batches = []
+        self.threads = []
+
+    def embed(self, texts):
+        self.batches.append(list(texts))
+        self.threads.append(threading.current_thread())
+        return super().embed(texts)
+
+
+@pytest.fixture
+def batching():
+    embedders = []
+
+    def make(**options):
+        embedder = BatchingEmbedder(RecordingEmbedder(), **options)
+        embedders.append(embedder)
+        return embedder
+
+    yield make
+    for embedder in embedders:
+        embedder.close()
+
+
+def test_embedder_requires_embed():
+    class Incomplete(Embedder):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_cache_round_trip(tmp_path):
+    embedder = HashingEmbedder(dimensions=16)
+    vectors = embedder.embed(TEXTS[:2])
+    cache = EmbeddingCache(str(tmp_path), embedder.cache_namespace, embedder.dimensions)
+    cache.put_many(TEXTS[:2], vectors)
+
+    found = cache.get_many([TEXTS[1], TEXTS[2], TEXTS[0]])
+    cache.close()
+
+    assert found[1] is None
+    assert found[0] == pytest.approx(vectors[1], abs=1e-6)
+    assert found[2] == pytest.approx(vectors[0], abs=1e-6)
+
+    reopened = EmbeddingCache(str(tmp_path), embedder.cache_namespace, embedder.dimensions)
+    assert reopened.get_many(TEXTS[:2]) == [pytest.approx(vector, abs=1e-6) for vector in vectors]
+    assert reopened.stats()["entries"] == 2
+    reopened.close()
+
+
+def test_cache_reopened_after_truncated_keys_file(tmp_path):
+    embedder = HashingEmbedder(dimensions=16)
+    cache = EmbeddingCache(str(tmp_path), embedder.cache_namespace, embedder.dimensions)
+    cache.put_many(TEXTS[:2], embedder.embed(TEXTS[:2]))
+    cache.close()
+    # Zapis klucza przerwany w połowie
+    keys_path = tmp_path / f"{embedder.cache_namespace}.keys"
+    with open(keys_path, "ab") as f:
+        f.write(EmbeddingCache.key(TEXTS[2])[:7])
+
+    reopened = EmbeddingCache(str(tmp_path), embedder.cache_namespace, embedder.dimensions)
+    assert os.path.getsize(keys_path) == 2 * EmbeddingCache.KEY_BYTES
+    assert reopened.get_many(TEXTS)[2] is None
+    reopened.put_many(TEXTS[2:], embedder.embed(TEXTS[2:]))
+
+    assert reopened.get_many(TEXTS) == [pytest.approx(vector, abs=1e-6) for vector in embedder.embed(TEXTS)]
+    reopened.close()
+
+
+def test_batch_flushes_when_full(batching):
+    embedder = batching(max_batch=3, max_wait=10.0)
+
+    started = time.monotonic()
+    vectors = embedder.embed(TEXTS)
+
+    # Pełna partia nie czeka na termin max_wait
+    assert time.monotonic() - started < 5.0
+    assert embedder.embedder.batches == [TEXTS]
+    assert vectors == HashingEmbedder(dimensions=16).embed(TEXTS)
+    assert embedder.stats()["full_batches"] == 1
+
+
+def test_batch_flushes_at_deadline(batching):
+    embedder = batching(max_batch=32, max_wait=0.1)
+    results = {}
+
+    def ask(text):
+        results[text] = embedder.embed_one(text)
+
+    threads = [threading.Thread(target=ask, args=(text,)) for text in TEXTS]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Pytania z trzech wątków w jednej niepełnej partii, policzonej po upływie max_wait
+    assert time.monotonic() - started >= 0.09
+    assert [sorted(batch) for batch in embedder.embedder.batches] == [sorted(TEXTS)]
+    assert embedder.stats()["batches"] == 1 and embedder.stats()["full_batches"] == 0
+    assert set(results) == set(TEXTS)
+
+
+def test_embed_after_close_runs_in_caller_thread(batching):
+    embedder = batching()
+    embedder.close()
+
+    vector = embedder.embed_one(TEXTS[0])
+
+    assert vector == HashingEmbedder(dimensions=16).embed_one(TEXTS[0])
+    assert embedder.embedder.threads == [threading.current_thread()]
+    assert embedder.stats()["batches"] == 0
@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import http_client
+from conftest import FAST_RETRY, UNLIMITED
+from http_client import HostPolicy, RetryPolicy, TokenBucket, UpstreamError
+from mocks import legal_api_server
+
+def test_concurrency_cap_per_host(mock_api, make_client):
+    state, base_url = mock_api(latency=0.1)
+    client = make_client(HostPolicy(rate=0, burst=1, max_concurrency=2))
+
+    threads = [
+        threading.Thread(target=client.get_json, args=(f"{base_url}/eli/acts/search",))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert state.stats["isap"]["requests"] == 8
+    assert state.stats["isap"]["max_concurrency"] == 2
+
+
+def test_async_concurrency_cap_per_host(mock_api, make_client):
+    state, base_url = mock_api(latency=0.1)
+    client = make_client(HostPolicy(rate=0, burst=1, max_concurrency=3))
+
+    async def fetch_all():
+        try:
+            return await asyncio.gather(*(client.aget_json(f"{base_url}/eli/acts/search") for _ in range(9)))
+        finally:
+            await client.aclose()
+
+    results = asyncio.run(fetch_all())
+
+    assert all(result["items"] for result in results)
+    assert state.stats["isap"]["max_concurrency"] == 3
+
+
+def test_token_bucket_paces_after_burst():
+    bucket = TokenBucket(rate=10.0, burst=2)
+
+    waits = [bucket.reserve() for _ in range(5)]
+
+    assert waits[:2] == [0.0, 0.0]
+    # Każde kolejne żądanie czeka o 1/rate dłużej od poprzedniego
+    assert waits[2:] == pytest.approx([0.1, 0.2, 0.3], abs=0.01)
+
+
+def test_requests_are_paced_by_rate_limit(mock_api, make_client):
+    state, base_url = mock_api()
+    client = make_client(HostPolicy(rate=10.0, burst=2, max_concurrency=4))
+
+    started = time.monotonic()
+    for _ in range(6):
+        client.get_json(f"{base_url}/eli/acts/search")
+    elapsed = time.monotonic() - started
+
+    # Dwa żądania z serii, cztery kolejne co 0,1 s
+    assert elapsed >= 0.35
+    assert client.stats()[base_url[len("http://"):]]["throttled_ms"] > 0
+
+
+def test_retries_on_503_until_success(mock_api, make_client, monkeypatch):
+    state, base_url = mock_api(fail_rate=0.5)
+    # Pierwsze dwie odpowiedzi to wstrzyknięte 503, trzecia jest poprawna
+    draws = iter([0.0, 0.0, 1.0])
+    monkeypatch.setattr(legal_api_server.random, "random", lambda: next(draws))
+    client = make_client()
+
+    result = client.get_json(f"{base_url}/eli/acts/search")
+
+    assert result["items"]
+    assert state.stats["isap"]["failures_injected"] == 2
+    host_stats = next(iter(client.stats().values()))
+    assert host_stats["requests"] == 3
+    assert host_stats["retries"] == 2
+
+
+def test_gives_up_after_max_attempts(mock_api, make_client):
+    state, base_url = mock_api(fail_rate=1.0)
+    client = make_client()
+
+    with pytest.raises(UpstreamError) as error:
+        client.get_json(f"{base_url}/saos/api/search/judgments")
+
+    assert error.value.status_code == 503
+    assert state.stats["saos"]["requests"] == FAST_RETRY.max_attempts
+    assert next(iter(client.stats().values()))["failures"] == 1
+
+
+def test_retry_after_on_429_is_respected(mock_api, make_client):
+    state, base_url = mock_api(rate_limit=1)
+    client = make_client()
+
+    client.get_json(f"{base_url}/eli/acts/search")
+    started = time.monotonic()
+    result = client.get_json(f"{base_url}/eli/acts/search")
+    elapsed = time.monotonic() - started
+
+    assert result["items"]
+    assert state.stats["isap"]["rate_limited"] == 1
+    # Retry-After: 1 zamiast opóźnienia wykładniczego z backoff=0,01 s
+    assert elapsed >= 0.95
+
+
+def test_retry_after_is_capped_by_backoff_max():
+    class Response:
+        headers = {"Retry-After": "120"}
+
+    assert RetryPolicy(backoff_max=5.0).delay(1, Response()) == 5.0
+
+
+def test_not_found_returns_none(mock_api, make_client):
+    state, base_url = mock_api()
+    client = make_client()
+
+    assert client.get_json(f"{base_url}/eli/acts/DU/1964/999999") is None
+    assert client.get_text(f"{base_url}/eli/acts/DU/1964/999999/text.html") is None
+    assert client.get_json(f"{base_url}/saos/api/judgments/0") is None
+    assert client.get_json(f"{base_url}/eli/acts/DU/1964/296")["pos"] == 296
+    # 404 nie jest ponawiane
+    assert state.stats["isap"]["requests"] == 3
+
+
+def test_close_http_client_closes_both_pools(mock_api, make_client, monkeypatch):
+    state, base_url = mock_api()
+    client = make_client()
+    monkeypatch.setattr(http_client, "_shared_client", client)
+
+    async def requests_then_shutdown():
+        await client.aget_json(f"{base_url}/eli/acts/search")
+        pools = client._client, client._async_client
+        await http_client.close_http_client()
+        return pools
+
+    client.get_json(f"{base_url}/eli/acts/search")
+    sync_pool, async_pool = asyncio.run(requests_then_shutdown())
+
+    assert sync_pool.is_closed and async_pool.is_closed
@@ -0,0 +1,203 @@
+import pytest
+
+import indexing_queue
+from indexing_queue import BulkIndexingQueue, IndexingError, PendingAction
+
+
+class FakeBulk:
+    """Zastępstwo helpers.bulk: zapamiętuje wywołania i zwraca zadane błędy operacji"""
+
+    def __init__(self, failures=(), exception=None):
+        self.failures = list(failures)
+        self.exception = exception
+        self.calls = []
+
+    def __call__(self, es, actions, **kwargs):
+        actions = list(actions)
+        self.calls.append((actions, kwargs))
+        if self.exception is not None:
+            raise self.exception
+        return len(actions) - len(self.failures), self.failures
+
+
+class FakeIndices:
+    def __init__(self, aliases):
+        self.aliases = aliases
+
+    def get_alias(self, name):
+        if name not in self.aliases:
+            raise LookupError(name)
+        return {self.aliases[name]: {"aliases": {name: {"is_write_index": True}}}}
+
+
+class FakeElasticsearch:
+    def __init__(self, aliases=None):
+        self.indices = FakeIndices(aliases or {})
+
+
+@pytest.fixture
+def bulk(monkeypatch):
+    def install(**options):
+        fake = FakeBulk(**options)
+        monkeypatch.setattr(indexing_queue.helpers, "bulk", fake)
+        return fake
+    return install
+
+
+def index(index_name, document_id, wait=False, **source):
+    return PendingAction({"_op_type": "index", "_index": index_name, "_id": document_id, "_source": source}, wait)
+
+
+def delete(index_name, document_id, wait=False):
+    return PendingAction({"_op_type": "delete", "_index": index_name, "_id": document_id}, wait)
+
+
+def flush_marker():
+    return PendingAction({"_op_type": "flush", "_index": "", "_id": ""}, wait=True)
+
+
+def failure(op_type, index_name, document_id, status, error="mapper_parsing_exception"):
+    return {op_type: {"_index": index_name, "_id": document_id, "status": status, "error": error}}
+
+
+def test_repeated_writes_are_coalesced(bulk):
+    fake = bulk()
+    queue = BulkIndexingQueue(FakeElasticsearch())
+    first, second, other = index("case-1", "a", version=1), index("case-1", "a", version=2), index("case-1", "b")
+
+    queue._flush([first, second, other])
+
+    actions, _ = fake.calls[0]
+    assert [(action["_id"], action["_source"]) for action in actions] == [("a", {"version": 2}), ("b", {})]
+    assert queue.stats()["coalesced"] == 1
+    assert queue.stats()["actions"] == 2
+    # Zastąpiona operacja jest rozliczana razem z ostatnią
+    assert first.error is None and second.error is None
+
+
+def test_errors_resolved_per_item(bulk):
+    bulk(failures=[failure("index", "case-1", "b", 400)])
+    queue = BulkIndexingQueue(FakeElasticsearch())
+    ok, failed = index("case-1", "a", wait=True), index("case-1", "b", wait=True)
+
+    queue._flush([ok, failed])
+
+    queue.wait(ok)
+    with pytest.raises(IndexingError, match="mapper_parsing_exception"):
+        queue.wait(failed)
+    assert queue.stats()["failed"] == 1
+
+
+def test_delete_of_missing_document_is_not_an_error(bulk):
+    bulk(failures=[failure("delete", "case-1", "gone", 404, error="not_found")])
+    queue = BulkIndexingQueue(FakeElasticsearch())
+    removed = delete("case-1", "gone", wait=True)
+
+    queue._flush([removed])
+
+    queue.wait(removed)
+    assert queue.stats()["failed"] == 0
+
+
+def test_failed_delete_other_than_404_is_reported(bulk):
+    bulk(failures=[failure("delete", "case-1", "a", 409, error="version_conflict")])
+    queue = BulkIndexingQueue(FakeElasticsearch())
+    removed = delete("case-1", "a", wait=True)
+
+    queue._flush([removed])
+
+    with pytest.raises(IndexingError, match="version_conflict"):
+        queue.wait(removed)
+
+
+@pytest.mark.parametrize("waiting, refresh", [(False, False), (True, "wait_for")])
+def test_refresh_only_when_someone_waits(bulk, waiting, refresh):
+    fake = bulk()
+    queue = BulkIndexingQueue(FakeElasticsearch())
+
+    queue._flush([index("case-1", "a"), index("case-1", "b", wait=waiting)])
+
+    assert fake.calls[0][1]["refresh"] == refresh
+
+
+def test_flush_marker_forces_refresh_and_reports_summary(bulk):
+    fake = bulk(failures=[failure("index", "case-1", "a", 400)])
+    queue = BulkIndexingQueue(FakeElasticsearch())
+    marker = flush_marker()
+
+    queue._flush([index("case-1", "a"), marker])
+
+    actions, kwargs = fake.calls[0]
+    assert [action["_op_type"] for action in actions] == ["index"]
+    assert kwargs["refresh"] == "wait_for"
+    with pytest.raises(IndexingError, match="1 operacji _bulk"):
+        queue.wait(marker)
+
+
+def test_flush_marker_alone_sends_nothing(bulk):
+    fake = bulk()
+    queue = BulkIndexingQueue(FakeElasticsearch())
+    marker = flush_marker()
+
+    queue._flush([marker])
+
+    assert fake.calls == []
+    queue.wait(marker)
+
+
+def test_request_failure_fails_every_item(bulk):
+    bulk(exception=ConnectionError("refused"))
+    queue = BulkIndexingQueue(FakeElasticsearch())
+    items = [index("case-1", "a", wait=True), delete("case-1", "b", wait=True)]
+
+    queue._flush(items)
+
+    for item in items:
+        with pytest.raises(IndexingError, match="refused"):
+            queue.wait(item)
+
+
+def test_alias_write_error_attributed_by_unique_id(bulk):
+    # Zapis przez alias sprawy — odpowiedź zawiera nazwę indeksu współdzielonego
+    bulk(failures=[failure("index", "cases-000001", "document-1", 400)])
+    queue = BulkIndexingQueue(FakeElasticsearch())
+    failed, ok = index("case-1", "document-1", wait=True), index("case-1", "document-2", wait=True)
+
+    queue._flush([failed, ok])
+
+    with pytest.raises(IndexingError):
+        queue.wait(failed)
+    queue.wait(ok)
+
+
+def test_alias_write_error_with_shared_id_resolved_by_concrete_index(bulk):
+    bulk(failures=[failure("index", "cases-000002", "summary", 400)])
+    queue = BulkIndexingQueue(FakeElasticsearch({"case-1": "cases-000001", "case-2": "cases-000002"}))
+    first, second = index("case-1", "summary", wait=True), index("case-2", "summary", wait=True)
+
+    queue._flush([first, second])
+
+    queue.wait(first)
+    with pytest.raises(IndexingError):
+        queue.wait(second)
+
+
+def test_worker_sends_batch_and_wakes_waiter(bulk):
+    fake = bulk()
+    queue = BulkIndexingQueue(FakeElasticsearch(), flush_interval=0.05)
+    try:
+        queue.submit_index("case-1", 1, {"content": "a"})
+        pending = queue.submit_index("case-1", 2, {"content": "b"}, wait=True)
+        queue.wait(pending, timeout=5)
+    finally:
+        queue.stop(timeout=5)
+
+    sent = [action["_id"] for actions, _ in fake.calls for action in actions]
+    assert sent == ["1", "2"]
+
+
+def test_wait_requires_wait_flag():
+    queue = BulkIndexingQueue(FakeElasticsearch())
+
+    with pytest.raises(ValueError):
+        queue.wait(index("case-1", "a"))
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+import models
+from isap_sync import ISAPSync
+
+AMENDED = "2030-01-02T00:00:00"
+
+
+@pytest.fixture
+def isap(mock_api, make_client, session_factory):
+    state, base_url = mock_api()
+    return state, ISAPSync(session_factory, http=make_client(), base_url=f"{base_url}/eli")
+
+
+def act_by_address(state, address):
+    return next(act for act in state.acts if act["address"] == address)
+
+
+def stored_act(session_factory, address):
+    db = session_factory()
+    try:
+        act = db.query(models.LegalAct).filter(models.LegalAct.isap_id == address).one()
+        return act, [article.content for article in act.articles]
+    finally:
+        db.close()
+
+
+def test_first_sync_stores_texts_and_articles(isap, session_factory):
+    state, sync = isap
+
+    result = asyncio.run(sync.run())
+
+    assert result["status"] == "done"
+    assert result["created"] == result["texts"] == len(state.acts)
+    act, articles = stored_act(session_factory, "WDU19640430296")
+    assert act.content and act.version == 1
+    assert articles
+
+
+def resync(sync, amend):
+    """Pełna synchronizacja, zmiana aktów w atrapie API i przebieg przyrostowy (jedna pętla zdarzeń klienta HTTP)"""
+    async def runs():
+        await sync.run()
+        amend()
+        return await sync.run()
+    return asyncio.run(runs())
+
+
+def test_change_without_html_keeps_stored_text(isap, session_factory):
+    state, sync = isap
+    before = {}
+
+    def amend():
+        before["act"], before["articles"] = stored_act(session_factory, "WDU19640430296")
+        # Nowa data zmiany, ale ISAP udostępnia już tylko PDF
+        act_by_address(state, "WDU19640430296").update(changeDate=AMENDED, textHTML=False)
+
+    result = resync(sync, amend)
+
+    assert result["updated"] == 1 and result["texts"] == 0
+    after, articles_after = stored_act(session_factory, "WDU19640430296")
+    assert after.change_date.isoformat() == AMENDED
+    assert after.content == before["act"].content
+    assert after.content_hash == before["act"].content_hash
+    assert after.version == before["act"].version
+    assert articles_after == before["articles"]
+
+
+def test_changed_html_bumps_version(isap, session_factory):
+    state, sync = isap
+
+    def amend():
+        amended = act_by_address(state, "WDU20200000875")
+        amended.update(changeDate=AMENDED, text_html=amended["text_html"].replace("</body>", "<p>Art. 99. Nowy przepis.</p></body>"))
+
+    result = resync(sync, amend)
+
+    assert result["updated"] == result["texts"] == 1
+    act, _ = stored_act(session_factory, "WDU20200000875")
+    assert act.version == 2
+    assert "Nowy przepis" in act.content
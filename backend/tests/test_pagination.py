@@ -0,0 +1,133 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from pagination import LIKE_ESCAPE, InvalidCursorError, decode_cursor, encode_cursor, keyset_page, like_pattern
+
+SAME_TIME = datetime(2024, 5, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    # Remisy: połowa spraw ma ten sam czas aktualizacji, część nie ma tytułu
+    for number in range(1, 12):
+        session.add(models.Case(
+            id=number,
+            owner_id=1,
+            title=None if number % 4 == 0 else f"Sprawa {number % 3}",
+            created_at=SAME_TIME,
+            updated_at=SAME_TIME if number % 2 else datetime(2024, 5, number, 8, 0, 0)
+        ))
+    session.commit()
+    yield session
+    session.close()
+
+
+def all_pages(db, sort, column, direction, limit=3, null_value=None):
+    ids, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = keyset_page(
+            db.query(models.Case.id, column),
+            sort, column, models.Case.id,
+            direction=direction, cursor=cursor, limit=limit, null_value=null_value
+        )
+        ids.extend(row.id for row in rows)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("updated_at:desc", SAME_TIME, 7)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "updated_at:desc") == (SAME_TIME, 7)
+    assert decode_cursor(encode_cursor("title:asc", "Sprawa", 3), "title:asc") == ("Sprawa", 3)
+
+
+def test_cursor_for_other_sort_is_rejected():
+    cursor = encode_cursor("updated_at:desc", SAME_TIME, 7)
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, "updated_at:asc")
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, "created_at:desc")
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("nie-kursor", "updated_at:desc")
+
+
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_pages_with_tied_sort_values(db, direction):
+    ids, pages = all_pages(db, "updated_at", models.Case.updated_at, direction)
+
+    expected = [
+        case.id for case in sorted(
+            db.query(models.Case).all(),
+            key=lambda case: (case.updated_at, case.id),
+            reverse=direction == "desc"
+        )
+    ]
+    assert ids == expected
+    assert pages == 4
+
+
+def test_all_rows_tied(db):
+    ids, _ = all_pages(db, "created_at", models.Case.created_at, "desc", limit=4)
+
+    assert ids == list(range(11, 0, -1))
+
+
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_nullable_sort_column_pages_through_nulls(db, direction):
+    ids, _ = all_pages(db, "title", models.Case.title, direction, limit=2, null_value="")
+
+    expected = [
+        case.id for case in sorted(
+            db.query(models.Case).all(),
+            key=lambda case: (case.title or "", case.id),
+            reverse=direction == "desc"
+        )
+    ]
+    assert ids == expected
+
+
+def test_last_page_has_no_cursor(db):
+    rows, cursor = keyset_page(
+        db.query(models.Case.id, models.Case.updated_at), "updated_at",
+        models.Case.updated_at, models.Case.id, limit=11
+    )
+
+    assert len(rows) == 11
+    assert cursor is None
+
+
+def test_like_pattern_escapes_wildcards():
+    assert like_pattern("50%") == "%50\\%%"
+    assert like_pattern("a_b\\c", prefix=True) == "a\\_b\\\\c%"
+
+
+def test_title_filter_matches_wildcards_literally(db):
+    for number, title in enumerate(["Rabat 50% ceny", "Rabat 500 zł", "umowa_najmu", "umowa najmu", "C:\\akta"], start=20):
+        db.add(models.Case(id=number, owner_id=1, title=title, created_at=SAME_TIME, updated_at=SAME_TIME))
+    db.commit()
+
+    def titles(phrase, prefix=False):
+        query = db.query(models.Case.id, models.Case.title).filter(
+            models.Case.title.ilike(like_pattern(phrase, prefix=prefix), escape=LIKE_ESCAPE)
+        )
+        rows, _ = keyset_page(query, "title", models.Case.title, models.Case.id, direction="asc", null_value="")
+        return [row.title for row in rows]
+
+    assert titles("50%") == ["Rabat 50% ceny"]
+    assert titles("umowa_") == ["umowa_najmu"]
+    assert titles("c:\\", prefix=True) == ["C:\\akta"]
+    assert titles("%") == ["Rabat 50% ceny"]
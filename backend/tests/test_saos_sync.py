@@ -0,0 +1,105 @@
+import asyncio
+import itertools
+
+import pytest
+
+import models
+from http_client import RetryPolicy, UpstreamError
+from mocks import legal_api_server
+from saos_sync import SAOSSync
+
+MODIFIED = "2031-01-02T00:00:00.000"
+
+
+@pytest.fixture
+def saos(mock_api, make_client, session_factory):
+    def make(retry=None, **options):
+        state, base_url = mock_api(**options)
+        client = make_client(retry=retry) if retry else make_client()
+        # Strony po dwa orzeczenia pobierane pojedynczo — wiadomo, którym żądaniem jest każda strona
+        return state, SAOSSync(session_factory, http=client, base_url=f"{base_url}/saos/api",
+                               page_size=2, parallel_pages=1, overlap=0)
+    return make
+
+
+def stored_judgments(session_factory):
+    db = session_factory()
+    try:
+        return {judgment.saos_id: judgment for judgment in db.query(models.Judgment)}
+    finally:
+        db.close()
+
+
+def test_first_full_sync(saos, session_factory):
+    state, sync = saos()
+
+    result = asyncio.run(sync.run())
+
+    assert result["status"] == "done"
+    assert result["pages"] == 4
+    assert result["created"] == len(state.judgments) and result["updated"] == 0
+    judgments = stored_judgments(session_factory)
+    assert sorted(judgments) == sorted(item["id"] for item in state.judgments)
+    assert judgments[12345].case_number == "III CZP 36/19"
+    # Kolejny przebieg zacznie od najnowszej widzianej modyfikacji
+    assert sync.load_checkpoint() == {"next_since": "2020-06-09T00:00:00.000", "page": None}
+
+
+def test_resume_from_checkpoint_after_failure(saos, session_factory, monkeypatch):
+    state, sync = saos(retry=RetryPolicy(max_attempts=1), fail_rate=0.5)
+    # Dwie pierwsze strony przechodzą, trzecia kończy się błędem 503
+    draws = itertools.chain([0.9, 0.9, 0.0], itertools.repeat(0.9))
+    monkeypatch.setattr(legal_api_server.random, "random", lambda: next(draws))
+
+    async def runs():
+        with pytest.raises(UpstreamError):
+            await sync.run()
+        interrupted = sync.load_checkpoint()
+        stored = len(stored_judgments(session_factory))
+        return interrupted, stored, await sync.run()
+
+    interrupted, stored, result = asyncio.run(runs())
+
+    assert interrupted["page"] == 2 and stored == 4
+    assert result["status"] == "done"
+    assert result["pages"] == 2 and result["created"] == 3 and result["updated"] == 0
+    assert state.stats["saos"]["requests"] == 3 + 2
+    assert len(stored_judgments(session_factory)) == len(state.judgments)
+
+
+def test_incremental_run_picks_up_only_modified(saos, session_factory):
+    state, sync = saos()
+
+    def modify(judgment_id, text):
+        judgment = next(item for item in state.judgments if item["id"] == judgment_id)
+        judgment.update(modificationDate=MODIFIED, textContent=text)
+
+    async def runs():
+        await sync.run()
+        modify(12345, "Uchwała po sprostowaniu.")
+        modify(54321, "Uzasadnienie uzupełnione.")
+        return await sync.run()
+
+    result = asyncio.run(runs())
+
+    assert result["since"] == "2020-06-09T00:00:00.000"
+    # Pełna strona dwóch zmienionych orzeczeń, po niej pusta strona kończąca przebieg
+    assert result["pages"] == 2 and result["created"] == 0 and result["updated"] == 2
+    judgments = stored_judgments(session_factory)
+    assert judgments[12345].content == "Uchwała po sprostowaniu."
+    assert judgments[54321].content == "Uzasadnienie uzupełnione."
+
+
+def test_repeated_sync_upserts_by_saos_id(saos, session_factory):
+    state, sync = saos()
+
+    async def runs():
+        await sync.run()
+        first = {saos_id: judgment.id for saos_id, judgment in stored_judgments(session_factory).items()}
+        return first, await sync.run(reset=True)
+
+    first, result = asyncio.run(runs())
+
+    assert result["created"] == 0 and result["updated"] == len(state.judgments)
+    second = {saos_id: judgment.id for saos_id, judgment in stored_judgments(session_factory).items()}
+    assert second == first
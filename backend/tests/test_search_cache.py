@@ -0,0 +1,98 @@
+import pytest
+
+from config import settings
+from elasticsearch_client import ElasticsearchClient
+
+
+class FakeElasticsearch:
+    """Odpowiedzi _msearch: cztery dokumenty, a dla żądań highlight — wyróżnienia wskazanych dokumentów"""
+
+    def __init__(self):
+        self.calls = []
+
+    def msearch(self, index, searches):
+        self.calls.append(searches)
+        responses = []
+        for body in searches[1::2]:
+            if "highlight" in body:
+                ids = body["query"]["bool"]["filter"]["ids"]["values"]
+                hits = [
+                    {"_id": hit_id, "_score": 1.0, "highlight": {"content": [f"<strong>{hit_id}</strong>"]}}
+                    for hit_id in ids
+                ]
+            else:
+                hits = [
+                    {"_id": f"d{number}", "_score": 5.0 - number, "_source": {"content": "Art. 1"}}
+                    for number in range(4)
+                ]
+            responses.append({"hits": {"hits": hits}})
+        return {"responses": responses}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_CACHE_SETTLE", 2.0)
+    es_client = ElasticsearchClient("http://localhost:9200")
+    es_client.es = FakeElasticsearch()
+    es_client.embedder = None
+    yield es_client
+    es_client.indexing_queue.stop()
+
+
+def search(es_client, query, **kwargs):
+    return es_client.search("case-1", query, size=4, mode="bm25", **kwargs)
+
+
+def test_respaced_query_hits_cache(client):
+    first = search(client, "Kodeks  cywilny")
+    second = search(client, "kodeks cywilny")
+
+    assert first == second
+    assert len(client.es.calls) == 1
+    assert client.search_stats()["cache_hits"] == 1
+
+
+def test_cached_results_are_copies(client):
+    search(client, "kodeks cywilny")[0]["score"] = 99
+
+    assert search(client, "kodeks cywilny")[0]["score"] == 5.0
+
+
+def test_write_invalidates_and_settle_window_skips_caching(client, monkeypatch):
+    search(client, "kodeks cywilny")
+    client.index_document("case-1", "d9", {"content": "nowy"})
+
+    # Zapis mógł jeszcze nie trafić do indeksu — wyniki nie są zapamiętywane
+    search(client, "kodeks cywilny")
+    search(client, "kodeks cywilny")
+    assert len(client.es.calls) == 3
+
+    monkeypatch.setattr(settings, "SEARCH_CACHE_SETTLE", 0.0)
+    search(client, "kodeks cywilny")
+    search(client, "kodeks cywilny")
+    assert len(client.es.calls) == 4
+
+
+def test_generation_is_per_index(client):
+    search(client, "kodeks cywilny")
+    client.index_document("case-2", "d9", {"content": "nowy"})
+    search(client, "kodeks cywilny")
+
+    assert len(client.es.calls) == 1
+
+
+def test_highlights_fetched_on_demand_and_cached(client):
+    plain = search(client, "kodeks cywilny")
+    assert not plain[0]["highlights"]
+
+    highlighted = search(client, "kodeks cywilny", highlight=True)
+    again = search(client, "kodeks cywilny", highlight=True)
+
+    assert highlighted[1]["highlights"] == {"content": ["<strong>d1</strong>"]}
+    assert again == highlighted
+    # Jedno wyszukiwanie i jedno żądanie wyróżnień, bez ponownego zapytania o wyniki
+    assert len(client.es.calls) == 2
+    assert client.search_stats()["highlight_requests"] == 1
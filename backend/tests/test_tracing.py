@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("opentelemetry.sdk")
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from opentelemetry.sdk.trace import TracerProvider  # noqa: E402
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor  # noqa: E402
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter  # noqa: E402
+
+import tracing  # noqa: E402
+
+
+@pytest.fixture
+def traced_app(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(tracing, "ENABLED", True)
+    monkeypatch.setattr(tracing, "_tracer", lambda: provider.get_tracer("test"))
+    app = FastAPI()
+    tracing.instrument_app(app)
+    return app, exporter
+
+
+def test_span_ends_after_streamed_body(traced_app):
+    app, exporter = traced_app
+    sent = []
+
+    @app.get("/stream/{chunks}")
+    async def stream(chunks: int):
+        async def body():
+            for number in range(chunks):
+                await asyncio.sleep(0.05)
+                sent.append(time.time_ns())
+                yield f"{number}\n"
+        return StreamingResponse(body(), media_type="text/plain")
+
+    response = TestClient(app).get("/stream/3")
+
+    assert response.text == "0\n1\n2\n"
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "GET /stream/{chunks}"
+    assert span.attributes["http.status_code"] == 200
+    # Czas spanu obejmuje wysłanie całej treści
+    assert span.end_time >= sent[-1]
+
+
+def test_span_ends_for_plain_response(traced_app):
+    app, exporter = traced_app
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    assert TestClient(app).get("/health").json() == {"status": "ok"}
+    (span,) = exporter.get_finished_spans()
+    assert span.attributes["http.route"] == "/health"
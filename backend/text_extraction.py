@@ -0,0 +1,87 @@
+"""
+Funkcje ekstrakcji tekstu z dokumentów (PDF, DOCX, TXT)
+
+Moduł nie importuje konfiguracji ani bazy danych, dzięki czemu może być
+ładowany w procesach roboczych puli ProcessPoolExecutor.
+"""
+import os
+from typing import List
+
+# Kodowania próbowane dla plików tekstowych (polskie dokumenty bywają w cp1250)
+TEXT_ENCODINGS = ("utf-8", "cp1250", "iso-8859-2")
+
+# Liczba akapitów DOCX łączonych w jedną "stronę" (DOCX nie ma podziału na strony)
+DOCX_PARAGRAPHS_PER_PAGE = 50
+
+
+class UnsupportedDocumentError(Exception):
+    """Wyjątek zgłaszany dla formatów, z których nie potrafimy wyekstrahować tekstu"""
+
+
+def detect_format(file_type: str, filename: str) -> str:
+    """Ustalenie formatu dokumentu na podstawie typu MIME lub rozszerzenia"""
+    file_type = (file_type or "").lower()
+    extension = os.path.splitext(filename or "")[1].lower()
+    if "pdf" in file_type or extension == ".pdf":
+        return "pdf"
+    if "wordprocessingml" in file_type or extension == ".docx":
+        return "docx"
+    if file_type.startswith("text/") or extension in (".txt", ".md", ".csv"):
+        return "txt"
+    raise UnsupportedDocumentError(f"Nieobsługiwany format dokumentu: {file_type or extension}")
+
+
+def extract_pages(path: str, file_type: str, filename: str) -> List[str]:
+    """
+    Ekstrakcja tekstu z pliku strona po stronie
+
+    Args:
+        path: Ścieżka do lokalnej kopii pliku
+        file_type: Typ MIME dokumentu
+        filename: Oryginalna nazwa pliku
+
+    Returns:
+        Lista tekstów kolejnych stron
+    """
+    document_format = detect_format(file_type, filename)
+    if document_format == "pdf":
+        pages = _extract_pdf(path)
+    elif document_format == "docx":
+        pages = _extract_docx(path)
+    else:
+        pages = _extract_txt(path)
+    # PostgreSQL nie przyjmuje znaków NUL w kolumnach tekstowych
+    return [page.replace("\x00", "") for page in pages]
+
+
+def _extract_pdf(path: str) -> List[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [(page.extract_text() or "").strip() for page in reader.pages]
+
+
+def _extract_docx(path: str) -> List[str]:
+    import docx
+
+    document = docx.Document(path)
+    paragraphs = [paragraph.text for paragraph in document.paragraphs if paragraph.text.strip()]
+    return [
+        "\n".join(paragraphs[start:start + DOCX_PARAGRAPHS_PER_PAGE])
+        for start in range(0, len(paragraphs), DOCX_PARAGRAPHS_PER_PAGE)
+    ]
+
+
+def _extract_txt(path: str) -> List[str]:
+    with open(path, "rb") as f:
+        raw = f.read()
+    for encoding in TEXT_ENCODINGS:
+        try:
+            text = raw.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        text = raw.decode("utf-8", errors="replace")
+    # Znak wysunięcia strony traktujemy jako podział strony
+    return [page.strip() for page in text.split("\f")]
@@ -0,0 +1,52 @@
+import re
+from functools import lru_cache
+from typing import List, Sequence
+
+# Kodowanie używane przez modele OpenAI (gpt-3.5/gpt-4)
+DEFAULT_ENCODING = "cl100k_base"
+
+
+class _WordEncoding:
+    """Przybliżone kodowanie słowami, gdy tiktoken nie może załadować słownika BPE"""
+
+    _pattern = re.compile(r"\S+\s*|\s+")
+
+    def encode(self, text: str, **kwargs) -> List[str]:
+        return self._pattern.findall(text)
+
+    def decode(self, tokens: Sequence[str]) -> str:
+        return "".join(tokens)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = DEFAULT_ENCODING):
+    """Kodowanie tiktoken (ładowane raz na proces)"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"Nie można załadować kodowania tiktoken {name}: {e}")
+        return _WordEncoding()
+
+
+def encode(text: str) -> list:
+    """Zamiana tekstu na listę tokenów"""
+    return get_encoding().encode(text, disallowed_special=())
+
+
+def decode(tokens: Sequence) -> str:
+    """Zamiana listy tokenów z powrotem na tekst"""
+    return get_encoding().decode(list(tokens))
+
+
+def count_tokens(text: str) -> int:
+    """Liczba tokenów w tekście"""
+    return len(encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Skrócenie tekstu do podanej liczby tokenów"""
+    tokens = encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return decode(tokens[:max_tokens])
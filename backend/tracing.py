@@ -0,0 +1,259 @@
+"""
+Śledzenie rozproszone OpenTelemetry
+
+Każde żądanie HTTP otwiera span serwera (z kontekstem przekazanym w nagłówku
+traceparent), a metody klientów MinIO, Elasticsearch, ISAP, SAOS oraz silnika
+RAG, zapytania SQL i wywołania LLM tworzą spany potomne. Spany trafiają do
+kolektora OTLP albo do pliku JSON Lines do analizy offline.
+
+Gdy śledzenie jest wyłączone (TRACING_ENABLED=false albo brak pakietów
+opentelemetry), `traced` zwraca dekorowaną funkcję bez zmian, a `span`
+współdzielony pusty kontekst.
+"""
+import functools
+import inspect
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, Optional
+
+from config import settings
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:
+    trace = None
+
+ENABLED = settings.TRACING_ENABLED and trace is not None
+
+_NOOP = nullcontext()
+
+_provider = None
+
+
+class _NoopSpan:
+    """Zastępczy span, gdy śledzenie jest wyłączone"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _tracer():
+    return trace.get_tracer("asystent-prawny")
+
+
+def _span_exporter():
+    """Eksporter spanów wybrany ustawieniem TRACING_EXPORTER: otlp, file lub console"""
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    exporter = settings.TRACING_EXPORTER
+    if exporter == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    if exporter == "file":
+        # Jeden span na linię (JSON Lines)
+        out = open(settings.TRACING_FILE_PATH, "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if exporter == "console":
+        return ConsoleSpanExporter()
+    raise ValueError(f"Nieznany eksporter śledzenia: {exporter}")
+
+
+def init_tracing():
+    """Konfiguracja dostawcy spanów; wywoływana raz przy starcie aplikacji"""
+    global _provider
+    if not ENABLED or _provider is not None:
+        return
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+            sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO))
+        )
+        provider.add_span_processor(BatchSpanProcessor(_span_exporter()))
+    except Exception as e:
+        print(f"Nie można skonfigurować śledzenia OpenTelemetry: {e}")
+        return
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    print(f"Śledzenie OpenTelemetry włączone (eksporter: {settings.TRACING_EXPORTER})")
+
+
+def shutdown_tracing():
+    """Wysłanie buforowanych spanów przed zakończeniem procesu"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def span(name: str, **attributes):
+    """
+    Span obejmujący blok kodu, ustawiany jako bieżący
+
+    Przykład:
+        with span("llm.complete", provider="openai"):
+            ...
+    """
+    if not ENABLED:
+        return _NOOP
+    return _tracer().start_as_current_span(name, attributes=attributes or None)
+
+
+def start_span(name: str, **attributes):
+    """
+    Span zamykany ręcznie przez `end()`, bez ustawiania go jako bieżący
+
+    Do bloków rozciągających się na kolejne kroki generatora, które mogą
+    wykonywać się w różnych wątkach.
+    """
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _tracer().start_span(name, attributes=attributes or None)
+
+
+def traced(name: Optional[str] = None, **attributes):
+    """
+    Dekorator tworzący span dla każdego wywołania funkcji
+
+    Nazwą spanu jest domyślnie kwalifikowana nazwa funkcji (np.
+    "MinioClient.upload_file"). Dla generatorów span obejmuje całe
+    przetwarzanie aż do wyczerpania lub zamknięcia generatora.
+    """
+    def decorator(func):
+        if not ENABLED:
+            return func
+        span_name = name or func.__qualname__
+        span_attributes = {"code.function": func.__qualname__, **attributes}
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                current = _tracer().start_span(span_name, attributes=span_attributes)
+                try:
+                    generator = func(*args, **kwargs)
+                    while True:
+                        # Każdy krok może działać w innym wątku puli, więc span jest
+                        # ustawiany jako bieżący tylko na czas kroku
+                        with trace.use_span(current, end_on_exit=False):
+                            try:
+                                item = next(generator)
+                            except StopIteration:
+                                return
+                        yield item
+                finally:
+                    current.end()
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer().start_as_current_span(span_name, attributes=span_attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_app(app):
+    """Span serwera dla każdego żądania HTTP, z kontekstem z nagłówka traceparent"""
+    if not ENABLED:
+        return
+
+    @app.middleware("http")
+    async def trace_request(request, call_next):
+        # Span kończy się po wysłaniu treści odpowiedzi, a nie po nagłówkach (odpowiedzi strumieniowe)
+        current = _tracer().start_span(
+            f"{request.method} {request.url.path}",
+            context=propagate.extract(request.headers),
+            kind=SpanKind.SERVER,
+            attributes={"http.method": request.method, "http.target": request.url.path}
+        )
+        try:
+            with trace.use_span(current, end_on_exit=False):
+                response = await call_next(request)
+        except BaseException:
+            current.end()
+            raise
+        route = request.scope.get("route")
+        if route is not None:
+            # Nazwa według szablonu trasy, aby spany tego samego endpointu się grupowały
+            current.update_name(f"{request.method} {route.path}")
+            current.set_attribute("http.route", route.path)
+        current.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            current.set_status(Status(StatusCode.ERROR))
+        body = getattr(response, "body_iterator", None)
+        if body is None:
+            current.end()
+        else:
+            response.body_iterator = _end_after_body(body, current)
+        return response
+
+
+async def _end_after_body(body, current):
+    """Przekazanie treści odpowiedzi i zakończenie spanu żądania po jej ostatniej części"""
+    try:
+        async for chunk in body:
+            yield chunk
+    except Exception as e:
+        current.record_exception(e)
+        current.set_status(Status(StatusCode.ERROR))
+        raise
+    finally:
+        current.end()
+
+
+def instrument_engine(engine):
+    """Span dla każdego zapytania SQL silnika SQLAlchemy"""
+    if not ENABLED:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip().split(" ", 1)[0].upper()
+        current = _tracer().start_span(
+            f"sql {operation}",
+            kind=SpanKind.CLIENT,
+            attributes={"db.system": engine.dialect.name, "db.statement": statement[:2000]}
+        )
+        conn.info.setdefault("trace_spans", []).append(current)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            spans.pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+        if spans:
+            current = spans.pop()
+            current.record_exception(exception_context.original_exception)
+            current.set_status(Status(StatusCode.ERROR))
+            current.end()
+
+
+def record_event(current, name: str, started: Optional[float] = None, **attributes: Any):
+    """Zdarzenie w spanie; przy podanym `started` dodaje czas od rozpoczęcia w ms"""
+    event_attributes: Dict[str, Any] = dict(attributes)
+    if started is not None:
+        event_attributes["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    current.add_event(name, event_attributes)
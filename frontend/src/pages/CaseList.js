@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Link as RouterLink } from 'react-router-dom';
 import api from '../utils/api';  // Import our configured api instance
 import {
@@ -34,58 +34,64 @@ import { pl } from 'date-fns/locale';
 
 const CaseList = () => {
   const [cases, setCases] = useState([]);
-  const [filteredCases, setFilteredCases] = useState([]);
   const [searchTerm, setSearchTerm] = useState('');
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [deleteDialogOpen, setDeleteDialogOpen] = useState(false);
   const [caseToDelete, setCaseToDelete] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Fraza ostatniego wyszukiwania — odpowiedzi dla wcześniejszych fraz są pomijane
+  const latestTerm = useRef('');
 
-  useEffect(() => {
-    const fetchCases = async () => {
-      try {
-        const response = await api.get('/cases');
-        console.log('Cases response:', response);
-        // Ensure we have a valid array of cases with required fields
-        const casesData = Array.isArray(response.data) ? response.data.map(caseItem => ({
-          ...caseItem,
-          documents: Array.isArray(caseItem.documents) ? caseItem.documents : [],
-          title: caseItem.title || 'Untitled Case',
-          description: caseItem.description || '',
-          created_at: caseItem.created_at || new Date().toISOString()
-        })) : [];
-        setCases(casesData);
-        setFilteredCases(casesData);
-        setLoading(false);
-      } catch (err) {
-        console.error('Błąd pobierania spraw:', err);
-        setError('Nie udało się pobrać listy spraw. Spróbuj ponownie później.');
+  const fetchCases = async (cursor = null, term = '') => {
+    latestTerm.current = term;
+    try {
+      // Lista jest stronicowana — kursor kolejnej strony przychodzi w nagłówku X-Next-Cursor;
+      // wyszukiwanie po tytule wykonuje serwer, więc obejmuje wszystkie strony
+      const params = {};
+      if (cursor) params.cursor = cursor;
+      if (term) params.title = term;
+      const response = await api.get('/cases', { params });
+      if (term !== latestTerm.current) return;
+      console.log('Cases response:', response);
+      // Ensure we have a valid array of cases with required fields
+      const casesData = Array.isArray(response.data) ? response.data.map(caseItem => ({
+        ...caseItem,
+        document_count: caseItem.document_count || 0,
+        title: caseItem.title || 'Untitled Case',
+        description: caseItem.description || '',
+        created_at: caseItem.created_at || new Date().toISOString()
+      })) : [];
+      setCases(prevCases => (cursor ? [...prevCases, ...casesData] : casesData));
+      setNextCursor(response.headers?.['x-next-cursor'] || null);
+    } catch (err) {
+      console.error('Błąd pobierania spraw:', err);
+      setError('Nie udało się pobrać listy spraw. Spróbuj ponownie później.');
+      if (!cursor) {
         setCases([]);
-        setFilteredCases([]);
-        setLoading(false);
       }
-    };
-
-    fetchCases();
-  }, []);
+    } finally {
+      setLoading(false);
+      setLoadingMore(false);
+    }
+  };
 
   useEffect(() => {
-    // Filtrowanie spraw na podstawie wyszukiwanego terminu
-    if (!Array.isArray(cases)) {
-      setFilteredCases([]);
-      return;
-    }
-    
-    if (searchTerm.trim() === '') {
-      setFilteredCases(cases);
-    } else {
-      const filtered = cases.filter(caseItem => 
-        caseItem?.title?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        caseItem?.description?.toLowerCase().includes(searchTerm.toLowerCase())
-      );
-      setFilteredCases(filtered);
-    }
-  }, [searchTerm, cases]);
+    // Nowa fraza zaczyna listę od pierwszej strony (kursor dotyczył poprzedniego filtra);
+    // zapytanie wysyłane jest po krótkiej przerwie w pisaniu
+    const term = searchTerm.trim();
+    const timer = setTimeout(() => {
+      setNextCursor(null);
+      fetchCases(null, term);
+    }, term ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  const handleLoadMore = () => {
+    setLoadingMore(true);
+    fetchCases(nextCursor, searchTerm.trim());
+  };
 
   const handleSearchChange = (e) => {
     setSearchTerm(e.target.value);
@@ -104,7 +110,6 @@ const CaseList = () => {
     try {
       await api.delete(`/cases/${caseToDelete.id}`);
       setCases(prevCases => prevCases.filter(c => c.id !== caseToDelete.id));
-      setFilteredCases(prevCases => prevCases.filter(c => c.id !== caseToDelete.id));
       setDeleteDialogOpen(false);
       setCaseToDelete(null);
     } catch (err) {
@@ -168,14 +173,14 @@ const CaseList = () => {
 
       <Paper elevation={3}>
         <List sx={{ width: '100%', bgcolor: 'background.paper' }}>
-          {!Array.isArray(filteredCases) || filteredCases.length === 0 ? (
+          {!Array.isArray(cases) || cases.length === 0 ? (
             <Box sx={{ p: 3, textAlign: 'center' }}>
               <Typography variant="body1" color="text.secondary">
-                {!Array.isArray(cases) || cases.length === 0 
+                {searchTerm.trim() === ''
                   ? "Nie masz jeszcze żadnych spraw. Utwórz nową sprawę, aby rozpocząć."
                   : "Nie znaleziono spraw pasujących do kryteriów wyszukiwania."}
               </Typography>
-              {(!Array.isArray(cases) || cases.length === 0) && (
+              {searchTerm.trim() === '' && (
                 <Button
                   variant="contained"
                   color="primary"
@@ -189,7 +194,7 @@ const CaseList = () => {
               )}
             </Box>
           ) : (
-            filteredCases.map((caseItem, index) => (
+            cases.map((caseItem, index) => (
               <React.Fragment key={caseItem?.id || index}>
                 {index > 0 && <Divider variant="inset" component="li" />}
                 <ListItem 
@@ -227,7 +232,7 @@ const CaseList = () => {
                   />
                   <ListItemSecondaryAction>
                     <Chip 
-                      label={`Dokumenty: ${Array.isArray(caseItem?.documents) ? caseItem.documents.length : 0}`} 
+                      label={`Dokumenty: ${caseItem?.document_count || 0}`} 
                       size="small" 
                       sx={{ mr: 1 }}
                     />
@@ -251,6 +256,13 @@ const CaseList = () => {
             ))
           )}
         </List>
+        {nextCursor && (
+          <Box sx={{ display: 'flex', justifyContent: 'center', p: 2 }}>
+            <Button onClick={handleLoadMore} disabled={loadingMore}>
+              {loadingMore ? 'Ładowanie...' : 'Pokaż więcej'}
+            </Button>
+          </Box>
+        )}
       </Paper>
 
       {/* Delete Confirmation Dialog */}
@@ -40,12 +40,12 @@ const Dashboard = () => {
         const casesResponse = await api.get('/cases');
         console.log('Cases response:', casesResponse);
         const casesData = casesResponse.data || [];
-        // Ensure each case has documents array initialized
+        // Case list returns summaries with counts instead of nested documents
         const normalizedCases = Array.isArray(casesData) ? casesData.map(caseItem => ({
           ...caseItem,
-          documents: Array.isArray(caseItem?.documents) ? caseItem.documents : [],
-          legal_acts: Array.isArray(caseItem?.legal_acts) ? caseItem.legal_acts : [],
-          judgments: Array.isArray(caseItem?.judgments) ? caseItem.judgments : []
+          document_count: caseItem?.document_count || 0,
+          legal_act_count: caseItem?.legal_act_count || 0,
+          judgment_count: caseItem?.judgment_count || 0
         })) : [];
         setCases(normalizedCases);
         